@@ -1,14 +1,61 @@
+import dataclasses
 import json
 import logging
+import sys
 import time
-from typing import Annotated
+from enum import Enum
+from typing import Annotated, Optional
 
+import click
 import typer
+from click.core import ParameterSource
 
-from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
-from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
-from org_fraggles.build_action_scheduler.scheduler import ActionScheduler
-from org_fraggles.build_action_scheduler.types import Action, ActionModel
+from org_fraggles.build_action_scheduler.action_cache import (
+    ActionCache,
+    SqliteActionCache,
+)
+from org_fraggles.build_action_scheduler.actions_loader import load_actions_info
+from org_fraggles.build_action_scheduler.compiled_graph import (
+    CompiledActionsInfo,
+    CompiledGraphError,
+    compile_actions_info,
+    is_compiled_graph,
+    load_compiled_actions_info,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    DependencyAnalyzer,
+    DependencyCycleError,
+    UnknownDependencyError,
+)
+from org_fraggles.build_action_scheduler.duration_history import (
+    DurationHistoryKey,
+    SqliteDurationHistory,
+    apply_duration_estimates,
+)
+from org_fraggles.build_action_scheduler.executors import (
+    ExecutorKind,
+    create_action_executor,
+)
+from org_fraggles.build_action_scheduler.priority_policies import (
+    CriticalPathPriorityPolicy,
+    FifoPriorityPolicy,
+    MostSuccessorsPriorityPolicy,
+    PriorityPolicy,
+    ShortestJobFirstPriorityPolicy,
+    WeightedPriorityPolicy,
+)
+from org_fraggles.build_action_scheduler.progress import ProgressReporter
+from org_fraggles.build_action_scheduler.resources import ResourceBudget
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.scheduling_trace import write_chrome_trace
+
+# The backends, the simulator, the analysis snapshots, the remote cache and the
+# daemon client are imported where they're used: most runs need only one of
+# them, and some import heavy modules (asyncio, multiprocessing, socket,
+# pickle, http.client) which would slow down every start.
 
 log = logging.getLogger(__name__)
 
@@ -21,23 +68,101 @@ logging.basicConfig(
 )
 
 
+class Backend(str, Enum):
+    """How actions are executed concurrently."""
+
+    # One thread per concurrently running action.
+    THREADS = "threads"
+
+    # One coroutine per concurrently running action, on a single event loop.
+    ASYNCIO = "asyncio"
+
+    # One worker process per concurrently running action.
+    PROCESSES = "processes"
+
+    # Worker processes connected to a coordinator, possibly on other hosts.
+    DISTRIBUTED = "distributed"
+
+
+class PriorityPolicyKind(str, Enum):
+    """Which ready actions are executed first."""
+
+    # The actions with the longest remaining path.
+    CRITICAL_PATH = "critical_path"
+
+    # The actions with the most transitive dependents.
+    MOST_SUCCESSORS = "most_successors"
+
+    # The shortest actions.
+    SHORTEST_JOB_FIRST = "shortest_job_first"
+
+    # The actions that became ready first.
+    FIFO = "fifo"
+
+    # A weighted mix of the critical path and most successors policies.
+    WEIGHTED = "weighted"
+
+
+# The parameters of `main` that can't be set with --daemon-socket, since the
+# daemon schedules and executes actions with its own settings.
+DAEMON_IGNORED_PARAMETERS = {
+    "action_status_polling_interval_s",
+    "dry_run",
+    "algorithm",
+    "backend",
+    "coordinator_host",
+    "coordinator_port",
+    "heartbeat_timeout_s",
+    "executor",
+    "action_cache_path",
+    "action_cache_max_entries",
+    "remote_cache_url",
+    "remote_cache_max_connections",
+    "use_numpy",
+    "analysis_snapshot",
+    "trace_out",
+    "progress_interval_s",
+    "progress_terminal",
+    "progress_json_lines",
+    "priority_policy",
+    "critical_path_weight",
+    "cpus",
+    "memory_mb",
+    "simulate",
+}
+
+
 def main(
-    parallelism: Annotated[
-        int,
-        typer.Option(..., help="The maximum number of actions to execute in parallel."),
-    ],
     actions_file: Annotated[
         str,
         typer.Option(
             ...,
-            help="The path to the JSON file containing the list of actions to schedule.",
+            help=(
+                "The path to the JSON (array or JSON Lines) file containing the"
+                " list of actions to schedule, or to a graph compiled from one"
+                " with the 'compile' command."
+            ),
         ),
     ],
+    parallelism: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            min=1,
+            help=(
+                "The maximum number of actions to execute in parallel. Required"
+                " unless --daemon-socket is given."
+            ),
+        ),
+    ] = None,
     action_status_polling_interval_s: Annotated[
-        int,
+        float,
         typer.Option(
             ...,
-            help="The interval in seconds to poll for actions ready to be scheduled.",
+            help=(
+                "The maximum interval in seconds to wait for an action to finish"
+                " before polling for actions ready to be scheduled."
+            ),
         ),
     ] = 1,
     dry_run: Annotated[
@@ -47,35 +172,590 @@ def main(
             help="Whether or not to actually execute actions. True will skip the sleep calls.",
         ),
     ] = False,
+    algorithm: Annotated[
+        SchedulingAlgorithm,
+        typer.Option(
+            ...,
+            help=(
+                "The algorithm used to find actions ready to be executed. The"
+                " critical paths algorithm enumerates every leaf-to-root path,"
+                " and is kept to compare with."
+            ),
+        ),
+    ] = SchedulingAlgorithm.READY_QUEUE,
+    backend: Annotated[
+        Backend,
+        typer.Option(
+            ...,
+            help=(
+                "How actions are executed concurrently. The asyncio backend always"
+                " uses the ready queue algorithm."
+            ),
+        ),
+    ] = Backend.THREADS,
+    coordinator_host: Annotated[
+        str,
+        typer.Option(
+            ...,
+            help="The host the coordinator listens on, with the distributed backend.",
+        ),
+    ] = "127.0.0.1",
+    coordinator_port: Annotated[
+        int,
+        typer.Option(
+            ...,
+            help=(
+                "The port the coordinator listens on, with the distributed backend."
+                " Workers are started with"
+                " 'python -m org_fraggles.build_action_scheduler.distributed'."
+            ),
+        ),
+    ] = 7070,
+    heartbeat_timeout_s: Annotated[
+        float,
+        typer.Option(
+            ...,
+            help=(
+                "How long a worker can stay silent before its actions are handed"
+                " to other workers, with the distributed backend."
+            ),
+        ),
+    ] = 10,
+    executor: Annotated[
+        ExecutorKind,
+        typer.Option(
+            ...,
+            help=(
+                "What executing an action means. The subprocess executor runs the"
+                " 'command' field of each action in a shell. With the distributed"
+                " backend, workers choose their own executor."
+            ),
+        ),
+    ] = ExecutorKind.SLEEP,
+    action_cache_path: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The path to a SQLite database caching action results across runs."
+                " Actions whose result is cached aren't executed."
+            ),
+        ),
+    ] = None,
+    action_cache_max_entries: Annotated[
+        int,
+        typer.Option(
+            ...,
+            help="The maximum number of results in the action cache.",
+        ),
+    ] = 1_000_000,
+    remote_cache_url: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The URL of a remote action cache shared across machines, e.g., by"
+                " CI runners. Can't be combined with --action-cache-path."
+            ),
+        ),
+    ] = None,
+    remote_cache_max_connections: Annotated[
+        int,
+        typer.Option(
+            ...,
+            help="The maximum number of connections open to the remote action cache.",
+        ),
+    ] = 8,
+    daemon_socket: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The Unix socket of a scheduler daemon to run the build on, sharing"
+                " its workers with the other builds it runs. The daemon executes"
+                " actions with its own settings, so --parallelism isn't needed and"
+                " the scheduling, execution and cache options can't be set."
+            ),
+        ),
+    ] = None,
+    build_weight: Annotated[
+        float,
+        typer.Option(
+            ...,
+            help=(
+                "The share of the daemon's workers the build gets, relative to the"
+                " other builds it runs. Must be positive."
+            ),
+        ),
+    ] = 1,
+    duration_history: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The path to a SQLite database keeping the measured durations of"
+                " actions across runs. Critical paths are computed from smoothed"
+                " estimates of past durations, falling back to the declared ones."
+            ),
+        ),
+    ] = None,
+    duration_history_key: Annotated[
+        DurationHistoryKey,
+        typer.Option(
+            ...,
+            help=(
+                "What identifies actions across runs in the durations history."
+                " The command key falls back to the SHA-1 for actions without one."
+            ),
+        ),
+    ] = DurationHistoryKey.SHA1,
+    duration_smoothing: Annotated[
+        float,
+        typer.Option(
+            ...,
+            min=0,
+            max=1,
+            help=(
+                "The weight of the latest measurement in the duration estimates."
+                " Higher values forget older measurements faster."
+            ),
+        ),
+    ] = 0.3,
+    use_numpy: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help=(
+                "Analyze the dependency graph with vectorized NumPy operations."
+                " Requires NumPy to be installed."
+            ),
+        ),
+    ] = False,
+    analysis_snapshot: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The path to a file keeping the dependency analysis across runs."
+                " Only the actions affected by changes since the previous run"
+                " are re-analyzed."
+            ),
+        ),
+    ] = None,
+    trace_out: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The path to a JSON file to write a trace of the scheduling to, in"
+                " the Chrome trace event format (e.g., for Perfetto)."
+            ),
+        ),
+    ] = None,
+    progress_interval_s: Annotated[
+        float,
+        typer.Option(
+            ...,
+            help="The interval in seconds between two progress reports.",
+        ),
+    ] = 1,
+    progress_terminal: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Keep a live progress line on the terminal instead of logging it.",
+        ),
+    ] = False,
+    progress_json_lines: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help="The path to a file to append progress reports to, as JSON lines.",
+        ),
+    ] = None,
+    priority_policy: Annotated[
+        PriorityPolicyKind,
+        typer.Option(
+            ...,
+            help=(
+                "Which ready actions are executed first, with the ready queue"
+                " algorithm and the asyncio backend, or when simulating."
+            ),
+        ),
+    ] = PriorityPolicyKind.CRITICAL_PATH,
+    critical_path_weight: Annotated[
+        float,
+        typer.Option(
+            ...,
+            min=0,
+            max=1,
+            help=(
+                "The weight of the critical path in the weighted priority policy."
+                " The number of transitive dependents is weighted by the rest."
+            ),
+        ),
+    ] = 0.5,
+    cpus: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            min=1,
+            help=(
+                "The number of CPUs shared by running actions, which declare how"
+                " many they use with their 'cpus' field. Unlimited by default."
+            ),
+        ),
+    ] = None,
+    memory_mb: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            min=1,
+            help=(
+                "The memory in MB shared by running actions, which declare how"
+                " much they use with their 'memory_mb' field. Unlimited by default."
+            ),
+        ),
+    ] = None,
+    simulate: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help=(
+                "Simulate the scheduling on a virtual clock instead of executing"
+                " actions, and print the makespan the parallelism would achieve"
+                " compared with its lower bounds."
+            ),
+        ),
+    ] = False,
+    validate: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help=(
+                "Whether or not to validate each action when loading a JSON"
+                " actions file. Skipping it saves a model instance per action,"
+                " for files produced by trusted tools. Compiled graphs are"
+                " validated once, when compiled."
+            ),
+        ),
+    ] = True,
 ) -> None:
     """Prints a JSON-formatted build report.
 
     Args:
-        parallelism: The maximum number of actions to execute in parallel.
+        parallelism: The maximum number of actions to execute in parallel, or
+            None with a daemon.
         actions_file: The path to the JSON file containing the list of actions to schedule.
     """
-    with open(actions_file, "r") as f:
-        actions_data = json.load(f)
+    if action_cache_path is not None and remote_cache_url is not None:
+        raise typer.BadParameter(
+            "--action-cache-path and --remote-cache-url can't be combined"
+        )
+
+    if daemon_socket is not None:
+        # The daemon only takes the actions, their estimated durations and the
+        # build weight. Options given on the command line are rejected, even
+        # when given their default value.
+        context = click.get_current_context()
+        options_set = [
+            parameter.opts[0]
+            for parameter in context.command.params
+            if parameter.name in DAEMON_IGNORED_PARAMETERS
+            and context.get_parameter_source(parameter.name) != ParameterSource.DEFAULT
+        ]
+
+        if options_set:
+            raise typer.BadParameter(
+                f"{', '.join(options_set)} can't be combined with --daemon-socket:"
+                " the daemon uses its own settings"
+            )
+
+        if parallelism is not None:
+            log.warning(
+                "--parallelism is ignored with --daemon-socket: the build gets a"
+                " share of the daemon's workers"
+            )
+    elif parallelism is None:
+        raise typer.BadParameter(
+            "--parallelism is required unless --daemon-socket is given"
+        )
+
+    if is_compiled_graph(actions_file):
+        if algorithm == SchedulingAlgorithm.CRITICAL_PATHS:
+            # Enumerating paths would undo dispatching right away from the
+            # precomputed bottom levels.
+            raise typer.BadParameter(
+                "--algorithm critical_paths can't be used with a compiled graph,"
+                " which is scheduled with the ready queue"
+            )
+
+        actions_info = load_compiled_actions_info(actions_file)
+    else:
+        actions_info = load_actions_info(actions_file, validate=validate)
+
+    estimated_durations = {}
+    action_duration_history = None
+    if duration_history is not None:
+        action_duration_history = SqliteDurationHistory(
+            path=duration_history, smoothing=duration_smoothing
+        )
+        estimated_durations = apply_duration_estimates(
+            actions_info, action_duration_history, duration_history_key
+        )
+        log.info(
+            "Estimated the duration of %d actions from their history",
+            len(estimated_durations),
+        )
 
-    # Validate JSON data.
-    action_models = [ActionModel(**action) for action in actions_data]
+        # Daemon builds and simulations only need the history for the estimates.
+        if daemon_socket is not None or simulate:
+            action_duration_history.close()
+            action_duration_history = None
 
-    actions = [Action(**action.dict()) for action in action_models]
+    if daemon_socket is not None:
+        from org_fraggles.build_action_scheduler.daemon import DaemonError, submit_build
 
-    actions_info = ActionsInfo(actions=actions)
+        try:
+            build_report = submit_build(
+                daemon_socket,
+                list(actions_info.actions_by_sha1.values()),
+                weight=build_weight,
+                estimated_durations=estimated_durations,
+            )
+        except DaemonError as e:
+            print(json.dumps({"error": str(e)}, indent=2))
+            raise typer.Exit(code=1)
 
-    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+        print(json.dumps(build_report, indent=2))
 
-    build_report = ActionScheduler(
-        parallelism=parallelism,
-        action_status_polling_interval_s=action_status_polling_interval_s,
-        dry_run=dry_run,
-        actions_info=actions_info,
-        dependency_analyzer=dependency_analyzer,
-    ).schedule()
+        return
+
+    dependency_analyzer = DependencyAnalyzer(
+        actions_info=actions_info, use_numpy=use_numpy
+    )
+
+    if analysis_snapshot is not None:
+        from org_fraggles.build_action_scheduler.analysis_snapshot import (
+            refresh_analysis_snapshot,
+        )
+
+        snapshot = refresh_analysis_snapshot(analysis_snapshot, actions_info, use_numpy)
+
+        # With a cycle or an unknown dependency, let the dependency analyzer
+        # report it.
+        if snapshot is not None and not snapshot.has_cycle():
+            dependency_analyzer.use_bottom_levels(snapshot.bottom_levels(actions_info))
+    elif isinstance(actions_info, CompiledActionsInfo) and not estimated_durations:
+        dependency_analyzer.use_bottom_levels(actions_info.bottom_levels())
+
+    if priority_policy == PriorityPolicyKind.MOST_SUCCESSORS:
+        action_priority_policy: PriorityPolicy = MostSuccessorsPriorityPolicy()
+    elif priority_policy == PriorityPolicyKind.SHORTEST_JOB_FIRST:
+        action_priority_policy = ShortestJobFirstPriorityPolicy()
+    elif priority_policy == PriorityPolicyKind.FIFO:
+        action_priority_policy = FifoPriorityPolicy()
+    elif priority_policy == PriorityPolicyKind.WEIGHTED:
+        action_priority_policy = WeightedPriorityPolicy(
+            critical_path_weight=critical_path_weight
+        )
+    else:
+        action_priority_policy = CriticalPathPriorityPolicy()
+
+    resource_budget = ResourceBudget(cpus=cpus, memory_mb=memory_mb)
+
+    if simulate:
+        from org_fraggles.build_action_scheduler.simulator import ScheduleSimulator
+
+        simulator = ScheduleSimulator(
+            parallelism=parallelism,
+            actions_info=actions_info,
+            dependency_analyzer=dependency_analyzer,
+            priority_policy=action_priority_policy,
+            resource_budget=resource_budget,
+        )
+
+        try:
+            simulation_report = dataclasses.asdict(simulator.simulate())
+        except DependencyCycleError:
+            simulation_report = {"error": "Dependency cycle detected"}
+        except UnknownDependencyError as e:
+            simulation_report = {"error": str(e)}
+
+        print(json.dumps(simulation_report, indent=2))
+
+        return
+
+    action_executor = create_action_executor(executor, dry_run)
+
+    action_result_cache: ActionCache | None = None
+    if action_cache_path is not None:
+        action_result_cache = SqliteActionCache(
+            path=action_cache_path, max_entries=action_cache_max_entries
+        )
+    elif remote_cache_url is not None:
+        from org_fraggles.build_action_scheduler.remote_cache import RemoteActionCache
+
+        action_result_cache = RemoteActionCache(
+            url=remote_cache_url, max_connections=remote_cache_max_connections
+        )
+
+    progress_reporter = ProgressReporter(
+        interval_s=progress_interval_s,
+        log_progress=not progress_terminal,
+        terminal=progress_terminal,
+        json_lines_path=progress_json_lines,
+    )
+
+    if backend == Backend.ASYNCIO:
+        from org_fraggles.build_action_scheduler.async_scheduler import (
+            AsyncActionScheduler,
+        )
+
+        scheduler: ActionScheduler = AsyncActionScheduler(
+            parallelism=parallelism,
+            dry_run=dry_run,
+            action_executor=action_executor,
+            action_result_cache=action_result_cache,
+            priority_policy=action_priority_policy,
+            resource_budget=resource_budget,
+            duration_history=action_duration_history,
+            duration_history_key=duration_history_key,
+            progress_reporter=progress_reporter,
+            actions_info=actions_info,
+            dependency_analyzer=dependency_analyzer,
+        )
+    elif backend == Backend.DISTRIBUTED:
+        from org_fraggles.build_action_scheduler.distributed import (
+            DistributedActionScheduler,
+        )
+
+        scheduler = DistributedActionScheduler(
+            parallelism=parallelism,
+            action_status_polling_interval_s=action_status_polling_interval_s,
+            dry_run=dry_run,
+            algorithm=algorithm,
+            action_result_cache=action_result_cache,
+            priority_policy=action_priority_policy,
+            resource_budget=resource_budget,
+            duration_history=action_duration_history,
+            duration_history_key=duration_history_key,
+            progress_reporter=progress_reporter,
+            actions_info=actions_info,
+            dependency_analyzer=dependency_analyzer,
+            coordinator_host=coordinator_host,
+            coordinator_port=coordinator_port,
+            heartbeat_timeout_s=heartbeat_timeout_s,
+        )
+    else:
+        scheduler_class = ActionScheduler
+        if backend == Backend.PROCESSES:
+            from org_fraggles.build_action_scheduler.process_scheduler import (
+                ProcessActionScheduler,
+            )
+
+            scheduler_class = ProcessActionScheduler
+
+        scheduler = scheduler_class(
+            parallelism=parallelism,
+            action_status_polling_interval_s=action_status_polling_interval_s,
+            dry_run=dry_run,
+            algorithm=algorithm,
+            action_executor=action_executor,
+            action_result_cache=action_result_cache,
+            priority_policy=action_priority_policy,
+            resource_budget=resource_budget,
+            duration_history=action_duration_history,
+            duration_history_key=duration_history_key,
+            progress_reporter=progress_reporter,
+            actions_info=actions_info,
+            dependency_analyzer=dependency_analyzer,
+        )
+
+    try:
+        build_report = scheduler.schedule()
+    finally:
+        if action_result_cache is not None:
+            action_result_cache.close()
+        if action_duration_history is not None:
+            action_duration_history.close()
+
+    if trace_out is not None:
+        critical_path = build_report.get("critical_path", {}).get("path")
+        write_chrome_trace(
+            trace_out, scheduler.trace().to_chrome_trace(critical_path=critical_path)
+        )
 
     print(json.dumps(build_report, indent=2))
 
 
+def compile_graph(
+    actions_file: Annotated[
+        str,
+        typer.Option(
+            ...,
+            help=(
+                "The path to the JSON (array or JSON Lines) file containing the"
+                " list of actions to compile."
+            ),
+        ),
+    ],
+    output: Annotated[
+        str,
+        typer.Option(..., help="The path to write the compiled graph to."),
+    ],
+    use_numpy: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help=(
+                "Analyze the dependency graph with vectorized NumPy operations."
+                " Requires NumPy to be installed."
+            ),
+        ),
+    ] = False,
+) -> None:
+    """Validates and analyzes actions once, and writes them to a compiled graph.
+
+    Scheduling a compiled graph memory-maps it instead of parsing, validating
+    and analyzing the actions again. Prints a JSON-formatted summary.
+    """
+    actions_info = load_actions_info(actions_file)
+
+    try:
+        bottom_levels = compile_actions_info(actions_info, output, use_numpy)
+    except CompiledGraphError as e:
+        print(json.dumps({"error": str(e)}, indent=2))
+        raise typer.Exit(code=1)
+
+    graph = actions_info.compact_graph
+
+    print(
+        json.dumps(
+            {
+                "output": output,
+                "actions_count": len(graph),
+                "dependencies_count": len(graph.dependents),
+                "critical_path_duration": max(
+                    bottom_levels.bottom_levels_by_index(), default=0
+                ),
+            },
+            indent=2,
+        )
+    )
+
+
 if __name__ == "__main__":
-    typer.run(main)
+    # `compile` is a command of its own, while scheduling stays the default so
+    # that existing invocations keep working. Help strings are shown as written
+    # rather than parsed as rich markup, and tracebacks are printed as usual
+    # rather than pretty-printed with locals.
+    app = typer.Typer(
+        add_completion=False, pretty_exceptions_enable=False, rich_markup_mode=None
+    )
+    if sys.argv[1:2] == ["compile"]:
+        del sys.argv[1]
+        app.command()(compile_graph)
+    else:
+        app.command()(main)
+    app()
@@ -0,0 +1,208 @@
+import time
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Set
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from org_fraggles.build_action_scheduler.types import ActionResult, ActionSha1
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# The most SHA-1s looked up with a single query, below SQLite's limit on the
+# number of query parameters.
+_LOOKUP_BATCH_SIZE = 500
+
+
+class ActionCache(BaseModel):
+    """Stores the results of successful action executions, keyed by action SHA-1.
+
+    Since an action's SHA-1 identifies its contents, a cached result can be
+    reused by any later build that contains the same action.
+    """
+
+    def get(self, action_sha1: ActionSha1) -> ActionResult | None:
+        """Returns the cached result for an action, or None if there's none.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+        """
+        raise NotImplementedError
+
+    def put(self, action_sha1: ActionSha1, action_result: ActionResult) -> None:
+        """Caches the result of an action execution.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+            action_result: The result of the action execution.
+        """
+        raise NotImplementedError
+
+    def contains_many(self, action_sha1s: Iterable[ActionSha1]) -> Set[ActionSha1]:
+        """Returns which of a number of actions have a cached result.
+
+        The scheduler checks ready actions with it before dispatching them,
+        so that it doesn't look up actions known to be missing one by one.
+        Defaults to looking each action up.
+
+        Args:
+            action_sha1s: The SHA-1s of the actions.
+        """
+        return {
+            action_sha1
+            for action_sha1 in action_sha1s
+            if self.get(action_sha1) is not None
+        }
+
+    def prefetch(self, action_sha1s: Iterable[ActionSha1]) -> None:
+        """Hints that actions will be looked up soon, e.g., once they're ready.
+
+        Caches with slow lookups can find out which actions have a cached
+        result in the background, so that `contains_many` is answered without
+        waiting. Does nothing by default.
+
+        Args:
+            action_sha1s: The SHA-1s of the actions, the most urgent first.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns statistics about the cache, for the build report."""
+        return {}
+
+    def close(self) -> None:
+        """Releases what the cache holds, e.g., its connections.
+
+        Does nothing by default.
+        """
+
+
+class SqliteActionCache(ActionCache):
+    """An on-disk action cache backed by a SQLite database.
+
+    Holds at most `max_entries` results, evicting the least recently used
+    ones. Safe to use from multiple threads.
+    """
+
+    # The path to the SQLite database file. Created if it doesn't exist.
+    path: str
+
+    # The maximum number of results to keep.
+    max_entries: int = Field(default=1_000_000, gt=0)
+
+    _connection: "sqlite3.Connection" = PrivateAttr(default=None)
+
+    # Number of results in the database.
+    _entries_count: int = PrivateAttr(default=0)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        # Imported here so that runs without a database don't pay for it.
+        import sqlite3
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS action_results (
+                sha1 TEXT PRIMARY KEY,
+                exit_code INTEGER NOT NULL,
+                wall_time_s REAL NOT NULL,
+                last_access_ns INTEGER NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS action_results_last_access"
+            " ON action_results (last_access_ns)"
+        )
+        self._connection.commit()
+
+        (self._entries_count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM action_results"
+        ).fetchone()
+
+    def get(self, action_sha1: ActionSha1) -> ActionResult | None:
+        """Returns the cached result for an action and marks it as recently used."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT exit_code, wall_time_s FROM action_results WHERE sha1 = ?",
+                (action_sha1,),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._connection.execute(
+                "UPDATE action_results SET last_access_ns = ? WHERE sha1 = ?",
+                (time.time_ns(), action_sha1),
+            )
+            self._connection.commit()
+
+        return ActionResult(exit_code=row[0], wall_time_s=row[1])
+
+    def contains_many(self, action_sha1s: Iterable[ActionSha1]) -> Set[ActionSha1]:
+        """Returns which actions have a cached result, without marking them as used."""
+        action_sha1s = list(action_sha1s)
+        present = set()
+
+        with self._lock:
+            for start in range(0, len(action_sha1s), _LOOKUP_BATCH_SIZE):
+                batch = action_sha1s[start : start + _LOOKUP_BATCH_SIZE]
+                present.update(
+                    action_sha1
+                    for (action_sha1,) in self._connection.execute(
+                        "SELECT sha1 FROM action_results WHERE sha1 IN"
+                        f" ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+
+        return present
+
+    def put(self, action_sha1: ActionSha1, action_result: ActionResult) -> None:
+        """Caches an action result, evicting the least recently used ones if full."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE action_results"
+                " SET exit_code = ?, wall_time_s = ?, last_access_ns = ?"
+                " WHERE sha1 = ?",
+                (
+                    action_result.exit_code,
+                    action_result.wall_time_s,
+                    time.time_ns(),
+                    action_sha1,
+                ),
+            )
+
+            if cursor.rowcount == 0:
+                self._connection.execute(
+                    "INSERT INTO action_results VALUES (?, ?, ?, ?)",
+                    (
+                        action_sha1,
+                        action_result.exit_code,
+                        action_result.wall_time_s,
+                        time.time_ns(),
+                    ),
+                )
+                self._entries_count += 1
+
+            if self._entries_count > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM action_results WHERE sha1 IN ("
+                    " SELECT sha1 FROM action_results"
+                    " ORDER BY last_access_ns LIMIT ?"
+                    ")",
+                    (self._entries_count - self.max_entries,),
+                )
+                self._entries_count = self.max_entries
+
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,126 @@
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.action_cache import SqliteActionCache
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+def test_sqlite_action_cache_persists(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    cache = SqliteActionCache(path=path)
+    cache.put("a", ActionResult(exit_code=0, wall_time_s=1.5))
+    cache.close()
+
+    cache = SqliteActionCache(path=path)
+    assert cache.get("a") == ActionResult(exit_code=0, wall_time_s=1.5)
+    assert cache.get("b") is None
+
+
+def test_sqlite_action_cache_evicts_least_recently_used(tmp_path):
+    cache = SqliteActionCache(path=str(tmp_path / "cache.db"), max_entries=2)
+
+    cache.put("a", ActionResult(exit_code=0, wall_time_s=1))
+    cache.put("b", ActionResult(exit_code=0, wall_time_s=2))
+    # Make "a" more recently used than "b".
+    assert cache.get("a") is not None
+    cache.put("c", ActionResult(exit_code=0, wall_time_s=3))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_sqlite_action_cache_contains_many(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "org_fraggles.build_action_scheduler.action_cache._LOOKUP_BATCH_SIZE", 2
+    )
+    cache = SqliteActionCache(path=str(tmp_path / "cache.db"))
+
+    cache.put("a", ActionResult(exit_code=0, wall_time_s=1))
+    cache.put("c", ActionResult(exit_code=0, wall_time_s=3))
+
+    assert cache.contains_many(["a", "b", "c", "d", "e"]) == {"a", "c"}
+    assert cache.contains_many([]) == set()
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_skips_cached_actions(tmp_path, algorithm):
+    actions = [
+        Action(sha1="a", duration=3, dependencies=["b", "e"]),
+        Action(sha1="b", duration=2, dependencies=["c"]),
+        Action(sha1="c", duration=1, dependencies=[]),
+        Action(sha1="e", duration=5, dependencies=[]),
+    ]
+    path = str(tmp_path / "cache.db")
+
+    def schedule(actions):
+        actions_info = ActionsInfo(actions=actions)
+        return ActionScheduler(
+            parallelism=2,
+            action_status_polling_interval_s=1,
+            dry_run=True,
+            algorithm=algorithm,
+            action_result_cache=SqliteActionCache(path=path),
+            actions_info=actions_info,
+            dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+        ).schedule()
+
+    first_result = schedule(actions)
+    assert sorted(first_result["action_execution_history"]) == ["a", "b", "c", "e"]
+    assert first_result["action_cache"] == {"hits": 0, "misses": 4}
+
+    second_result = schedule(actions)
+    assert second_result["action_execution_history"] == []
+    assert second_result["action_wall_times_s"] == {}
+    assert second_result["action_cache"] == {"hits": 4, "misses": 0}
+
+    # Changing "b" changes its SHA-1, and so the SHA-1 of its dependent "a".
+    changed_actions = [
+        Action(sha1="a2", duration=3, dependencies=["b2", "e"]),
+        Action(sha1="b2", duration=2, dependencies=["c"]),
+        Action(sha1="c", duration=1, dependencies=[]),
+        Action(sha1="e", duration=5, dependencies=[]),
+    ]
+    third_result = schedule(changed_actions)
+    assert third_result["action_execution_history"] == ["b2", "a2"]
+    assert third_result["action_cache"] == {"hits": 2, "misses": 2}
+
+
+class FailingActionCache(SqliteActionCache):
+    def put(self, action_sha1, action_result):
+        raise OSError("Disk full")
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_survives_failing_cache_writes(tmp_path, algorithm):
+    actions_info = ActionsInfo(
+        actions=[
+            Action(sha1="a", duration=1, dependencies=["b"]),
+            Action(sha1="b", duration=1, dependencies=[]),
+        ]
+    )
+
+    result = ActionScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=algorithm,
+        action_result_cache=FailingActionCache(path=str(tmp_path / "cache.db")),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).schedule()
+
+    assert "error" not in result
+    assert result["action_execution_history"] == ["b", "a"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
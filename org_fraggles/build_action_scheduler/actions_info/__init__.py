@@ -1,10 +1,184 @@
+from array import array
 from collections import defaultdict
-from typing import Dict, List, Set
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, Iterator, List, Set
 
 from pydantic import BaseModel, PrivateAttr
 
 from org_fraggles.build_action_scheduler.types import Action, ActionSha1
 
+ActionIndex = int
+
+
+@dataclass
+class CompactActionGraph:
+    """An integer-indexed representation of the dependency graph.
+
+    Every action gets a dense index, in the order of
+    `ActionsInfo.actions_by_sha1`, and per-action data lives in flat arrays
+    indexed by it. The dependents of the action with index `i` are
+    `dependents[dependents_offsets[i]:dependents_offsets[i + 1]]` (compressed
+    sparse row layout), so the whole graph takes a few machine words per
+    action and per edge, and walking it never hashes a SHA-1.
+
+    Actions added afterwards are appended to the arrays, but the edges to
+    them are kept in `added_dependents` until `compact` merges them in.
+    """
+
+    # The SHA-1 of each action, by index.
+    sha1s: List[ActionSha1]
+
+    # The index of each action, by SHA-1.
+    index_by_sha1: Dict[ActionSha1, ActionIndex]
+
+    # The duration of each action, by index, which the dependency graph is
+    # analyzed with. The declared durations, as integers, unless estimates
+    # replaced them (see `ActionsInfo.update_durations`), as fractions.
+    durations: array
+
+    # The number of dependencies of each action, by index. Dependencies that
+    # aren't actions themselves are counted too, so such actions never
+    # become ready.
+    dependencies_count: array
+
+    # Where the dependents of each action start in `dependents`, by index,
+    # followed by the total number of edges.
+    dependents_offsets: array
+
+    # The indexes of the dependents of all actions, grouped by action.
+    dependents: array
+
+    # The dependents added since the graph was built or last compacted, by
+    # action index.
+    added_dependents: Dict[ActionIndex, List[ActionIndex]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        """Returns the number of actions."""
+        return len(self.sha1s)
+
+    def dependents_of(self, index: ActionIndex) -> Iterator[ActionIndex]:
+        """Returns the indexes of the dependents of an action.
+
+        Args:
+            index: The index of the action.
+        """
+        dependents = self.dependents[
+            self.dependents_offsets[index] : self.dependents_offsets[index + 1]
+        ]
+
+        if index in self.added_dependents:
+            return chain(dependents, self.added_dependents[index])
+
+        return iter(dependents)
+
+    def add_actions(self, actions: List[Action]) -> range:
+        """Appends new actions to the graph.
+
+        Existing actions can gain dependents, but not dependencies.
+
+        Args:
+            actions: The new actions. Their SHA-1s must be unique, and their
+                dependencies must be in the graph or among the new actions.
+
+        Returns:
+            The indexes of the new actions.
+        """
+        first_index = len(self.sha1s)
+
+        for action in actions:
+            self.index_by_sha1[action.sha1] = len(self.sha1s)
+            self.sha1s.append(action.sha1)
+            self.durations.append(action.duration)
+            self.dependencies_count.append(len(action.dependencies))
+            self.dependents_offsets.append(self.dependents_offsets[-1])
+
+        for action in actions:
+            for dependency in action.dependencies:
+                self.added_dependents.setdefault(
+                    self.index_by_sha1[dependency], []
+                ).append(self.index_by_sha1[action.sha1])
+
+        return range(first_index, len(self.sha1s))
+
+    def compact(self) -> None:
+        """Merges the dependents added since the graph was built into the arrays.
+
+        Graph-wide walks over the arrays must call this first. It's a no-op
+        if no actions were added.
+        """
+        if not self.added_dependents:
+            return
+
+        dependents_offsets = array("q", [0])
+        dependents = array("q")
+
+        for i in range(len(self.sha1s)):
+            dependents.extend(
+                self.dependents[
+                    self.dependents_offsets[i] : self.dependents_offsets[i + 1]
+                ]
+            )
+            dependents.extend(self.added_dependents.get(i, ()))
+            dependents_offsets.append(len(dependents))
+
+        self.dependents_offsets = dependents_offsets
+        self.dependents = dependents
+        self.added_dependents = {}
+
+    @classmethod
+    def from_actions(cls, actions: List[Action]) -> "CompactActionGraph":
+        """Builds the compact graph of a list of actions, in O(V+E).
+
+        Args:
+            actions: The list of actions. Their SHA-1s must be unique.
+        """
+        sha1s = [action.sha1 for action in actions]
+        index_by_sha1 = {action_sha1: i for i, action_sha1 in enumerate(sha1s)}
+
+        durations = array("q", (action.duration for action in actions))
+        dependencies_count = array(
+            "q", (len(action.dependencies) for action in actions)
+        )
+
+        # Resolve every dependency to an index once (-1 if it isn't an
+        # action), counting the dependents of every action along the way.
+        # Then turn the counts into offsets, and finally fill each action's
+        # slice of `dependents`.
+        dependency_indexes = array("q")
+        dependents_offsets = array("q", bytes(8 * (len(actions) + 1)))
+        for action in actions:
+            for dependency in action.dependencies:
+                dependency_index = index_by_sha1.get(dependency, -1)
+                dependency_indexes.append(dependency_index)
+                dependents_offsets[dependency_index + 1] += 1
+
+        # Dependencies that aren't actions were counted in slot 0.
+        dependents_offsets[0] = 0
+        for i in range(len(actions)):
+            dependents_offsets[i + 1] += dependents_offsets[i]
+
+        dependents = array("q", bytes(8 * dependents_offsets[-1]))
+        next_slot = dependents_offsets[:-1]
+        edge = 0
+        for i, action_dependencies_count in enumerate(dependencies_count):
+            for dependency_index in dependency_indexes[
+                edge : edge + action_dependencies_count
+            ]:
+                if dependency_index >= 0:
+                    dependents[next_slot[dependency_index]] = i
+                    next_slot[dependency_index] += 1
+            edge += action_dependencies_count
+
+        return cls(
+            sha1s=sha1s,
+            index_by_sha1=index_by_sha1,
+            durations=durations,
+            dependencies_count=dependencies_count,
+            dependents_offsets=dependents_offsets,
+            dependents=dependents,
+        )
+
 
 class ActionsInfo(BaseModel):
     # The list of actions.
@@ -20,6 +194,8 @@ class ActionsInfo(BaseModel):
         default=defaultdict(int)
     )
 
+    _compact_graph: CompactActionGraph | None = PrivateAttr(default=None)
+
     @property
     def actions_by_sha1(self) -> Dict[ActionSha1, Action]:
         """Returns a mapping of SHA-1 strings to action objects."""
@@ -55,3 +231,101 @@ class ActionsInfo(BaseModel):
                 self._action_dependencies_count[action.sha1] = len(action.dependencies)
 
         return self._action_dependencies_count
+
+    @property
+    def compact_graph(self) -> CompactActionGraph:
+        """Returns the integer-indexed representation of the dependency graph."""
+        if self._compact_graph is None:
+            self._compact_graph = CompactActionGraph.from_actions(
+                list(self.actions_by_sha1.values())
+            )
+
+        return self._compact_graph
+
+    def action_at(self, index: ActionIndex) -> Action:
+        """Returns the action at an index of the compact graph.
+
+        Args:
+            index: The index of the action in the compact graph.
+        """
+        return self.actions_by_sha1[self.compact_graph.sha1s[index]]
+
+    def update_durations(self, durations: Dict[ActionSha1, float]) -> None:
+        """Changes the durations the dependency graph is analyzed with.
+
+        Only the compact graph's durations, which bottom levels and priorities
+        are computed from, change, and they become fractional. The declared
+        durations of the actions, which executors use, stay as they are.
+        Analyses of the dependency graph made before aren't updated.
+
+        Args:
+            durations: The new duration of each action, by SHA-1.
+        """
+        if not durations:
+            return
+
+        graph = self.compact_graph
+
+        if graph.durations.typecode != "d":
+            graph.durations = array("d", graph.durations)
+
+        for action_sha1, duration in durations.items():
+            graph.durations[graph.index_by_sha1[action_sha1]] = duration
+
+    def add_actions(self, actions: List[Action]) -> range:
+        """Adds new actions, updating the indexes that are already built.
+
+        Args:
+            actions: The new actions. Their SHA-1s must be unique, and their
+                dependencies must be known actions or among the new actions.
+
+        Returns:
+            The indexes of the new actions in the compact graph.
+        """
+        # Built from the current actions before the new ones are added.
+        compact_graph = self.compact_graph
+
+        self.actions.extend(actions)
+
+        for action in actions:
+            if self._actions_by_sha1 is not None:
+                self._actions_by_sha1[action.sha1] = action
+
+            if self._actions_dependents is not None:
+                self._actions_dependents.setdefault(action.sha1, set())
+                for dependency in action.dependencies:
+                    self._actions_dependents.setdefault(dependency, set()).add(
+                        action.sha1
+                    )
+
+            if len(self._action_dependencies_count) > 0:
+                self._action_dependencies_count[action.sha1] = len(action.dependencies)
+
+        return compact_graph.add_actions(actions)
+
+    @classmethod
+    def from_indexes(
+        cls,
+        actions: List[Action],
+        actions_by_sha1: Dict[ActionSha1, Action],
+        action_dependents: Dict[ActionSha1, Set[ActionSha1]],
+        action_dependencies_count: Dict[ActionSha1, int],
+    ) -> "ActionsInfo":
+        """Creates an instance of ActionsInfo from already built indexes.
+
+        The actions aren't validated again, so that loading very large graphs
+        doesn't walk all actions once more.
+
+        Args:
+            actions: The list of actions.
+            actions_by_sha1: A mapping of SHA-1 strings to action objects.
+            action_dependents: An inverse mapping of dependencies to dependents.
+            action_dependencies_count: A mapping of SHA-1 strings to the number
+                of dependencies each action has.
+        """
+        actions_info = cls.model_construct(actions=actions)
+        actions_info._actions_by_sha1 = actions_by_sha1
+        actions_info._actions_dependents = action_dependents
+        actions_info._action_dependencies_count = action_dependencies_count
+
+        return actions_info
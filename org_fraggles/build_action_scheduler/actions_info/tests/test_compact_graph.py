@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.types import Action
+
+
+@pytest.fixture
+def actions_info():
+    return ActionsInfo(
+        actions=[
+            Action(sha1="a", duration=1, dependencies=[]),
+            Action(sha1="b", duration=2, dependencies=["a"]),
+            Action(sha1="c", duration=3, dependencies=["a", "b"]),
+            Action(sha1="d", duration=4, dependencies=["missing"]),
+        ]
+    )
+
+
+def test_compact_graph(actions_info):
+    graph = actions_info.compact_graph
+
+    assert len(graph) == 4
+    assert graph.sha1s == ["a", "b", "c", "d"]
+    assert graph.index_by_sha1 == {"a": 0, "b": 1, "c": 2, "d": 3}
+    assert list(graph.durations) == [1, 2, 3, 4]
+    assert list(graph.dependencies_count) == [0, 1, 2, 1]
+    assert list(graph.dependents_offsets) == [0, 2, 3, 3, 3]
+
+    assert list(graph.dependents_of(0)) == [1, 2]
+    assert list(graph.dependents_of(1)) == [2]
+    assert list(graph.dependents_of(2)) == []
+
+
+def test_compact_graph_matches_dependents(actions_info):
+    graph = actions_info.compact_graph
+
+    for action_sha1, dependents in actions_info.action_dependents.items():
+        if action_sha1 in graph.index_by_sha1:
+            assert {
+                graph.sha1s[i]
+                for i in graph.dependents_of(graph.index_by_sha1[action_sha1])
+            } == dependents
+
+
+def test_compact_graph_is_cached(actions_info):
+    assert actions_info.compact_graph is actions_info.compact_graph
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,254 @@
+import io
+import itertools
+import json
+import sys
+from collections import defaultdict
+from typing import IO, Any, Dict, Iterable, Iterator, Tuple
+
+from pydantic import ValidationError
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.types import Action, ActionModel
+
+# The number of characters read from an actions file at a time.
+CHUNK_SIZE = 1 << 16
+
+
+class ActionsLoaderError(Exception):
+    """Raised when an actions file is malformed or contains invalid actions."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of ActionsLoaderError."""
+        super().__init__(message)
+
+
+def load_actions_info(actions_file: str, validate: bool = True) -> ActionsInfo:
+    """Loads actions from a file, building the `ActionsInfo` indexes as it goes.
+
+    The file is either a JSON array of actions or JSON Lines (one action per
+    line), and is parsed incrementally, so the raw JSON for all actions is
+    never held in memory at once. SHA-1 strings are interned, so that each
+    one is stored once no matter how many actions depend on it.
+
+    Args:
+        actions_file: The path to the actions file.
+        validate: Whether or not to validate each action with `ActionModel`.
+
+    Returns:
+        The actions info, with its indexes already built.
+
+    Raises:
+        ActionsLoaderError: If the file is malformed or an action is invalid.
+    """
+    with open(actions_file, "r") as f:
+        return actions_info_from_records(iter_action_records(f), validate)
+
+
+def actions_info_from_records(
+    records: Iterable[Any], validate: bool = True
+) -> ActionsInfo:
+    """Builds the `ActionsInfo` indexes from raw action records, e.g., parsed JSON.
+
+    Args:
+        records: The raw action records, as in actions files.
+        validate: Whether or not to validate each action with `ActionModel`.
+
+    Returns:
+        The actions info, with its indexes already built.
+
+    Raises:
+        ActionsLoaderError: If an action is invalid.
+    """
+    actions = []
+    actions_by_sha1 = {}
+    action_dependents = defaultdict(set)
+    action_dependencies_count = defaultdict(int)
+
+    for i, record in enumerate(records):
+        action = _to_action(record, i, validate)
+
+        actions.append(action)
+        actions_by_sha1[action.sha1] = action
+        action_dependencies_count[action.sha1] = len(action.dependencies)
+
+        for dependency in action.dependencies:
+            action_dependents[dependency].add(action.sha1)
+
+    return ActionsInfo.from_indexes(
+        actions=actions,
+        actions_by_sha1=actions_by_sha1,
+        action_dependents=action_dependents,
+        action_dependencies_count=action_dependencies_count,
+    )
+
+
+def iter_action_records(f: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Yields the raw action records of an actions file, one at a time.
+
+    Args:
+        f: The actions file, either a JSON array or JSON Lines.
+
+    Raises:
+        ActionsLoaderError: If the file is malformed.
+    """
+    buffer = f.read(CHUNK_SIZE)
+    start = _skip_whitespace(buffer, 0)
+
+    while start == len(buffer):
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+        start = _skip_whitespace(buffer, start)
+
+    if buffer[start] == "[":
+        yield from _iter_json_array(f, buffer, start + 1)
+    else:
+        yield from _iter_json_lines(f, buffer[start:])
+
+
+def _iter_json_array(
+    f: IO[str], buffer: str, position: int
+) -> Iterator[Dict[str, Any]]:
+    """Yields the elements of a JSON array, reading the file as needed.
+
+    Args:
+        f: The file being read.
+        buffer: The characters read so far.
+        position: The position in `buffer` right after the opening bracket.
+    """
+    decoder = json.JSONDecoder()
+    expecting_element = True
+
+    while True:
+        position = _skip_whitespace(buffer, position)
+
+        if position == len(buffer):
+            buffer, position = _refill(f, buffer, position)
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        if not expecting_element:
+            if buffer[position] != ",":
+                raise ActionsLoaderError(
+                    f"Expected ',' or ']' in JSON array, got {buffer[position]!r}"
+                )
+            position += 1
+            expecting_element = True
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # The element might just be incomplete, so read more and retry.
+            buffer, position = _refill(f, buffer, position, e)
+            continue
+
+        yield record
+
+        position = end
+        expecting_element = False
+
+
+def _refill(
+    f: IO[str], buffer: str, position: int, error: Exception | None = None
+) -> Tuple[str, int]:
+    """Drops the consumed part of the buffer and reads the next chunk into it.
+
+    Args:
+        f: The file being read.
+        buffer: The characters read so far.
+        position: The position of the first character not yet consumed.
+        error: The error which made reading more necessary, if any.
+
+    Returns:
+        The new buffer, and the new position of the first unconsumed character.
+
+    Raises:
+        ActionsLoaderError: If the end of the file has been reached.
+    """
+    chunk = f.read(CHUNK_SIZE)
+
+    if not chunk:
+        if error is not None:
+            raise ActionsLoaderError(f"Malformed JSON array: {error}") from error
+        raise ActionsLoaderError("Unterminated JSON array")
+
+    return buffer[position:] + chunk, 0
+
+
+def _iter_json_lines(f: IO[str], buffer: str) -> Iterator[Dict[str, Any]]:
+    """Yields one JSON object per non-empty line.
+
+    Args:
+        f: The file being read.
+        buffer: The characters read so far, starting at the first line.
+    """
+    pending = ""
+
+    # The buffered characters may end in the middle of a line, which the first
+    # line read from the file then completes.
+    for line in itertools.chain(io.StringIO(buffer), f):
+        if not line.endswith("\n"):
+            pending += line
+            continue
+
+        line, pending = pending + line, ""
+
+        if line.strip():
+            yield _loads_line(line)
+
+    if pending.strip():
+        yield _loads_line(pending)
+
+
+def _loads_line(line: str) -> Dict[str, Any]:
+    """Parses a JSON Lines line.
+
+    Raises:
+        ActionsLoaderError: If the line isn't valid JSON.
+    """
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ActionsLoaderError(f"Malformed JSON line: {e}") from e
+
+
+def _skip_whitespace(buffer: str, position: int) -> int:
+    """Returns the position of the first non-whitespace character from `position`."""
+    while position < len(buffer) and buffer[position].isspace():
+        position += 1
+
+    return position
+
+
+def _to_action(record: Any, index: int, validate: bool) -> Action:
+    """Converts a raw action record into an action, interning its SHA-1s.
+
+    Args:
+        record: The raw action record.
+        index: The position of the record in the file, for error messages.
+        validate: Whether or not to validate the record with `ActionModel`.
+
+    Raises:
+        ActionsLoaderError: If the record is invalid.
+    """
+    try:
+        if validate:
+            record = ActionModel.model_validate(record).model_dump()
+
+        return Action(
+            sha1=sys.intern(record["sha1"]),
+            duration=record["duration"],
+            dependencies=[
+                sys.intern(dependency) for dependency in record.get("dependencies", [])
+            ],
+            command=record.get("command"),
+            cpus=record.get("cpus", 1),
+            memory_mb=record.get("memory_mb", 0),
+            exclusive_resources=tuple(record.get("exclusive_resources", ())),
+        )
+    except (ValidationError, KeyError, TypeError, AttributeError) as e:
+        raise ActionsLoaderError(f"Invalid action at index {index}: {e}") from e
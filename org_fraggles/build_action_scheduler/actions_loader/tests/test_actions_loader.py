@@ -0,0 +1,126 @@
+import io
+import json
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler import actions_loader
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.actions_loader import (
+    ActionsLoaderError,
+    iter_action_records,
+    load_actions_info,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+ACTIONS = [
+    {"sha1": "a", "duration": 1, "dependencies": []},
+    {"sha1": "b", "duration": 2, "dependencies": ["a"]},
+    {"sha1": "c", "duration": 3, "dependencies": ["a", "b"], "command": "true"},
+]
+
+
+def _assert_same_indexes(actions_info: ActionsInfo) -> None:
+    expected = ActionsInfo(actions=[Action(**a) for a in ACTIONS])
+
+    assert actions_info.actions == expected.actions
+    assert actions_info.actions_by_sha1 == expected.actions_by_sha1
+    assert actions_info.action_dependents == expected.action_dependents
+    assert actions_info.action_dependencies_count == expected.action_dependencies_count
+
+
+def test_load_json_array(tmp_path):
+    path = tmp_path / "actions.json"
+    path.write_text(json.dumps(ACTIONS, indent=2))
+
+    _assert_same_indexes(load_actions_info(str(path)))
+
+
+def test_load_json_lines(tmp_path):
+    path = tmp_path / "actions.jsonl"
+    path.write_text("\n".join(json.dumps(a) for a in ACTIONS) + "\n\n")
+
+    _assert_same_indexes(load_actions_info(str(path)))
+
+
+def test_records_across_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(actions_loader, "CHUNK_SIZE", 7)
+
+    array = json.dumps(ACTIONS, indent=1)
+    lines = "\n".join(json.dumps(a) for a in ACTIONS)
+
+    assert list(iter_action_records(io.StringIO(array))) == ACTIONS
+    assert list(iter_action_records(io.StringIO(lines))) == ACTIONS
+    assert list(iter_action_records(io.StringIO("  [ ]"))) == []
+    assert list(iter_action_records(io.StringIO("   "))) == []
+
+
+def test_load_interns_sha1s(tmp_path):
+    path = tmp_path / "actions.json"
+    path.write_text(json.dumps(ACTIONS))
+
+    actions_info = load_actions_info(str(path))
+
+    assert actions_info.actions[2].dependencies[0] is actions_info.actions[0].sha1
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '[{"sha1": "a", "duration": 1}',
+        '[{"sha1": "a", "duration": 1} {"sha1": "b", "duration": 1}]',
+        '{"sha1": "a", "duration": 1}\n{"sha1": ',
+    ],
+)
+def test_malformed_file(tmp_path, content):
+    path = tmp_path / "actions.json"
+    path.write_text(content)
+
+    with pytest.raises(ActionsLoaderError):
+        load_actions_info(str(path))
+
+
+def test_invalid_action(tmp_path):
+    path = tmp_path / "actions.json"
+    path.write_text(json.dumps(ACTIONS + [{"sha1": "d", "duration": -1}]))
+
+    with pytest.raises(ActionsLoaderError, match="index 3"):
+        load_actions_info(str(path))
+
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_load_resources(tmp_path, validate):
+    path = tmp_path / "actions.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"sha1": "a", "duration": 1},
+                {
+                    "sha1": "b",
+                    "duration": 1,
+                    "cpus": 4,
+                    "memory_mb": 2048,
+                    "exclusive_resources": ["gpu"],
+                },
+            ]
+        )
+    )
+
+    actions_by_sha1 = load_actions_info(str(path), validate=validate).actions_by_sha1
+
+    assert (actions_by_sha1["a"].cpus, actions_by_sha1["a"].memory_mb) == (1, 0)
+    assert actions_by_sha1["a"].exclusive_resources == ()
+    assert (actions_by_sha1["b"].cpus, actions_by_sha1["b"].memory_mb) == (4, 2048)
+    assert actions_by_sha1["b"].exclusive_resources == ("gpu",)
+
+
+def test_invalid_resources(tmp_path):
+    path = tmp_path / "actions.json"
+    path.write_text(json.dumps([{"sha1": "a", "duration": 1, "cpus": 0}]))
+
+    with pytest.raises(ActionsLoaderError, match="index 0"):
+        load_actions_info(str(path))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
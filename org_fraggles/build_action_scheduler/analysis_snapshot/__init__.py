@@ -0,0 +1,955 @@
+import heapq
+import logging
+import mmap
+import os
+import struct
+from array import array
+from dataclasses import dataclass, field
+from itertools import chain, compress, count, islice, repeat
+from operator import ne
+from typing import Dict, Iterator, List, Set
+
+from pydantic import BaseModel, PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import (
+    ActionIndex,
+    ActionsInfo,
+    CompactActionGraph,
+)
+from org_fraggles.build_action_scheduler.compiled_graph import (
+    CompiledGraphError,
+    StringTable,
+    map_sections,
+    section_array,
+    section_bytes,
+    section_string_table,
+    write_sections,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    BottomLevels,
+    DependencyCycleError,
+    UnknownDependencyError,
+    check_dependencies,
+)
+from org_fraggles.build_action_scheduler.types import ActionDuration, ActionSha1
+
+log = logging.getLogger(__name__)
+
+# The first bytes of every analysis snapshot file.
+SNAPSHOT_MAGIC = b"BASSNAPS"
+
+# Bumped whenever the persisted format changes, so that older snapshots are
+# discarded instead of misread.
+SNAPSHOT_FORMAT_VERSION = 2
+
+# The sections of an analysis snapshot file (see `write_sections`). Arrays
+# are of 64-bit values in little-endian order, by action index.
+_SECTIONS = (
+    # See `_METADATA`.
+    "metadata",
+    # String table of the action SHA-1s (see `StringTable`).
+    "sha1s",
+    "durations",
+    # The compressed sparse row arrays of `CompactActionGraph`.
+    "dependents_offsets",
+    "dependents",
+    # Stale if there is a cycle.
+    "bottom_levels",
+    "heights",
+)
+
+# Whether the file is complete (0 while changes are written in place),
+# whether there is a dependency cycle, and the type code of the durations and
+# bottom levels.
+_METADATA = struct.Struct("<qqq")
+
+# The durations and bottom levels, by type code.
+_VALUES = {"q": struct.Struct("<q"), "d": struct.Struct("<d")}
+
+# How many actions are compared with the snapshot at once, before comparing
+# them one by one if they differ.
+_BLOCK_SIZE = 256
+
+
+class AnalysisSnapshotError(Exception):
+    """Raised when an analysis snapshot can't be loaded or updated."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of AnalysisSnapshotError."""
+        super().__init__(message)
+
+
+@dataclass
+class ActionsDiff:
+    """The changes to the action graph since a snapshot was taken.
+
+    Actions are designated by their index in the current compact graph.
+    """
+
+    # Actions that weren't in the graph.
+    added: List[ActionIndex] = field(default_factory=list)
+
+    # Actions that are no longer in the graph.
+    removed: List[ActionSha1] = field(default_factory=list)
+
+    # Actions whose duration changed.
+    reweighted: List[ActionIndex] = field(default_factory=list)
+
+    # Actions that gained or lost dependents.
+    relinked: List[ActionIndex] = field(default_factory=list)
+
+    # The index of every action in the snapshot, or -1 for the added actions,
+    # by index in the current graph. None if the graph has the same actions
+    # as the snapshot, in the same order.
+    snapshot_indexes: array | None = None
+
+    # The string table of the SHA-1s of the current graph, if they differ
+    # from the snapshot's.
+    sha1s: bytes | None = field(default=None, repr=False)
+
+    def empty(self) -> bool:
+        """Returns True if the graph didn't change, False otherwise."""
+        return self.snapshot_indexes is None and not (self.reweighted or self.relinked)
+
+
+class AnalysisSnapshot(BaseModel):
+    """The dependency analysis results of a build, updatable between builds.
+
+    Keeps the graph and the bottom level of every action in flat arrays by
+    action index, like the compact graph, so that it's saved, loaded and
+    compared with the graph of the next build array by array, without a
+    Python object per action. When a few actions are added, removed or
+    re-weighted, only the bottom levels of the actions they can affect are
+    recomputed: the changed actions and their transitive dependencies.
+    Cycles can only be introduced among those actions too, so they're the
+    only ones checked for cycles.
+    """
+
+    # The string table of the action SHA-1s, as stored in the file.
+    _sha1s: bytes = PrivateAttr(default=b"")
+
+    # The duration of each action.
+    _durations: array = PrivateAttr(default_factory=lambda: array("q"))
+
+    # The dependents of each action, as in `CompactActionGraph`.
+    _dependents_offsets: array = PrivateAttr(default_factory=lambda: array("q", [0]))
+    _dependents: array = PrivateAttr(default_factory=lambda: array("q"))
+
+    # The bottom level of each action. Stale if there is a cycle.
+    _bottom_levels: array = PrivateAttr(default_factory=lambda: array("q"))
+
+    # The height of each action: 0 for root actions, otherwise one more than
+    # the largest height among its dependents, so that every action is
+    # higher than its dependents. Stale if there is a cycle.
+    _heights: array = PrivateAttr(default_factory=lambda: array("q"))
+
+    # Whether or not there is a dependency cycle.
+    _has_cycle: bool = PrivateAttr(default=False)
+
+    # The index of each action, by SHA-1. Built on demand.
+    _index_by_sha1: Dict[ActionSha1, ActionIndex] | None = PrivateAttr(default=None)
+
+    # The actions whose duration or bottom level changed since the snapshot
+    # was loaded or saved, or None if the whole file has to be written.
+    _changed: Set[ActionIndex] | None = PrivateAttr(default=None)
+
+    @classmethod
+    def from_actions_info(
+        cls, actions_info: ActionsInfo, use_numpy: bool = False
+    ) -> "AnalysisSnapshot":
+        """Analyzes a whole action graph.
+
+        Args:
+            actions_info: Actions info.
+            use_numpy: Whether or not to analyze the graph with NumPy.
+
+        Raises:
+            UnknownDependencyError: If an action depends on an unknown action.
+        """
+        snapshot = cls()
+        snapshot._analyze(actions_info, use_numpy)
+
+        return snapshot
+
+    @classmethod
+    def load(cls, path: str) -> "AnalysisSnapshot":
+        """Loads a snapshot saved by `save`.
+
+        Args:
+            path: The path to the snapshot file.
+
+        Raises:
+            AnalysisSnapshotError: If the snapshot can't be read, was saved
+            in a different format, or was only partly written.
+        """
+        try:
+            mapped, sections = map_sections(
+                path,
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_FORMAT_VERSION,
+                _SECTIONS,
+                "analysis snapshot",
+            )
+        except (OSError, CompiledGraphError) as e:
+            raise AnalysisSnapshotError(f"Can't load analysis snapshot: {e}") from e
+
+        try:
+            complete, has_cycle, typecode = _METADATA.unpack_from(sections["metadata"])
+            if not complete or chr(typecode) not in _VALUES:
+                raise AnalysisSnapshotError(f"Incomplete analysis snapshot: {path}")
+
+            snapshot = cls()
+            snapshot._sha1s = bytes(sections["sha1s"])
+            snapshot._durations = section_array(sections["durations"], chr(typecode))
+            snapshot._dependents_offsets = section_array(sections["dependents_offsets"])
+            snapshot._dependents = section_array(sections["dependents"])
+            snapshot._bottom_levels = section_array(
+                sections["bottom_levels"], chr(typecode)
+            )
+            snapshot._heights = section_array(sections["heights"])
+            snapshot._has_cycle = bool(has_cycle)
+            snapshot._changed = set()
+        except struct.error as e:
+            raise AnalysisSnapshotError(f"Can't load analysis snapshot: {e}") from e
+        finally:
+            for section in sections.values():
+                section.release()
+            mapped.close()
+
+        return snapshot
+
+    def save(self, path: str) -> None:
+        """Saves the snapshot, atomically replacing any previous one.
+
+        Args:
+            path: The path to the snapshot file.
+        """
+        write_sections(
+            f"{path}.tmp",
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_FORMAT_VERSION,
+            [
+                _METADATA.pack(1, self._has_cycle, ord(self._durations.typecode)),
+                self._sha1s,
+                self._durations,
+                self._dependents_offsets,
+                self._dependents,
+                self._bottom_levels,
+                self._heights,
+            ],
+        )
+        os.replace(f"{path}.tmp", path)
+
+        self._changed = set()
+
+    def save_changes(self, path: str) -> None:
+        """Saves the changes made since the snapshot was loaded from or saved to a path.
+
+        Nothing is written if nothing changed. If only durations and bottom
+        levels changed, they're overwritten in place, and the file is marked
+        as incomplete meanwhile, so that an interrupted write is detected by
+        `load`. Otherwise, the whole snapshot is saved.
+
+        Args:
+            path: The path the snapshot was loaded from or saved to.
+        """
+        if self._changed is not None and not self._changed:
+            return
+
+        if self._changed is None or not os.path.exists(path):
+            self.save(path)
+            return
+
+        try:
+            mapped, sections = map_sections(
+                path,
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_FORMAT_VERSION,
+                _SECTIONS,
+                "analysis snapshot",
+                access=mmap.ACCESS_WRITE,
+            )
+        except CompiledGraphError:
+            self.save(path)
+            return
+
+        typecode = self._durations.typecode
+        value = _VALUES[typecode]
+
+        try:
+            metadata = sections["metadata"]
+            durations = sections["durations"]
+            bottom_levels = sections["bottom_levels"]
+            matches = len(durations) == 8 * len(
+                self._durations
+            ) and _METADATA.unpack_from(metadata)[2] == ord(typecode)
+
+            if matches:
+                _METADATA.pack_into(metadata, 0, 0, self._has_cycle, ord(typecode))
+                mapped.flush()
+
+                for index in self._changed:
+                    value.pack_into(durations, 8 * index, self._durations[index])
+                    value.pack_into(
+                        bottom_levels, 8 * index, self._bottom_levels[index]
+                    )
+
+                mapped.flush()
+                _METADATA.pack_into(metadata, 0, 1, self._has_cycle, ord(typecode))
+                mapped.flush()
+        finally:
+            for section in sections.values():
+                section.release()
+            mapped.close()
+
+        if not matches:
+            # Not the file the snapshot was loaded from.
+            self.save(path)
+            return
+
+        self._changed = set()
+
+    def has_cycle(self) -> bool:
+        """Returns True if there is a cycle in the dependency graph, False otherwise."""
+        return self._has_cycle
+
+    def bottom_level(self, action_sha1: ActionSha1) -> ActionDuration:
+        """Returns the longest duration from an action to a root action.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+        """
+        return self._bottom_levels[self._get_index_by_sha1()[action_sha1]]
+
+    def bottom_levels(self, actions_info: ActionsInfo) -> BottomLevels:
+        """Returns the bottom levels in the form the scheduler consumes.
+
+        Args:
+            actions_info: Actions info for the same graph as the snapshot,
+                which `diff` was last called with.
+
+        Raises:
+            DependencyCycleError: If there is a dependency cycle.
+            AnalysisSnapshotError: If the snapshot is for a different graph.
+        """
+        if self._has_cycle:
+            raise DependencyCycleError("There is a dependency cycle")
+
+        graph = actions_info.compact_graph
+        if (
+            len(graph) != len(self._bottom_levels)
+            or graph.durations.typecode != self._bottom_levels.typecode
+        ):
+            raise AnalysisSnapshotError("The snapshot is for a different graph")
+
+        # The scheduler extends the bottom levels when actions are submitted.
+        return BottomLevels.from_arrays(
+            actions_info, array(graph.durations.typecode, self._bottom_levels), None
+        )
+
+    def diff(self, actions_info: ActionsInfo) -> ActionsDiff:
+        """Computes the changes from the snapshot's graph to another graph.
+
+        If the other graph has the same actions in the same order, which is
+        the common case between builds, the arrays of both graphs are
+        compared as a whole, and only compared action by action if they
+        differ. Otherwise, the actions both graphs start and end with are
+        compared the same way, and only the ones in between are looked up by
+        SHA-1.
+
+        Args:
+            actions_info: Actions info for the other graph.
+
+        Raises:
+            UnknownDependencyError: If an action of the other graph depends
+                on an unknown action.
+        """
+        check_dependencies(actions_info)
+        graph = actions_info.compact_graph
+
+        sha1s = _encode_sha1s(graph)
+        if sha1s == self._sha1s:
+            return self._diff_same_actions(graph)
+
+        return self._diff_other_actions(graph, sha1s)
+
+    def update(
+        self, actions_info: ActionsInfo, diff: ActionsDiff, use_numpy: bool = False
+    ) -> int:
+        """Brings the snapshot up to date, re-analyzing only what changes affect.
+
+        The bottom level of an action only depends on its own duration and on
+        the bottom levels of its dependents, so the actions whose bottom levels
+        can change are the ones added or re-weighted, those that gained or
+        lost a dependent, and their transitive dependencies. If actions were
+        only re-weighted, the changes are propagated from dependents to
+        dependencies, and stop at the actions whose bottom levels don't
+        change.
+
+        Args:
+            actions_info: Actions info for the graph `diff` was computed for.
+            diff: The changes to the graph, as computed by `diff`.
+            use_numpy: Whether or not to analyze the graph with NumPy, if it
+                has to be analyzed from scratch.
+
+        Returns:
+            The number of actions that were re-analyzed.
+
+        Raises:
+            UnknownDependencyError: If an action depends on an unknown action.
+        """
+        graph = actions_info.compact_graph
+        graph.compact()
+
+        if self._has_cycle or graph.durations.typecode != self._durations.typecode:
+            # The bottom levels are stale everywhere, or of the wrong type, so
+            # start over.
+            self._analyze(actions_info, use_numpy)
+
+            return len(graph)
+
+        if diff.empty():
+            return 0
+
+        if diff.snapshot_indexes is None and not diff.relinked:
+            return self._propagate(actions_info, diff.reweighted)
+
+        return self._reanalyze(actions_info, diff)
+
+    def _propagate(
+        self, actions_info: ActionsInfo, reweighted: List[ActionIndex]
+    ) -> int:
+        """Recomputes bottom levels after re-weighting actions, where they change.
+
+        The actions are recomputed by increasing height, so that the bottom
+        levels of their dependents, which are lower, are final by then. Only
+        the dependencies of the actions whose bottom levels changed are
+        recomputed next, so every action is recomputed at most once, and the
+        work is proportional to the changes rather than to the number of
+        transitive dependencies.
+
+        Args:
+            actions_info: Actions info for a graph with the same actions and
+                dependencies as the snapshot.
+            reweighted: The actions whose duration changed.
+
+        Returns:
+            The number of actions that were re-analyzed.
+        """
+        graph = actions_info.compact_graph
+        actions_by_sha1 = actions_info.actions_by_sha1
+        sha1s = graph.sha1s
+        index_by_sha1 = graph.index_by_sha1
+        durations = graph.durations
+        offsets = self._dependents_offsets
+        dependents = self._dependents
+        bottom_levels = self._bottom_levels
+        heights = self._heights
+
+        for index in reweighted:
+            self._durations[index] = durations[index]
+
+        queued = set(reweighted)
+        heap = [(heights[index], index) for index in queued]
+        heapq.heapify(heap)
+        changed = []
+
+        while heap:
+            _, current = heapq.heappop(heap)
+
+            longest_dependent = 0
+            for dependent in dependents[offsets[current] : offsets[current + 1]]:
+                if bottom_levels[dependent] > longest_dependent:
+                    longest_dependent = bottom_levels[dependent]
+
+            bottom_level = durations[current] + longest_dependent
+            if bottom_level == bottom_levels[current]:
+                continue
+
+            bottom_levels[current] = bottom_level
+            changed.append(current)
+
+            for dependency in actions_by_sha1[sha1s[current]].dependencies:
+                dependency_index = index_by_sha1[dependency]
+                if dependency_index not in queued:
+                    queued.add(dependency_index)
+                    heapq.heappush(heap, (heights[dependency_index], dependency_index))
+
+        if self._changed is not None:
+            self._changed.update(reweighted, changed)
+
+        return len(queued)
+
+    def _reanalyze(self, actions_info: ActionsInfo, diff: ActionsDiff) -> int:
+        """Recomputes the actions affected by changes to the dependencies.
+
+        Heights can change too, so the affected actions are all recomputed,
+        in topological order, which also detects the cycles among them.
+
+        Args:
+            actions_info: Actions info for the graph `diff` was computed for.
+            diff: The changes to the graph, with actions added, removed or
+                relinked.
+
+        Returns:
+            The number of actions that were re-analyzed.
+        """
+        graph = actions_info.compact_graph
+        actions_by_sha1 = actions_info.actions_by_sha1
+        sha1s = graph.sha1s
+        index_by_sha1 = graph.index_by_sha1
+
+        if diff.snapshot_indexes is None:
+            bottom_levels = self._bottom_levels
+            heights = self._heights
+        else:
+            # The values of the added actions are recomputed below.
+            bottom_levels = _gather(self._bottom_levels, diff.snapshot_indexes)
+            heights = _gather(self._heights, diff.snapshot_indexes)
+
+        # The dependencies of the affected actions, which are walked twice.
+        affected_dependencies: Dict[ActionIndex, List[ActionIndex]] = {}
+        affected = bytearray(len(graph))
+        stack = []
+        for index in diff.added + diff.reweighted + diff.relinked:
+            if not affected[index]:
+                affected[index] = 1
+                stack.append(index)
+
+        while stack:
+            current = stack.pop()
+            dependencies = [
+                index_by_sha1[dependency]
+                for dependency in actions_by_sha1[sha1s[current]].dependencies
+            ]
+            affected_dependencies[current] = dependencies
+
+            for dependency in dependencies:
+                if not affected[dependency]:
+                    affected[dependency] = 1
+                    stack.append(dependency)
+
+        # Kahn's algorithm over the affected actions, from the actions closest
+        # to the roots: an action is ready once all its affected dependents
+        # have been recomputed. The bottom levels and heights of unaffected
+        # dependents are still valid.
+        durations = graph.durations
+        offsets = graph.dependents_offsets
+        dependents = graph.dependents
+
+        pending_dependents_count = {}
+        ready = []
+        for index in affected_dependencies:
+            count = sum(
+                affected[dependent]
+                for dependent in dependents[offsets[index] : offsets[index + 1]]
+            )
+            pending_dependents_count[index] = count
+            if count == 0:
+                ready.append(index)
+
+        recomputed_count = 0
+
+        while ready:
+            current = ready.pop()
+            recomputed_count += 1
+
+            longest_dependent = 0
+            height = 0
+            for dependent in dependents[offsets[current] : offsets[current + 1]]:
+                if bottom_levels[dependent] > longest_dependent:
+                    longest_dependent = bottom_levels[dependent]
+                if heights[dependent] >= height:
+                    height = heights[dependent] + 1
+
+            bottom_levels[current] = durations[current] + longest_dependent
+            heights[current] = height
+
+            for dependency in affected_dependencies[current]:
+                pending_dependents_count[dependency] -= 1
+                if pending_dependents_count[dependency] == 0:
+                    ready.append(dependency)
+
+        # Actions that are part of a cycle never run out of pending
+        # dependents.
+        self._has_cycle = recomputed_count < len(affected_dependencies)
+
+        self._adopt(graph, self._sha1s if diff.sha1s is None else diff.sha1s)
+        self._bottom_levels = bottom_levels
+        self._heights = heights
+
+        return len(affected_dependencies)
+
+    def _diff_same_actions(self, graph: CompactActionGraph) -> ActionsDiff:
+        """Computes the changes to a graph with the same actions, in the same order.
+
+        Args:
+            graph: The compact graph of the other graph.
+        """
+        diff = ActionsDiff()
+
+        if graph.durations != self._durations:
+            diff.reweighted = list(
+                compress(range(len(graph)), map(ne, graph.durations, self._durations))
+            )
+
+        offsets = graph.dependents_offsets
+        dependents = graph.dependents
+
+        if offsets != self._dependents_offsets or dependents != self._dependents:
+            diff.relinked = list(
+                compress(
+                    range(len(graph)),
+                    map(
+                        ne,
+                        _slices(dependents, offsets),
+                        _slices(self._dependents, self._dependents_offsets),
+                    ),
+                )
+            )
+
+        return diff
+
+    def _diff_other_actions(
+        self, graph: CompactActionGraph, sha1s: bytes
+    ) -> ActionsDiff:
+        """Computes the changes to a graph with different actions, or in a different order.
+
+        Args:
+            graph: The compact graph of the other graph.
+            sha1s: The string table of the SHA-1s of the other graph.
+        """
+        snapshot_actions_count = len(self._durations)
+        previous_sha1s = list(
+            section_string_table(memoryview(self._sha1s), snapshot_actions_count)
+        )
+        current_sha1s = list(graph.sha1s)
+
+        # Changes are mostly in one place, around which the actions are the
+        # same, only shifted. Just the actions in the middle are looked up.
+        prefix_length = _common_prefix_length(current_sha1s, previous_sha1s)
+        suffix_length = _common_prefix_length(
+            current_sha1s[prefix_length:][::-1], previous_sha1s[prefix_length:][::-1]
+        )
+        current_stop = len(graph) - suffix_length
+        previous_stop = snapshot_actions_count - suffix_length
+        current_middle = current_sha1s[prefix_length:current_stop]
+        previous_middle = previous_sha1s[prefix_length:previous_stop]
+        current_index_by_sha1 = dict(
+            zip(current_middle, range(prefix_length, current_stop))
+        )
+        previous_index_by_sha1 = dict(
+            zip(previous_middle, range(prefix_length, previous_stop))
+        )
+
+        # The index of every action of the snapshot in the other graph, or
+        # -1 for the removed ones, and the other way around.
+        current_indexes = (
+            array("q", range(prefix_length))
+            + array("q", map(current_index_by_sha1.get, previous_middle, repeat(-1)))
+            + array("q", range(current_stop, len(graph)))
+        )
+        snapshot_indexes = (
+            array("q", range(prefix_length))
+            + array("q", map(previous_index_by_sha1.get, current_middle, repeat(-1)))
+            + array("q", range(previous_stop, snapshot_actions_count))
+        )
+
+        diff = ActionsDiff(snapshot_indexes=snapshot_indexes, sha1s=sha1s)
+        diff.added = [
+            index
+            for index in range(prefix_length, current_stop)
+            if snapshot_indexes[index] < 0
+        ]
+        diff.removed = [
+            action_sha1
+            for action_sha1 in previous_middle
+            if action_sha1 not in current_index_by_sha1
+        ]
+
+        # The values of the snapshot by index in the other graph, compared
+        # as a whole. Added actions are skipped.
+        previous_durations = (
+            self._durations[:prefix_length]
+            + _gather(self._durations, snapshot_indexes[prefix_length:current_stop])
+            + self._durations[previous_stop:]
+        )
+        diff.reweighted = [
+            index
+            for index in compress(
+                range(len(graph)), map(ne, graph.durations, previous_durations)
+            )
+            if snapshot_indexes[index] >= 0
+        ]
+
+        # Likewise for the dependents, which are renumbered so that the
+        # unchanged ones compare equal. Removed dependents become -1.
+        if (current_stop == previous_stop or not suffix_length) and current_indexes[
+            prefix_length:previous_stop
+        ] == array("q", range(prefix_length, previous_stop)):
+            previous_dependents = self._dependents
+        else:
+            previous_dependents = array(
+                "q", map(current_indexes.__getitem__, self._dependents)
+            )
+        previous_offsets = self._dependents_offsets
+        dependents = graph.dependents
+        offsets = graph.dependents_offsets
+
+        for index in chain(
+            _changed_slices(
+                dependents,
+                offsets,
+                previous_dependents,
+                previous_offsets,
+                0,
+                prefix_length,
+                0,
+            ),
+            range(prefix_length, current_stop),
+            _changed_slices(
+                dependents,
+                offsets,
+                previous_dependents,
+                previous_offsets,
+                current_stop,
+                len(graph),
+                previous_stop,
+            ),
+        ):
+            snapshot_index = snapshot_indexes[index]
+            if snapshot_index < 0:
+                continue
+
+            # The order of the dependents only changes with the order of the
+            # actions.
+            if sorted(dependents[offsets[index] : offsets[index + 1]]) != sorted(
+                previous_dependents[
+                    previous_offsets[snapshot_index] : previous_offsets[
+                        snapshot_index + 1
+                    ]
+                ]
+            ):
+                diff.relinked.append(index)
+
+        return diff
+
+    def _analyze(self, actions_info: ActionsInfo, use_numpy: bool = False) -> None:
+        """Analyzes the whole graph from scratch.
+
+        Args:
+            actions_info: Actions info.
+            use_numpy: Whether or not to analyze the graph with NumPy.
+
+        Raises:
+            UnknownDependencyError: If an action depends on an unknown action.
+        """
+        graph = actions_info.compact_graph
+
+        offsets = graph.dependents_offsets
+        dependents = graph.dependents
+        heights = array("q", bytes(8 * len(graph)))
+
+        try:
+            analysis = BottomLevels(actions_info=actions_info, use_numpy=use_numpy)
+        except DependencyCycleError:
+            analysis = None
+
+        self._has_cycle = analysis is None
+
+        if analysis is None:
+            bottom_levels = array(graph.durations.typecode, graph.durations)
+        else:
+            bottom_levels = analysis.bottom_levels_by_index()
+
+            for current in reversed(analysis.topological_order_by_index()):
+                height = 0
+                for dependent in dependents[offsets[current] : offsets[current + 1]]:
+                    if heights[dependent] >= height:
+                        height = heights[dependent] + 1
+                heights[current] = height
+
+        self._adopt(graph, _encode_sha1s(graph))
+        self._bottom_levels = bottom_levels
+        self._heights = heights
+
+    def _adopt(self, graph: CompactActionGraph, sha1s: bytes) -> None:
+        """Replaces the snapshot's graph with a copy of another.
+
+        Args:
+            graph: The compact graph of the other graph.
+            sha1s: The string table of the SHA-1s of the other graph.
+        """
+        self._sha1s = sha1s
+        self._durations = array(graph.durations.typecode, graph.durations)
+        self._dependents_offsets = array("q", graph.dependents_offsets)
+        self._dependents = array("q", graph.dependents)
+        self._index_by_sha1 = None
+        self._changed = None
+
+    def _get_index_by_sha1(self) -> Dict[ActionSha1, ActionIndex]:
+        """Returns the index of each action in the snapshot, by SHA-1."""
+        if self._index_by_sha1 is None:
+            sha1s = section_string_table(memoryview(self._sha1s), len(self._durations))
+            self._index_by_sha1 = dict(zip(sha1s, range(len(self._durations))))
+
+        return self._index_by_sha1
+
+
+def refresh_analysis_snapshot(
+    path: str, actions_info: ActionsInfo, use_numpy: bool = False
+) -> AnalysisSnapshot | None:
+    """Brings the analysis snapshot at a path up to date with an action graph.
+
+    The snapshot saved by the previous build is updated with the changes
+    since then, or the graph is analyzed from scratch if there's no usable
+    snapshot. Either way, the changes are saved for the next build.
+
+    Args:
+        path: The path to the snapshot file.
+        actions_info: Actions info for the current graph.
+        use_numpy: Whether or not to analyze the graph with NumPy, if it has
+            to be analyzed from scratch.
+
+    Returns:
+        The up to date snapshot, or None if an action depends on an unknown
+        action, in which case the snapshot is left as it is.
+    """
+    snapshot = None
+
+    try:
+        if os.path.exists(path):
+            try:
+                snapshot = AnalysisSnapshot.load(path)
+                diff = snapshot.diff(actions_info)
+                reanalyzed_count = snapshot.update(actions_info, diff, use_numpy)
+
+                log.info(
+                    "Updated analysis snapshot: %s added, %s removed, %s re-weighted,"
+                    " %s relinked, %s actions re-analyzed",
+                    len(diff.added),
+                    len(diff.removed),
+                    len(diff.reweighted),
+                    len(diff.relinked),
+                    reanalyzed_count,
+                )
+            except AnalysisSnapshotError as e:
+                log.warning("Analyzing the graph from scratch: %s", e)
+                snapshot = None
+
+        if snapshot is None:
+            snapshot = AnalysisSnapshot.from_actions_info(actions_info, use_numpy)
+    except UnknownDependencyError as e:
+        log.warning("Not using the analysis snapshot: %s", e)
+        return None
+
+    snapshot.save_changes(path)
+
+    return snapshot
+
+
+def _encode_sha1s(graph: CompactActionGraph) -> bytes:
+    """Returns the string table of the SHA-1s of a graph, as stored in snapshots.
+
+    Args:
+        graph: The compact graph.
+    """
+    offsets, data = StringTable.encode(graph.sha1s)
+
+    return section_bytes(offsets) + data
+
+
+def _gather(values: array, indexes: array) -> array:
+    """Returns the values at some indexes.
+
+    Args:
+        values: The values.
+        indexes: The indexes, where -1 stands for any value.
+    """
+    if not values:
+        return array(values.typecode, bytes(values.itemsize * len(indexes)))
+
+    # Index -1 is the last value.
+    return array(values.typecode, map(values.__getitem__, indexes))
+
+
+def _slices(values: array, offsets: array) -> Iterator[array]:
+    """Returns the slices of a compressed sparse row array, one per action.
+
+    Args:
+        values: The values of all actions, grouped by action.
+        offsets: Where the values of each action start in `values`, followed
+            by the number of values.
+    """
+    return map(values.__getitem__, map(slice, offsets, islice(offsets, 1, None)))
+
+
+def _common_prefix_length(values: List[str], other_values: List[str]) -> int:
+    """Returns how many values two lists start with in common.
+
+    Args:
+        values: The values.
+        other_values: The other values.
+    """
+    limit = min(len(values), len(other_values))
+    for start in range(0, limit, _BLOCK_SIZE):
+        stop = min(start + _BLOCK_SIZE, limit)
+        if values[start:stop] != other_values[start:stop]:
+            return next(
+                compress(
+                    count(start), map(ne, values[start:stop], other_values[start:stop])
+                )
+            )
+
+    return limit
+
+
+def _changed_slices(
+    values: array,
+    offsets: array,
+    other_values: array,
+    other_offsets: array,
+    start: int,
+    stop: int,
+    other_start: int,
+) -> Iterator[int]:
+    """Yields the actions of a run whose slice differs from their slice in other arrays.
+
+    Action `start + i` is action `other_start + i` in the other arrays. Blocks
+    of actions are compared as a whole, then action by action if they differ.
+
+    Args:
+        values: The values of all actions, grouped by action.
+        offsets: Where the values of each action start in `values`, followed
+            by the number of values.
+        other_values: Likewise for the other arrays.
+        other_offsets: Likewise for the other arrays.
+        start: The first action of the run.
+        stop: The action after the last one of the run.
+        other_start: The first action of the run in the other arrays.
+    """
+    for block_start in range(start, stop, _BLOCK_SIZE):
+        block_stop = min(block_start + _BLOCK_SIZE, stop)
+        block_offsets = offsets[block_start : block_stop + 1]
+        other_block_offsets = other_offsets[
+            other_start + block_start - start : other_start + block_stop - start + 1
+        ]
+
+        if (
+            values[block_offsets[0] : block_offsets[-1]]
+            == other_values[other_block_offsets[0] : other_block_offsets[-1]]
+        ):
+            shift = other_block_offsets[0] - block_offsets[0]
+            if shift:
+                block_offsets = array("q", map(shift.__add__, block_offsets))
+            if block_offsets == other_block_offsets:
+                continue
+
+        yield from compress(
+            range(block_start, block_stop),
+            map(
+                ne,
+                _slices(values, offsets[block_start : block_stop + 1]),
+                _slices(other_values, other_block_offsets),
+            ),
+        )
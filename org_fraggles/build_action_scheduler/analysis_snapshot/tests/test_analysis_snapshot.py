@@ -0,0 +1,279 @@
+import os
+import random
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler import analysis_snapshot
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.analysis_snapshot import (
+    AnalysisSnapshot,
+    AnalysisSnapshotError,
+    refresh_analysis_snapshot,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    BottomLevels,
+    DependencyAnalyzer,
+    DependencyCycleError,
+    UnknownDependencyError,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def _random_actions(actions_count: int, rng: random.Random) -> list:
+    return [
+        Action(
+            sha1=f"{i:05}",
+            duration=rng.randint(1, 100),
+            dependencies=[
+                f"{d:05}" for d in rng.sample(range(i), min(i, rng.randint(0, 3)))
+            ],
+        )
+        for i in range(actions_count)
+    ]
+
+
+def _update(snapshot: AnalysisSnapshot, actions: list) -> int:
+    actions_info = ActionsInfo(actions=actions)
+
+    return snapshot.update(actions_info, snapshot.diff(actions_info))
+
+
+def _assert_matches_full_analysis(snapshot: AnalysisSnapshot, actions: list) -> None:
+    bottom_levels = DependencyAnalyzer(
+        actions_info=ActionsInfo(actions=actions)
+    ).bottom_levels()
+
+    for action in actions:
+        assert snapshot.bottom_level(action.sha1) == bottom_levels.bottom_level(
+            action.sha1
+        )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_update_matches_full_analysis(seed):
+    rng = random.Random(seed)
+    actions = _random_actions(300, rng)
+    snapshot = AnalysisSnapshot.from_actions_info(ActionsInfo(actions=actions))
+
+    for _ in range(10):
+        actions = list(actions)
+        sha1s = [action.sha1 for action in actions]
+
+        # Re-weight a few actions.
+        for i in rng.sample(range(len(actions)), 5):
+            actions[i] = Action(
+                sha1=actions[i].sha1,
+                duration=rng.randint(1, 100),
+                dependencies=actions[i].dependencies,
+            )
+
+        # Add an action depending on existing ones.
+        new_sha1 = f"new-{rng.random()}"
+        actions.append(
+            Action(sha1=new_sha1, duration=50, dependencies=rng.sample(sha1s, 2))
+        )
+
+        # Remove an action that nothing depends on.
+        dependencies = {d for action in actions for d in action.dependencies}
+        removable = [a for a in actions if a.sha1 not in dependencies]
+        actions.remove(rng.choice(removable))
+
+        # Move an action to another dependency.
+        i = rng.randrange(1, len(actions))
+        actions[i] = Action(
+            sha1=actions[i].sha1,
+            duration=actions[i].duration,
+            dependencies=[actions[rng.randrange(i)].sha1],
+        )
+
+        actions_info = ActionsInfo(actions=actions)
+        diff = snapshot.diff(actions_info)
+        assert not diff.empty()
+        snapshot.update(actions_info, diff)
+
+        assert not snapshot.has_cycle()
+        _assert_matches_full_analysis(snapshot, actions)
+
+
+def test_update_only_reanalyzes_affected_actions():
+    actions = [Action(sha1="0", duration=1, dependencies=[])] + [
+        Action(sha1=str(i), duration=1, dependencies=[str(i - 1)])
+        for i in range(1, 1000)
+    ]
+    snapshot = AnalysisSnapshot.from_actions_info(ActionsInfo(actions=actions))
+
+    # The first action has no dependencies, so only its own bottom level
+    # can change.
+    actions[0] = Action("0", 5, [])
+    assert _update(snapshot, actions) == 1
+    assert snapshot.bottom_level("0") == 1004
+    assert snapshot.bottom_level("1") == 999
+
+    # The last action is a transitive dependent of all others.
+    actions[999] = Action("999", 5, ["998"])
+    assert _update(snapshot, actions) == 1000
+    assert snapshot.bottom_level("0") == 1008
+
+    assert _update(snapshot, actions) == 0
+
+    # Adding a root action only affects its dependency chain.
+    actions.append(Action("1000", 1, ["999"]))
+    assert _update(snapshot, actions) == 1001
+    actions.append(Action("1001", 1, ["0"]))
+    assert _update(snapshot, actions) == 2
+    assert snapshot.bottom_level("0") == 1009
+
+
+def test_update_with_estimated_durations():
+    actions = _random_actions(100, random.Random(0))
+    snapshot = AnalysisSnapshot.from_actions_info(ActionsInfo(actions=actions))
+
+    # The bottom levels become fractional, so they're all recomputed.
+    actions_info = ActionsInfo(actions=actions)
+    actions_info.update_durations({actions[0].sha1: 0.5})
+    assert snapshot.update(actions_info, snapshot.diff(actions_info)) == 100
+
+    actions_info = ActionsInfo(actions=actions)
+    actions_info.update_durations({actions[0].sha1: 0.5, actions[99].sha1: 2.5})
+    assert snapshot.update(actions_info, snapshot.diff(actions_info)) < 100
+
+    assert snapshot.bottom_levels(actions_info).bottom_levels_by_index() == (
+        BottomLevels(actions_info=actions_info).bottom_levels_by_index()
+    )
+
+
+def test_update_detects_cycles():
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="b", duration=2, dependencies=["a"]),
+        Action(sha1="c", duration=3, dependencies=["b"]),
+    ]
+    snapshot = AnalysisSnapshot.from_actions_info(ActionsInfo(actions=actions))
+
+    cyclic_actions = [Action("a", 1, ["c"])] + actions[1:]
+    _update(snapshot, cyclic_actions)
+    assert snapshot.has_cycle()
+
+    with pytest.raises(DependencyCycleError):
+        snapshot.bottom_levels(ActionsInfo(actions=cyclic_actions))
+
+    _update(snapshot, actions)
+    assert not snapshot.has_cycle()
+    _assert_matches_full_analysis(snapshot, actions)
+
+
+def test_diff_rejects_unknown_dependencies(tmp_path):
+    path = str(tmp_path / "snapshot")
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="b", duration=2, dependencies=["a"]),
+    ]
+    snapshot = refresh_analysis_snapshot(path, ActionsInfo(actions=actions))
+    assert snapshot is not None
+
+    dangling_actions = actions[1:]
+    with pytest.raises(UnknownDependencyError):
+        snapshot.diff(ActionsInfo(actions=dangling_actions))
+
+    # The snapshot isn't used, nor overwritten.
+    modified_time = os.stat(path).st_mtime_ns
+    assert (
+        refresh_analysis_snapshot(path, ActionsInfo(actions=dangling_actions)) is None
+    )
+    assert os.stat(path).st_mtime_ns == modified_time
+    os.remove(path)
+    assert (
+        refresh_analysis_snapshot(path, ActionsInfo(actions=dangling_actions)) is None
+    )
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "snapshot")
+    actions = _random_actions(50, random.Random(0))
+
+    AnalysisSnapshot.from_actions_info(ActionsInfo(actions=actions)).save(path)
+    snapshot = AnalysisSnapshot.load(path)
+
+    assert snapshot.diff(ActionsInfo(actions=actions)).empty()
+    _assert_matches_full_analysis(snapshot, actions)
+
+    with open(path, "wb") as f:
+        f.write(b"not a snapshot")
+
+    with pytest.raises(AnalysisSnapshotError):
+        AnalysisSnapshot.load(path)
+
+    with pytest.raises(AnalysisSnapshotError):
+        AnalysisSnapshot.load(str(tmp_path / "missing"))
+
+
+def test_refresh_only_writes_changes(tmp_path):
+    path = str(tmp_path / "snapshot")
+    actions = _random_actions(50, random.Random(0))
+    refresh_analysis_snapshot(path, ActionsInfo(actions=actions))
+    stat = os.stat(path)
+
+    # Nothing changed, so nothing is written.
+    refresh_analysis_snapshot(path, ActionsInfo(actions=actions))
+    assert os.stat(path).st_mtime_ns == stat.st_mtime_ns
+
+    # Re-weighted actions are written in place.
+    actions[10] = Action(
+        sha1=actions[10].sha1, duration=1000, dependencies=actions[10].dependencies
+    )
+    refresh_analysis_snapshot(path, ActionsInfo(actions=actions))
+    assert os.stat(path).st_ino == stat.st_ino
+    _assert_matches_full_analysis(AnalysisSnapshot.load(path), actions)
+
+    # Other changes replace the file.
+    actions.append(Action(sha1="new", duration=1, dependencies=[actions[10].sha1]))
+    refresh_analysis_snapshot(path, ActionsInfo(actions=actions))
+    assert os.stat(path).st_ino != stat.st_ino
+    _assert_matches_full_analysis(AnalysisSnapshot.load(path), actions)
+
+
+def test_load_rejects_interrupted_writes(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot")
+    actions = _random_actions(50, random.Random(0))
+    snapshot = refresh_analysis_snapshot(path, ActionsInfo(actions=actions))
+    assert snapshot is not None
+
+    actions[10] = Action(
+        sha1=actions[10].sha1, duration=1000, dependencies=actions[10].dependencies
+    )
+    _update(snapshot, actions)
+
+    class InterruptedValue:
+        def pack_into(self, *args):
+            raise KeyboardInterrupt()
+
+    monkeypatch.setitem(analysis_snapshot._VALUES, "q", InterruptedValue())
+    with pytest.raises(KeyboardInterrupt):
+        snapshot.save_changes(path)
+
+    with pytest.raises(AnalysisSnapshotError, match="Incomplete"):
+        AnalysisSnapshot.load(path)
+
+
+def test_bottom_levels_for_dependency_analyzer():
+    actions = _random_actions(100, random.Random(0))
+    actions_info = ActionsInfo(actions=actions)
+    snapshot = AnalysisSnapshot.from_actions_info(actions_info)
+
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+    dependency_analyzer.use_bottom_levels(snapshot.bottom_levels(actions_info))
+
+    expected = DependencyAnalyzer(actions_info=actions_info).bottom_levels()
+
+    assert not dependency_analyzer.detect_cycle()
+    assert dependency_analyzer.bottom_levels().critical_path() == (
+        expected.critical_path()
+    )
+    assert dependency_analyzer.bottom_levels().topological_levels() == (
+        expected.topological_levels()
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from threading import get_ident
+from typing import Any, Dict
+
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    DependencyCycleError,
+    UnknownDependencyError,
+)
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import ActionResult, ActionSha1
+
+log = logging.getLogger(__name__)
+
+
+class AsyncActionScheduler(ActionScheduler):
+    """Schedules actions as coroutines on a single asyncio event loop.
+
+    Meant for I/O-bound actions that spend most of their time waiting, where
+    one OS thread per concurrent action would be too expensive. Ready actions
+    are kept in a heap keyed by their priorities, and concurrency is
+    bounded by a semaphore. The event loop thread is the dispatcher: all
+    callbacks run on it, and actions submitted from other threads are queued
+    for it. Action result cache and duration history I/O (SQLite or HTTP)
+    runs in threads, so that it doesn't block the event loop.
+    """
+
+    # Completions wake the event loop up directly, so there's nothing to poll.
+    action_status_polling_interval_s: float = 0
+
+    # The ready queue is the only supported algorithm.
+    algorithm: SchedulingAlgorithm = SchedulingAlgorithm.READY_QUEUE
+
+    # Set whenever an action execution is done or has failed. Created in
+    # `schedule_async` so that it's bound to the running event loop.
+    _action_execution_finished: asyncio.Event = PrivateAttr(default=None)
+
+    # The event loop scheduling the actions.
+    _loop: asyncio.AbstractEventLoop = PrivateAttr(default=None)
+
+    def schedule(self) -> Dict[str, Any]:
+        """Schedules actions for execution on a new event loop.
+
+        Returns:
+            An error dict in case of errors, or a dict containing scheduling results.
+        """
+        return asyncio.run(self.schedule_async())
+
+    async def schedule_async(self) -> Dict[str, Any]:
+        """Schedules actions for execution on the running event loop.
+
+        Returns:
+            An error dict in case of errors, or a dict containing scheduling results.
+        """
+        try:
+            overall_critical_path = self._analyze_dependencies()
+        except DependencyCycleError:
+            return {"error": "Dependency cycle detected"}
+        except UnknownDependencyError as e:
+            return {"error": str(e)}
+
+        self._action_execution_finished = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._dispatcher_thread_id = get_ident()
+        self._prefetch_from_action_result_cache(overall_critical_path[1])
+
+        self._push_initial_ready_actions()
+
+        self.progress_reporter.start(self.progress)
+
+        try:
+            semaphore = asyncio.Semaphore(self.parallelism)
+            tasks = set()
+
+            while not self._all_actions_finished():
+                # Wait for a free slot before picking an action, so that the action
+                # with the highest priority when the slot frees up is the one to run.
+                await semaphore.acquire()
+
+                while True:
+                    # Cleared before draining the completions, so that the
+                    # ones queued from now on, even while checking the action
+                    # result cache, still wake the loop up.
+                    self._action_execution_finished.clear()
+
+                    # Actions can be added from other threads.
+                    self._process_completions(0)
+                    await self._check_ready_actions_in_action_result_cache_async()
+                    action_sha1s = self._pop_ready_actions(1)
+
+                    if action_sha1s or self._all_actions_finished():
+                        break
+
+                    # Wait for an action to become ready, or for resources to
+                    # be released.
+                    await self._action_execution_finished.wait()
+
+                if not action_sha1s:
+                    semaphore.release()
+                    break
+
+                action_sha1 = action_sha1s[0]
+                self._actions_in_flight_count += 1
+
+                cached_action_result = await self._get_cached_action_result_async(
+                    action_sha1
+                )
+                self._prefetch_dependents_from_action_result_cache(action_sha1s)
+
+                if cached_action_result is not None:
+                    self._on_action_execution_done(action_sha1, cached_action_result)
+                    semaphore.release()
+                    continue
+
+                task = asyncio.create_task(
+                    self._execute_and_release(action_sha1, semaphore)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            # Wait for the actions in flight, if any.
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.progress_reporter.stop()
+
+        return self._build_report(overall_critical_path)
+
+    async def execute_async(self, action_sha1: ActionSha1) -> ActionResult:
+        """Executes a given action with the action executor, without blocking.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+
+        Returns:
+            The result of the action execution.
+        """
+        self._on_action_execution_start(action_sha1)
+
+        try:
+            action_result = await self.action_executor.execute_async(
+                self.actions_info.actions_by_sha1[action_sha1]
+            )
+        except Exception as e:
+            self._on_action_execution_failed(action_sha1, repr(e))
+            raise
+
+        if self.action_result_cache is None and self.duration_history is None:
+            self._on_action_execution_result(action_sha1, action_result)
+        else:
+            # Storing the result blocks, and the completion is queued from
+            # the thread like from any worker.
+            await asyncio.to_thread(
+                self._on_action_execution_result, action_sha1, action_result
+            )
+
+        return action_result
+
+    async def _execute_and_release(
+        self, action_sha1: ActionSha1, semaphore: asyncio.Semaphore
+    ) -> ActionResult:
+        """Executes an action and releases its slot in the semaphore.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+            semaphore: The semaphore bounding the number of running actions.
+
+        Returns:
+            The result of the action execution.
+        """
+        try:
+            return await self.execute_async(action_sha1)
+        finally:
+            semaphore.release()
+
+    async def _check_ready_actions_in_action_result_cache_async(self) -> None:
+        """Checks the ready actions not checked yet against the action result
+        cache, in a thread.
+
+        Like `_check_ready_actions_in_action_result_cache`.
+        """
+        if not self._action_result_cache_unchecked:
+            return
+
+        action_sha1s = self._action_result_cache_unchecked
+        self._action_result_cache_unchecked = []
+
+        present = await asyncio.to_thread(
+            self.action_result_cache.contains_many, action_sha1s
+        )
+
+        for action_sha1 in action_sha1s:
+            self._action_result_cache_presence[action_sha1] = action_sha1 in present
+
+    async def _get_cached_action_result_async(
+        self, action_sha1: ActionSha1
+    ) -> ActionResult | None:
+        """Looks an action up in the action result cache, if there's one, in a
+        thread.
+
+        Like `_get_cached_action_result`.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+
+        Returns:
+            The cached result of the action, or None.
+        """
+        if self.action_result_cache is None:
+            return None
+
+        # Actions the batched check found missing aren't looked up again.
+        if self._action_result_cache_presence.pop(action_sha1, None) is False:
+            cached_action_result = None
+        else:
+            cached_action_result = await asyncio.to_thread(
+                self.action_result_cache.get, action_sha1
+            )
+
+        if cached_action_result is None:
+            self._action_result_cache_misses += 1
+        else:
+            self._actions_from_action_result_cache.add(action_sha1)
+
+        return cached_action_result
+
+    def _wake_dispatcher(self) -> None:
+        """Wakes the event loop up after a completion or a submission."""
+        self._loop.call_soon_threadsafe(self._action_execution_finished.set)
@@ -0,0 +1,202 @@
+import sys
+import threading
+import time
+from typing import Set
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.action_cache import SqliteActionCache
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.async_scheduler import AsyncActionScheduler
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.executors import (
+    ActionExecutor,
+    SubprocessActionExecutor,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+@pytest.fixture
+def actions_info():
+    actions = [
+        Action(sha1="a", duration=3, dependencies=["b", "e"]),
+        Action(sha1="b", duration=2, dependencies=["c"]),
+        Action(sha1="c", duration=1, dependencies=[]),
+        Action(sha1="e", duration=5, dependencies=[]),
+    ]
+    return ActionsInfo(actions=actions)
+
+
+@pytest.fixture
+def dependency_analyzer(actions_info):
+    return DependencyAnalyzer(actions_info=actions_info)
+
+
+def test_schedule_simple(actions_info, dependency_analyzer):
+    result = AsyncActionScheduler(
+        parallelism=1,
+        dry_run=True,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    ).schedule()
+    assert "error" not in result
+    assert result["action_execution_history"] == ["e", "c", "b", "a"]
+    assert result["critical_path"]["duration"] == 8
+    assert result["critical_path"]["path"] == ["e", "a"]
+
+
+def test_schedule_cycle():
+    actions = [
+        Action(sha1="a", duration=1, dependencies=["b"]),
+        Action(sha1="b", duration=1, dependencies=["a"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    result = AsyncActionScheduler(
+        parallelism=1,
+        dry_run=True,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).schedule()
+    assert result == {"error": "Dependency cycle detected"}
+
+
+def test_schedule_high_parallelism():
+    actions = [Action(sha1=str(i), duration=1, dependencies=[]) for i in range(2_000)]
+    actions.append(
+        Action(sha1="root", duration=1, dependencies=[str(i) for i in range(2_000)])
+    )
+    actions_info = ActionsInfo(actions=actions)
+    scheduler = AsyncActionScheduler(
+        parallelism=2_000,
+        dry_run=False,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    start = time.monotonic()
+    result = scheduler.schedule()
+
+    # All leaf actions sleep concurrently, so this takes ~2 seconds rather
+    # than ~2k.
+    assert time.monotonic() - start < 10
+    assert len(result["action_execution_history"]) == 2_001
+    assert result["action_execution_history"][-1] == "root"
+
+
+def test_schedule_failed_action_skips_dependents():
+    actions = [
+        Action(sha1="a", duration=1, dependencies=["b"], command="true"),
+        Action(sha1="b", duration=1, dependencies=[], command="exit 2"),
+        Action(sha1="c", duration=1, dependencies=[], command="true"),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    result = AsyncActionScheduler(
+        parallelism=2,
+        dry_run=False,
+        action_executor=SubprocessActionExecutor(),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).schedule()
+    assert result["action_execution_failures"] == {"b": "Exited with code 2"}
+    assert result["actions_skipped"] == ["a"]
+    assert list(result["action_wall_times_s"]) == ["c"]
+
+
+class ThreadRecordingActionCache(SqliteActionCache):
+    """Records the threads the cache is used from."""
+
+    _thread_ids: Set[int] = PrivateAttr(default_factory=set)
+
+    def contains_many(self, action_sha1s):
+        self._thread_ids.add(threading.get_ident())
+        return super().contains_many(action_sha1s)
+
+    def get(self, action_sha1):
+        self._thread_ids.add(threading.get_ident())
+        return super().get(action_sha1)
+
+    def put(self, action_sha1, action_result):
+        self._thread_ids.add(threading.get_ident())
+        super().put(action_sha1, action_result)
+
+
+def test_schedule_uses_action_result_cache_off_the_event_loop(
+    actions_info, dependency_analyzer, tmp_path
+):
+    action_result_cache = ThreadRecordingActionCache(path=str(tmp_path / "cache.db"))
+    action_result_cache.put("c", ActionResult(exit_code=0, wall_time_s=1))
+    action_result_cache._thread_ids.clear()
+
+    result = AsyncActionScheduler(
+        parallelism=2,
+        dry_run=True,
+        action_result_cache=action_result_cache,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    ).schedule()
+
+    assert result["action_execution_history"] == ["e", "b", "a"]
+    assert result["action_cache"] == {"hits": 1, "misses": 3}
+    # The event loop runs on the calling thread.
+    assert action_result_cache._thread_ids
+    assert threading.get_ident() not in action_result_cache._thread_ids
+
+
+class SlowCheckActionCache(SqliteActionCache):
+    """Takes a while to check for some actions."""
+
+    # The actions whose checks are slow.
+    _slow_action_sha1s: Set[str] = PrivateAttr(default_factory=set)
+
+    def contains_many(self, action_sha1s):
+        if self._slow_action_sha1s.intersection(action_sha1s):
+            time.sleep(0.3)
+        return super().contains_many(action_sha1s)
+
+
+class SlowActionExecutor(ActionExecutor):
+    """Takes a while to execute some actions."""
+
+    # The actions that are slow to execute.
+    slow_action_sha1s: Set[str]
+
+    def execute(self, action: Action) -> ActionResult:
+        if action.sha1 in self.slow_action_sha1s:
+            time.sleep(0.1)
+        return ActionResult(exit_code=0, wall_time_s=0)
+
+
+def test_schedule_wakes_up_for_completions_during_cache_checks(tmp_path):
+    # "y" becomes ready once "x" is done, and is checked against the cache
+    # while "a", which holds the GPU it needs, completes.
+    actions = [
+        Action(sha1="x", duration=2, dependencies=[]),
+        Action(sha1="y", duration=2, dependencies=["x"], exclusive_resources=("gpu",)),
+        Action(sha1="a", duration=1, dependencies=[], exclusive_resources=("gpu",)),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    action_result_cache = SlowCheckActionCache(path=str(tmp_path / "cache.db"))
+    action_result_cache._slow_action_sha1s.add("y")
+    scheduler = AsyncActionScheduler(
+        parallelism=3,
+        dry_run=True,
+        action_executor=SlowActionExecutor(slow_action_sha1s={"a"}),
+        action_result_cache=action_result_cache,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(scheduler.schedule()), daemon=True
+    )
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert sorted(results[0]["action_execution_history"]) == ["a", "x", "y"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,980 @@
+import dataclasses
+import hashlib
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.actions_loader import load_actions_info
+from org_fraggles.build_action_scheduler.analysis_snapshot import (
+    refresh_analysis_snapshot,
+)
+from org_fraggles.build_action_scheduler.compiled_graph import (
+    compile_actions_info,
+    load_compiled_actions_info,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    BottomLevels,
+    DependencyAnalyzer,
+)
+from org_fraggles.build_action_scheduler.executors import SleepActionExecutor
+from org_fraggles.build_action_scheduler.progress import ProgressReporter
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionSha1
+
+# The version of the baseline file format, bumped whenever it changes.
+BASELINE_FORMAT_VERSION = 1
+
+# The metrics compared against a baseline. Higher is worse for all of them.
+COMPARED_METRICS = [
+    "detect_cycle_s",
+    "critical_path_s",
+    "schedule_s",
+    "peak_memory_bytes",
+]
+
+# Timings that differ from the baseline by less than this are never
+# reported as regressions, since they're mostly noise.
+TIMING_NOISE_FLOOR_S = 0.01
+
+# The modules that scheduling with the default options must not import, since
+# they're only needed by optional features and slow down every start.
+STARTUP_DEFERRED_MODULES = [
+    "asyncio",
+    "http.client",
+    "multiprocessing",
+    "sqlite3",
+    "org_fraggles.build_action_scheduler.analysis_snapshot",
+    "org_fraggles.build_action_scheduler.async_scheduler",
+    "org_fraggles.build_action_scheduler.daemon",
+    "org_fraggles.build_action_scheduler.distributed",
+    "org_fraggles.build_action_scheduler.process_scheduler",
+    "org_fraggles.build_action_scheduler.remote_cache",
+    "org_fraggles.build_action_scheduler.simulator",
+]
+
+# The directory containing the `org_fraggles` package, which the scheduler
+# command is run from when measuring its startup.
+_PACKAGE_ROOT = Path(__file__).parents[3]
+
+
+class GraphShape(str, Enum):
+    """The shapes of the generated dependency graphs."""
+
+    # Every action depends on the previous one.
+    CHAIN = "chain"
+
+    # One action that every other action depends on, and one action that
+    # depends on every other action.
+    FAN = "fan"
+
+    # Rows of actions, each depending on two adjacent actions of the previous
+    # row, so that paths form diamonds.
+    LATTICE = "lattice"
+
+    # Every action depends on a few actions picked uniformly among the
+    # previous ones.
+    RANDOM = "random"
+
+    # Mostly local dependencies, a few widely shared ones, and heavy-tailed
+    # durations, like the actions of a large code base.
+    REAL_WORLD = "real_world"
+
+
+class BenchmarkError(Exception):
+    """Raised when a benchmark can't be run or compared."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of BenchmarkError."""
+        super().__init__(message)
+
+
+@dataclass
+class BenchmarkResult:
+    """How long each scheduling phase took on a generated graph."""
+
+    # The shape of the generated graph.
+    shape: str
+
+    # The seed the graph was generated with.
+    seed: int
+
+    # The number of actions in the graph.
+    actions_count: int
+
+    # The number of dependency edges in the graph.
+    dependencies_count: int
+
+    # The time taken by `DependencyAnalyzer.detect_cycle`.
+    detect_cycle_s: float
+
+    # The time taken to compute the bottom levels and the critical path, from
+    # scratch.
+    critical_path_s: float
+
+    # The time taken to create the scheduler and schedule every action in
+    # dry-run mode, once the dependencies are analyzed.
+    schedule_s: float
+
+    # The number of actions dispatched per second while scheduling.
+    actions_per_s: float
+
+    # The peak memory allocated while loading, analyzing and scheduling the
+    # graph, or None if it wasn't measured.
+    peak_memory_bytes: int | None
+
+    @property
+    def key(self) -> str:
+        """Identifies the benchmark, to compare it with a baseline."""
+        return f"{self.shape}/{self.actions_count}/{self.seed}"
+
+
+@dataclass
+class BenchmarkComparison:
+    """A metric of a benchmark compared with the same metric in a baseline."""
+
+    # The key of the benchmark.
+    key: str
+
+    # The name of the metric.
+    metric: str
+
+    # The value in the baseline.
+    baseline: float
+
+    # The value in the current run.
+    current: float
+
+    # The current value divided by the baseline value.
+    ratio: float
+
+    # Whether or not the current value is worse than the baseline by more
+    # than the tolerance.
+    regressed: bool
+
+
+@dataclass
+class CompiledGraphResult:
+    """How long scheduling a generated graph took from a JSON file and from a compiled graph."""
+
+    # The shape of the generated graph.
+    shape: str
+
+    # The seed the graph was generated with.
+    seed: int
+
+    # The number of actions in the graph.
+    actions_count: int
+
+    # The time taken to load the JSON actions file, analyze the dependencies
+    # and schedule every action in dry-run mode.
+    json_s: float
+
+    # The time taken to load the compiled graph and schedule every action in
+    # dry-run mode, with the bottom levels precomputed by the compiler.
+    compiled_s: float
+
+    # The JSON time divided by the compiled graph time.
+    speedup: float
+
+
+@dataclass
+class AnalysisSnapshotResult:
+    """How long refreshing an analysis snapshot took, compared with a full analysis."""
+
+    # The shape of the generated graph.
+    shape: str
+
+    # The seed the graph was generated with.
+    seed: int
+
+    # The number of actions in the graph.
+    actions_count: int
+
+    # The time taken to compute the bottom levels of every action.
+    full_analysis_s: float
+
+    # The time taken to analyze the graph and save the snapshot.
+    create_s: float
+
+    # The time taken to refresh the snapshot for the same graph.
+    unchanged_refresh_s: float
+
+    # The time taken to refresh the snapshot after re-weighting a root
+    # action, which affects all its transitive dependencies.
+    reweighted_refresh_s: float
+
+    # The time taken to refresh the snapshot after adding an action in the
+    # middle of the graph, which renumbers the actions after it.
+    added_refresh_s: float
+
+    # The full analysis time divided by the re-weighted refresh time.
+    speedup: float
+
+
+@dataclass
+class StartupResult:
+    """How long the scheduler command took to start and schedule a tiny graph."""
+
+    # The wall time of the whole command, in seconds.
+    wall_time_s: float
+
+    # The time spent importing modules, in seconds, as reported by
+    # `python -X importtime`.
+    import_time_s: float
+
+    # The number of modules imported.
+    imported_modules_count: int
+
+    # The modules of `STARTUP_DEFERRED_MODULES` which were imported anyway.
+    deferred_modules_imported: List[str]
+
+
+def _action_sha1(shape: GraphShape, seed: int, index: int) -> ActionSha1:
+    """Returns a stable SHA-1 for a generated action."""
+    return hashlib.sha1(f"{shape.value}:{seed}:{index}".encode()).hexdigest()
+
+
+def _make_actions(
+    shape: GraphShape,
+    seed: int,
+    durations: List[int],
+    dependencies: List[List[int]],
+) -> List[Action]:
+    """Turns action indexes into actions, naming them with stable SHA-1s."""
+    sha1s = [_action_sha1(shape, seed, index) for index in range(len(durations))]
+
+    return [
+        Action(
+            sha1=sha1s[index],
+            duration=durations[index],
+            dependencies=[sha1s[dependency] for dependency in dependencies[index]],
+        )
+        for index in range(len(durations))
+    ]
+
+
+def generate_chain(actions_count: int, seed: int = 0) -> List[Action]:
+    """Generates actions that each depend on the previous one.
+
+    Args:
+        actions_count: The number of actions to generate.
+        seed: Seeds the action durations.
+
+    Returns:
+        The actions, dependencies first.
+    """
+    rng = random.Random(seed)
+
+    return _make_actions(
+        GraphShape.CHAIN,
+        seed,
+        [rng.randint(1, 10) for _ in range(actions_count)],
+        [[index - 1] if index > 0 else [] for index in range(actions_count)],
+    )
+
+
+def generate_fan(actions_count: int, seed: int = 0) -> List[Action]:
+    """Generates a wide fan-out followed by a wide fan-in.
+
+    The first action is a dependency of every other action, and the last
+    action depends on every other action.
+
+    Args:
+        actions_count: The number of actions to generate.
+        seed: Seeds the action durations.
+
+    Returns:
+        The actions, dependencies first.
+    """
+    rng = random.Random(seed)
+    dependencies: List[List[int]] = [[]]
+
+    for _ in range(1, actions_count - 1):
+        dependencies.append([0])
+
+    if actions_count > 1:
+        dependencies.append(list(range(1, actions_count - 1)) or [0])
+
+    return _make_actions(
+        GraphShape.FAN,
+        seed,
+        [rng.randint(1, 10) for _ in range(actions_count)],
+        dependencies,
+    )
+
+
+def generate_lattice(actions_count: int, seed: int = 0) -> List[Action]:
+    """Generates square-ish rows of actions forming diamonds.
+
+    Each action depends on the action in the same column and the one in the
+    next column of the previous row, so that the number of paths grows
+    exponentially with the number of rows.
+
+    Args:
+        actions_count: The number of actions to generate.
+        seed: Seeds the action durations.
+
+    Returns:
+        The actions, dependencies first.
+    """
+    rng = random.Random(seed)
+    width = max(1, math.isqrt(actions_count))
+    dependencies = []
+
+    for index in range(actions_count):
+        if index < width:
+            dependencies.append([])
+            continue
+
+        above = index - width
+        column = index % width
+        dependencies.append([above, above + 1] if column + 1 < width else [above])
+
+    return _make_actions(
+        GraphShape.LATTICE,
+        seed,
+        [rng.randint(1, 10) for _ in range(actions_count)],
+        dependencies,
+    )
+
+
+def generate_random(
+    actions_count: int, seed: int = 0, max_dependencies: int = 4
+) -> List[Action]:
+    """Generates actions depending on actions picked uniformly among the previous ones.
+
+    Args:
+        actions_count: The number of actions to generate.
+        seed: Seeds the dependencies and the action durations.
+        max_dependencies: The maximum number of dependencies of an action.
+
+    Returns:
+        The actions, dependencies first.
+    """
+    rng = random.Random(seed)
+    dependencies = []
+
+    for index in range(actions_count):
+        dependencies_count = rng.randint(0, min(index, max_dependencies))
+        dependencies.append(rng.sample(range(index), dependencies_count))
+
+    return _make_actions(
+        GraphShape.RANDOM,
+        seed,
+        [rng.randint(1, 10) for _ in range(actions_count)],
+        dependencies,
+    )
+
+
+def generate_real_world(actions_count: int, seed: int = 0) -> List[Action]:
+    """Generates actions shaped like the build of a large code base.
+
+    Most dependencies are on recently generated actions (e.g., the other
+    actions of the same library), some are on a small set of widely shared
+    actions (e.g., code generation or base libraries), and durations are
+    heavy-tailed, with actions that have many dependencies (e.g., links)
+    taking longer.
+
+    Args:
+        actions_count: The number of actions to generate.
+        seed: Seeds the dependencies and the action durations.
+
+    Returns:
+        The actions, dependencies first.
+    """
+    rng = random.Random(seed)
+    shared_actions_count = max(1, math.isqrt(actions_count) // 4)
+    locality_window = 1000
+    durations = []
+    dependencies = []
+
+    for index in range(actions_count):
+        action_dependencies = set()
+
+        if index > 0:
+            # Mostly a few dependencies, sometimes many.
+            dependencies_count = min(index, int(rng.paretovariate(1.5)))
+
+            for _ in range(dependencies_count):
+                if index > shared_actions_count and rng.random() < 0.2:
+                    action_dependencies.add(rng.randrange(shared_actions_count))
+                else:
+                    action_dependencies.add(
+                        rng.randrange(max(0, index - locality_window), index)
+                    )
+
+        dependencies.append(sorted(action_dependencies))
+        durations.append(
+            max(1, int(rng.lognormvariate(0, 1) * (1 + len(action_dependencies) / 4)))
+        )
+
+    return _make_actions(GraphShape.REAL_WORLD, seed, durations, dependencies)
+
+
+# The generator of each graph shape.
+GRAPH_GENERATORS: Dict[GraphShape, Callable[[int, int], List[Action]]] = {
+    GraphShape.CHAIN: generate_chain,
+    GraphShape.FAN: generate_fan,
+    GraphShape.LATTICE: generate_lattice,
+    GraphShape.RANDOM: generate_random,
+    GraphShape.REAL_WORLD: generate_real_world,
+}
+
+
+def generate_actions(
+    shape: GraphShape, actions_count: int, seed: int = 0
+) -> List[Action]:
+    """Generates actions with a dependency graph of the given shape.
+
+    The same shape, number of actions and seed always generate the same
+    actions.
+
+    Args:
+        shape: The shape of the dependency graph.
+        actions_count: The number of actions to generate.
+        seed: Seeds the generator.
+
+    Returns:
+        The actions, dependencies first.
+    """
+    return GRAPH_GENERATORS[shape](actions_count, seed)
+
+
+def _schedule_dry_run(
+    actions_info: ActionsInfo,
+    dependency_analyzer: DependencyAnalyzer,
+    parallelism: int,
+) -> None:
+    """Schedules every action without executing it."""
+    scheduler = ActionScheduler(
+        parallelism=parallelism,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        action_executor=SleepActionExecutor(dry_run=True),
+        progress_reporter=ProgressReporter(interval_s=3600, log_progress=False),
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    )
+
+    build_report = scheduler.schedule()
+
+    if "error" in build_report:
+        raise BenchmarkError(f"Scheduling failed: {build_report['error']}")
+
+
+def _measure_peak_memory(actions: List[Action], parallelism: int) -> int:
+    """Returns the peak memory allocated while analyzing and scheduling actions.
+
+    Measured in a separate run, since tracing allocations slows everything
+    down.
+    """
+    tracemalloc.start()
+
+    try:
+        actions_info = ActionsInfo(actions=actions)
+        dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+        dependency_analyzer.detect_cycle()
+        _schedule_dry_run(actions_info, dependency_analyzer, parallelism)
+
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _time_phases(
+    shape: GraphShape, actions: List[Action], parallelism: int
+) -> Tuple[float, float, float]:
+    """Times cycle detection, critical path initialization and scheduling.
+
+    Every phase starts from scratch, since the dependency analyzer caches
+    its results.
+
+    Returns:
+        The time taken by each phase, in seconds.
+    """
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+
+    start = time.perf_counter()
+    has_cycle = dependency_analyzer.detect_cycle()
+    detect_cycle_s = time.perf_counter() - start
+
+    if has_cycle:
+        raise BenchmarkError(f"The {shape.value} graph has a dependency cycle")
+
+    start = time.perf_counter()
+    BottomLevels(actions_info=actions_info).critical_path()
+    critical_path_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _schedule_dry_run(actions_info, dependency_analyzer, parallelism)
+    schedule_s = time.perf_counter() - start
+
+    return detect_cycle_s, critical_path_s, schedule_s
+
+
+def run_benchmark(
+    shape: GraphShape,
+    actions_count: int,
+    seed: int = 0,
+    parallelism: int = 64,
+    repeat: int = 3,
+    measure_memory: bool = True,
+) -> BenchmarkResult:
+    """Times each scheduling phase on a generated graph.
+
+    Each phase is timed `repeat` times and the fastest time is kept, since
+    slower times are mostly due to noise (e.g., other processes, or warming
+    up), not to the code being measured.
+
+    Args:
+        shape: The shape of the dependency graph.
+        actions_count: The number of actions to generate.
+        seed: Seeds the generator.
+        parallelism: The maximum number of actions to execute in parallel.
+        repeat: The number of times to time each phase.
+        measure_memory: Whether or not to also measure the peak memory, which
+            runs every phase again with allocations traced.
+
+    Returns:
+        The benchmark result.
+
+    Raises:
+        BenchmarkError: If the generated graph can't be scheduled.
+    """
+    actions = generate_actions(shape, actions_count, seed)
+
+    detect_cycle_s, critical_path_s, schedule_s = (
+        min(phase_timings)
+        for phase_timings in zip(
+            *(_time_phases(shape, actions, parallelism) for _ in range(repeat))
+        )
+    )
+
+    peak_memory_bytes = None
+    if measure_memory:
+        peak_memory_bytes = _measure_peak_memory(actions, parallelism)
+
+    return BenchmarkResult(
+        shape=shape.value,
+        seed=seed,
+        actions_count=actions_count,
+        dependencies_count=sum(len(action.dependencies) for action in actions),
+        detect_cycle_s=detect_cycle_s,
+        critical_path_s=critical_path_s,
+        schedule_s=schedule_s,
+        actions_per_s=actions_count / schedule_s if schedule_s > 0 else math.inf,
+        peak_memory_bytes=peak_memory_bytes,
+    )
+
+
+def _time_scheduling_file(path: str, compiled: bool, parallelism: int) -> float:
+    """Times loading an actions file and scheduling every action in dry-run mode.
+
+    Args:
+        path: The path to the JSON actions file, or to the compiled graph.
+        compiled: Whether or not the file is a compiled graph.
+        parallelism: The maximum number of actions to execute in parallel.
+
+    Returns:
+        The time taken, in seconds.
+    """
+    start = time.perf_counter()
+
+    if not compiled:
+        actions_info = load_actions_info(path)
+        dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+        if dependency_analyzer.detect_cycle():
+            raise BenchmarkError(f"The actions of {path} have a dependency cycle")
+
+        _schedule_dry_run(actions_info, dependency_analyzer, parallelism)
+
+        return time.perf_counter() - start
+
+    compiled_actions_info = load_compiled_actions_info(path)
+    try:
+        dependency_analyzer = DependencyAnalyzer(actions_info=compiled_actions_info)
+        dependency_analyzer.use_bottom_levels(compiled_actions_info.bottom_levels())
+
+        _schedule_dry_run(compiled_actions_info, dependency_analyzer, parallelism)
+
+        return time.perf_counter() - start
+    finally:
+        compiled_actions_info.close()
+
+
+def run_compiled_graph_benchmark(
+    shape: GraphShape,
+    actions_count: int,
+    seed: int = 0,
+    parallelism: int = 64,
+    repeat: int = 3,
+) -> CompiledGraphResult:
+    """Times scheduling a generated graph from a JSON file and from a compiled graph.
+
+    Both include loading the file, so that the compiled graph's lazily
+    built actions and SHA-1 lookups are weighed against parsing,
+    validating and analyzing the JSON file. The fastest of `repeat` runs
+    is kept for each.
+
+    Args:
+        shape: The shape of the dependency graph.
+        actions_count: The number of actions to generate.
+        seed: Seeds the generator.
+        parallelism: The maximum number of actions to execute in parallel.
+        repeat: The number of times to time each.
+
+    Returns:
+        The benchmark result.
+
+    Raises:
+        BenchmarkError: If the generated graph can't be scheduled.
+    """
+    actions = generate_actions(shape, actions_count, seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        actions_file = os.path.join(directory, "actions.json")
+        with open(actions_file, "w") as f:
+            json.dump([dataclasses.asdict(action) for action in actions], f)
+
+        compiled_graph = os.path.join(directory, "actions.graph")
+        compile_actions_info(ActionsInfo(actions=actions), compiled_graph)
+
+        json_s = min(
+            _time_scheduling_file(actions_file, False, parallelism)
+            for _ in range(repeat)
+        )
+        compiled_s = min(
+            _time_scheduling_file(compiled_graph, True, parallelism)
+            for _ in range(repeat)
+        )
+
+    return CompiledGraphResult(
+        shape=shape.value,
+        seed=seed,
+        actions_count=actions_count,
+        json_s=json_s,
+        compiled_s=compiled_s,
+        speedup=json_s / compiled_s,
+    )
+
+
+def run_analysis_snapshot_benchmark(
+    shape: GraphShape,
+    actions_count: int,
+    seed: int = 0,
+    repeat: int = 3,
+) -> AnalysisSnapshotResult:
+    """Times refreshing an analysis snapshot, and analyzing the graph from scratch.
+
+    The actions are loaded before timing, since both need them. The fastest
+    of `repeat` runs is kept for each.
+
+    Args:
+        shape: The shape of the dependency graph.
+        actions_count: The number of actions to generate.
+        seed: Seeds the generator.
+        repeat: The number of times to time each.
+
+    Returns:
+        The benchmark result.
+
+    Raises:
+        BenchmarkError: If the generated graph can't be analyzed.
+    """
+    actions = generate_actions(shape, actions_count, seed)
+
+    def actions_info() -> ActionsInfo:
+        info = ActionsInfo(actions=actions)
+        info.compact_graph.compact()
+
+        return info
+
+    def timed(function: Callable[[ActionsInfo], object]) -> float:
+        info = actions_info()
+        start = time.perf_counter()
+        function(info)
+
+        return time.perf_counter() - start
+
+    full_analysis_s = min(
+        timed(lambda info: BottomLevels(actions_info=info)) for _ in range(repeat)
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "analysis.snapshot")
+
+        def refresh(info: ActionsInfo) -> None:
+            snapshot = refresh_analysis_snapshot(path, info)
+            if snapshot is None or snapshot.has_cycle():
+                raise BenchmarkError(f"The {shape.value} graph can't be analyzed")
+
+        create_times = []
+        for _ in range(repeat):
+            if os.path.exists(path):
+                os.remove(path)
+            create_times.append(timed(refresh))
+
+        unchanged_refresh_s = min(timed(refresh) for _ in range(repeat))
+
+        # The generators return dependencies first, so the last action has
+        # no dependents.
+        root = actions[-1]
+        reweighted_times = []
+        for i in range(repeat):
+            actions[-1] = dataclasses.replace(root, duration=root.duration + i + 1)
+            reweighted_times.append(timed(refresh))
+        actions[-1] = root
+
+        middle = len(actions) // 2
+        added_times = []
+        for i in range(repeat):
+            actions.insert(
+                middle,
+                Action(sha1=f"added-{i}", duration=1, dependencies=[actions[0].sha1]),
+            )
+            added_times.append(timed(refresh))
+            del actions[middle]
+            refresh(actions_info())
+
+    reweighted_refresh_s = min(reweighted_times)
+
+    return AnalysisSnapshotResult(
+        shape=shape.value,
+        seed=seed,
+        actions_count=actions_count,
+        full_analysis_s=full_analysis_s,
+        create_s=min(create_times),
+        unchanged_refresh_s=unchanged_refresh_s,
+        reweighted_refresh_s=reweighted_refresh_s,
+        added_refresh_s=min(added_times),
+        speedup=full_analysis_s / reweighted_refresh_s,
+    )
+
+
+def save_baseline(path: str, results: List[BenchmarkResult]) -> None:
+    """Saves benchmark results to compare later runs with.
+
+    Args:
+        path: The path to the baseline file, replaced atomically.
+        results: The benchmark results.
+    """
+    temporary_path = f"{path}.tmp"
+
+    with open(temporary_path, "w") as f:
+        json.dump(
+            {
+                "format_version": BASELINE_FORMAT_VERSION,
+                "results": [dataclasses.asdict(result) for result in results],
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+    os.replace(temporary_path, path)
+
+
+def load_baseline(path: str) -> Dict[str, BenchmarkResult]:
+    """Loads benchmark results saved with `save_baseline`.
+
+    Args:
+        path: The path to the baseline file.
+
+    Returns:
+        The benchmark results, by key.
+
+    Raises:
+        BenchmarkError: If the file isn't a baseline in the current format.
+    """
+    try:
+        with open(path) as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BenchmarkError(f"Can't load the baseline {path}: {e}") from e
+
+    if baseline.get("format_version") != BASELINE_FORMAT_VERSION:
+        raise BenchmarkError(f"The baseline {path} has an unsupported format version")
+
+    results = [BenchmarkResult(**result) for result in baseline["results"]]
+
+    return {result.key: result for result in results}
+
+
+def compare_to_baseline(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, BenchmarkResult],
+    tolerance: float = 0.5,
+) -> List[BenchmarkComparison]:
+    """Compares benchmark results with a baseline, metric by metric.
+
+    Results that aren't in the baseline, and metrics that weren't measured
+    in both, are left out.
+
+    Args:
+        results: The benchmark results.
+        baseline: The baseline results, by key.
+        tolerance: How much worse than the baseline a metric can get, as a
+            fraction of the baseline value, before it's a regression.
+
+    Returns:
+        The comparisons of every metric of every result in the baseline.
+    """
+    comparisons = []
+
+    for result in results:
+        baseline_result = baseline.get(result.key)
+        if baseline_result is None:
+            continue
+
+        for metric in COMPARED_METRICS:
+            baseline_value = getattr(baseline_result, metric)
+            current_value = getattr(result, metric)
+
+            if baseline_value is None or current_value is None:
+                continue
+
+            ratio = current_value / baseline_value if baseline_value else math.inf
+            regressed = ratio > 1 + tolerance
+
+            if metric.endswith("_s"):
+                regressed = (
+                    regressed and current_value - baseline_value > TIMING_NOISE_FLOOR_S
+                )
+
+            comparisons.append(
+                BenchmarkComparison(
+                    key=result.key,
+                    metric=metric,
+                    baseline=baseline_value,
+                    current=current_value,
+                    ratio=ratio,
+                    regressed=regressed,
+                )
+            )
+
+    return comparisons
+
+
+def _parse_import_times(stderr: str) -> Tuple[float, List[str]]:
+    """Parses the output of `python -X importtime`.
+
+    Returns:
+        The cumulative time of the top-level imports, in seconds, and the
+        names of all imported modules, in import order.
+    """
+    import_time_us = 0
+    modules = []
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        _, cumulative_us, name = line.split("|")
+        if not cumulative_us.strip().isdigit():
+            # The header line.
+            continue
+
+        modules.append(name.strip())
+
+        # Nested imports are indented further, and counted by their parent.
+        if not name.startswith("  "):
+            import_time_us += int(cumulative_us)
+
+    return import_time_us / 1_000_000, modules
+
+
+def measure_startup(extra_args: Sequence[str] = (), repeat: int = 3) -> StartupResult:
+    """Times the scheduler command on a tiny graph, in a fresh interpreter.
+
+    The command is run with `python -X importtime`, so that the time spent
+    importing modules and the modules imported can be checked too. The
+    fastest run is kept.
+
+    Args:
+        extra_args: Options passed to the command, on top of scheduling a
+            dry run with a parallelism of 1.
+        repeat: The number of times to run the command.
+
+    Returns:
+        The startup result of the fastest run.
+
+    Raises:
+        BenchmarkError: If the command fails.
+    """
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(_PACKAGE_ROOT), environment.get("PYTHONPATH")])
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        actions_file = os.path.join(directory, "actions.json")
+        with open(actions_file, "w") as f:
+            json.dump(
+                [
+                    dataclasses.asdict(action)
+                    for action in generate_chain(actions_count=10)
+                ],
+                f,
+            )
+
+        command = [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-m",
+            "org_fraggles.build_action_scheduler",
+            "--parallelism",
+            "1",
+            "--actions-file",
+            actions_file,
+            "--dry-run",
+            *extra_args,
+        ]
+
+        results = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed_process = subprocess.run(
+                command, env=environment, capture_output=True, text=True
+            )
+            wall_time_s = time.perf_counter() - start
+
+            if completed_process.returncode != 0:
+                raise BenchmarkError(
+                    "The scheduler command failed with exit code"
+                    f" {completed_process.returncode}: {completed_process.stderr}"
+                )
+
+            import_time_s, modules = _parse_import_times(completed_process.stderr)
+            imported_modules = set(modules)
+
+            results.append(
+                StartupResult(
+                    wall_time_s=wall_time_s,
+                    import_time_s=import_time_s,
+                    imported_modules_count=len(imported_modules),
+                    deferred_modules_imported=[
+                        module
+                        for module in STARTUP_DEFERRED_MODULES
+                        if module in imported_modules
+                    ],
+                )
+            )
+
+    return min(results, key=lambda result: result.wall_time_s)
@@ -0,0 +1,201 @@
+import dataclasses
+import json
+import logging
+import time
+from typing import Annotated, List, Optional
+
+import typer
+
+from org_fraggles.build_action_scheduler.benchmarks import (
+    GraphShape,
+    compare_to_baseline,
+    load_baseline,
+    measure_startup,
+    run_analysis_snapshot_benchmark,
+    run_benchmark,
+    run_compiled_graph_benchmark,
+    save_baseline,
+)
+
+log = logging.getLogger(__name__)
+
+logging.Formatter.converter = time.gmtime
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%SZ",
+)
+
+
+def main(
+    shape: Annotated[
+        Optional[List[GraphShape]],
+        typer.Option(
+            ...,
+            help="The shapes of the generated graphs. Can be repeated. Defaults to all.",
+        ),
+    ] = None,
+    actions_count: Annotated[
+        Optional[List[int]],
+        typer.Option(
+            ...,
+            help=(
+                "The number of actions of the generated graphs. Can be repeated."
+                " Defaults to 1000 and 10000."
+            ),
+        ),
+    ] = None,
+    seed: Annotated[
+        int,
+        typer.Option(..., help="Seeds the graph generators."),
+    ] = 0,
+    parallelism: Annotated[
+        int,
+        typer.Option(..., help="The maximum number of actions to execute in parallel."),
+    ] = 64,
+    repeat: Annotated[
+        int,
+        typer.Option(
+            ..., help="The number of times to time each phase, keeping the fastest."
+        ),
+    ] = 3,
+    measure_memory: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Whether or not to measure the peak memory, in a separate run.",
+        ),
+    ] = True,
+    baseline: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help=(
+                "The path to a baseline to compare the results with. Exits with"
+                " an error if any metric regressed."
+            ),
+        ),
+    ] = None,
+    tolerance: Annotated[
+        float,
+        typer.Option(
+            ...,
+            help=(
+                "How much worse than the baseline a metric can get, as a fraction"
+                " of the baseline value, before it's a regression."
+            ),
+        ),
+    ] = 0.5,
+    save_baseline_to: Annotated[
+        Optional[str],
+        typer.Option(..., help="The path to save the results to, as a new baseline."),
+    ] = None,
+    compare_compiled_graph: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help=(
+                "Also time scheduling every generated graph from a JSON actions"
+                " file and from a compiled graph, loading included."
+            ),
+        ),
+    ] = False,
+    compare_analysis_snapshot: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help=(
+                "Also time refreshing an analysis snapshot of every generated"
+                " graph, unchanged and with a re-weighted root action, against"
+                " analyzing it from scratch."
+            ),
+        ),
+    ] = False,
+    startup_import_budget_s: Annotated[
+        Optional[float],
+        typer.Option(
+            ...,
+            help=(
+                "Also measure the startup of the scheduler command, with"
+                " 'python -X importtime'. Exits with an error if its imports"
+                " take longer than this budget in seconds, or if it imports"
+                " modules only needed by optional features."
+            ),
+        ),
+    ] = None,
+) -> None:
+    """Prints JSON-formatted benchmark results for generated dependency graphs."""
+    results = []
+
+    for graph_shape in shape or list(GraphShape):
+        for count in actions_count or [1_000, 10_000]:
+            log.info("Benchmarking a %s graph of %d actions", graph_shape.value, count)
+
+            results.append(
+                run_benchmark(
+                    graph_shape,
+                    count,
+                    seed=seed,
+                    parallelism=parallelism,
+                    repeat=repeat,
+                    measure_memory=measure_memory,
+                )
+            )
+
+    report = {"results": [dataclasses.asdict(result) for result in results]}
+
+    if compare_compiled_graph:
+        report["compiled_graph"] = [
+            dataclasses.asdict(
+                run_compiled_graph_benchmark(
+                    graph_shape,
+                    count,
+                    seed=seed,
+                    parallelism=parallelism,
+                    repeat=repeat,
+                )
+            )
+            for graph_shape in shape or list(GraphShape)
+            for count in actions_count or [1_000, 10_000]
+        ]
+
+    if compare_analysis_snapshot:
+        report["analysis_snapshot"] = [
+            dataclasses.asdict(
+                run_analysis_snapshot_benchmark(
+                    graph_shape, count, seed=seed, repeat=repeat
+                )
+            )
+            for graph_shape in shape or list(GraphShape)
+            for count in actions_count or [1_000, 10_000]
+        ]
+
+    regressed = False
+    if baseline is not None:
+        comparisons = compare_to_baseline(results, load_baseline(baseline), tolerance)
+        report["comparisons"] = [
+            dataclasses.asdict(comparison) for comparison in comparisons
+        ]
+        regressed = any(comparison.regressed for comparison in comparisons)
+
+    if startup_import_budget_s is not None:
+        startup = measure_startup(repeat=repeat)
+        report["startup"] = dataclasses.asdict(startup)
+        regressed = (
+            regressed
+            or startup.import_time_s > startup_import_budget_s
+            or len(startup.deferred_modules_imported) > 0
+        )
+
+    if save_baseline_to is not None:
+        save_baseline(save_baseline_to, results)
+
+    print(json.dumps(report, indent=2))
+
+    if regressed:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,93 @@
+import dataclasses
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.benchmarks import (
+    BenchmarkError,
+    GraphShape,
+    compare_to_baseline,
+    load_baseline,
+    run_analysis_snapshot_benchmark,
+    run_benchmark,
+    run_compiled_graph_benchmark,
+    save_baseline,
+)
+
+
+@pytest.mark.parametrize("shape", list(GraphShape))
+def test_run_benchmark(shape):
+    result = run_benchmark(shape, 500, parallelism=8, repeat=2)
+
+    assert result.shape == shape.value
+    assert result.actions_count == 500
+    assert result.detect_cycle_s > 0
+    assert result.critical_path_s > 0
+    assert result.schedule_s > 0
+    assert result.actions_per_s == pytest.approx(500 / result.schedule_s)
+    assert result.peak_memory_bytes > 0
+
+
+def test_run_compiled_graph_benchmark():
+    result = run_compiled_graph_benchmark(
+        GraphShape.REAL_WORLD, 500, parallelism=8, repeat=1
+    )
+
+    assert result.shape == GraphShape.REAL_WORLD.value
+    assert result.actions_count == 500
+    assert result.json_s > 0
+    assert result.compiled_s > 0
+    assert result.speedup == pytest.approx(result.json_s / result.compiled_s)
+
+
+def test_run_analysis_snapshot_benchmark():
+    result = run_analysis_snapshot_benchmark(GraphShape.REAL_WORLD, 500, repeat=1)
+
+    assert result.shape == GraphShape.REAL_WORLD.value
+    assert result.actions_count == 500
+    assert result.full_analysis_s > 0
+    assert result.create_s > 0
+    assert result.unchanged_refresh_s > 0
+    assert result.reweighted_refresh_s > 0
+    assert result.added_refresh_s > 0
+    assert result.speedup == pytest.approx(
+        result.full_analysis_s / result.reweighted_refresh_s
+    )
+
+
+def test_compare_to_baseline(tmp_path):
+    result = run_benchmark(GraphShape.RANDOM, 200, repeat=1, measure_memory=False)
+    baseline_path = str(tmp_path / "baseline.json")
+    save_baseline(baseline_path, [result])
+
+    baseline = load_baseline(baseline_path)
+
+    assert baseline == {result.key: result}
+
+    slower_result = dataclasses.replace(result, schedule_s=result.schedule_s + 1)
+    comparisons = compare_to_baseline([slower_result], baseline)
+
+    assert {comparison.metric for comparison in comparisons} == {
+        "detect_cycle_s",
+        "critical_path_s",
+        "schedule_s",
+    }
+    assert [
+        comparison.metric for comparison in comparisons if comparison.regressed
+    ] == ["schedule_s"]
+
+    # Results that aren't in the baseline aren't compared.
+    other_result = dataclasses.replace(result, seed=1)
+    assert compare_to_baseline([other_result], baseline) == []
+
+
+def test_load_invalid_baseline(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text('{"format_version": 0, "results": []}')
+
+    with pytest.raises(BenchmarkError):
+        load_baseline(str(baseline_path))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
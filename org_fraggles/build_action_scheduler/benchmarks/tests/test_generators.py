@@ -0,0 +1,45 @@
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.benchmarks import GraphShape, generate_actions
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+
+
+@pytest.mark.parametrize("shape", list(GraphShape))
+@pytest.mark.parametrize("actions_count", [1, 2, 1000])
+def test_generated_graphs_are_valid(shape, actions_count):
+    actions = generate_actions(shape, actions_count, seed=1)
+
+    assert len(actions) == actions_count
+    assert len({action.sha1 for action in actions}) == actions_count
+    assert all(action.duration > 0 for action in actions)
+
+    # Validates that dependencies exist.
+    actions_info = ActionsInfo(actions=actions)
+
+    assert not DependencyAnalyzer(actions_info=actions_info).detect_cycle()
+
+
+@pytest.mark.parametrize("shape", list(GraphShape))
+def test_generated_graphs_are_seeded(shape):
+    assert generate_actions(shape, 100, seed=1) == generate_actions(shape, 100, seed=1)
+    assert generate_actions(shape, 100, seed=1) != generate_actions(shape, 100, seed=2)
+
+
+def test_generated_graph_shapes():
+    chain = generate_actions(GraphShape.CHAIN, 100)
+    assert all(len(action.dependencies) == 1 for action in chain[1:])
+
+    fan = generate_actions(GraphShape.FAN, 100)
+    assert all(action.dependencies == [fan[0].sha1] for action in fan[1:-1])
+    assert len(fan[-1].dependencies) == 98
+
+    lattice = generate_actions(GraphShape.LATTICE, 100)
+    assert sum(len(action.dependencies) == 0 for action in lattice) == 10
+    assert max(len(action.dependencies) for action in lattice) == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
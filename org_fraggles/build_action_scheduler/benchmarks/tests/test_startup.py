@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.benchmarks import (
+    _parse_import_times,
+    measure_startup,
+)
+
+# How long the scheduler command can spend importing modules, in seconds.
+# Timings depend on the machine and its load, so the budget is only checked
+# when set, e.g., to 1.0 (it takes about 0.4s), on a quiet machine.
+IMPORT_TIME_BUDGET_S = os.environ.get("STARTUP_IMPORT_BUDGET_S")
+
+
+def test_parse_import_times():
+    import_time_s, modules = _parse_import_times(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   b\n"
+        "import time:       200 |        300 | a\n"
+        "import time:       400 |        400 | c\n"
+        "some other output\n"
+    )
+
+    assert import_time_s == pytest.approx(0.0007)
+    assert modules == ["b", "a", "c"]
+
+
+def test_startup_imports_no_deferred_modules():
+    startup = measure_startup(repeat=1)
+
+    assert startup.deferred_modules_imported == []
+    assert startup.wall_time_s > startup.import_time_s > 0
+    assert startup.imported_modules_count > 0
+
+
+@pytest.mark.skipif(
+    IMPORT_TIME_BUDGET_S is None, reason="STARTUP_IMPORT_BUDGET_S isn't set"
+)
+def test_startup_within_budget():
+    startup = measure_startup(repeat=3)
+
+    assert startup.import_time_s < float(IMPORT_TIME_BUDGET_S)
+
+
+def test_startup_without_validation():
+    startup = measure_startup(["--no-validate"], repeat=1)
+
+    assert startup.deferred_modules_imported == []
+
+
+def test_optional_backends_imported_on_demand():
+    startup = measure_startup(["--backend", "asyncio"], repeat=1)
+
+    assert "asyncio" in startup.deferred_modules_imported
+    assert (
+        "org_fraggles.build_action_scheduler.async_scheduler"
+        in startup.deferred_modules_imported
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
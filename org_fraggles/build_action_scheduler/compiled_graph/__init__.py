@@ -0,0 +1,733 @@
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, islice
+from typing import Any, Dict, Iterator, List, Mapping, Sequence, Tuple
+
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import (
+    ActionIndex,
+    ActionsInfo,
+    CompactActionGraph,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    BottomLevels,
+    DependencyAnalyzer,
+    DependencyCycleError,
+    UnknownDependencyError,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionSha1
+
+# The first bytes of every compiled graph file.
+COMPILED_GRAPH_MAGIC = b"BASGRAPH"
+
+# Incremented whenever the layout of compiled graph files changes.
+COMPILED_GRAPH_VERSION = 2
+
+# The magic, the version, and the number of sections, followed by the offset
+# and length in bytes of every section, in `_SECTIONS` order.
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<QQ")
+
+# The sections of a compiled graph file. Arrays are of signed 64-bit integers
+# in little-endian order, by action index unless noted otherwise. String
+# tables are an array of `len + 1` offsets into the UTF-8 encoded strings
+# that follow them (see `StringTable`).
+_SECTIONS = (
+    # String table of the action SHA-1s.
+    "sha1s",
+    # Hash table of the action indexes, to look SHA-1s up (see `Sha1Index`).
+    "sha1_table",
+    "durations",
+    "dependencies_count",
+    # The compressed sparse row arrays of `CompactActionGraph`.
+    "dependents_offsets",
+    "dependents",
+    # The same, for dependencies, so that actions can be rebuilt.
+    "dependencies_offsets",
+    "dependencies",
+    "cpus",
+    "memory_mb",
+    # String table of the JSON encoded optional fields of every action, or
+    # empty strings for actions without any.
+    "extras",
+    # Precomputed by the compiler, which checks that there are no cycles.
+    "bottom_levels",
+    "topological_order",
+)
+
+
+class CompiledGraphError(Exception):
+    """Raised when a graph can't be compiled, or a compiled graph can't be loaded."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of CompiledGraphError."""
+        super().__init__(message)
+
+
+class StringTable(Sequence[str]):
+    """Strings stored back to back in a buffer, decoded on access.
+
+    String `i` is `data[offsets[i]:offsets[i + 1]]`, so no Python object is
+    created until a string is accessed. Strings appended afterwards are kept
+    in a list.
+    """
+
+    def __init__(self, offsets: array, data: memoryview) -> None:
+        """Creates a string table.
+
+        Args:
+            offsets: Where every string starts in `data`, followed by the
+                length of `data`.
+            data: The UTF-8 encoded strings.
+        """
+        self._offsets = offsets
+        self._data = data
+        self._stored_count = len(offsets) - 1
+        self._appended: List[str] = []
+
+    def __len__(self) -> int:
+        """Returns the number of strings."""
+        return self._stored_count + len(self._appended)
+
+    def __getitem__(self, index: int) -> str:  # type: ignore[override]
+        """Returns a string, decoding it if it's stored in the buffer."""
+        if index < 0:
+            index += len(self)
+
+        if index >= self._stored_count:
+            return self._appended[index - self._stored_count]
+
+        return str(self._data[self._offsets[index] : self._offsets[index + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the strings, decoding the whole buffer at once."""
+        offsets = self._offsets
+        data = str(self._data, "utf-8")
+
+        if len(data) == len(self._data):
+            # ASCII only, so byte offsets are character offsets too.
+            yield from [
+                data[start:end] for start, end in zip(offsets, islice(offsets, 1, None))
+            ]
+        else:
+            yield from (self[index] for index in range(self._stored_count))
+
+        yield from self._appended
+
+    def encoded(self, index: int) -> memoryview:
+        """Returns a string stored in the buffer, without decoding it.
+
+        Args:
+            index: The index of the string, which can't be an appended one.
+        """
+        return self._data[self._offsets[index] : self._offsets[index + 1]]
+
+    def append(self, value: str) -> None:
+        """Appends a string."""
+        self._appended.append(value)
+
+    def release(self) -> None:
+        """Releases the buffer. Strings stored in it can't be accessed afterwards."""
+        self._data.release()
+
+    @staticmethod
+    def encode(values: Sequence[str]) -> Tuple[array, bytes]:
+        """Returns the offsets and the data of a string table.
+
+        The strings of another string table are copied without decoding them.
+
+        Args:
+            values: The strings.
+        """
+        if isinstance(values, StringTable) and not values._appended:
+            return array("q", values._offsets), bytes(values._data)
+
+        offsets = array("q", [0])
+        data = "".join(values)
+        if data.isascii():
+            # Character lengths are byte lengths too.
+            offsets.extend(accumulate(map(len, values)))
+            return offsets, data.encode()
+
+        encoded = [value.encode() for value in values]
+        offsets.extend(accumulate(map(len, encoded)))
+
+        return offsets, b"".join(encoded)
+
+
+class Sha1Index(Mapping[ActionSha1, ActionIndex]):
+    """Looks action indexes up by SHA-1 in a hash table built by the compiler.
+
+    Stands for the `index_by_sha1` dict of the compact graph, without
+    hashing every SHA-1 up front. The table has a power of two number of
+    slots, at least twice as many as actions, holding action indexes or -1
+    for empty slots. An action is in the first slot from the CRC-32 of its
+    SHA-1 that isn't taken by another action. Actions added afterwards are
+    kept in a dict. Actions can't be removed.
+    """
+
+    def __init__(self, sha1s: StringTable, table: array) -> None:
+        """Creates a SHA-1 index.
+
+        Args:
+            sha1s: The SHA-1s, by action index.
+            table: The hash table of the action indexes of the stored SHA-1s.
+        """
+        self._sha1s = sha1s
+        self._table = table
+        self._mask = len(table) - 1
+        self._added: Dict[ActionSha1, ActionIndex] = {}
+
+    def __getitem__(self, action_sha1: ActionSha1) -> ActionIndex:
+        """Returns the index of an action."""
+        if action_sha1 in self._added:
+            return self._added[action_sha1]
+
+        encoded = action_sha1.encode()
+        slot = zlib.crc32(encoded) & self._mask
+
+        while True:
+            index = self._table[slot]
+
+            if index < 0:
+                raise KeyError(action_sha1)
+            if self._sha1s.encoded(index) == encoded:
+                return index
+
+            slot = (slot + 1) & self._mask
+
+    def __setitem__(self, action_sha1: ActionSha1, index: ActionIndex) -> None:
+        """Adds an action."""
+        self._added[action_sha1] = index
+
+    def __delitem__(self, action_sha1: ActionSha1) -> None:
+        """Actions can't be removed from a compiled graph."""
+        raise TypeError("Actions can't be removed from a compiled graph")
+
+    def __iter__(self) -> Iterator[ActionSha1]:
+        """Iterates over the SHA-1s, in action index order."""
+        return iter(self._sha1s)
+
+    def __len__(self) -> int:
+        """Returns the number of actions."""
+        return len(self._sha1s)
+
+    @staticmethod
+    def build_table(sha1s: Sequence[ActionSha1]) -> array:
+        """Returns the hash table of the action indexes of SHA-1s.
+
+        Args:
+            sha1s: The SHA-1s, by action index. They must be unique.
+        """
+        size = 1
+        while size < 2 * len(sha1s):
+            size *= 2
+
+        mask = size - 1
+        table = array("q", [-1]) * size
+
+        for index, action_sha1 in enumerate(sha1s):
+            slot = zlib.crc32(action_sha1.encode()) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = index
+
+        return table
+
+
+class CompiledActions(Mapping[ActionSha1, Action]):
+    """Builds actions from a compiled graph when they're first accessed.
+
+    Stands for the `actions_by_sha1` dict of `ActionsInfo`. Built actions are
+    kept, so that changes to them (e.g., of their duration) stick. Actions can
+    be added, but not removed.
+
+    Holds the sections actions are built from itself, rather than reading
+    them from the private attributes of `CompiledActionsInfo`, since the
+    scheduler builds an action for every action it dispatches.
+    """
+
+    def __init__(
+        self,
+        graph: CompactActionGraph,
+        sections: Dict[str, memoryview],
+        actions_count: int,
+    ) -> None:
+        """Creates the mapping.
+
+        Args:
+            graph: The compact graph of the compiled actions.
+            sections: The sections of the compiled graph file, by name.
+            actions_count: The number of compiled actions.
+        """
+        self._graph = graph
+        self._extras = section_string_table(sections["extras"], actions_count)
+        self._dependencies_offsets = section_array(sections["dependencies_offsets"])
+        self._dependencies = section_array(sections["dependencies"])
+        # The declared durations. The compact graph's durations are replaced
+        # when estimates are applied.
+        self._durations = graph.durations
+        self._cpus = section_array(sections["cpus"])
+        self._memory_mb = section_array(sections["memory_mb"])
+        self._actions: Dict[ActionSha1, Action] = {}
+
+    def __getitem__(self, action_sha1: ActionSha1) -> Action:
+        """Returns an action, building it if needed."""
+        action = self._actions.get(action_sha1)
+
+        if action is None:
+            action = self.build(self._graph.index_by_sha1[action_sha1])
+            self._actions[action_sha1] = action
+
+        return action
+
+    def at(self, index: ActionIndex) -> Action:
+        """Returns the action at an index, building it if needed.
+
+        Args:
+            index: The index of the action in the compact graph.
+        """
+        action_sha1 = self._graph.sha1s[index]
+        action = self._actions.get(action_sha1)
+
+        if action is None:
+            action = self.build(index)
+            self._actions[action_sha1] = action
+
+        return action
+
+    def build(self, index: ActionIndex) -> Action:
+        """Builds an action from the compiled graph.
+
+        Args:
+            index: The index of the action in the compact graph.
+        """
+        sha1s = self._graph.sha1s
+        extras = self._extras[index]
+
+        return Action(
+            sha1=sha1s[index],
+            duration=self._durations[index],
+            dependencies=[
+                sha1s[dependency]
+                for dependency in self._dependencies[
+                    self._dependencies_offsets[index] : self._dependencies_offsets[
+                        index + 1
+                    ]
+                ]
+            ],
+            cpus=self._cpus[index],
+            memory_mb=self._memory_mb[index],
+            **(_decode_extras(extras) if extras else {}),
+        )
+
+    def release(self) -> None:
+        """Releases the buffers actions are built from."""
+        self._extras.release()
+
+    def __contains__(self, action_sha1: object) -> bool:
+        """Returns True if there's an action with a SHA-1, without building it."""
+        return action_sha1 in self._actions or action_sha1 in self._graph.index_by_sha1
+
+    def __setitem__(self, action_sha1: ActionSha1, action: Action) -> None:
+        """Adds an action."""
+        self._actions[action_sha1] = action
+
+    def __delitem__(self, action_sha1: ActionSha1) -> None:
+        """Actions can't be removed from a compiled graph."""
+        raise TypeError("Actions can't be removed from a compiled graph")
+
+    def __iter__(self) -> Iterator[ActionSha1]:
+        """Iterates over the SHA-1s, in action index order."""
+        return iter(self._graph.sha1s)
+
+    def __len__(self) -> int:
+        """Returns the number of actions."""
+        return len(self._graph)
+
+
+class CompiledActionsInfo(ActionsInfo):
+    """Actions info backed by a memory-mapped compiled graph file.
+
+    The compact graph and the bottom levels are read from the file as they
+    are, so no Python object is created per action until an action is
+    accessed by SHA-1 (e.g., to be executed). Code that needs every action
+    (`actions`, `action_dependents`) builds them all, like a regular load.
+    """
+
+    # The memory-mapped file. Kept open as long as the actions info is used.
+    _mmap: mmap.mmap = PrivateAttr(default=None)
+
+    # Precomputed by the compiler.
+    _bottom_levels: array = PrivateAttr(default=None)
+    _topological_order: array = PrivateAttr(default=None)
+
+    def build_action(self, index: ActionIndex) -> Action:
+        """Builds an action from the compiled graph.
+
+        Args:
+            index: The index of the action in the compact graph.
+        """
+        return self._actions_by_sha1.build(index)  # type: ignore[union-attr]
+
+    def action_at(self, index: ActionIndex) -> Action:
+        """Returns the action at an index of the compact graph, building it if needed.
+
+        Args:
+            index: The index of the action in the compact graph.
+        """
+        return self._actions_by_sha1.at(index)  # type: ignore[union-attr]
+
+    def bottom_levels(self) -> BottomLevels:
+        """Returns the bottom levels precomputed by the compiler.
+
+        Only valid as long as the durations of the actions weren't changed.
+        """
+        return BottomLevels.from_arrays(
+            self, self._bottom_levels, self._topological_order
+        )
+
+    def close(self) -> None:
+        """Closes the memory-mapped file. The actions info can't be used afterwards."""
+        self._actions_by_sha1.release()  # type: ignore[union-attr]
+        self.compact_graph.sha1s.release()  # type: ignore[attr-defined]
+        self._mmap.close()
+
+
+class CompiledActionsList(list):
+    """The list of actions of a compiled graph, built when first used.
+
+    Only the list operations `ActionsInfo` relies on (iterating, indexing,
+    measuring and extending) build the actions.
+    """
+
+    def __init__(self, actions_by_sha1: CompiledActions, sha1s: StringTable) -> None:
+        """Creates the list, empty until used.
+
+        Args:
+            actions_by_sha1: Builds the actions.
+            sha1s: The SHA-1s of the actions, by action index.
+        """
+        super().__init__()
+        self._actions_by_sha1 = actions_by_sha1
+        self._sha1s = sha1s
+        self._built = False
+
+    def __iter__(self) -> Iterator[Action]:
+        """Iterates over the actions, in action index order."""
+        self._build()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        """Returns the number of actions."""
+        self._build()
+        return super().__len__()
+
+    def __getitem__(self, index: Any) -> Any:
+        """Returns an action, or a list of actions for a slice."""
+        self._build()
+        return super().__getitem__(index)
+
+    def extend(self, actions: Any) -> None:
+        """Appends actions, after the compiled ones."""
+        self._build()
+        super().extend(actions)
+
+    def append(self, action: Action) -> None:
+        """Appends an action, after the compiled ones."""
+        self._build()
+        super().append(action)
+
+    def _build(self) -> None:
+        """Builds every compiled action, unless already done."""
+        if not self._built:
+            self._built = True
+            super().extend(self._actions_by_sha1.at(i) for i in range(len(self._sha1s)))
+
+
+def is_compiled_graph(path: str) -> bool:
+    """Returns True if a file is a compiled graph, False otherwise.
+
+    Args:
+        path: The path to the file.
+    """
+    with open(path, "rb") as f:
+        return f.read(len(COMPILED_GRAPH_MAGIC)) == COMPILED_GRAPH_MAGIC
+
+
+def compile_actions_info(
+    actions_info: ActionsInfo, path: str, use_numpy: bool = False
+) -> BottomLevels:
+    """Writes actions to a compiled graph file.
+
+    Args:
+        actions_info: The actions, which must have been validated.
+        path: The path to the compiled graph file.
+        use_numpy: Analyze the graph with vectorized NumPy operations.
+
+    Returns:
+        The bottom levels of the actions, which are stored in the file.
+
+    Raises:
+        CompiledGraphError: If there is a dependency cycle or an unknown
+            dependency.
+    """
+    try:
+        bottom_levels = DependencyAnalyzer(
+            actions_info=actions_info, use_numpy=use_numpy
+        ).bottom_levels()
+    except DependencyCycleError as e:
+        raise CompiledGraphError("Dependency cycle detected") from e
+    except UnknownDependencyError as e:
+        raise CompiledGraphError(str(e)) from e
+
+    graph = actions_info.compact_graph
+    graph.compact()
+    actions = [actions_info.actions_by_sha1[sha1] for sha1 in graph.sha1s]
+
+    sha1_offsets, sha1_data = StringTable.encode(graph.sha1s)
+    extras_offsets, extras_data = StringTable.encode(
+        [_encode_extras(action) for action in actions]
+    )
+
+    dependencies_offsets = array("q", [0])
+    dependencies = array("q")
+    for action in actions:
+        dependencies.extend(graph.index_by_sha1[sha1] for sha1 in action.dependencies)
+        dependencies_offsets.append(len(dependencies))
+
+    sections = {
+        "sha1s": sha1_offsets.tobytes() + sha1_data,
+        "sha1_table": Sha1Index.build_table(graph.sha1s),
+        "durations": graph.durations,
+        "dependencies_count": graph.dependencies_count,
+        "dependents_offsets": graph.dependents_offsets,
+        "dependents": graph.dependents,
+        "dependencies_offsets": dependencies_offsets,
+        "dependencies": dependencies,
+        "cpus": array("q", (action.cpus for action in actions)),
+        "memory_mb": array("q", (action.memory_mb for action in actions)),
+        "extras": extras_offsets.tobytes() + extras_data,
+        "bottom_levels": bottom_levels.bottom_levels_by_index(),
+        "topological_order": bottom_levels.topological_order_by_index(),
+    }
+
+    write_sections(
+        path,
+        COMPILED_GRAPH_MAGIC,
+        COMPILED_GRAPH_VERSION,
+        [sections[name] for name in _SECTIONS],
+    )
+
+    return bottom_levels
+
+
+def load_compiled_actions_info(path: str) -> CompiledActionsInfo:
+    """Memory-maps a compiled graph file.
+
+    Args:
+        path: The path to the compiled graph file.
+
+    Returns:
+        The actions info, with its compact graph and bottom levels.
+
+    Raises:
+        CompiledGraphError: If the file isn't a compiled graph of this version.
+    """
+    mapped, sections = map_sections(
+        path, COMPILED_GRAPH_MAGIC, COMPILED_GRAPH_VERSION, _SECTIONS, "compiled graph"
+    )
+
+    actions_count = len(sections["durations"]) // 8
+    sha1s = section_string_table(sections["sha1s"], actions_count)
+
+    graph = CompactActionGraph(
+        sha1s=sha1s,  # type: ignore[arg-type]
+        index_by_sha1=Sha1Index(sha1s, section_array(sections["sha1_table"])),  # type: ignore[arg-type]
+        durations=section_array(sections["durations"]),
+        dependencies_count=section_array(sections["dependencies_count"]),
+        dependents_offsets=section_array(sections["dependents_offsets"]),
+        dependents=section_array(sections["dependents"]),
+    )
+
+    actions_info = CompiledActionsInfo.model_construct(actions=[])
+    actions_by_sha1 = CompiledActions(graph, sections, actions_count)
+    actions_info.actions = CompiledActionsList(actions_by_sha1, sha1s)
+    actions_info._actions_by_sha1 = actions_by_sha1  # type: ignore[assignment]
+    actions_info._compact_graph = graph
+    actions_info._mmap = mapped
+    actions_info._bottom_levels = section_array(sections["bottom_levels"])
+    actions_info._topological_order = section_array(sections["topological_order"])
+
+    return actions_info
+
+
+def _encode_extras(action: Action) -> str:
+    """Returns the optional fields of an action that aren't set to their default."""
+    extras: Dict[str, Any] = {}
+
+    if action.command is not None:
+        extras["command"] = action.command
+    if action.exclusive_resources:
+        extras["exclusive_resources"] = list(action.exclusive_resources)
+
+    return json.dumps(extras) if extras else ""
+
+
+def _decode_extras(extras: str) -> Dict[str, Any]:
+    """Returns the optional fields of an action, as `Action` arguments."""
+    fields = json.loads(extras)
+
+    if "exclusive_resources" in fields:
+        fields["exclusive_resources"] = tuple(fields["exclusive_resources"])
+
+    return fields
+
+
+def write_sections(
+    path: str, magic: bytes, version: int, sections: Sequence[Any]
+) -> None:
+    """Writes a file of sections, which can be memory-mapped with `map_sections`.
+
+    The file starts with the magic, the version and the number of sections,
+    followed by the offset and length in bytes of every section. Sections
+    start on 8-byte boundaries, so that they can be read as arrays of 64-bit
+    values.
+
+    Args:
+        path: The path to the file.
+        magic: The first bytes of the file, which tell what it is.
+        version: The version of the layout of the file.
+        sections: The sections, as accepted by `section_bytes`.
+    """
+    contents = [section_bytes(section) for section in sections]
+
+    offset = _HEADER.size + _SECTION.size * len(contents)
+    table = []
+    for content in contents:
+        offset += -offset % 8
+        table.append(_SECTION.pack(offset, len(content)))
+        offset += len(content)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(magic, version, len(contents)))
+        f.write(b"".join(table))
+
+        for content in contents:
+            f.write(b"\0" * (-f.tell() % 8))
+            f.write(content)
+
+
+def map_sections(
+    path: str,
+    magic: bytes,
+    version: int,
+    names: Sequence[str],
+    kind: str,
+    access: int = mmap.ACCESS_READ,
+) -> Tuple[mmap.mmap, Dict[str, memoryview]]:
+    """Memory-maps a file written by `write_sections`.
+
+    Args:
+        path: The path to the file.
+        magic: The first bytes the file must start with.
+        version: The version of the layout the file must have.
+        names: The names of the sections, in the order they were written.
+        kind: What the file is, for error messages (e.g., "compiled graph").
+        access: How the file is mapped, e.g., `mmap.ACCESS_WRITE` to change
+            sections in place.
+
+    Returns:
+        The memory-mapped file, and a view of every section by name. The
+        file can only be closed once the views are released.
+
+    Raises:
+        CompiledGraphError: If the file doesn't have the magic, the version
+            or the sections expected.
+    """
+    with open(path, "rb" if access == mmap.ACCESS_READ else "r+b") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=access)
+        except ValueError as e:
+            raise CompiledGraphError(f"Empty {kind} file: {path}") from e
+
+    if len(mapped) < _HEADER.size:
+        raise CompiledGraphError(f"Not a {kind} file: {path}")
+
+    file_magic, file_version, sections_count = _HEADER.unpack_from(mapped)
+    if file_magic != magic:
+        raise CompiledGraphError(f"Not a {kind} file: {path}")
+    if file_version != version or sections_count != len(names):
+        raise CompiledGraphError(
+            f"Unsupported {kind} version {file_version}, recreate {path}"
+        )
+
+    buffer = memoryview(mapped)
+    sections = {}
+    for i, name in enumerate(names):
+        offset, length = _SECTION.unpack_from(mapped, _HEADER.size + i * _SECTION.size)
+        if offset + length > len(mapped):
+            raise CompiledGraphError(f"Truncated {kind} file: {path}")
+        sections[name] = buffer[offset : offset + length]
+
+    return mapped, sections
+
+
+def section_bytes(section: Any) -> bytes:
+    """Returns the bytes of a section, in little-endian order.
+
+    Args:
+        section: Bytes, returned as they are, an array of 64-bit values
+            (e.g., of floats), or a sequence of integers, stored as 64-bit
+            integers.
+    """
+    if isinstance(section, bytes):
+        return section
+
+    if not isinstance(section, array) or section.itemsize != 8:
+        section = array("q", section)
+    elif sys.byteorder == "big":
+        section = array(section.typecode, section)
+
+    if sys.byteorder == "big":
+        section.byteswap()
+
+    return section.tobytes()
+
+
+def section_array(section: memoryview, typecode: str = "q") -> array:
+    """Copies a section of little-endian 64-bit values into an array.
+
+    A single copy of the bytes, without a Python object per element, so that
+    the arrays can be extended like those of a regular compact graph.
+
+    Args:
+        section: The section.
+        typecode: The type of the values, "q" for integers or "d" for floats.
+    """
+    values = array(typecode)
+    values.frombytes(section)
+
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    return values
+
+
+def section_string_table(section: memoryview, count: int) -> StringTable:
+    """Returns the string table stored in a section.
+
+    Args:
+        section: The section, with `count + 1` offsets followed by the data.
+        count: The number of strings.
+    """
+    offsets_length = 8 * (count + 1)
+
+    return StringTable(
+        section_array(section[:offsets_length]), section[offsets_length:]
+    )
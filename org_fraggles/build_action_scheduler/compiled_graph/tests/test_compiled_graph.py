@@ -0,0 +1,200 @@
+import struct
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.compiled_graph import (
+    COMPILED_GRAPH_MAGIC,
+    CompiledGraphError,
+    compile_actions_info,
+    is_compiled_graph,
+    load_compiled_actions_info,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def _actions():
+    return [
+        Action(sha1="a", duration=3, dependencies=["b", "e"], command="link a"),
+        Action(sha1="b", duration=2, dependencies=["c"], cpus=4, memory_mb=512),
+        Action(sha1="c", duration=1, dependencies=[], exclusive_resources=("gpu",)),
+        Action(sha1="e", duration=5, dependencies=[]),
+        Action(sha1="é", duration=7, dependencies=["c"], command="ünïcode"),
+    ]
+
+
+@pytest.fixture
+def compiled_path(tmp_path):
+    path = str(tmp_path / "graph.bin")
+    compile_actions_info(ActionsInfo(actions=_actions()), path)
+
+    return path
+
+
+def test_round_trip(compiled_path):
+    actions_info = load_compiled_actions_info(compiled_path)
+    expected = ActionsInfo(actions=_actions())
+
+    graph = actions_info.compact_graph
+    expected_graph = expected.compact_graph
+    assert list(graph.sha1s) == expected_graph.sha1s
+    assert graph.durations == expected_graph.durations
+    assert graph.dependencies_count == expected_graph.dependencies_count
+    assert graph.dependents_offsets == expected_graph.dependents_offsets
+    assert graph.dependents == expected_graph.dependents
+
+    for action in _actions():
+        assert (
+            graph.index_by_sha1[action.sha1]
+            == expected_graph.index_by_sha1[action.sha1]
+        )
+        assert action.sha1 in actions_info.actions_by_sha1
+        assert actions_info.actions_by_sha1[action.sha1] == action
+
+    assert "z" not in actions_info.actions_by_sha1
+    with pytest.raises(KeyError):
+        graph.index_by_sha1["z"]
+
+    assert list(actions_info.actions) == _actions()
+
+
+def test_sha1_index(tmp_path):
+    # Enough actions for their SHA-1s to collide in the hash table.
+    actions = [
+        Action(
+            sha1=f"{i:040x}", duration=1, dependencies=[f"{i - 1:040x}"] if i else []
+        )
+        for i in range(2000)
+    ]
+    path = str(tmp_path / "graph.bin")
+    compile_actions_info(ActionsInfo(actions=actions), path)
+
+    actions_info = load_compiled_actions_info(path)
+    index_by_sha1 = actions_info.compact_graph.index_by_sha1
+
+    assert [index_by_sha1[action.sha1] for action in actions] == list(range(2000))
+    assert f"{2000:040x}" not in index_by_sha1
+    assert "" not in index_by_sha1
+
+
+def test_action_at(compiled_path):
+    actions_info = load_compiled_actions_info(compiled_path)
+
+    for index, action in enumerate(_actions()):
+        assert actions_info.action_at(index) == action
+
+        # Built once, whether looked up by index or by SHA-1.
+        assert (
+            actions_info.action_at(index) is actions_info.actions_by_sha1[action.sha1]
+        )
+
+    actions_info.close()
+
+
+def test_precomputed_bottom_levels(compiled_path):
+    actions_info = load_compiled_actions_info(compiled_path)
+    bottom_levels = actions_info.bottom_levels()
+
+    expected = DependencyAnalyzer(
+        actions_info=ActionsInfo(actions=_actions())
+    ).bottom_levels()
+
+    assert bottom_levels.bottom_levels_by_index() == expected.bottom_levels_by_index()
+    assert bottom_levels.topological_order() == expected.topological_order()
+    assert bottom_levels.critical_path() == expected.critical_path()
+
+
+def test_add_actions(compiled_path):
+    actions_info = load_compiled_actions_info(compiled_path)
+
+    indexes = actions_info.add_actions(
+        [Action(sha1="f", duration=1, dependencies=["a"])]
+    )
+
+    assert list(indexes) == [5]
+    assert actions_info.compact_graph.index_by_sha1["f"] == 5
+    assert actions_info.compact_graph.sha1s[5] == "f"
+
+    # Actions can't be removed.
+    with pytest.raises(TypeError):
+        del actions_info.compact_graph.index_by_sha1["f"]
+    with pytest.raises(TypeError):
+        del actions_info.actions_by_sha1["a"]
+    assert list(actions_info.compact_graph.dependents_of(0)) == [5]
+    assert [action.sha1 for action in actions_info.actions] == [
+        "a",
+        "b",
+        "c",
+        "e",
+        "é",
+        "f",
+    ]
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_compiled_graph(compiled_path, algorithm):
+    def schedule(actions_info, dependency_analyzer):
+        return ActionScheduler(
+            parallelism=1,
+            action_status_polling_interval_s=1,
+            dry_run=True,
+            algorithm=algorithm,
+            actions_info=actions_info,
+            dependency_analyzer=dependency_analyzer,
+        ).schedule()
+
+    actions_info = load_compiled_actions_info(compiled_path)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+    dependency_analyzer.use_bottom_levels(actions_info.bottom_levels())
+
+    expected_actions_info = ActionsInfo(actions=_actions())
+    expected = schedule(
+        expected_actions_info, DependencyAnalyzer(actions_info=expected_actions_info)
+    )
+
+    report = schedule(actions_info, dependency_analyzer)
+
+    assert report["action_execution_history"] == expected["action_execution_history"]
+    assert report["critical_path"] == expected["critical_path"]
+
+
+def test_compile_rejects_cycles(tmp_path):
+    actions_info = ActionsInfo(
+        actions=[
+            Action(sha1="a", duration=1, dependencies=["b"]),
+            Action(sha1="b", duration=1, dependencies=["a"]),
+        ]
+    )
+
+    with pytest.raises(CompiledGraphError, match="cycle"):
+        compile_actions_info(actions_info, str(tmp_path / "graph.bin"))
+
+
+def test_is_compiled_graph(compiled_path, tmp_path):
+    json_path = tmp_path / "actions.json"
+    json_path.write_text("[]")
+
+    assert is_compiled_graph(compiled_path)
+    assert not is_compiled_graph(str(json_path))
+
+
+def test_load_invalid_files(tmp_path):
+    not_compiled = tmp_path / "not_compiled.bin"
+    not_compiled.write_bytes(b"[" * 64)
+    with pytest.raises(CompiledGraphError, match="Not a compiled graph"):
+        load_compiled_actions_info(str(not_compiled))
+
+    other_version = tmp_path / "other_version.bin"
+    other_version.write_bytes(struct.pack("<8sII", COMPILED_GRAPH_MAGIC, 999, 13))
+    with pytest.raises(CompiledGraphError, match="version 999"):
+        load_compiled_actions_info(str(other_version))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,730 @@
+import dataclasses
+import json
+import logging
+import os
+import socket
+import stat
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import count
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Deque, Dict, List
+
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
+
+from org_fraggles.build_action_scheduler.action_cache import ActionCache
+from org_fraggles.build_action_scheduler.actions_loader import (
+    ActionsLoaderError,
+    actions_info_from_records,
+)
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    CriticalPath,
+    DependencyAnalyzer,
+)
+from org_fraggles.build_action_scheduler.executors import (
+    ActionExecutor,
+    SleepActionExecutor,
+)
+from org_fraggles.build_action_scheduler.progress import ProgressReporter
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult, ActionSha1
+
+log = logging.getLogger(__name__)
+
+# Messages are JSON objects, one per line, with a "type" field:
+# - "build" (client to daemon): "actions", a list of action objects as in
+#   actions files, and optionally "name", "weight" and "estimated_durations",
+#   the durations to analyze the graph with by SHA-1 (see
+#   `ActionsInfo.update_durations`).
+# - "stats" (client to daemon): no other fields.
+# - "report" (daemon to client): "report", the build report.
+# - "stats" (daemon to client): "stats", what the daemon did so far.
+# - "error" (daemon to client): "error", why the request was rejected.
+# The daemon answers every request with a single message, then closes the
+# connection.
+
+# Called with the result of a shared execution, or with a description of the
+# error if the action executor raised.
+ExecutionCallback = Callable[[ActionResult | None, str | None], None]
+
+
+class DaemonError(Exception):
+    """Raised when talking to the scheduler daemon fails."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of DaemonError."""
+        super().__init__(message)
+
+
+def send_message(connection: socket.socket, message: Dict[str, Any]) -> None:
+    """Sends a message as a line of JSON.
+
+    Args:
+        connection: The connection to send the message on.
+        message: The message.
+    """
+    connection.sendall(json.dumps(message).encode() + b"\n")
+
+
+@dataclass
+class SharedExecution:
+    """An action execution that any number of builds are waiting on."""
+
+    # The action to execute.
+    action: Action
+
+    # Called with the outcome, once per build waiting on the execution.
+    callbacks: List[ExecutionCallback] = field(default_factory=list)
+
+    # Whether or not a worker was given the execution.
+    started: bool = False
+
+
+@dataclass
+class BuildShare:
+    """What the shared pool knows about a build."""
+
+    # The share of the workers the build gets, relative to the other builds.
+    weight: float
+
+    # The SHA-1s of the actions the build is waiting on that haven't started
+    # yet, in the order the build submitted them.
+    queue: Deque[ActionSha1] = field(default_factory=deque)
+
+    # The work given to the build so far divided by its weight, in the same
+    # unit as action durations. The build with the lowest one goes next.
+    virtual_time: float = 0
+
+    # The number of executions started on behalf of the build.
+    executed_count: int = 0
+
+    # The number of actions of the build that joined an execution another
+    # build had already submitted.
+    coalesced_count: int = 0
+
+
+class SharedActionPool(BaseModel):
+    """Executes the actions of many builds on one set of workers.
+
+    Workers are shared with start-time fair queueing: every build has a
+    virtual time, which grows by the duration of each action started on its
+    behalf divided by its weight, and the next action comes from the build
+    with the lowest one. A build with twice the weight of another thus gets
+    about twice the worker time while both have actions waiting. Builds that
+    were idle catch up with the others' virtual time, so they can't save up
+    a share. Within a build, actions start in the order they're submitted,
+    which is the build scheduler's priority order.
+
+    An action submitted while another build's execution of the same SHA-1 is
+    queued or running joins that execution, and every build gets its
+    outcome. A queued execution is in the queue of every build waiting on
+    it, and starts on the turn of the first one to get there.
+    """
+
+    # The maximum number of actions executed at once, across all builds.
+    parallelism: int = Field(gt=0)
+
+    # Executes the actions of all builds.
+    action_executor: ActionExecutor
+
+    _workers: ThreadPoolExecutor = PrivateAttr(default=None)
+
+    # The builds using the pool, by name.
+    _builds: Dict[str, BuildShare] = PrivateAttr(default_factory=dict)
+
+    # The executions that are queued or running, by action SHA-1.
+    _executions: Dict[ActionSha1, SharedExecution] = PrivateAttr(default_factory=dict)
+
+    # The number of executions running.
+    _running_count: int = PrivateAttr(default=0)
+
+    # The virtual time of the last build an execution was started for.
+    _virtual_time: float = PrivateAttr(default=0)
+
+    # The number of executions started, and of submissions that joined an
+    # execution in flight, over the lifetime of the pool.
+    _executed_count: int = PrivateAttr(default=0)
+    _coalesced_count: int = PrivateAttr(default=0)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        self._workers = ThreadPoolExecutor(max_workers=self.parallelism)
+
+    def add_build(self, name: str, weight: float) -> None:
+        """Registers a build, which can then submit actions.
+
+        Args:
+            name: The name of the build, unique among the builds using the pool.
+            weight: The share of the workers the build gets, relative to the
+                other builds.
+        """
+        with self._lock:
+            self._builds[name] = BuildShare(
+                weight=weight, virtual_time=self._virtual_time
+            )
+
+    def remove_build(self, name: str) -> Dict[str, Any]:
+        """Unregisters a build, once it's not waiting on any action anymore.
+
+        Args:
+            name: The name of the build.
+
+        Returns:
+            The number of executions started on behalf of the build, and of
+            its actions that joined another build's execution.
+        """
+        with self._lock:
+            build = self._builds.pop(name)
+
+        return {
+            "weight": build.weight,
+            "executed": build.executed_count,
+            "coalesced": build.coalesced_count,
+        }
+
+    def submit(
+        self, build_name: str, action: Action, callback: ExecutionCallback
+    ) -> None:
+        """Queues an action for execution on behalf of a build.
+
+        Args:
+            build_name: The name of the build.
+            action: The action to execute.
+            callback: Called with the outcome, from a worker thread.
+        """
+        with self._lock:
+            build = self._builds[build_name]
+
+            # A build that had nothing queued doesn't get credit for the time
+            # it was idle.
+            if not build.queue:
+                build.virtual_time = max(build.virtual_time, self._virtual_time)
+
+            execution = self._executions.get(action.sha1)
+
+            if execution is None:
+                execution = SharedExecution(action=action)
+                self._executions[action.sha1] = execution
+            else:
+                build.coalesced_count += 1
+                self._coalesced_count += 1
+
+            execution.callbacks.append(callback)
+
+            if not execution.started:
+                build.queue.append(action.sha1)
+
+            executions = self._pop_executions_to_start()
+
+        self._start_executions(executions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns what the pool is doing, and the number of executions started
+        and coalesced so far."""
+        with self._lock:
+            return {
+                "builds": {
+                    name: {
+                        "weight": build.weight,
+                        "queued": len(build.queue),
+                        "executed": build.executed_count,
+                        "coalesced": build.coalesced_count,
+                    }
+                    for name, build in self._builds.items()
+                },
+                "running": self._running_count,
+                "executed": self._executed_count,
+                "coalesced": self._coalesced_count,
+            }
+
+    def shutdown(self) -> None:
+        """Waits for the running executions to finish, and stops the workers."""
+        self._workers.shutdown(wait=True)
+
+    def _pop_executions_to_start(self) -> List[SharedExecution]:
+        """Picks the executions to start on the workers that are free.
+
+        Must be called with `self._lock` held.
+
+        Returns:
+            The executions, marked as started.
+        """
+        executions = []
+
+        while self._running_count < self.parallelism:
+            builds_waiting = [build for build in self._builds.values() if build.queue]
+            if not builds_waiting:
+                break
+
+            build = min(builds_waiting, key=lambda build: build.virtual_time)
+            execution = self._executions.get(build.queue.popleft())
+
+            # Already started on the turn of another build waiting on it, and
+            # maybe done.
+            if execution is None or execution.started:
+                continue
+
+            execution.started = True
+            self._running_count += 1
+            self._executed_count += 1
+            build.executed_count += 1
+
+            self._virtual_time = build.virtual_time
+            build.virtual_time += max(execution.action.duration, 1) / build.weight
+
+            executions.append(execution)
+
+        return executions
+
+    def _execute(self, execution: SharedExecution) -> None:
+        """Executes an action on a worker, and hands the outcome to every build
+        waiting on it.
+
+        Args:
+            execution: The execution.
+        """
+        action_result = None
+        error = None
+
+        try:
+            action_result = self.action_executor.execute(execution.action)
+        except Exception as e:
+            error = repr(e)
+
+        with self._lock:
+            del self._executions[execution.action.sha1]
+            self._running_count -= 1
+
+            executions = self._pop_executions_to_start()
+
+        # The builds waiting on this execution hear about it before anything
+        # else can go wrong.
+        self._call_callbacks(execution, action_result, error)
+        self._start_executions(executions)
+
+    def _start_executions(self, executions: List[SharedExecution]) -> None:
+        """Submits executions to the workers, failing them if the pool is shut down.
+
+        Args:
+            executions: The executions, marked as started.
+        """
+        for execution in executions:
+            try:
+                self._workers.submit(self._execute, execution)
+            except RuntimeError as e:
+                with self._lock:
+                    del self._executions[execution.action.sha1]
+                    self._running_count -= 1
+
+                self._call_callbacks(execution, None, repr(e))
+
+    def _call_callbacks(
+        self,
+        execution: SharedExecution,
+        action_result: ActionResult | None,
+        error: str | None,
+    ) -> None:
+        """Hands the outcome of an execution to every build waiting on it.
+
+        A callback that raises is logged, and doesn't keep the others from
+        being called.
+
+        Args:
+            execution: The execution, no longer in `self._executions`.
+            action_result: The result of the action, unless it failed.
+            error: Why the action failed, if it did.
+        """
+        for callback in execution.callbacks:
+            try:
+                callback(action_result, error)
+            except Exception:
+                log.exception(
+                    "Handing the outcome of %s to a build failed",
+                    execution.action.sha1,
+                )
+
+
+class DaemonActionScheduler(ActionScheduler):
+    """Schedules the actions of one build on the daemon's shared pool.
+
+    Every build has its own dispatcher and scheduling state, like with the
+    other schedulers, but their actions run on the workers of a pool that all
+    builds share. The pool decides which build's action runs next, and runs
+    an action once for all builds that submit it at the same time.
+    """
+
+    # The pool shared by the builds of the daemon.
+    shared_pool: SharedActionPool
+
+    # The name of the build, unique among the builds using the pool.
+    build_name: str
+
+    # The share of the pool's workers the build gets, relative to the other
+    # builds.
+    weight: float = Field(default=1, gt=0)
+
+    # What the pool did for the build, once it's done.
+    _pool_stats: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def _create_executor(self) -> SharedActionPool:
+        """Registers the build with the shared pool, which actions are submitted to."""
+        self.shared_pool.add_build(self.build_name, self.weight)
+
+        return self.shared_pool
+
+    def _shutdown_executor(self) -> None:
+        """Unregisters the build from the shared pool, which keeps running."""
+        self._pool_stats = self.shared_pool.remove_build(self.build_name)
+
+    def _submit_action(self, action_sha1: ActionSha1) -> None:
+        """Queues an action on the shared pool.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+        """
+        self.shared_pool.submit(
+            self.build_name,
+            self.actions_info.actions_by_sha1[action_sha1],
+            lambda action_result, error: self._on_shared_execution_done(
+                action_sha1, action_result, error
+            ),
+        )
+
+    def _on_shared_execution_done(
+        self,
+        action_sha1: ActionSha1,
+        action_result: ActionResult | None,
+        error: str | None,
+    ) -> None:
+        """Turns the outcome of a shared execution into a completion event.
+
+        Args:
+            action_sha1: The SHA-1 of the action that was executed.
+            action_result: The result of the execution, unless it raised.
+            error: A description of the error if the execution raised.
+        """
+        if error is None:
+            self._on_action_execution_result(action_sha1, action_result)
+        else:
+            self._on_action_execution_failed(action_sha1, error)
+
+    def _build_report(self, overall_critical_path: CriticalPath) -> Dict[str, Any]:
+        """Adds what the shared pool did for the build to the build report."""
+        report = super()._build_report(overall_critical_path)
+        report["daemon"] = {"build": self.build_name, **self._pool_stats}
+
+        return report
+
+
+class SchedulerDaemon(BaseModel):
+    """Serves builds submitted over a Unix socket, on one shared pool.
+
+    Builds run concurrently, each on its own thread with its own
+    `DaemonActionScheduler`, and share the workers of a `SharedActionPool`
+    according to their weights. So concurrent builds on a host don't
+    oversubscribe it, and actions they have in common run once.
+    """
+
+    # The path of the Unix socket to listen on. A stale socket file left by
+    # a previous daemon is replaced.
+    socket_path: str
+
+    # The maximum number of actions executed at once, across all builds.
+    parallelism: int = Field(gt=0)
+
+    # Whether or not to actually execute actions.
+    dry_run: bool = False
+
+    # Executes the actions of all builds. Defaults to sleeping for their
+    # duration.
+    action_executor: ActionExecutor | None = None
+
+    # The scheduling algorithm of every build.
+    algorithm: SchedulingAlgorithm = SchedulingAlgorithm.READY_QUEUE
+
+    # The maximum time in seconds a build's dispatcher waits for a completion
+    # before checking for ready actions again.
+    action_status_polling_interval_s: float = 1
+
+    # Results shared by all builds, if any.
+    action_result_cache: ActionCache | None = None
+
+    _pool: SharedActionPool = PrivateAttr(default=None)
+
+    _server: socket.socket | None = PrivateAttr(default=None)
+
+    # Numbers the builds, so that their names are unique.
+    _build_numbers: count = PrivateAttr(default_factory=lambda: count(1))
+
+    # The number of builds done so far, and of builds running.
+    _builds_done_count: int = PrivateAttr(default=0)
+    _builds_running_count: int = PrivateAttr(default=0)
+
+    _stopped: Event = PrivateAttr(default_factory=Event)
+
+    _accept_thread: Thread | None = PrivateAttr(default=None)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        if self.action_executor is None:
+            self.action_executor = SleepActionExecutor(dry_run=self.dry_run)
+
+        self._pool = SharedActionPool(
+            parallelism=self.parallelism, action_executor=self.action_executor
+        )
+
+    def start(self) -> None:
+        """Starts listening on a background thread, unless already started.
+
+        Raises:
+            DaemonError: If something other than a socket is at the socket path.
+        """
+        with self._lock:
+            if self._server is not None:
+                return
+
+            if os.path.exists(self.socket_path):
+                if not stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                    raise DaemonError(f"{self.socket_path} exists and isn't a socket")
+
+                os.unlink(self.socket_path)
+
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(self.socket_path)
+            self._server.listen()
+            self._server.settimeout(0.5)
+
+            self._accept_thread = Thread(target=self._accept_builds, daemon=True)
+            self._accept_thread.start()
+
+    def serve_forever(self) -> None:
+        """Starts listening, and blocks until `shutdown` is called."""
+        self.start()
+        self._stopped.wait()
+
+    def shutdown(self) -> None:
+        """Stops accepting builds, and waits for the running actions to finish.
+
+        Builds still running are cut off: their clients get no report.
+        """
+        self._stopped.set()
+
+        with self._lock:
+            server, self._server = self._server, None
+
+        if server is not None:
+            server.close()
+            self._accept_thread.join()
+
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+        self._pool.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of builds done and running, and what the pool is doing."""
+        with self._lock:
+            builds_stats = {
+                "builds_done": self._builds_done_count,
+                "builds_running": self._builds_running_count,
+            }
+
+        return {**builds_stats, "pool": self._pool.stats()}
+
+    def _accept_builds(self) -> None:
+        """Serves every connection on its own thread."""
+        while not self._stopped.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+
+            Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: socket.socket) -> None:
+        """Answers the request on a connection, then closes it.
+
+        Args:
+            connection: The connection to the client.
+        """
+        try:
+            with connection:
+                connection.settimeout(None)
+                line = connection.makefile("rb").readline()
+
+                try:
+                    reply = self._handle(json.loads(line))
+                except (
+                    ValueError,
+                    KeyError,
+                    TypeError,
+                    ActionsLoaderError,
+                    DaemonError,
+                ) as e:
+                    reply = {"type": "error", "error": str(e)}
+
+                send_message(connection, reply)
+        except OSError as e:
+            log.warning("Dropping client connection: %r", e)
+
+    def _handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Answers a request.
+
+        Args:
+            message: The request.
+
+        Returns:
+            The reply.
+
+        Raises:
+            DaemonError: If the request is invalid.
+        """
+        if message["type"] == "stats":
+            return {"type": "stats", "stats": self.stats()}
+
+        if message["type"] != "build":
+            raise DaemonError(f"Unknown request type {message['type']!r}")
+
+        return {"type": "report", "report": self._run_build(message)}
+
+    def _run_build(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Schedules a build on the shared pool, on the calling thread.
+
+        Args:
+            message: The "build" request.
+
+        Returns:
+            The build report.
+
+        Raises:
+            DaemonError: If the build is invalid.
+            ActionsLoaderError: If an action is invalid.
+        """
+        actions_info = actions_info_from_records(message["actions"])
+
+        estimated_durations = message.get("estimated_durations", {})
+        for action_sha1 in estimated_durations:
+            if action_sha1 not in actions_info.actions_by_sha1:
+                raise DaemonError(f"Estimated duration of unknown action {action_sha1}")
+        actions_info.update_durations(estimated_durations)
+
+        build_name = f"{message.get('name', 'build')}-{next(self._build_numbers)}"
+
+        try:
+            scheduler = DaemonActionScheduler(
+                parallelism=self.parallelism,
+                action_status_polling_interval_s=self.action_status_polling_interval_s,
+                dry_run=self.dry_run,
+                algorithm=self.algorithm,
+                action_result_cache=self.action_result_cache,
+                progress_reporter=ProgressReporter(log_progress=False),
+                actions_info=actions_info,
+                dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+                shared_pool=self._pool,
+                build_name=build_name,
+                weight=message.get("weight", 1),
+            )
+        except ValidationError as e:
+            raise DaemonError(f"Invalid build: {e}") from e
+
+        with self._lock:
+            self._builds_running_count += 1
+
+        log.info("Starting %s with %d actions", build_name, len(actions_info.actions))
+
+        try:
+            return scheduler.schedule()
+        finally:
+            with self._lock:
+                self._builds_running_count -= 1
+                self._builds_done_count += 1
+
+            log.info("Finished %s", build_name)
+
+
+def submit_build(
+    socket_path: str,
+    actions: List[Action],
+    weight: float = 1,
+    name: str | None = None,
+    estimated_durations: Dict[ActionSha1, float] | None = None,
+) -> Dict[str, Any]:
+    """Has a scheduler daemon run a build, and waits for it.
+
+    Args:
+        socket_path: The path of the daemon's Unix socket.
+        actions: The actions of the build.
+        weight: The share of the daemon's workers the build gets, relative to
+            the other builds.
+        name: The name of the build in the daemon's logs and reports.
+        estimated_durations: The durations to analyze the graph with instead
+            of the declared ones, by SHA-1, e.g., from a durations history.
+
+    Returns:
+        The build report.
+
+    Raises:
+        DaemonError: If the daemon can't be reached or rejects the build.
+    """
+    message = {
+        "type": "build",
+        "actions": [dataclasses.asdict(action) for action in actions],
+        "weight": weight,
+    }
+    if name is not None:
+        message["name"] = name
+    if estimated_durations:
+        message["estimated_durations"] = estimated_durations
+
+    return _request(socket_path, message)["report"]
+
+
+def daemon_stats(socket_path: str) -> Dict[str, Any]:
+    """Returns what a scheduler daemon did so far.
+
+    Args:
+        socket_path: The path of the daemon's Unix socket.
+
+    Raises:
+        DaemonError: If the daemon can't be reached.
+    """
+    return _request(socket_path, {"type": "stats"})["stats"]
+
+
+def _request(socket_path: str, message: Dict[str, Any]) -> Dict[str, Any]:
+    """Sends a request to a scheduler daemon and returns its reply.
+
+    Raises:
+        DaemonError: If the daemon can't be reached, or replies with an error.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(socket_path)
+            send_message(connection, message)
+            line = connection.makefile("rb").readline()
+    except OSError as e:
+        raise DaemonError(f"Can't reach the daemon at {socket_path}: {e}") from e
+
+    if not line:
+        raise DaemonError("The daemon closed the connection without replying")
+
+    reply = json.loads(line)
+
+    if reply["type"] == "error":
+        raise DaemonError(reply["error"])
+
+    return reply
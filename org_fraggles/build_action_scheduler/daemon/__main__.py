@@ -0,0 +1,86 @@
+import logging
+import time
+from typing import Annotated, Optional
+
+import typer
+
+from org_fraggles.build_action_scheduler.action_cache import SqliteActionCache
+from org_fraggles.build_action_scheduler.daemon import SchedulerDaemon
+from org_fraggles.build_action_scheduler.executors import (
+    ExecutorKind,
+    create_action_executor,
+)
+
+logging.Formatter.converter = time.gmtime
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%SZ",
+)
+
+log = logging.getLogger(__name__)
+
+
+def main(
+    socket_path: Annotated[
+        str,
+        typer.Option(..., help="The path of the Unix socket to listen on."),
+    ],
+    parallelism: Annotated[
+        int,
+        typer.Option(
+            ...,
+            min=1,
+            help="The maximum number of actions to execute in parallel, across all builds.",
+        ),
+    ],
+    executor: Annotated[
+        ExecutorKind,
+        typer.Option(
+            ...,
+            help=(
+                "What executing an action means. The subprocess executor runs the"
+                " 'command' field of each action in a shell."
+            ),
+        ),
+    ] = ExecutorKind.SLEEP,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Whether or not to actually execute actions. True will skip the sleep calls.",
+        ),
+    ] = False,
+    action_cache_path: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help="The path to a SQLite database caching action results for all builds.",
+        ),
+    ] = None,
+) -> None:
+    """Runs the builds submitted to the socket on one shared pool, until interrupted."""
+    daemon = SchedulerDaemon(
+        socket_path=socket_path,
+        parallelism=parallelism,
+        dry_run=dry_run,
+        action_executor=create_action_executor(executor, dry_run),
+        action_result_cache=(
+            None
+            if action_cache_path is None
+            else SqliteActionCache(path=action_cache_path)
+        ),
+    )
+    log.info("Serving builds on %s", socket_path)
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+
+
+if __name__ == "__main__":
+    typer.run(main)
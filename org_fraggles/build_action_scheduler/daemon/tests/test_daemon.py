@@ -0,0 +1,250 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import List
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.daemon import (
+    DaemonError,
+    SchedulerDaemon,
+    SharedActionPool,
+    daemon_stats,
+    submit_build,
+)
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+class GatedActionExecutor(ActionExecutor):
+    """Records executions, which all block until released."""
+
+    # The SHA-1s of the actions executed, in the order they started.
+    _started: List[str] = PrivateAttr(default_factory=list)
+
+    _released: threading.Event = PrivateAttr(default_factory=threading.Event)
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def execute(self, action: Action) -> ActionResult:
+        with self._lock:
+            self._started.append(action.sha1)
+
+        self._released.wait()
+
+        return ActionResult(exit_code=0, wall_time_s=0.01)
+
+    def release(self) -> None:
+        self._released.set()
+
+    def started(self) -> List[str]:
+        with self._lock:
+            return list(self._started)
+
+
+def wait_until(condition, timeout_s: float = 5) -> None:
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to about a hundred characters, which
+    # pytest's temporary directories can exceed.
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "daemon.sock")
+
+
+def test_shared_action_pool_shares_workers_by_weight():
+    action_executor = GatedActionExecutor()
+    pool = SharedActionPool(parallelism=1, action_executor=action_executor)
+    pool.add_build("heavy", weight=3)
+    pool.add_build("light", weight=1)
+
+    done = threading.Semaphore(0)
+    for i in range(8):
+        for build_name in ("heavy", "light"):
+            pool.submit(
+                build_name,
+                Action(sha1=f"{build_name}{i}", duration=1, dependencies=[]),
+                lambda action_result, error: done.release(),
+            )
+
+    action_executor.release()
+    for _ in range(16):
+        done.acquire()
+    pool.shutdown()
+
+    # While both builds have actions waiting, the heavy one gets three times
+    # as many workers.
+    first_started = action_executor.started()[:8]
+    assert sum(sha1.startswith("heavy") for sha1 in first_started) == 6
+    assert pool.remove_build("heavy") == {"weight": 3, "executed": 8, "coalesced": 0}
+
+
+@pytest.mark.parametrize("started", [True, False])
+def test_shared_action_pool_coalesces_identical_actions(started):
+    action_executor = GatedActionExecutor()
+    pool = SharedActionPool(parallelism=1, action_executor=action_executor)
+    pool.add_build("first", weight=1)
+    pool.add_build("second", weight=1)
+
+    outcomes = []
+    done = threading.Semaphore(0)
+
+    def on_done(action_result, error):
+        outcomes.append((action_result, error))
+        done.release()
+
+    if not started:
+        # Keeps the only worker busy, so that the shared action is queued.
+        pool.submit("first", Action(sha1="gate", duration=1, dependencies=[]), on_done)
+
+    shared_action = Action(sha1="shared", duration=1, dependencies=[])
+    pool.submit("first", shared_action, on_done)
+    pool.submit("second", shared_action, on_done)
+
+    # Both builds get the outcome of the shared action.
+    callbacks_count = 2 if started else 3
+
+    action_executor.release()
+    for _ in range(callbacks_count):
+        done.acquire()
+    pool.shutdown()
+
+    assert Counter(action_executor.started())["shared"] == 1
+    assert (
+        outcomes
+        == [(ActionResult(exit_code=0, wall_time_s=0.01), None)] * callbacks_count
+    )
+    assert pool.stats()["coalesced"] == 1
+    assert pool.remove_build("second")["coalesced"] == 1
+
+
+def test_shared_action_pool_survives_failing_callbacks():
+    action_executor = GatedActionExecutor()
+    pool = SharedActionPool(parallelism=1, action_executor=action_executor)
+    pool.add_build("first", weight=1)
+    pool.add_build("second", weight=1)
+
+    done = threading.Semaphore(0)
+
+    def failing_callback(action_result, error):
+        raise RuntimeError("Build went away")
+
+    shared_action = Action(sha1="shared", duration=1, dependencies=[])
+    pool.submit("first", shared_action, failing_callback)
+    pool.submit("second", shared_action, lambda action_result, error: done.release())
+    pool.submit(
+        "first",
+        Action(sha1="next", duration=1, dependencies=[]),
+        lambda action_result, error: done.release(),
+    )
+
+    # The second build hears about the shared action, and the next action
+    # still runs.
+    action_executor.release()
+    for _ in range(2):
+        assert done.acquire(timeout=5)
+    pool.shutdown()
+
+    assert action_executor.started() == ["shared", "next"]
+
+
+def test_shared_action_pool_fails_executions_after_shutdown():
+    pool = SharedActionPool(parallelism=1, action_executor=GatedActionExecutor())
+    pool.add_build("build", weight=1)
+    pool.shutdown()
+
+    outcomes = []
+    pool.submit(
+        "build",
+        Action(sha1="a", duration=1, dependencies=[]),
+        lambda action_result, error: outcomes.append((action_result, error)),
+    )
+
+    assert len(outcomes) == 1
+    assert outcomes[0][0] is None
+    assert "shutdown" in outcomes[0][1]
+    assert pool.stats()["running"] == 0
+
+
+def test_daemon_runs_concurrent_builds_on_one_pool(socket_path):
+    action_executor = GatedActionExecutor()
+    daemon = SchedulerDaemon(
+        socket_path=socket_path,
+        parallelism=2,
+        action_executor=action_executor,
+        action_status_polling_interval_s=0.1,
+    )
+    daemon.start()
+
+    reports = {}
+
+    def build(name):
+        reports[name] = submit_build(
+            socket_path,
+            [
+                Action(sha1="common", duration=2, dependencies=[]),
+                Action(sha1=name, duration=1, dependencies=["common"]),
+            ],
+            name=name,
+        )
+
+    threads = [threading.Thread(target=build, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+
+    # Both builds wait on the same execution of the common action.
+    wait_until(lambda: daemon_stats(socket_path)["pool"]["coalesced"] == 1)
+    action_executor.release()
+
+    for thread in threads:
+        thread.join()
+
+    assert Counter(action_executor.started()) == {"common": 1, "a": 1, "b": 1}
+
+    for name in ("a", "b"):
+        assert reports[name]["action_execution_history"] == ["common", name]
+
+    assert sorted(
+        (report["daemon"]["executed"], report["daemon"]["coalesced"])
+        for report in reports.values()
+    ) == [(1, 1), (2, 0)]
+    assert daemon_stats(socket_path)["builds_done"] == 2
+
+    daemon.shutdown()
+    assert not os.path.exists(socket_path)
+
+
+def test_daemon_rejects_invalid_builds(socket_path):
+    daemon = SchedulerDaemon(socket_path=socket_path, parallelism=1, dry_run=True)
+    daemon.start()
+
+    with pytest.raises(DaemonError, match="Invalid action at index 0"):
+        submit_build(socket_path, [Action(sha1="a", duration=0, dependencies=[])])
+
+    with pytest.raises(DaemonError, match="Invalid build"):
+        submit_build(
+            socket_path, [Action(sha1="a", duration=1, dependencies=[])], weight=0
+        )
+
+    report = submit_build(socket_path, [Action(sha1="a", duration=1, dependencies=[])])
+    assert report["action_execution_history"] == ["a"]
+
+    daemon.shutdown()
+
+
+def test_submit_build_without_daemon(socket_path):
+    with pytest.raises(DaemonError, match="Can't reach the daemon"):
+        submit_build(socket_path, [Action(sha1="a", duration=1, dependencies=[])])
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -1,10 +1,16 @@
+from array import array
 from queue import PriorityQueue
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 from pydantic import BaseModel, PrivateAttr
 
-from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
-from org_fraggles.build_action_scheduler.types import ActionPath
+from org_fraggles.build_action_scheduler.actions_info import ActionIndex, ActionsInfo
+from org_fraggles.build_action_scheduler.types import (
+    Action,
+    ActionDuration,
+    ActionPath,
+    ActionSha1,
+)
 
 CriticalPath = Tuple[int, ActionPath]
 
@@ -61,6 +67,10 @@ class CriticalPaths(BaseModel):
         """
         self._critical_paths = PriorityQueue()
 
+        graph = self.actions_info.compact_graph
+        durations = graph.durations
+        index_by_sha1 = graph.index_by_sha1
+
         all_actions = set(self.actions_info.actions_by_sha1.keys())
         actions_with_dependencies = set(
             action_sha1
@@ -71,10 +81,7 @@ class CriticalPaths(BaseModel):
 
         for leaf_action_sha1 in leaf_actions:
             self._critical_paths.put(
-                (
-                    self.actions_info.actions_by_sha1[leaf_action_sha1].duration,
-                    [leaf_action_sha1],
-                )
+                (durations[index_by_sha1[leaf_action_sha1]], [leaf_action_sha1])
             )
 
         all_paths = []
@@ -88,9 +95,7 @@ class CriticalPaths(BaseModel):
                 # and the root. Add it to the path and increment the path
                 # duration with its duration.
                 for dependent in self.actions_info.action_dependents[path_last_action]:
-                    new_duration = (
-                        duration + self.actions_info.actions_by_sha1[dependent].duration
-                    )
+                    new_duration = duration + durations[index_by_sha1[dependent]]
                     new_path = path + [dependent]
                     self._critical_paths.put((new_duration, new_path))
             else:
@@ -102,6 +107,481 @@ class CriticalPaths(BaseModel):
             self._critical_paths.put((-1 * duration, path))
 
 
+class BottomLevels(BaseModel):
+    """Longest remaining durations ("bottom levels") for every action.
+
+    The bottom level of an action is its own duration plus the largest bottom
+    level among its dependents, i.e., the duration of the longest path from the
+    action to a root action. They are computed with a single topological pass
+    over the dependency graph, in O(V+E), without enumerating paths.
+    """
+
+    # Actions info.
+    actions_info: ActionsInfo
+
+    # Analyze the graph with vectorized NumPy operations instead of walking
+    # it in Python. Requires NumPy to be installed.
+    use_numpy: bool = False
+
+    # Action indexes in topological order (dependencies before dependents).
+    # Computed on demand when the bottom levels were computed elsewhere.
+    _topological_order: array | None = PrivateAttr(default=None)
+
+    # The longest duration from each action to a root action, including the
+    # action's own duration, by action index.
+    _bottom_levels: array = PrivateAttr(default_factory=lambda: array("q"))
+
+    # The topological level of each action, by action index: 0 for actions
+    # with no dependencies, otherwise one more than the largest level among
+    # its dependencies. Computed on demand by the pure Python analysis.
+    _topological_levels: array | None = PrivateAttr(default=None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        self._check_dependencies()
+
+        if self.use_numpy:
+            self._initialize_bottom_levels_numpy()
+        else:
+            self._initialize_bottom_levels()
+
+    @classmethod
+    def from_values(
+        cls,
+        actions_info: ActionsInfo,
+        bottom_levels: Dict[ActionSha1, ActionDuration],
+    ) -> "BottomLevels":
+        """Creates an instance of BottomLevels from already computed values.
+
+        The graph isn't analyzed again, so the caller is responsible for the
+        values matching the actions and for the graph having no cycles.
+
+        Args:
+            actions_info: Actions info.
+            bottom_levels: The bottom level of every action, by SHA-1.
+        """
+        instance = cls.model_construct(actions_info=actions_info)
+        instance._bottom_levels = array(
+            actions_info.compact_graph.durations.typecode,
+            (
+                bottom_levels[action_sha1]
+                for action_sha1 in actions_info.compact_graph.sha1s
+            ),
+        )
+
+        return instance
+
+    @classmethod
+    def from_arrays(
+        cls,
+        actions_info: ActionsInfo,
+        bottom_levels: array,
+        topological_order: array | None,
+    ) -> "BottomLevels":
+        """Creates an instance of BottomLevels from already computed arrays.
+
+        Unlike `from_values`, nothing is looked up by SHA-1, so no Python
+        object is created per action. The graph isn't analyzed again, so the
+        caller is responsible for the arrays matching the actions and for the
+        graph having no cycles.
+
+        Args:
+            actions_info: Actions info.
+            bottom_levels: The bottom level of every action, by action index.
+            topological_order: The action indexes in topological order, or
+                None to sort them when they're first needed.
+        """
+        instance = cls.model_construct(actions_info=actions_info)
+        instance._bottom_levels = bottom_levels
+        instance._topological_order = topological_order
+
+        return instance
+
+    def bottom_level(self, action_sha1: ActionSha1) -> ActionDuration:
+        """Returns the longest duration from an action to a root action.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+        """
+        return self._bottom_levels[
+            self.actions_info.compact_graph.index_by_sha1[action_sha1]
+        ]
+
+    def bottom_level_at(self, index: ActionIndex) -> ActionDuration:
+        """Returns the longest duration from an action to a root action.
+
+        Args:
+            index: The index of the action in the compact graph.
+        """
+        return self._bottom_levels[index]
+
+    def bottom_levels_by_index(self) -> array:
+        """Returns the bottom level of every action, by action index.
+
+        The array is shared, not copied, so it must not be modified.
+        """
+        return self._bottom_levels
+
+    def topological_order(self) -> List[ActionSha1]:
+        """Returns the actions ordered so that dependencies come before dependents."""
+        sha1s = self.actions_info.compact_graph.sha1s
+
+        return [sha1s[i] for i in self._get_topological_order()]
+
+    def topological_order_by_index(self) -> array:
+        """Returns the action indexes ordered so that dependencies come before dependents.
+
+        The array is shared, not copied, so it must not be modified.
+        """
+        return self._get_topological_order()
+
+    def add_actions(self, indexes: range) -> List[ActionIndex]:
+        """Computes the bottom levels of actions added to the compact graph.
+
+        New actions can depend on existing actions, but not the other way
+        around, so their bottom levels only depend on each other's. Existing
+        actions gain new dependents though, so the increases are propagated to
+        their transitive dependencies.
+
+        Args:
+            indexes: The indexes of the new actions, which must have been
+                added in topological order (see `sort_actions`).
+
+        Returns:
+            The indexes of the existing actions whose bottom levels increased.
+        """
+        graph = self.actions_info.compact_graph
+        actions_by_sha1 = self.actions_info.actions_by_sha1
+        bottom_levels = self._bottom_levels
+
+        bottom_levels.extend(graph.durations[index] for index in indexes)
+
+        for index in reversed(indexes):
+            bottom_levels[index] += max(
+                (bottom_levels[dependent] for dependent in graph.dependents_of(index)),
+                default=0,
+            )
+
+        increased = set()
+        stack = list(indexes)
+
+        while stack:
+            index = stack.pop()
+
+            for dependency in actions_by_sha1[graph.sha1s[index]].dependencies:
+                dependency_index = graph.index_by_sha1[dependency]
+                bottom_level = graph.durations[dependency_index] + bottom_levels[index]
+
+                if bottom_level > bottom_levels[dependency_index]:
+                    bottom_levels[dependency_index] = bottom_level
+                    increased.add(dependency_index)
+                    stack.append(dependency_index)
+
+        self._topological_order = None
+        self._topological_levels = None
+
+        return sorted(increased.difference(indexes))
+
+    def topological_levels(self) -> array:
+        """Returns the topological level of each action, by action index.
+
+        Actions with no dependencies are at level 0, and every other action is
+        one level above its deepest dependency, so actions at the same level
+        don't depend on each other.
+        """
+        if self._topological_levels is None:
+            graph = self.actions_info.compact_graph
+            graph.compact()
+            offsets = graph.dependents_offsets
+            dependents = graph.dependents
+
+            levels = array("q", bytes(8 * len(graph)))
+
+            for current in self._get_topological_order():
+                for j in range(offsets[current], offsets[current + 1]):
+                    if levels[dependents[j]] <= levels[current]:
+                        levels[dependents[j]] = levels[current] + 1
+
+            self._topological_levels = levels
+
+        return self._topological_levels
+
+    def critical_path(self) -> CriticalPath:
+        """Rebuilds the overall critical path from the bottom levels.
+
+        Starts from the leaf action with the largest bottom level and follows,
+        at each step, the dependent whose bottom level accounts for the rest
+        of the path. Ties are broken by the smallest SHA-1, which yields the
+        same path as the lexicographically smallest most critical path.
+
+        Returns:
+            The `(duration, path)` tuple for the overall critical path, or
+            `(0, [])` if there are no actions.
+        """
+        graph = self.actions_info.compact_graph
+        graph.compact()
+        bottom_levels = self._bottom_levels
+
+        leaf_actions = [
+            i for i in range(len(graph)) if graph.dependencies_count[i] == 0
+        ]
+
+        if not leaf_actions:
+            return (0, [])
+
+        current = min(leaf_actions, key=lambda i: (-bottom_levels[i], graph.sha1s[i]))
+        duration = bottom_levels[current]
+        path = [graph.sha1s[current]]
+
+        while graph.dependents_offsets[current] < graph.dependents_offsets[current + 1]:
+            remaining = bottom_levels[current] - graph.durations[current]
+            current = min(
+                (
+                    dependent
+                    for dependent in graph.dependents_of(current)
+                    if bottom_levels[dependent] == remaining
+                ),
+                key=lambda i: graph.sha1s[i],
+            )
+            path.append(graph.sha1s[current])
+
+        return (duration, path)
+
+    def _get_topological_order(self) -> array:
+        """Returns the action indexes in topological order, sorting them if needed."""
+        if self._topological_order is None:
+            self._topological_order = self._topological_sort()
+
+        return self._topological_order
+
+    def _check_dependencies(self) -> None:
+        """Checks that every dependency is an action.
+
+        Raises:
+            UnknownDependencyError: If an action depends on an unknown action.
+        """
+        check_dependencies(self.actions_info)
+
+    def _initialize_bottom_levels(self) -> None:
+        """Computes the topological order and the bottom levels of all actions.
+
+        Sorts the actions topologically, then walks the topological order
+        backwards so that every action's dependents have their bottom levels
+        computed before the action itself.
+
+        Raises:
+            DependencyCycleError: If there is a dependency cycle.
+        """
+        graph = self.actions_info.compact_graph
+        graph.compact()
+        offsets = graph.dependents_offsets
+        dependents = graph.dependents
+
+        order = self._topological_sort()
+
+        bottom_levels = array(graph.durations.typecode, graph.durations)
+
+        for current in reversed(order):
+            longest_dependent = 0
+            for j in range(offsets[current], offsets[current + 1]):
+                if bottom_levels[dependents[j]] > longest_dependent:
+                    longest_dependent = bottom_levels[dependents[j]]
+            bottom_levels[current] += longest_dependent
+
+        self._topological_order = order
+        self._bottom_levels = bottom_levels
+
+    def _topological_sort(self) -> array:
+        """Sorts the action indexes topologically with Kahn's algorithm.
+
+        Returns:
+            The action indexes, dependencies before dependents.
+
+        Raises:
+            DependencyCycleError: If there is a dependency cycle.
+        """
+        graph = self.actions_info.compact_graph
+        graph.compact()
+        offsets = graph.dependents_offsets
+        dependents = graph.dependents
+
+        in_degree = array("q", graph.dependencies_count)
+
+        order = array("q", (i for i in range(len(graph)) if in_degree[i] == 0))
+
+        # `order` doubles as the queue of actions with no unprocessed
+        # dependencies.
+        i = 0
+        while i < len(order):
+            current = order[i]
+            for j in range(offsets[current], offsets[current + 1]):
+                dependent = dependents[j]
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    order.append(dependent)
+            i += 1
+
+        if len(order) < len(graph):
+            raise DependencyCycleError("There is a dependency cycle")
+
+        return order
+
+    def _initialize_bottom_levels_numpy(self) -> None:
+        """Computes the topological order, levels and bottom levels with NumPy.
+
+        Runs a level-synchronous Kahn's algorithm: all actions with no
+        unprocessed dependencies form the current level, and the in-degrees of
+        all their dependents are decremented at once. Bottom levels are then
+        computed one level at a time, from the deepest level up, as every
+        action's dependents are in deeper levels. The number of Python-level
+        iterations is the depth of the graph rather than its size.
+
+        The results are stored in the same arrays as the pure Python analysis,
+        so consumers can't tell them apart.
+
+        Raises:
+            DependencyAnalyzerError: If NumPy isn't installed.
+            DependencyCycleError: If there is a dependency cycle.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise DependencyAnalyzerError(
+                "NumPy is required to analyze the dependency graph with NumPy"
+            ) from e
+
+        graph = self.actions_info.compact_graph
+        graph.compact()
+        n = len(graph)
+
+        offsets = np.frombuffer(graph.dependents_offsets, dtype=np.int64)
+        dependents = np.frombuffer(graph.dependents, dtype=np.int64)
+        durations = np.frombuffer(
+            graph.durations,
+            dtype=np.float64 if graph.durations.typecode == "d" else np.int64,
+        )
+
+        in_degree = np.frombuffer(graph.dependencies_count, dtype=np.int64).copy()
+        levels = np.zeros(n, dtype=np.int64)
+
+        def edges_of(actions):
+            """Returns the positions of the actions' edges and their counts."""
+            starts = offsets[actions]
+            counts = offsets[actions + 1] - starts
+            edges = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            edges += np.arange(edges.size)
+
+            return edges, counts
+
+        frontiers = []
+        frontier = np.flatnonzero(in_degree == 0)
+        processed_count = 0
+
+        while frontier.size:
+            levels[frontier] = len(frontiers)
+            frontiers.append(frontier)
+            processed_count += frontier.size
+
+            edges, _ = edges_of(frontier)
+            unblocked, decrements = np.unique(dependents[edges], return_counts=True)
+            in_degree[unblocked] -= decrements
+            frontier = unblocked[in_degree[unblocked] == 0]
+
+        if processed_count < n:
+            raise DependencyCycleError("There is a dependency cycle")
+
+        bottom_levels = durations.copy()
+
+        for frontier in reversed(frontiers):
+            edges, counts = edges_of(frontier)
+
+            if edges.size == 0:
+                continue
+
+            # Edges are grouped by action, so the largest dependent bottom
+            # level of every action with dependents is a segmented maximum.
+            has_dependents = counts > 0
+            segment_starts = (np.cumsum(counts) - counts)[has_dependents]
+            bottom_levels[frontier[has_dependents]] += np.maximum.reduceat(
+                bottom_levels[dependents[edges]], segment_starts
+            )
+
+        order = np.concatenate(frontiers) if frontiers else levels[:0]
+
+        self._topological_order = array("q", order.astype(np.int64).tobytes())
+        self._bottom_levels = array(graph.durations.typecode, bottom_levels.tobytes())
+        self._topological_levels = array("q", levels.tobytes())
+
+
+def check_dependencies(actions_info: ActionsInfo) -> None:
+    """Checks that every dependency is an action.
+
+    Such dependencies aren't edges of the compact graph, so comparing the
+    number of edges with the number of dependencies is enough, and the
+    actions are only walked to name the culprit.
+
+    Args:
+        actions_info: Actions info.
+
+    Raises:
+        UnknownDependencyError: If an action depends on an unknown action.
+    """
+    graph = actions_info.compact_graph
+    graph.compact()
+
+    if graph.dependents_offsets[-1] == sum(graph.dependencies_count):
+        return
+
+    for action in actions_info.actions_by_sha1.values():
+        for dependency in action.dependencies:
+            if dependency not in graph.index_by_sha1:
+                raise UnknownDependencyError(
+                    f"Action {action.sha1} depends on unknown action {dependency}"
+                )
+
+
+def sort_actions(actions: List[Action]) -> List[Action]:
+    """Sorts actions topologically, ignoring dependencies on other actions.
+
+    Args:
+        actions: The actions to sort.
+
+    Returns:
+        The actions, each one after its dependencies among them.
+
+    Raises:
+        DependencyCycleError: If there is a dependency cycle among the actions.
+    """
+    actions_by_sha1 = {action.sha1: action for action in actions}
+    dependents = {action.sha1: [] for action in actions}
+    in_degree = {}
+
+    for action in actions:
+        in_degree[action.sha1] = 0
+        for dependency in action.dependencies:
+            if dependency in dependents:
+                dependents[dependency].append(action.sha1)
+                in_degree[action.sha1] += 1
+
+    order = [action.sha1 for action in actions if in_degree[action.sha1] == 0]
+
+    # `order` doubles as the queue of actions with no unprocessed
+    # dependencies.
+    i = 0
+    while i < len(order):
+        for dependent in dependents[order[i]]:
+            in_degree[dependent] -= 1
+            if in_degree[dependent] == 0:
+                order.append(dependent)
+        i += 1
+
+    if len(order) < len(actions_by_sha1):
+        raise DependencyCycleError("There is a dependency cycle")
+
+    return [actions_by_sha1[action_sha1] for action_sha1 in order]
+
+
 class DependencyAnalyzerError(Exception):
     """Parent exception for exceptions raised by the DependencyAnalyzer."""
 
@@ -114,13 +594,24 @@ class DependencyCycleError(DependencyAnalyzerError):
     """Raised when there is a dependency cycle."""
 
 
+class UnknownDependencyError(DependencyAnalyzerError):
+    """Raised when an action depends on an action that isn't in the graph."""
+
+
 class DependencyAnalyzer(BaseModel):
     # Actions info.
     actions_info: ActionsInfo
 
+    # Analyze the graph with vectorized NumPy operations instead of walking
+    # it in Python. Requires NumPy to be installed.
+    use_numpy: bool = False
+
     # Priority queue to store paths and their overall durations.
     _critical_paths: CriticalPaths | None = PrivateAttr(default=None)
 
+    # Longest remaining durations for every action.
+    _bottom_levels: BottomLevels | None = PrivateAttr(default=None)
+
     def critical_paths(self) -> CriticalPaths:
         """Calculates the critical paths and their overall durations.
 
@@ -129,6 +620,7 @@ class DependencyAnalyzer(BaseModel):
 
         Raises:
             DependencyCycleError: If there is a dependency cycle.
+            UnknownDependencyError: If an action depends on an unknown action.
         """
         if self._critical_paths:
             return self._critical_paths
@@ -140,38 +632,55 @@ class DependencyAnalyzer(BaseModel):
 
         return self._critical_paths
 
-    def detect_cycle(self) -> bool:
-        """Returns True if there is a cycle in the dependency graph, False otherwise.
+    def bottom_levels(self) -> BottomLevels:
+        """Calculates the longest remaining duration of every action.
+
+        Unlike `critical_paths`, this doesn't enumerate leaf-to-root paths, so
+        it stays linear in the size of the graph.
+
+        Returns:
+            BottomLevels: The bottom levels for the actions.
 
-        Uses depth-first search to detect cycles by checking if a node being
-        visited is already in the tree/graph path.
+        Raises:
+            DependencyCycleError: If there is a dependency cycle.
+            UnknownDependencyError: If an action depends on an unknown action.
         """
-        visited = set()
-        action_path = set()
+        if self._bottom_levels:
+            return self._bottom_levels
 
-        def dfs(action_sha1):
-            if action_sha1 in action_path:
-                return True
+        self._bottom_levels = BottomLevels(
+            actions_info=self.actions_info, use_numpy=self.use_numpy
+        )
 
-            if action_sha1 in visited:
-                return False
+        return self._bottom_levels
 
-            visited.add(action_sha1)
-            action_path.add(action_sha1)
+    def use_bottom_levels(self, bottom_levels: BottomLevels) -> None:
+        """Makes the analyzer use bottom levels computed elsewhere.
 
-            for dependency_sha1 in self.actions_info.actions_by_sha1[
-                action_sha1
-            ].dependencies:
-                if dfs(dependency_sha1):
-                    return True
+        E.g., by an analysis snapshot updated incrementally since a previous
+        build, so that the graph doesn't have to be analyzed from scratch.
+
+        Args:
+            bottom_levels: The bottom levels for the actions.
+        """
+        self._bottom_levels = bottom_levels
 
-            action_path.remove(action_sha1)
+    def detect_cycle(self) -> bool:
+        """Returns True if there is a cycle in the dependency graph, False otherwise.
 
-            return False
+        Runs the topological sort of `bottom_levels` (with NumPy if
+        `use_numpy` is set), which can't order actions that are part of a
+        cycle. Unlike a recursive depth-first search, it isn't bounded by the
+        recursion limit on long dependency chains, and its results are reused
+        when the bottom levels are needed afterwards.
 
-        for action_sha1 in self.actions_info.actions_by_sha1:
-            if action_sha1 not in visited:
-                if dfs(action_sha1):
-                    return True
+        Raises:
+            UnknownDependencyError: If an action depends on an unknown action,
+                which is neither a cycle nor a valid graph.
+        """
+        try:
+            self.bottom_levels()
+        except DependencyCycleError:
+            return True
 
         return False
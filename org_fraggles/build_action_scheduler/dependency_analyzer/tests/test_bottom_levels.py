@@ -0,0 +1,153 @@
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    DependencyAnalyzer,
+    DependencyCycleError,
+    sort_actions,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def test_bottom_levels_no_dependencies():
+    actions = [
+        Action(sha1="a", duration=10, dependencies=[]),
+        Action(sha1="b", duration=20, dependencies=[]),
+        Action(sha1="c", duration=30, dependencies=[]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+    bottom_levels = dependency_analyzer.bottom_levels()
+
+    assert bottom_levels.bottom_level("a") == 10
+    assert bottom_levels.bottom_level("b") == 20
+    assert bottom_levels.bottom_level("c") == 30
+    assert bottom_levels.critical_path() == (30, ["c"])
+
+
+def test_bottom_levels_with_dependencies():
+    actions = [
+        Action(sha1="a", duration=10, dependencies=[]),
+        Action(sha1="b", duration=20, dependencies=["a"]),
+        Action(sha1="c", duration=30, dependencies=["b"]),
+        Action(sha1="d", duration=40, dependencies=["b"]),
+        Action(sha1="e", duration=50, dependencies=["c", "d"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+    bottom_levels = dependency_analyzer.bottom_levels()
+
+    assert bottom_levels.bottom_level("e") == 50
+    assert bottom_levels.bottom_level("d") == 90
+    assert bottom_levels.bottom_level("c") == 80
+    assert bottom_levels.bottom_level("b") == 110
+    assert bottom_levels.bottom_level("a") == 120
+    assert bottom_levels.critical_path() == (120, ["a", "b", "d", "e"])
+
+    order = bottom_levels.topological_order()
+    for action in actions:
+        for dependency in action.dependencies:
+            assert order.index(dependency) < order.index(action.sha1)
+
+
+def test_bottom_levels_match_critical_paths():
+    actions = [
+        Action(sha1="a", duration=3, dependencies=["b", "e"]),
+        Action(sha1="b", duration=2, dependencies=["c"]),
+        Action(sha1="c", duration=1, dependencies=[]),
+        Action(sha1="e", duration=5, dependencies=[]),
+        Action(sha1="f", duration=5, dependencies=[]),
+        Action(sha1="g", duration=3, dependencies=["f"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+
+    assert (
+        dependency_analyzer.bottom_levels().critical_path()
+        == dependency_analyzer.critical_paths().peek()
+    )
+
+
+def test_bottom_levels_diamond_lattice():
+    # Every layer doubles the number of leaf-to-root paths, so enumerating
+    # them is intractable while the bottom levels are not.
+    layers = 200
+    actions = [Action(sha1="0", duration=1, dependencies=[])]
+    previous = "0"
+    for layer in range(1, layers + 1):
+        left, right, join = f"{layer}l", f"{layer}r", f"{layer}j"
+        actions.append(Action(sha1=left, duration=1, dependencies=[previous]))
+        actions.append(Action(sha1=right, duration=2, dependencies=[previous]))
+        actions.append(Action(sha1=join, duration=1, dependencies=[left, right]))
+        previous = join
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+    bottom_levels = dependency_analyzer.bottom_levels()
+
+    duration, path = bottom_levels.critical_path()
+
+    assert duration == 1 + layers * 3
+    assert len(path) == 1 + layers * 2
+    assert path[1] == "1r"
+
+
+def test_bottom_levels_with_cycle():
+    actions = [
+        Action(sha1="a", duration=10, dependencies=["c"]),
+        Action(sha1="b", duration=20, dependencies=["a"]),
+        Action(sha1="c", duration=30, dependencies=["b"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+
+    with pytest.raises(DependencyCycleError):
+        dependency_analyzer.bottom_levels()
+
+
+def test_bottom_levels_add_actions():
+    actions = [
+        Action(sha1="a", duration=10, dependencies=[]),
+        Action(sha1="b", duration=20, dependencies=["a"]),
+        Action(sha1="c", duration=5, dependencies=[]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    bottom_levels = DependencyAnalyzer(actions_info=actions_info).bottom_levels()
+
+    new_actions = sort_actions(
+        [
+            Action(sha1="e", duration=50, dependencies=["d"]),
+            Action(sha1="d", duration=1, dependencies=["a", "c"]),
+        ]
+    )
+    assert [action.sha1 for action in new_actions] == ["d", "e"]
+
+    increased = bottom_levels.add_actions(actions_info.add_actions(new_actions))
+
+    expected = DependencyAnalyzer(
+        actions_info=ActionsInfo(actions=actions + new_actions)
+    ).bottom_levels()
+
+    for action in actions + new_actions:
+        assert bottom_levels.bottom_level(action.sha1) == expected.bottom_level(
+            action.sha1
+        )
+
+    assert increased == [0, 2]
+    assert bottom_levels.topological_order() == expected.topological_order()
+    assert bottom_levels.critical_path() == (61, ["a", "d", "e"])
+
+
+def test_sort_actions_with_cycle():
+    with pytest.raises(DependencyCycleError):
+        sort_actions(
+            [
+                Action(sha1="a", duration=10, dependencies=["b"]),
+                Action(sha1="b", duration=20, dependencies=["a"]),
+            ]
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -3,7 +3,10 @@ import sys
 import pytest
 
 from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
-from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    DependencyAnalyzer,
+    UnknownDependencyError,
+)
 from org_fraggles.build_action_scheduler.types import Action
 
 
@@ -72,5 +75,23 @@ def test_larger_graph_without_cycle():
     assert not dependency_analyzer.detect_cycle()
 
 
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_unknown_dependency_isnt_a_cycle(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+
+    actions = [
+        Action(sha1="a", duration=10, dependencies=[]),
+        Action(sha1="b", duration=20, dependencies=["a", "zz"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(
+        actions_info=actions_info, use_numpy=use_numpy
+    )
+
+    with pytest.raises(UnknownDependencyError, match="b depends on unknown action zz"):
+        dependency_analyzer.detect_cycle()
+
+
 if __name__ == "__main__":
     sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,99 @@
+import random
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    DependencyAnalyzer,
+    DependencyCycleError,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+pytest.importorskip("numpy")
+
+
+def _random_dag(actions_count: int, seed: int) -> ActionsInfo:
+    rng = random.Random(seed)
+    actions = []
+
+    for i in range(actions_count):
+        dependencies = rng.sample(range(i), min(i, rng.randint(0, 4)))
+        actions.append(
+            Action(
+                sha1=f"{i:05}",
+                duration=rng.randint(1, 100),
+                dependencies=[f"{d:05}" for d in dependencies],
+            )
+        )
+
+    # Shuffle so that indexes aren't already in topological order.
+    rng.shuffle(actions)
+
+    return ActionsInfo(actions=actions)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_numpy_analysis_matches_python(seed):
+    actions_info = _random_dag(500, seed)
+
+    python = DependencyAnalyzer(actions_info=actions_info).bottom_levels()
+    numpy = DependencyAnalyzer(
+        actions_info=actions_info, use_numpy=True
+    ).bottom_levels()
+
+    graph = actions_info.compact_graph
+    for i in range(len(graph)):
+        assert numpy.bottom_level_at(i) == python.bottom_level_at(i)
+
+    assert numpy.topological_levels() == python.topological_levels()
+    assert numpy.critical_path() == python.critical_path()
+
+    position = {sha1: i for i, sha1 in enumerate(numpy.topological_order())}
+    for action in actions_info.actions:
+        for dependency in action.dependencies:
+            assert position[dependency] < position[action.sha1]
+
+
+def test_numpy_analysis_with_cycle():
+    actions = [
+        Action(sha1="a", duration=10, dependencies=[]),
+        Action(sha1="b", duration=20, dependencies=["a", "d"]),
+        Action(sha1="c", duration=30, dependencies=["b"]),
+        Action(sha1="d", duration=40, dependencies=["c"]),
+    ]
+    dependency_analyzer = DependencyAnalyzer(
+        actions_info=ActionsInfo(actions=actions), use_numpy=True
+    )
+
+    assert dependency_analyzer.detect_cycle()
+
+    with pytest.raises(DependencyCycleError):
+        dependency_analyzer.bottom_levels()
+
+
+def test_numpy_analysis_no_actions():
+    bottom_levels = DependencyAnalyzer(
+        actions_info=ActionsInfo(actions=[]), use_numpy=True
+    ).bottom_levels()
+
+    assert bottom_levels.topological_order() == []
+    assert bottom_levels.critical_path() == (0, [])
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_detect_cycle_long_chain(use_numpy):
+    actions = [Action(sha1="0", duration=1, dependencies=[])] + [
+        Action(sha1=str(i), duration=1, dependencies=[str(i - 1)])
+        for i in range(1, 5000)
+    ]
+    dependency_analyzer = DependencyAnalyzer(
+        actions_info=ActionsInfo(actions=actions), use_numpy=use_numpy
+    )
+
+    assert not dependency_analyzer.detect_cycle()
+    assert dependency_analyzer.bottom_levels().bottom_level("0") == 5000
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,673 @@
+import dataclasses
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Deque, Dict, List, Set, Tuple
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from org_fraggles.build_action_scheduler.dependency_analyzer import CriticalPath
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.scheduler import ActionScheduler
+from org_fraggles.build_action_scheduler.types import Action, ActionResult, ActionSha1
+
+log = logging.getLogger(__name__)
+
+# Messages are JSON objects, one per line, with a "type" field:
+# - "register" (worker to coordinator, first message): "name" and "capacity".
+# - "heartbeat" (worker to coordinator): no other fields.
+# - "execute" (coordinator to worker): "action", without its dependencies.
+# - "result" (worker to coordinator): "sha1", and either "exit_code" and
+#   "wall_time_s", or "error" if the action executor raised.
+# - "shutdown" (coordinator to worker): no other fields.
+
+
+class DistributedError(Exception):
+    """Raised when coordinating workers fails."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of DistributedError."""
+        super().__init__(message)
+
+
+def send_message(connection: socket.socket, message: Dict[str, Any]) -> None:
+    """Sends a message as a line of JSON.
+
+    Args:
+        connection: The connection to send the message on.
+        message: The message.
+    """
+    connection.sendall(json.dumps(message).encode() + b"\n")
+
+
+def action_to_message(action: Action) -> Dict[str, Any]:
+    """Returns the "execute" message for an action, without its dependencies."""
+    return {
+        "type": "execute",
+        "action": dataclasses.asdict(dataclasses.replace(action, dependencies=[])),
+    }
+
+
+def action_from_message(message: Dict[str, Any]) -> Action:
+    """Returns the action of an "execute" message."""
+    action = message["action"]
+
+    return Action(
+        **{**action, "exclusive_resources": tuple(action["exclusive_resources"])}
+    )
+
+
+@dataclass
+class WorkerState:
+    """What the coordinator knows about a connected worker."""
+
+    # The name the worker registered with, made unique by the coordinator.
+    name: str
+
+    # The maximum number of actions the worker executes in parallel.
+    capacity: int
+
+    # The connection to the worker.
+    connection: socket.socket
+
+    # Serializes the messages sent to the worker.
+    send_lock: Lock = field(default_factory=Lock)
+
+    # The actions assigned to the worker that haven't finished yet.
+    actions: Set[ActionSha1] = field(default_factory=set)
+
+    # When the last message from the worker was received, from
+    # `time.monotonic`.
+    last_seen_s: float = field(default_factory=time.monotonic)
+
+
+class ActionCoordinator(BaseModel):
+    """Hands actions to remote workers over TCP and collects their results.
+
+    Workers connect, register with a capacity, and are sent actions as long
+    as they have fewer actions in flight than their capacity, least loaded
+    worker first. Actions wait in a first in, first out queue until a worker
+    has room.
+
+    Workers send heartbeats. A worker whose connection is closed or that
+    stays silent for longer than the heartbeat timeout is considered dead:
+    it's disconnected and the actions it was executing are handed to other
+    workers, ahead of the queued ones.
+    """
+
+    # The address to listen on. Port 0 picks a free port.
+    host: str = "127.0.0.1"
+    port: int = 0
+
+    # How long a worker can stay silent before it's considered dead.
+    heartbeat_timeout_s: float = Field(default=10, gt=0)
+
+    # The number of times an action is handed to another worker after the
+    # worker executing it died. Actions are assumed to be safe to run again.
+    max_reassignments: int = Field(default=2, ge=0)
+
+    # Called with the result of every action execution.
+    on_result: Callable[[ActionSha1, ActionResult], None]
+
+    # Called with the SHA-1 of every action that couldn't be executed, and
+    # with a description of the error.
+    on_failure: Callable[[ActionSha1, str], None]
+
+    _server: socket.socket | None = PrivateAttr(default=None)
+
+    # The connected workers, by name.
+    _workers: Dict[str, WorkerState] = PrivateAttr(default_factory=dict)
+
+    # The actions waiting for a worker with room.
+    _pending: Deque[Action] = PrivateAttr(default_factory=deque)
+
+    # The actions assigned to workers, by SHA-1.
+    _assigned: Dict[ActionSha1, Action] = PrivateAttr(default_factory=dict)
+
+    # The number of times each action was handed to another worker.
+    _reassignments_count: Dict[ActionSha1, int] = PrivateAttr(default_factory=dict)
+
+    # Per worker name, for the report: its capacity, the number of actions
+    # it executed, the largest number of actions it had in flight at once,
+    # and whether or not it died.
+    _worker_stats: Dict[str, Dict[str, Any]] = PrivateAttr(default_factory=dict)
+
+    # Set whenever a worker registers.
+    _worker_registered: Event = PrivateAttr(default_factory=Event)
+
+    _stopped: Event = PrivateAttr(default_factory=Event)
+
+    _threads: List[Thread] = PrivateAttr(default_factory=list)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def start(self) -> Tuple[str, int]:
+        """Starts listening for workers, unless already started.
+
+        Returns:
+            The address workers connect to.
+        """
+        with self._lock:
+            if self._server is None:
+                self._server = socket.create_server((self.host, self.port))
+
+                # Closing a socket doesn't wake up a thread blocked accepting
+                # connections on it, so accepting times out periodically.
+                self._server.settimeout(0.5)
+
+                for target in (self._accept_workers, self._monitor_heartbeats):
+                    thread = Thread(target=target, daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+            return self._server.getsockname()[:2]
+
+    def wait_for_workers(self, count: int, timeout_s: float | None = None) -> None:
+        """Blocks until a number of workers are connected.
+
+        Args:
+            count: The number of workers.
+            timeout_s: How long to wait for, or None to wait forever.
+
+        Raises:
+            DistributedError: If fewer workers are connected after the timeout.
+        """
+        deadline_s = None if timeout_s is None else time.monotonic() + timeout_s
+
+        while True:
+            with self._lock:
+                if len(self._workers) >= count:
+                    return
+
+                self._worker_registered.clear()
+
+            remaining_s = None
+            if deadline_s is not None:
+                remaining_s = deadline_s - time.monotonic()
+
+                if remaining_s <= 0:
+                    raise DistributedError(
+                        f"Only {len(self._workers)} of {count} workers connected"
+                    )
+
+            self._worker_registered.wait(remaining_s)
+
+    def submit(self, action: Action) -> None:
+        """Hands an action to a worker, as soon as one has room.
+
+        Args:
+            action: The action to execute.
+        """
+        with self._lock:
+            self._pending.append(action)
+
+        self._dispatch()
+
+    def actions_in_flight(self) -> Dict[str, List[ActionSha1]]:
+        """Returns the actions assigned to each connected worker, by name."""
+        with self._lock:
+            return {
+                name: sorted(worker.actions) for name, worker in self._workers.items()
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns what every worker that ever connected did, by name."""
+        with self._lock:
+            return {
+                "workers": {
+                    name: dict(stats) for name, stats in self._worker_stats.items()
+                },
+                "reassignments_count": sum(self._reassignments_count.values()),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Tells workers to exit, and stops listening.
+
+        Args:
+            wait: Whether or not to wait for the coordinator threads to exit.
+        """
+        self._stopped.set()
+
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+
+            if self._server is not None:
+                self._server.close()
+
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    send_message(worker.connection, {"type": "shutdown"})
+            except OSError:
+                pass
+
+            _close(worker.connection)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _accept_workers(self) -> None:
+        """Serves every worker connection on its own thread."""
+        while not self._stopped.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            Thread(target=self._serve_worker, args=(connection,), daemon=True).start()
+
+    def _serve_worker(self, connection: socket.socket) -> None:
+        """Registers a worker and handles its messages until it's gone.
+
+        Args:
+            connection: The connection to the worker.
+        """
+        worker = None
+
+        try:
+            for line in connection.makefile("rb"):
+                message = json.loads(line)
+
+                if worker is None:
+                    if message["type"] != "register":
+                        raise DistributedError("Workers must register first")
+
+                    worker = self._register(connection, message)
+                    continue
+
+                with self._lock:
+                    worker.last_seen_s = time.monotonic()
+
+                if message["type"] == "result":
+                    self._on_result(worker, message)
+        except (OSError, ValueError, KeyError, DistributedError) as e:
+            log.warning("Dropping worker connection: %r", e)
+
+        if worker is None:
+            _close(connection)
+        else:
+            self._on_worker_lost(worker, "its connection was closed")
+
+    def _register(
+        self, connection: socket.socket, message: Dict[str, Any]
+    ) -> WorkerState:
+        """Adds a worker that just connected.
+
+        Args:
+            connection: The connection to the worker.
+            message: The "register" message of the worker.
+        """
+        capacity = int(message["capacity"])
+        if capacity < 1:
+            raise DistributedError(f"Invalid worker capacity: {capacity}")
+
+        with self._lock:
+            name = message["name"]
+            suffix = 1
+            while name in self._worker_stats:
+                suffix += 1
+                name = f"{message['name']}-{suffix}"
+
+            worker = WorkerState(name=name, capacity=capacity, connection=connection)
+            self._workers[name] = worker
+            self._worker_stats[name] = {
+                "capacity": capacity,
+                "actions_executed": 0,
+                "peak_actions_in_flight": 0,
+                "lost": False,
+            }
+            self._worker_registered.set()
+
+        log.info("Worker %s connected, with a capacity of %d", name, capacity)
+
+        self._dispatch()
+
+        return worker
+
+    def _on_result(self, worker: WorkerState, message: Dict[str, Any]) -> None:
+        """Reports the result of an action execution, and refills the worker.
+
+        Args:
+            worker: The worker that executed the action.
+            message: The "result" message of the worker.
+        """
+        action_sha1 = message["sha1"]
+
+        with self._lock:
+            if action_sha1 not in worker.actions:
+                return
+
+            worker.actions.remove(action_sha1)
+            del self._assigned[action_sha1]
+            self._worker_stats[worker.name]["actions_executed"] += 1
+
+        if "error" in message:
+            self.on_failure(action_sha1, message["error"])
+        else:
+            self.on_result(
+                action_sha1,
+                ActionResult(
+                    exit_code=message["exit_code"],
+                    wall_time_s=message["wall_time_s"],
+                ),
+            )
+
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hands pending actions to the least loaded workers with room."""
+        assignments = []
+
+        with self._lock:
+            while self._pending:
+                worker = max(
+                    self._workers.values(),
+                    key=lambda worker: worker.capacity - len(worker.actions),
+                    default=None,
+                )
+                if worker is None or len(worker.actions) >= worker.capacity:
+                    break
+
+                action = self._pending.popleft()
+                worker.actions.add(action.sha1)
+                self._assigned[action.sha1] = action
+
+                stats = self._worker_stats[worker.name]
+                stats["peak_actions_in_flight"] = max(
+                    stats["peak_actions_in_flight"], len(worker.actions)
+                )
+
+                assignments.append((worker, action))
+
+        for worker, action in assignments:
+            try:
+                with worker.send_lock:
+                    send_message(worker.connection, action_to_message(action))
+            except OSError:
+                self._on_worker_lost(worker, "sending it an action failed")
+
+    def _monitor_heartbeats(self) -> None:
+        """Drops the workers that stayed silent for too long."""
+        while not self._stopped.wait(self.heartbeat_timeout_s / 4):
+            now_s = time.monotonic()
+
+            with self._lock:
+                silent_workers = [
+                    worker
+                    for worker in self._workers.values()
+                    if now_s - worker.last_seen_s > self.heartbeat_timeout_s
+                ]
+
+            for worker in silent_workers:
+                self._on_worker_lost(worker, "it stopped sending heartbeats")
+
+    def _on_worker_lost(self, worker: WorkerState, reason: str) -> None:
+        """Disconnects a dead worker and hands its actions to other workers.
+
+        Actions lost more than `max_reassignments` times are failed instead.
+
+        Args:
+            worker: The dead worker.
+            reason: Why the worker is considered dead.
+        """
+        failed_actions = []
+
+        with self._lock:
+            if self._workers.get(worker.name) is not worker:
+                return
+
+            del self._workers[worker.name]
+            self._worker_stats[worker.name]["lost"] = True
+
+            for action_sha1 in sorted(worker.actions, reverse=True):
+                action = self._assigned.pop(action_sha1)
+                reassignments_count = self._reassignments_count.get(action_sha1, 0)
+
+                if reassignments_count >= self.max_reassignments:
+                    failed_actions.append(action_sha1)
+                else:
+                    self._reassignments_count[action_sha1] = reassignments_count + 1
+                    self._pending.appendleft(action)
+
+            lost_actions = sorted(worker.actions)
+            worker.actions.clear()
+
+        _close(worker.connection)
+
+        log.warning(
+            "Lost worker %s, because %s, while it was executing %s",
+            worker.name,
+            reason,
+            lost_actions,
+        )
+
+        for action_sha1 in failed_actions:
+            self.on_failure(
+                action_sha1, f"Lost {self.max_reassignments + 1} workers executing it"
+            )
+
+        self._dispatch()
+
+
+def _close(connection: socket.socket) -> None:
+    """Closes a connection, waking up the threads blocked reading from it."""
+    try:
+        connection.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+    connection.close()
+
+
+class ActionWorker(BaseModel):
+    """Executes the actions a coordinator hands it, and reports their results."""
+
+    # The address of the coordinator.
+    coordinator_host: str
+    coordinator_port: int
+
+    # The maximum number of actions to execute in parallel.
+    capacity: int = Field(default=1, ge=1)
+
+    # Executes actions.
+    action_executor: ActionExecutor
+
+    # The interval between two heartbeats. Must be well below the heartbeat
+    # timeout of the coordinator.
+    heartbeat_interval_s: float = Field(default=1, gt=0)
+
+    # How long to keep trying to connect to the coordinator, which may not
+    # be listening yet.
+    connect_timeout_s: float = Field(default=30, ge=0)
+
+    # The name of the worker in the coordinator reports.
+    name: str = Field(default_factory=lambda: f"{socket.gethostname()}:{os.getpid()}")
+
+    _connection: socket.socket = PrivateAttr(default=None)
+
+    # Serializes the messages sent to the coordinator.
+    _send_lock: Lock = PrivateAttr(default_factory=Lock)
+
+    _stopped: Event = PrivateAttr(default_factory=Event)
+
+    def run(self) -> None:
+        """Executes actions until the coordinator shuts down or goes away.
+
+        Raises:
+            DistributedError: If the coordinator can't be reached.
+        """
+        self._connection = self._connect()
+        self._send({"type": "register", "name": self.name, "capacity": self.capacity})
+
+        heartbeats = Thread(target=self._send_heartbeats, daemon=True)
+        heartbeats.start()
+
+        executor = ThreadPoolExecutor(max_workers=self.capacity)
+
+        try:
+            for line in self._connection.makefile("rb"):
+                message = json.loads(line)
+
+                if message["type"] == "shutdown":
+                    break
+
+                if message["type"] == "execute":
+                    executor.submit(self._execute, action_from_message(message))
+        except OSError:
+            pass
+        finally:
+            self._stopped.set()
+            _close(self._connection)
+            executor.shutdown(wait=False, cancel_futures=True)
+            heartbeats.join()
+
+    def _connect(self) -> socket.socket:
+        """Connects to the coordinator, retrying until the connect timeout."""
+        deadline_s = time.monotonic() + self.connect_timeout_s
+
+        while True:
+            try:
+                connection = socket.create_connection(
+                    (self.coordinator_host, self.coordinator_port)
+                )
+            except OSError as e:
+                if time.monotonic() >= deadline_s:
+                    raise DistributedError(
+                        f"Couldn't connect to the coordinator: {e}"
+                    ) from e
+
+                time.sleep(0.1)
+                continue
+
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            return connection
+
+    def _execute(self, action: Action) -> None:
+        """Executes an action and reports its result.
+
+        Args:
+            action: The action to execute.
+        """
+        try:
+            action_result = self.action_executor.execute(action)
+        except Exception as e:
+            self._send({"type": "result", "sha1": action.sha1, "error": repr(e)})
+            return
+
+        self._send(
+            {
+                "type": "result",
+                "sha1": action.sha1,
+                "exit_code": action_result.exit_code,
+                "wall_time_s": action_result.wall_time_s,
+            }
+        )
+
+    def _send_heartbeats(self) -> None:
+        """Sends heartbeats until the worker stops."""
+        while not self._stopped.wait(self.heartbeat_interval_s):
+            self._send({"type": "heartbeat"})
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        """Sends a message to the coordinator, unless it went away.
+
+        Args:
+            message: The message.
+        """
+        try:
+            with self._send_lock:
+                send_message(self._connection, message)
+        except OSError:
+            pass
+
+
+class DistributedActionScheduler(ActionScheduler):
+    """Schedules actions for execution on remote workers.
+
+    Scheduling state stays in this process, like with the other schedulers:
+    ready actions are handed to a coordinator, which sends them to the
+    workers connected to it and turns their results into completion events.
+    The `parallelism` caps the number of actions in flight across all
+    workers, on top of their own capacities.
+    """
+
+    # The address the coordinator listens on for workers.
+    coordinator_host: str = "127.0.0.1"
+    coordinator_port: int = 0
+
+    # How long a worker can stay silent before its actions are handed to
+    # other workers.
+    heartbeat_timeout_s: float = 10
+
+    # The number of times an action is handed to another worker after the
+    # worker executing it died.
+    max_reassignments: int = 2
+
+    _coordinator: ActionCoordinator = PrivateAttr(default=None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        self._coordinator = ActionCoordinator(
+            host=self.coordinator_host,
+            port=self.coordinator_port,
+            heartbeat_timeout_s=self.heartbeat_timeout_s,
+            max_reassignments=self.max_reassignments,
+            on_result=self._on_action_execution_result,
+            on_failure=self._on_action_execution_failed,
+        )
+
+    def coordinator_address(self) -> Tuple[str, int]:
+        """Starts the coordinator, unless already started, and returns its address."""
+        return self._coordinator.start()
+
+    def wait_for_workers(self, count: int, timeout_s: float | None = None) -> None:
+        """Starts the coordinator, and blocks until a number of workers are connected.
+
+        Args:
+            count: The number of workers.
+            timeout_s: How long to wait for, or None to wait forever.
+
+        Raises:
+            DistributedError: If fewer workers are connected after the timeout.
+        """
+        self._coordinator.start()
+        self._coordinator.wait_for_workers(count, timeout_s)
+
+    def actions_in_flight(self) -> Dict[str, List[ActionSha1]]:
+        """Returns the actions assigned to each connected worker, by name."""
+        return self._coordinator.actions_in_flight()
+
+    def _create_executor(self) -> ActionCoordinator:
+        """Starts the coordinator, which actions are submitted to."""
+        address = self._coordinator.start()
+        log.info("Coordinator listening on %s:%d", *address)
+
+        return self._coordinator
+
+    def _submit_action(self, action_sha1: ActionSha1) -> None:
+        """Hands an action to the coordinator.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+        """
+        self._coordinator.submit(self.actions_info.actions_by_sha1[action_sha1])
+
+    def _build_report(self, overall_critical_path: CriticalPath) -> Dict[str, Any]:
+        """Adds what every worker did to the build report."""
+        report = super()._build_report(overall_critical_path)
+        report["distributed"] = self._coordinator.stats()
+
+        return report
@@ -0,0 +1,79 @@
+import logging
+import time
+from typing import Annotated, Optional
+
+import typer
+
+from org_fraggles.build_action_scheduler.distributed import ActionWorker
+from org_fraggles.build_action_scheduler.executors import (
+    ExecutorKind,
+    create_action_executor,
+)
+
+logging.Formatter.converter = time.gmtime
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%SZ",
+)
+
+
+def main(
+    coordinator_port: Annotated[
+        int,
+        typer.Option(..., help="The port the coordinator listens on."),
+    ],
+    coordinator_host: Annotated[
+        str,
+        typer.Option(..., help="The host the coordinator listens on."),
+    ] = "127.0.0.1",
+    capacity: Annotated[
+        int,
+        typer.Option(
+            ..., min=1, help="The maximum number of actions to execute in parallel."
+        ),
+    ] = 1,
+    executor: Annotated[
+        ExecutorKind,
+        typer.Option(
+            ...,
+            help=(
+                "What executing an action means. The subprocess executor runs the"
+                " 'command' field of each action in a shell."
+            ),
+        ),
+    ] = ExecutorKind.SLEEP,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Whether or not to actually execute actions. True will skip the sleep calls.",
+        ),
+    ] = False,
+    heartbeat_interval_s: Annotated[
+        float,
+        typer.Option(..., help="The interval in seconds between two heartbeats."),
+    ] = 1,
+    name: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help="The name of the worker in reports. Defaults to the host name and PID.",
+        ),
+    ] = None,
+) -> None:
+    """Executes the actions a coordinator hands out, until it shuts down."""
+    worker = ActionWorker(
+        coordinator_host=coordinator_host,
+        coordinator_port=coordinator_port,
+        capacity=capacity,
+        action_executor=create_action_executor(executor, dry_run),
+        heartbeat_interval_s=heartbeat_interval_s,
+        **({} if name is None else {"name": name}),
+    )
+    worker.run()
+
+
+if __name__ == "__main__":
+    typer.run(main)
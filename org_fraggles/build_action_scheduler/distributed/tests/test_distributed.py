@@ -0,0 +1,196 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from org_fraggles.build_action_scheduler import distributed
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.distributed import (
+    ActionCoordinator,
+    DistributedActionScheduler,
+    DistributedError,
+)
+from org_fraggles.build_action_scheduler.scheduler import SchedulingAlgorithm
+from org_fraggles.build_action_scheduler.types import Action
+
+# The directory containing the `org_fraggles` package, but not its
+# subpackages, which would shadow standard library modules (e.g., `types`).
+PACKAGE_ROOT = str(Path(distributed.__file__).parents[3])
+
+
+@pytest.fixture
+def start_worker():
+    """Starts worker processes on localhost, and kills them at the end."""
+    processes = []
+
+    def start(address, name, capacity=1):
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "org_fraggles.build_action_scheduler.distributed",
+                f"--coordinator-host={address[0]}",
+                f"--coordinator-port={address[1]}",
+                f"--capacity={capacity}",
+                "--executor=subprocess",
+                "--heartbeat-interval-s=0.1",
+                f"--name={name}",
+            ],
+            env={**os.environ, "PYTHONPATH": PACKAGE_ROOT},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        processes.append(process)
+
+        return process
+
+    yield start
+
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def _scheduler(actions, algorithm=SchedulingAlgorithm.READY_QUEUE, **kwargs):
+    actions_info = ActionsInfo(actions=actions)
+
+    return DistributedActionScheduler(
+        parallelism=8,
+        action_status_polling_interval_s=1,
+        dry_run=False,
+        algorithm=algorithm,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+        heartbeat_timeout_s=1,
+        **kwargs,
+    )
+
+
+def _wait_until(predicate, timeout_s=30):
+    deadline_s = time.monotonic() + timeout_s
+    while not predicate():
+        assert time.monotonic() < deadline_s
+        time.sleep(0.05)
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_on_workers(start_worker, algorithm):
+    actions = [
+        Action(sha1=f"compile-{i}", duration=1, dependencies=[], command="sleep 0.05")
+        for i in range(12)
+    ] + [
+        Action(
+            sha1=f"link-{i}",
+            duration=1,
+            dependencies=[f"compile-{j}" for j in range(4 * i, 4 * i + 4)],
+            command="sleep 0.05",
+        )
+        for i in range(3)
+    ]
+    scheduler = _scheduler(actions, algorithm=algorithm)
+    address = scheduler.coordinator_address()
+    for capacity in (1, 2, 3):
+        start_worker(address, f"worker-{capacity}", capacity)
+    scheduler.wait_for_workers(3, timeout_s=30)
+
+    report = scheduler.schedule()
+
+    assert "error" not in report
+    history = report["action_execution_history"]
+    assert sorted(history) == sorted(action.sha1 for action in actions)
+    for action in actions:
+        for dependency in action.dependencies:
+            assert history.index(dependency) < history.index(action.sha1)
+
+    workers = report["distributed"]["workers"]
+    assert sum(worker["actions_executed"] for worker in workers.values()) == 15
+    for capacity in (1, 2, 3):
+        worker = workers[f"worker-{capacity}"]
+        assert 1 <= worker["peak_actions_in_flight"] <= capacity
+        assert not worker["lost"]
+    assert report["distributed"]["reassignments_count"] == 0
+
+
+@pytest.mark.parametrize(
+    "signal_number",
+    [
+        # The worker connection is closed.
+        signal.SIGKILL,
+        # The worker is alive but stops sending heartbeats.
+        signal.SIGSTOP,
+    ],
+    ids=["killed", "stopped"],
+)
+def test_reassign_actions_of_dead_worker(start_worker, signal_number):
+    actions = [
+        Action(sha1="slow", duration=1, dependencies=[], command="sleep 1"),
+        Action(sha1="after", duration=1, dependencies=["slow"], command="true"),
+    ]
+    scheduler = _scheduler(actions)
+    address = scheduler.coordinator_address()
+    doomed = start_worker(address, "doomed")
+    scheduler.wait_for_workers(1, timeout_s=30)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(scheduler.schedule)
+
+        _wait_until(lambda: scheduler.actions_in_flight().get("doomed") == ["slow"])
+        doomed.send_signal(signal_number)
+        start_worker(address, "rescuer")
+
+        report = future.result(timeout=60)
+
+    assert "error" not in report
+    assert report["action_execution_history"] == ["slow", "after"]
+    assert report["distributed"]["workers"]["doomed"]["lost"]
+    assert report["distributed"]["workers"]["rescuer"]["actions_executed"] == 2
+    assert report["distributed"]["reassignments_count"] == 1
+
+
+def test_fail_actions_lost_too_many_times(start_worker):
+    actions = [
+        Action(sha1="slow", duration=1, dependencies=[], command="sleep 1"),
+        Action(sha1="after", duration=1, dependencies=["slow"], command="true"),
+        Action(sha1="other", duration=1, dependencies=[], command="true"),
+    ]
+    scheduler = _scheduler(actions, max_reassignments=0)
+    address = scheduler.coordinator_address()
+    doomed = start_worker(address, "doomed")
+    scheduler.wait_for_workers(1, timeout_s=30)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(scheduler.schedule)
+
+        _wait_until(lambda: scheduler.actions_in_flight().get("doomed") == ["slow"])
+        doomed.kill()
+        start_worker(address, "rescuer")
+
+        report = future.result(timeout=60)
+
+    assert report["error"] == "Action execution failed"
+    assert list(report["action_execution_failures"]) == ["slow"]
+    assert report["actions_skipped"] == ["after"]
+    assert "other" in report["action_execution_history"]
+
+
+def test_wait_for_workers_timeout():
+    coordinator = ActionCoordinator(
+        on_result=lambda *args: None, on_failure=lambda *args: None
+    )
+    coordinator.start()
+
+    try:
+        with pytest.raises(DistributedError, match="0 of 1 workers"):
+            coordinator.wait_for_workers(1, timeout_s=0.1)
+    finally:
+        coordinator.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
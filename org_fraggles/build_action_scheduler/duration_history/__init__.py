@@ -0,0 +1,181 @@
+from enum import Enum
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Iterable
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.types import Action, ActionSha1
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# The most keys looked up with a single query, below SQLite's limit on the
+# number of query parameters.
+_LOOKUP_BATCH_SIZE = 500
+
+
+class DurationHistoryKey(str, Enum):
+    """What identifies an action across runs in the durations history."""
+
+    # The action SHA-1. Only the exact same action shares its history.
+    SHA1 = "sha1"
+
+    # The action command, or the SHA-1 for actions without one. Actions
+    # whose inputs changed but run the same command share their history.
+    COMMAND = "command"
+
+
+def duration_history_key(action: Action, key: DurationHistoryKey) -> str:
+    """Returns the key of an action in the durations history.
+
+    Args:
+        action: The action.
+        key: What identifies actions across runs.
+    """
+    if key == DurationHistoryKey.COMMAND and action.command is not None:
+        return f"command:{action.command}"
+
+    return action.sha1
+
+
+class DurationHistory(BaseModel):
+    """Stores smoothed estimates of measured action durations across runs."""
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """Returns the estimated durations, in seconds, of the actions with a history.
+
+        Args:
+            keys: The keys of the actions.
+        """
+        raise NotImplementedError
+
+    def record(self, key: str, wall_time_s: float) -> None:
+        """Folds a measured duration into an action's estimate.
+
+        Args:
+            key: The key of the action.
+            wall_time_s: The measured wall time of the execution, in seconds.
+        """
+        raise NotImplementedError
+
+
+class SqliteDurationHistory(DurationHistory):
+    """An on-disk durations history backed by a SQLite database.
+
+    Estimates are exponentially weighted moving averages of the measured
+    durations, so that they follow actions getting slower or faster without
+    being thrown off by a single outlier. Safe to use from multiple threads.
+    """
+
+    # The path to the SQLite database file. Created if it doesn't exist.
+    path: str
+
+    # The weight of the latest measurement in the estimate. Higher values
+    # forget older measurements faster, and 0 keeps the first one forever.
+    smoothing: float = Field(default=0.3, ge=0, le=1)
+
+    _connection: "sqlite3.Connection" = PrivateAttr(default=None)
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        # Imported here so that runs without a database don't pay for it.
+        import sqlite3
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS action_durations (
+                key TEXT PRIMARY KEY,
+                estimate_s REAL NOT NULL,
+                samples_count INTEGER NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """Returns the estimates for the keys with a history, in batched queries."""
+        keys = list(keys)
+        estimates = {}
+
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+                batch = keys[start : start + _LOOKUP_BATCH_SIZE]
+                estimates.update(
+                    self._connection.execute(
+                        "SELECT key, estimate_s FROM action_durations"
+                        f" WHERE key IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+
+        return estimates
+
+    def record(self, key: str, wall_time_s: float) -> None:
+        """Moves the estimate towards the measurement, or starts from it."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE action_durations"
+                " SET estimate_s = ? * ? + (1 - ?) * estimate_s,"
+                " samples_count = samples_count + 1"
+                " WHERE key = ?",
+                (self.smoothing, wall_time_s, self.smoothing, key),
+            )
+
+            if cursor.rowcount == 0:
+                self._connection.execute(
+                    "INSERT INTO action_durations VALUES (?, ?, 1)",
+                    (key, wall_time_s),
+                )
+
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+def apply_duration_estimates(
+    actions_info: ActionsInfo,
+    duration_history: DurationHistory,
+    key: DurationHistoryKey = DurationHistoryKey.SHA1,
+) -> Dict[ActionSha1, float]:
+    """Analyzes the dependency graph with the history's estimates of durations.
+
+    Must be called before the dependency graph is analyzed, so that critical
+    paths and priorities are computed from the estimates. Actions without a
+    history are analyzed with their declared duration. Estimates are kept as
+    they are, fractions of a second included, and only replace the durations
+    of the compact graph (see `ActionsInfo.update_durations`): the actions
+    themselves, which executors use, keep their declared duration.
+
+    Args:
+        actions_info: The actions.
+        duration_history: The durations history.
+        key: What identifies actions across runs.
+
+    Returns:
+        The estimated duration of every action with a history, by SHA-1.
+    """
+    keys = {
+        action.sha1: duration_history_key(action, key)
+        for action in actions_info.actions_by_sha1.values()
+    }
+    estimates = duration_history.get_many(set(keys.values()))
+
+    durations = {
+        action_sha1: estimates[action_key]
+        for action_sha1, action_key in keys.items()
+        if action_key in estimates
+    }
+
+    actions_info.update_durations(durations)
+
+    return durations
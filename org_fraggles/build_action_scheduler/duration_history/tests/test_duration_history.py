@@ -0,0 +1,182 @@
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.duration_history import (
+    DurationHistoryKey,
+    SqliteDurationHistory,
+    apply_duration_estimates,
+    duration_history_key,
+)
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+class MeasuredActionExecutor(ActionExecutor):
+    """Reports fixed wall times instead of executing actions."""
+
+    # The wall time reported for each action, by SHA-1.
+    wall_times_s: dict
+
+    def execute(self, action: Action) -> ActionResult:
+        return ActionResult(exit_code=0, wall_time_s=self.wall_times_s[action.sha1])
+
+
+def test_estimates_are_smoothed(tmp_path):
+    path = str(tmp_path / "durations.db")
+
+    history = SqliteDurationHistory(path=path, smoothing=0.5)
+    history.record("a", 10)
+    history.record("a", 20)
+    history.record("b", 3)
+    history.close()
+
+    history = SqliteDurationHistory(path=path, smoothing=0.5)
+    history.record("a", 40)
+
+    assert history.get_many(["a", "b", "c"]) == {
+        "a": pytest.approx(27.5),
+        "b": pytest.approx(3),
+    }
+
+
+def test_get_many_in_batches(tmp_path):
+    history = SqliteDurationHistory(path=str(tmp_path / "durations.db"))
+    for i in range(1200):
+        history.record(f"action-{i}", i)
+
+    estimates = history.get_many(f"action-{i}" for i in range(0, 2400, 2))
+
+    assert len(estimates) == 600
+    assert estimates["action-1198"] == 1198
+
+
+def test_duration_history_key():
+    with_command = Action(sha1="a", duration=1, dependencies=[], command="cc a.c")
+    without_command = Action(sha1="b", duration=1, dependencies=[])
+
+    assert duration_history_key(with_command, DurationHistoryKey.SHA1) == "a"
+    assert (
+        duration_history_key(with_command, DurationHistoryKey.COMMAND)
+        == "command:cc a.c"
+    )
+    assert duration_history_key(without_command, DurationHistoryKey.COMMAND) == "b"
+
+
+def test_apply_duration_estimates(tmp_path):
+    history = SqliteDurationHistory(path=str(tmp_path / "durations.db"))
+    history.record("command:cc a.c", 7.4)
+    history.record("b", 0.2)
+
+    actions_info = ActionsInfo(
+        actions=[
+            Action(sha1="a", duration=1, dependencies=[], command="cc a.c"),
+            Action(sha1="b", duration=5, dependencies=["a"]),
+            Action(sha1="c", duration=3, dependencies=["b"]),
+        ]
+    )
+    # Built before the estimates are applied, and updated with them.
+    graph = actions_info.compact_graph
+
+    assert apply_duration_estimates(
+        actions_info, history, DurationHistoryKey.COMMAND
+    ) == {"a": 7.4, "b": 0.2}
+    # Executors still get the declared durations.
+    assert [action.duration for action in actions_info.actions] == [1, 5, 3]
+    assert list(graph.durations) == [7.4, 0.2, 3]
+
+    bottom_levels = DependencyAnalyzer(actions_info=actions_info).bottom_levels()
+    assert bottom_levels.bottom_level("a") == pytest.approx(10.6)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_sub_second_estimates_order_actions(tmp_path, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+
+    history = SqliteDurationHistory(path=str(tmp_path / "durations.db"))
+    history.record("short", 0.2)
+    history.record("long", 0.4)
+
+    actions_info = ActionsInfo(
+        actions=[
+            Action(sha1="short", duration=1, dependencies=[]),
+            Action(sha1="long", duration=1, dependencies=[]),
+        ]
+    )
+    apply_duration_estimates(actions_info, history)
+
+    result = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(
+            actions_info=actions_info, use_numpy=use_numpy
+        ),
+    ).schedule()
+
+    assert result["action_execution_history"] == ["long", "short"]
+    assert result["critical_path"]["duration"] == pytest.approx(0.4)
+
+
+def test_scheduling_follows_measured_durations(tmp_path):
+    path = str(tmp_path / "durations.db")
+    actions = [
+        # Declared short, but actually the longest chain.
+        Action(sha1="slow", duration=1, dependencies=[]),
+        Action(sha1="slow-dependent", duration=1, dependencies=["slow"]),
+        Action(sha1="fast", duration=10, dependencies=[]),
+    ]
+    wall_times_s = {"slow": 30, "slow-dependent": 30, "fast": 2}
+
+    def schedule():
+        actions_info = ActionsInfo(actions=[Action(**vars(a)) for a in actions])
+        history = SqliteDurationHistory(path=path)
+        apply_duration_estimates(actions_info, history)
+
+        scheduler = ActionScheduler(
+            parallelism=1,
+            action_status_polling_interval_s=1,
+            dry_run=False,
+            algorithm=SchedulingAlgorithm.READY_QUEUE,
+            action_executor=MeasuredActionExecutor(wall_times_s=wall_times_s),
+            duration_history=history,
+            actions_info=actions_info,
+            dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+        )
+        report = scheduler.schedule()
+        history.close()
+
+        return report["action_execution_history"]
+
+    assert schedule()[0] == "fast"
+    assert schedule()[0] == "slow"
+
+
+def test_dry_run_isnt_recorded(tmp_path):
+    history = SqliteDurationHistory(path=str(tmp_path / "durations.db"))
+    actions_info = ActionsInfo(actions=[Action(sha1="a", duration=1, dependencies=[])])
+
+    ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        duration_history=history,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).schedule()
+
+    assert history.get_many(["a"]) == {}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,192 @@
+import logging
+import subprocess
+import time
+from enum import Enum
+
+from pydantic import BaseModel
+
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+log = logging.getLogger(__name__)
+
+
+class ExecutorKind(str, Enum):
+    """What executing an action means."""
+
+    # Sleep for the action duration.
+    SLEEP = "sleep"
+
+    # Run the action command in a shell.
+    SUBPROCESS = "subprocess"
+
+
+class ActionExecutor(BaseModel):
+    """Executes a single action on behalf of a scheduler.
+
+    Executors must be picklable so that they can be shipped to worker
+    processes along with the actions they execute.
+    """
+
+    def execute(self, action: Action) -> ActionResult:
+        """Executes an action, blocking until it's done.
+
+        Args:
+            action: The action to execute.
+
+        Returns:
+            The result of the action execution.
+        """
+        raise NotImplementedError
+
+    async def execute_async(self, action: Action) -> ActionResult:
+        """Executes an action without blocking the running event loop.
+
+        Defaults to running `execute` on a thread.
+
+        Args:
+            action: The action to execute.
+
+        Returns:
+            The result of the action execution.
+        """
+        # asyncio is only imported by the asyncio backend, which has already
+        # imported it by the time coroutines run, so the import is free here.
+        import asyncio
+
+        return await asyncio.to_thread(self.execute, action)
+
+
+class SleepActionExecutor(ActionExecutor):
+    """Executes actions by sleeping for their declared duration."""
+
+    # Don't actually sleep.
+    dry_run: bool = False
+
+    def execute(self, action: Action) -> ActionResult:
+        """Sleeps for the duration of the action, unless in dry-run mode."""
+        start = time.monotonic()
+
+        if not self.dry_run:
+            time.sleep(action.duration)
+
+        return ActionResult(exit_code=0, wall_time_s=time.monotonic() - start)
+
+    async def execute_async(self, action: Action) -> ActionResult:
+        """Sleeps for the duration of the action without blocking the event loop."""
+        import asyncio
+
+        start = time.monotonic()
+
+        if not self.dry_run:
+            await asyncio.sleep(action.duration)
+
+        return ActionResult(exit_code=0, wall_time_s=time.monotonic() - start)
+
+
+class SubprocessActionExecutor(ActionExecutor):
+    """Executes actions by running their `command` in a shell.
+
+    Actions without a command (e.g., ones that only group their dependencies)
+    succeed right away. The output of commands is captured, and logged when
+    they fail, so that it doesn't interleave with the build report.
+    """
+
+    # The working directory for commands. Defaults to the current one.
+    cwd: str | None = None
+
+    # Commands running for longer than this are killed and fail.
+    timeout_s: float | None = None
+
+    def execute(self, action: Action) -> ActionResult:
+        """Runs the command of the action and waits for it to exit."""
+        start = time.monotonic()
+
+        if action.command is None:
+            return ActionResult(exit_code=0, wall_time_s=time.monotonic() - start)
+
+        try:
+            completed_process = subprocess.run(
+                action.command,
+                shell=True,
+                cwd=self.cwd,
+                timeout=self.timeout_s,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+        except subprocess.TimeoutExpired as e:
+            self._log_failure(action, None, e.output)
+            return ActionResult(exit_code=-1, wall_time_s=time.monotonic() - start)
+
+        if completed_process.returncode != 0:
+            self._log_failure(
+                action, completed_process.returncode, completed_process.stdout
+            )
+
+        return ActionResult(
+            exit_code=completed_process.returncode,
+            wall_time_s=time.monotonic() - start,
+        )
+
+    async def execute_async(self, action: Action) -> ActionResult:
+        """Runs the command of the action as an asyncio subprocess."""
+        import asyncio
+
+        start = time.monotonic()
+
+        if action.command is None:
+            return ActionResult(exit_code=0, wall_time_s=time.monotonic() - start)
+
+        process = await asyncio.create_subprocess_shell(
+            action.command,
+            cwd=self.cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+
+        try:
+            output, _ = await asyncio.wait_for(
+                process.communicate(), timeout=self.timeout_s
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            self._log_failure(action, None, None)
+            return ActionResult(exit_code=-1, wall_time_s=time.monotonic() - start)
+
+        if process.returncode != 0:
+            self._log_failure(action, process.returncode, output)
+
+        return ActionResult(
+            exit_code=process.returncode, wall_time_s=time.monotonic() - start
+        )
+
+    def _log_failure(
+        self, action: Action, exit_code: int | None, output: bytes | None
+    ) -> None:
+        """Logs the exit code and output of a failed command.
+
+        Args:
+            action: The action whose command failed.
+            exit_code: The exit code of the command, or None if it timed out.
+            output: The combined stdout and stderr of the command, if any.
+        """
+        log.error(
+            "Action %s %s: %s\n%s",
+            action.sha1,
+            "timed out" if exit_code is None else f"exited with code {exit_code}",
+            action.command,
+            (output or b"").decode(errors="replace"),
+        )
+
+
+def create_action_executor(kind: ExecutorKind, dry_run: bool) -> ActionExecutor:
+    """Creates an action executor.
+
+    Args:
+        kind: What executing an action means.
+        dry_run: Whether or not to skip the sleep calls of the sleep executor.
+    """
+    if kind == ExecutorKind.SUBPROCESS:
+        return SubprocessActionExecutor()
+
+    return SleepActionExecutor(dry_run=dry_run)
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.executors import (
+    SleepActionExecutor,
+    SubprocessActionExecutor,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def test_sleep_executor_dry_run():
+    action = Action(sha1="a", duration=60, dependencies=[])
+    result = SleepActionExecutor(dry_run=True).execute(action)
+    assert result.exit_code == 0
+    assert result.wall_time_s < 1
+
+
+def test_subprocess_executor_exit_codes():
+    executor = SubprocessActionExecutor()
+
+    ok = Action(sha1="ok", duration=1, dependencies=[], command="true")
+    failed = Action(sha1="failed", duration=1, dependencies=[], command="exit 3")
+    no_command = Action(sha1="none", duration=1, dependencies=[])
+
+    assert executor.execute(ok).exit_code == 0
+    assert executor.execute(failed).exit_code == 3
+    assert executor.execute(no_command).exit_code == 0
+
+
+def test_subprocess_executor_measures_wall_time():
+    action = Action(sha1="a", duration=1, dependencies=[], command="sleep 0.2")
+    result = SubprocessActionExecutor().execute(action)
+    assert result.exit_code == 0
+    assert result.wall_time_s >= 0.2
+
+
+def test_subprocess_executor_cwd(tmp_path):
+    action = Action(sha1="a", duration=1, dependencies=[], command="touch out")
+    SubprocessActionExecutor(cwd=str(tmp_path)).execute(action)
+    assert (tmp_path / "out").exists()
+
+
+def test_subprocess_executor_timeout():
+    action = Action(sha1="a", duration=1, dependencies=[], command="sleep 10")
+    result = SubprocessActionExecutor(timeout_s=0.1).execute(action)
+    assert result.exit_code != 0
+
+
+def test_subprocess_executor_async():
+    executor = SubprocessActionExecutor()
+    ok = Action(sha1="ok", duration=1, dependencies=[], command="true")
+    failed = Action(sha1="failed", duration=1, dependencies=[], command="exit 3")
+
+    async def execute_both():
+        return await asyncio.gather(
+            executor.execute_async(ok), executor.execute_async(failed)
+        )
+
+    ok_result, failed_result = asyncio.run(execute_both())
+    assert ok_result.exit_code == 0
+    assert failed_result.exit_code == 3
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,328 @@
+from array import array
+from typing import Dict, List, Tuple
+
+from pydantic import BaseModel, Field
+
+from org_fraggles.build_action_scheduler.actions_info import ActionIndex
+from org_fraggles.build_action_scheduler.dependency_analyzer import BottomLevels
+
+# Weighted priorities are fractions scaled to integers, so that they're
+# integers like those of the other policies, as long as durations are.
+WEIGHTED_PRIORITY_SCALE = 1_000_000
+
+
+class PriorityPolicy(BaseModel):
+    """Decides which ready actions are executed first.
+
+    Policies compute a priority for every action up front, from the dependency
+    graph, so that picking the next ready action stays a heap operation.
+    """
+
+    def priorities(self, bottom_levels: BottomLevels) -> array | None:
+        """Computes the priority of every action.
+
+        Args:
+            bottom_levels: The bottom levels of the actions, which give access
+                to the compact graph as well.
+
+        Returns:
+            The priority of every action, by action index, where actions with
+            higher priorities are executed first and ties are broken by the
+            smallest index. None executes actions in the order they became
+            ready in.
+        """
+        raise NotImplementedError
+
+    def update_priorities(
+        self,
+        bottom_levels: BottomLevels,
+        priorities: array | None,
+        indexes: range,
+        increased: List[ActionIndex],
+    ) -> Tuple[array | None, bool]:
+        """Updates the priorities after actions were added to the graph.
+
+        Policies that can update only the priorities the new actions affect
+        override this, so that adding a few actions to a large graph doesn't
+        recompute every priority. By default, they're all recomputed.
+
+        Args:
+            bottom_levels: The bottom levels of the actions, already updated
+                for the new ones.
+            priorities: The priorities before the actions were added, as
+                returned by this policy. Can be updated in place.
+            indexes: The indexes of the new actions.
+            increased: The indexes of the existing actions whose bottom levels
+                increased.
+
+        Returns:
+            The priority of every action, and whether or not the priority of
+            any existing action changed.
+        """
+        priorities = self.priorities(bottom_levels)
+
+        return priorities, priorities is not None
+
+
+class CriticalPathPriorityPolicy(PriorityPolicy):
+    """Executes the actions with the longest remaining path first."""
+
+    def priorities(self, bottom_levels: BottomLevels) -> array | None:
+        """Returns the bottom levels, as they are (not copied)."""
+        return bottom_levels.bottom_levels_by_index()
+
+    def update_priorities(
+        self,
+        bottom_levels: BottomLevels,
+        priorities: array | None,
+        indexes: range,
+        increased: List[ActionIndex],
+    ) -> Tuple[array | None, bool]:
+        """Returns the bottom levels, which are updated already."""
+        return bottom_levels.bottom_levels_by_index(), len(increased) > 0
+
+
+class MostSuccessorsPriorityPolicy(PriorityPolicy):
+    """Executes the actions with the most transitive dependents first.
+
+    Finishing them eventually unblocks the most actions, which keeps workers
+    busy on graphs with large fan-outs. Transitive dependents are counted
+    exactly, with one bit set per action, so computing them takes up to
+    quadratic time and memory in the number of actions on deep, wide graphs.
+    Actions added later are only counted for themselves and for the existing
+    actions they transitively depend on.
+    """
+
+    def priorities(self, bottom_levels: BottomLevels) -> array | None:
+        """Returns the number of transitive dependents of every action."""
+        return transitive_dependents_counts(bottom_levels)
+
+    def update_priorities(
+        self,
+        bottom_levels: BottomLevels,
+        priorities: array | None,
+        indexes: range,
+        increased: List[ActionIndex],
+    ) -> Tuple[array | None, bool]:
+        """Counts the new transitive dependents of the new actions and of the
+        existing actions they depend on, in place.
+
+        This walks the existing actions the new actions transitively depend
+        on, so it costs as much as a full recompute when they depend on most
+        of the graph, but without its sets as large as the graph.
+        """
+        updated = add_transitive_dependents_counts(bottom_levels, priorities, indexes)
+
+        return priorities, updated > 0
+
+
+class ShortestJobFirstPriorityPolicy(PriorityPolicy):
+    """Executes the shortest actions first."""
+
+    def priorities(self, bottom_levels: BottomLevels) -> array | None:
+        """Returns the negated durations."""
+        durations = bottom_levels.actions_info.compact_graph.durations
+
+        return array(durations.typecode, (-duration for duration in durations))
+
+    def update_priorities(
+        self,
+        bottom_levels: BottomLevels,
+        priorities: array | None,
+        indexes: range,
+        increased: List[ActionIndex],
+    ) -> Tuple[array | None, bool]:
+        """Appends the negated durations of the new actions."""
+        durations = bottom_levels.actions_info.compact_graph.durations
+        priorities.extend(-durations[index] for index in indexes)
+
+        return priorities, False
+
+
+class FifoPriorityPolicy(PriorityPolicy):
+    """Executes actions in the order they became ready in."""
+
+    def priorities(self, bottom_levels: BottomLevels) -> array | None:
+        """Returns None, for first in, first out."""
+        return None
+
+    def update_priorities(
+        self,
+        bottom_levels: BottomLevels,
+        priorities: array | None,
+        indexes: range,
+        increased: List[ActionIndex],
+    ) -> Tuple[array | None, bool]:
+        """Returns None, for first in, first out."""
+        return None, False
+
+
+class WeightedPriorityPolicy(PriorityPolicy):
+    """Mixes the critical path and most successors policies.
+
+    Both the bottom level and the number of transitive dependents of every
+    action are divided by their largest values, and weighted. Since adding
+    actions can change the largest values, every priority is recomputed
+    then.
+    """
+
+    # The weight of the bottom levels, between 0 and 1. The number of
+    # transitive dependents is weighted by the rest.
+    critical_path_weight: float = Field(default=0.5, ge=0, le=1)
+
+    def priorities(self, bottom_levels: BottomLevels) -> array | None:
+        """Returns the weighted sums, scaled to integers."""
+        levels = bottom_levels.bottom_levels_by_index()
+        successors = transitive_dependents_counts(bottom_levels)
+
+        levels_weight = self.critical_path_weight / max(max(levels, default=0), 1)
+        successors_weight = (1 - self.critical_path_weight) / max(
+            max(successors, default=0), 1
+        )
+
+        return array(
+            "q",
+            (
+                round(
+                    WEIGHTED_PRIORITY_SCALE
+                    * (level * levels_weight + successors_count * successors_weight)
+                )
+                for level, successors_count in zip(levels, successors)
+            ),
+        )
+
+
+def transitive_dependents_counts(bottom_levels: BottomLevels) -> array:
+    """Counts the transitive dependents of every action.
+
+    Walks the topological order backwards, so that the set of transitive
+    dependents of every action is the union of its dependents and of their
+    own sets. Sets are integers with one bit per action index, dropped once
+    every dependency of their action has used them.
+
+    Args:
+        bottom_levels: The bottom levels of the actions, which give access to
+            their topological order and to the compact graph.
+
+    Returns:
+        The number of transitive dependents of every action, by action index.
+    """
+    graph = bottom_levels.actions_info.compact_graph
+    graph.compact()
+    offsets = graph.dependents_offsets
+    dependents = graph.dependents
+
+    # The number of dependencies that still have to use each action's set.
+    pending_dependencies_count = array("q", graph.dependencies_count)
+
+    dependents_sets = {}
+    counts = array("q", bytes(8 * len(graph)))
+
+    for current in reversed(bottom_levels.topological_order_by_index()):
+        dependents_set = 0
+
+        for j in range(offsets[current], offsets[current + 1]):
+            dependent = dependents[j]
+            dependents_set |= dependents_sets[dependent] | (1 << dependent)
+
+            pending_dependencies_count[dependent] -= 1
+            if pending_dependencies_count[dependent] == 0:
+                del dependents_sets[dependent]
+
+        counts[current] = dependents_set.bit_count()
+
+        if pending_dependencies_count[current] > 0:
+            dependents_sets[current] = dependents_set
+
+    return counts
+
+
+def add_transitive_dependents_counts(
+    bottom_levels: BottomLevels, counts: array, indexes: range
+) -> int:
+    """Updates the transitive dependents counts after actions were added.
+
+    New actions can only depend on existing actions, not the other way around,
+    so the new actions' transitive dependents are new actions, and the
+    existing actions gaining transitive dependents are the ones the new
+    actions transitively depend on. Only those are walked, dependents first,
+    with one bit per new action in their sets.
+
+    Args:
+        bottom_levels: The bottom levels of the actions, which give access to
+            the compact graph and to the actions.
+        counts: The number of transitive dependents of every existing action,
+            by action index. The counts of the new actions are appended.
+        indexes: The indexes of the new actions, which must have been added in
+            topological order (see `sort_actions`).
+
+    Returns:
+        The number of existing actions whose count increased.
+    """
+    if not indexes:
+        return 0
+
+    actions_info = bottom_levels.actions_info
+    graph = actions_info.compact_graph
+    actions_by_sha1 = actions_info.actions_by_sha1
+    index_by_sha1 = graph.index_by_sha1
+    sha1s = graph.sha1s
+    first = indexes[0]
+
+    # The set of new transitive dependents of every new action, whose
+    # dependents are all new and come after it.
+    new_sets: Dict[ActionIndex, int] = {}
+    for index in reversed(indexes):
+        dependents_set = 0
+        for dependent in graph.dependents_of(index):
+            dependents_set |= new_sets[dependent] | (1 << (dependent - first))
+        new_sets[index] = dependents_set
+
+    counts.extend(new_sets[index].bit_count() for index in indexes)
+
+    # The sets of the existing actions the new actions transitively depend
+    # on, starting with what their new dependents add.
+    sets: Dict[ActionIndex, int] = {}
+    for index in indexes:
+        new_set = new_sets[index] | (1 << (index - first))
+
+        for dependency in actions_by_sha1[sha1s[index]].dependencies:
+            dependency_index = index_by_sha1[dependency]
+            if dependency_index < first:
+                sets[dependency_index] = sets.get(dependency_index, 0) | new_set
+
+    # Every existing action they transitively depend on, with its
+    # dependencies and its number of dependents among them.
+    dependencies: Dict[ActionIndex, List[ActionIndex]] = {}
+    pending_dependents_count: Dict[ActionIndex, int] = dict.fromkeys(sets, 0)
+    stack = list(sets)
+
+    while stack:
+        index = stack.pop()
+        dependencies[index] = [
+            index_by_sha1[dependency]
+            for dependency in actions_by_sha1[sha1s[index]].dependencies
+        ]
+
+        for dependency in dependencies[index]:
+            if dependency not in pending_dependents_count:
+                pending_dependents_count[dependency] = 0
+                stack.append(dependency)
+            pending_dependents_count[dependency] += 1
+
+    # Kahn's algorithm from the actions closest to the roots, pushing every
+    # set to the action's dependencies once all its dependents pushed theirs.
+    ready = [index for index, count in pending_dependents_count.items() if count == 0]
+
+    while ready:
+        current = ready.pop()
+        dependents_set = sets.get(current, 0)
+        counts[current] += dependents_set.bit_count()
+
+        for dependency in dependencies[current]:
+            sets[dependency] = sets.get(dependency, 0) | dependents_set
+            pending_dependents_count[dependency] -= 1
+            if pending_dependents_count[dependency] == 0:
+                ready.append(dependency)
+
+    return len(dependencies)
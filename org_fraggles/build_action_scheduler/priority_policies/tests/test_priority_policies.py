@@ -0,0 +1,248 @@
+import sys
+from typing import Any
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.async_scheduler import AsyncActionScheduler
+from org_fraggles.build_action_scheduler.benchmarks import GraphShape, generate_actions
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    BottomLevels,
+    DependencyAnalyzer,
+)
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.priority_policies import (
+    CriticalPathPriorityPolicy,
+    FifoPriorityPolicy,
+    MostSuccessorsPriorityPolicy,
+    ShortestJobFirstPriorityPolicy,
+    WeightedPriorityPolicy,
+    transitive_dependents_counts,
+)
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.simulator import ScheduleSimulator
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+# `short` has the longest remaining path, `wide` has the most transitive
+# dependents, and `tiny` is the shortest action.
+ACTIONS = [
+    Action(sha1="short", duration=2, dependencies=[]),
+    Action(sha1="wide", duration=3, dependencies=[]),
+    Action(sha1="tiny", duration=1, dependencies=[]),
+    Action(sha1="long", duration=20, dependencies=["short"]),
+] + [Action(sha1=f"fan-{i}", duration=1, dependencies=["wide"]) for i in range(3)]
+
+
+def _bottom_levels(actions):
+    return BottomLevels(actions_info=ActionsInfo(actions=actions))
+
+
+def _by_sha1(bottom_levels, priorities):
+    return dict(zip(bottom_levels.actions_info.compact_graph.sha1s, priorities))
+
+
+def test_transitive_dependents_counts():
+    bottom_levels = _bottom_levels(
+        [
+            Action(sha1="a", duration=1, dependencies=[]),
+            Action(sha1="b", duration=1, dependencies=["a"]),
+            Action(sha1="c", duration=1, dependencies=["a"]),
+            Action(sha1="d", duration=1, dependencies=["b", "c"]),
+            Action(sha1="e", duration=1, dependencies=[]),
+        ]
+    )
+
+    assert _by_sha1(bottom_levels, transitive_dependents_counts(bottom_levels)) == {
+        "a": 3,
+        "b": 1,
+        "c": 1,
+        "d": 0,
+        "e": 0,
+    }
+
+
+@pytest.mark.parametrize("shape", list(GraphShape))
+def test_transitive_dependents_counts_generated_graphs(shape):
+    actions = generate_actions(shape, 300)
+    bottom_levels = _bottom_levels(actions)
+    dependents = {action.sha1: [] for action in actions}
+    for action in actions:
+        for dependency in action.dependencies:
+            dependents[dependency].append(action.sha1)
+
+    def transitive_dependents(action_sha1):
+        visited = set()
+        stack = [action_sha1]
+        while stack:
+            for dependent in dependents[stack.pop()]:
+                if dependent not in visited:
+                    visited.add(dependent)
+                    stack.append(dependent)
+        return visited
+
+    assert _by_sha1(bottom_levels, transitive_dependents_counts(bottom_levels)) == {
+        action.sha1: len(transitive_dependents(action.sha1)) for action in actions
+    }
+
+
+@pytest.mark.parametrize(
+    "priority_policy,first",
+    [
+        (CriticalPathPriorityPolicy(), "short"),
+        (MostSuccessorsPriorityPolicy(), "wide"),
+        (ShortestJobFirstPriorityPolicy(), "tiny"),
+        (FifoPriorityPolicy(), "short"),
+        (WeightedPriorityPolicy(critical_path_weight=1), "short"),
+        (WeightedPriorityPolicy(critical_path_weight=0), "wide"),
+    ],
+)
+@pytest.mark.parametrize("scheduler_class", [ActionScheduler, AsyncActionScheduler])
+def test_scheduler_priority_policies(priority_policy, first, scheduler_class):
+    actions_info = ActionsInfo(actions=ACTIONS)
+    scheduler = scheduler_class(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        priority_policy=priority_policy,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    report = scheduler.schedule()
+
+    assert report["action_execution_history"][0] == first
+    assert len(report["action_execution_history"]) == len(ACTIONS)
+
+
+def test_fifo_priority_policy():
+    actions = [
+        Action(sha1=f"action-{i}", duration=i + 1, dependencies=[]) for i in range(5)
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    scheduler = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        priority_policy=FifoPriorityPolicy(),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    report = scheduler.schedule()
+
+    assert report["action_execution_history"] == [action.sha1 for action in actions]
+
+
+@pytest.mark.parametrize(
+    "priority_policy",
+    [
+        CriticalPathPriorityPolicy(),
+        MostSuccessorsPriorityPolicy(),
+        ShortestJobFirstPriorityPolicy(),
+        FifoPriorityPolicy(),
+        WeightedPriorityPolicy(),
+    ],
+)
+@pytest.mark.parametrize("shape", list(GraphShape))
+def test_update_priorities_matches_recomputing(priority_policy, shape):
+    # Generated actions only depend on actions generated before them.
+    actions = generate_actions(shape, 300)
+    actions_info = ActionsInfo(actions=actions[:200])
+    bottom_levels = BottomLevels(actions_info=actions_info)
+    priorities = priority_policy.priorities(bottom_levels)
+
+    for added_actions in (actions[200:250], actions[250:]):
+        indexes = actions_info.add_actions(list(added_actions))
+        increased = bottom_levels.add_actions(indexes)
+        priorities, _ = priority_policy.update_priorities(
+            bottom_levels, priorities, indexes, increased
+        )
+
+    expected = priority_policy.priorities(_bottom_levels(actions))
+    if expected is None:
+        assert priorities is None
+    else:
+        assert list(priorities) == list(expected)
+
+
+class SubmittingActionExecutor(ActionExecutor):
+    """Adds actions to the scheduler when executing the first action."""
+
+    # The scheduler that the actions are added to.
+    _scheduler: Any = PrivateAttr(default=None)
+
+    def execute(self, action: Action) -> ActionResult:
+        if action.sha1 == "first":
+            self._scheduler.submit_actions(
+                [
+                    Action(sha1="new-long", duration=5, dependencies=[]),
+                    Action(sha1="new-short", duration=1, dependencies=["first"]),
+                ]
+            )
+
+        return ActionResult(exit_code=0, wall_time_s=0)
+
+
+def test_submit_actions_with_priority_policy():
+    actions = [
+        Action(sha1="first", duration=1, dependencies=[]),
+        Action(sha1="medium", duration=3, dependencies=["first"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    action_executor = SubmittingActionExecutor()
+    scheduler = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        action_executor=action_executor,
+        priority_policy=ShortestJobFirstPriorityPolicy(),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+    action_executor._scheduler = scheduler
+
+    report = scheduler.schedule()
+
+    assert report["action_execution_history"] == [
+        "first",
+        "new-short",
+        "medium",
+        "new-long",
+    ]
+
+
+def test_simulator_priority_policies():
+    actions = [
+        Action(sha1="tiny-1", duration=1, dependencies=[]),
+        Action(sha1="tiny-2", duration=1, dependencies=[]),
+        Action(sha1="head", duration=2, dependencies=[]),
+        Action(sha1="tail", duration=10, dependencies=["head"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    dependency_analyzer = DependencyAnalyzer(actions_info=actions_info)
+
+    def makespan(priority_policy):
+        return (
+            ScheduleSimulator(
+                parallelism=2,
+                actions_info=actions_info,
+                dependency_analyzer=dependency_analyzer,
+                priority_policy=priority_policy,
+            )
+            .simulate()
+            .makespan
+        )
+
+    assert makespan(CriticalPathPriorityPolicy()) == 12
+    assert makespan(ShortestJobFirstPriorityPolicy()) == 13
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,259 @@
+import dataclasses
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Set, Tuple
+
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.scheduler import ActionScheduler
+from org_fraggles.build_action_scheduler.types import Action, ActionResult, ActionSha1
+
+log = logging.getLogger(__name__)
+
+
+def execute_action_in_process(
+    action: Action, action_executor: ActionExecutor
+) -> ActionResult:
+    """Executes an action in a worker process.
+
+    Args:
+        action: The action to execute.
+        action_executor: The executor to execute the action with.
+
+    Returns:
+        The result of the action execution.
+    """
+    return action_executor.execute(action)
+
+
+class ProcessActionScheduler(ActionScheduler):
+    """Schedules actions for execution on a pool of worker processes.
+
+    Meant for CPU-bound actions, which would otherwise be serialized by the
+    GIL. Scheduling state stays in the coordinating process: workers only
+    receive the action to execute (without its dependencies) and the action
+    executor, and their results are turned into completion events through
+    future callbacks.
+
+    A worker process that crashes breaks the whole pool, failing every
+    action in flight on it, so the pool is replaced. Which action crashed
+    the worker can't be told apart from the ones that just ran next to it,
+    so they're all rerun one at a time on a separate single-worker pool, and
+    only crashes there, or of an action that was alone on its pool, count
+    against an action. An action that keeps crashing workers is marked as
+    failed, so that the scheduler never waits on it forever.
+    """
+
+    # The number of times an action is resubmitted after a worker process
+    # crashed while it was the only action in flight on its pool.
+    max_worker_crash_retries: int = 2
+
+    # Number of worker process crashes blamed on each action.
+    _worker_crash_count: Dict[ActionSha1, int] = PrivateAttr(default_factory=dict)
+
+    # Process pools that broke and were replaced. References are kept until
+    # scheduling is done because a pool must not be garbage collected while
+    # its management thread is still failing its futures.
+    _broken_process_pools: List[Executor] = PrivateAttr(default_factory=list)
+
+    # The actions submitted to each process pool that haven't finished on it.
+    _process_pool_actions: Dict[Executor, Set[ActionSha1]] = PrivateAttr(
+        default_factory=dict
+    )
+
+    # The number of actions that were in flight on each pool when it broke.
+    _process_pool_crash_sizes: Dict[Executor, int] = PrivateAttr(default_factory=dict)
+
+    # The single-worker pool that actions are rerun on after a crash, if any.
+    _isolation_pool: Executor | None = PrivateAttr(default=None)
+
+    # The actions waiting to be rerun on the isolation pool, and the one
+    # running on it.
+    _isolation_queue: Deque[ActionSha1] = PrivateAttr(default_factory=deque)
+    _isolated_action: ActionSha1 | None = PrivateAttr(default=None)
+
+    def _create_executor(self) -> Executor:
+        """Creates a pool of worker processes."""
+        return self._create_process_pool(self.parallelism)
+
+    def _create_process_pool(self, max_workers: int) -> Executor:
+        """Creates a pool of worker processes.
+
+        Args:
+            max_workers: The number of worker processes.
+        """
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _shutdown_executor(self) -> None:
+        """Shuts down the current process pools and the ones that broke."""
+        super()._shutdown_executor()
+
+        if self._isolation_pool is not None:
+            self._isolation_pool.shutdown(wait=True)
+
+        for process_pool in self._broken_process_pools:
+            process_pool.shutdown(wait=True)
+
+    def _submit_action(self, action_sha1: ActionSha1) -> None:
+        """Submits an action for execution on a worker process.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+        """
+        self._submit_to_process_pool(action_sha1, isolated=False)
+
+    def _process_target(self) -> Callable[..., Any]:
+        """Returns the module-level function that executes actions in workers."""
+        return execute_action_in_process
+
+    def _process_payload(self, action_sha1: ActionSha1) -> Tuple[Any, ...]:
+        """Returns the arguments shipped to a worker process to execute an action.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+        """
+        action = self.actions_info.actions_by_sha1[action_sha1]
+
+        return (dataclasses.replace(action, dependencies=[]), self.action_executor)
+
+    def _submit_to_process_pool(self, action_sha1: ActionSha1, isolated: bool) -> None:
+        """Submits an action to the current process pool, or to the isolation pool.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+            isolated: Whether or not to submit it to the isolation pool.
+        """
+        with self._lock:
+            if isolated:
+                if self._isolation_pool is None:
+                    self._isolation_pool = self._create_process_pool(1)
+
+                process_pool = self._isolation_pool
+            else:
+                process_pool = self._executor
+
+            self._process_pool_actions.setdefault(process_pool, set()).add(action_sha1)
+
+        try:
+            future = process_pool.submit(
+                self._process_target(), *self._process_payload(action_sha1)
+            )
+        except BrokenProcessPool:
+            self._on_worker_crash(action_sha1, process_pool, isolated)
+            return
+
+        future.add_done_callback(
+            partial(self._on_process_future_done, action_sha1, process_pool, isolated)
+        )
+
+    def _on_process_future_done(
+        self,
+        action_sha1: ActionSha1,
+        process_pool: Executor,
+        isolated: bool,
+        future: Future,
+    ) -> None:
+        """Turns the result of a worker process into a completion event.
+
+        Args:
+            action_sha1: The SHA-1 of the action that was executed.
+            process_pool: The process pool that executed the action.
+            isolated: Whether or not the action ran on the isolation pool.
+            future: The future for the action execution.
+        """
+        error = future.exception()
+
+        if isinstance(error, BrokenProcessPool):
+            self._on_worker_crash(action_sha1, process_pool, isolated)
+            return
+
+        with self._lock:
+            # Missing if the pool broke after the action was done.
+            self._process_pool_actions.get(process_pool, set()).discard(action_sha1)
+
+            if isolated:
+                self._isolated_action = None
+
+        if error is None:
+            self._on_action_execution_result(action_sha1, future.result())
+        else:
+            self._on_action_execution_failed(action_sha1, repr(error))
+
+        if isolated:
+            self._run_next_isolated_action()
+
+    def _on_worker_crash(
+        self, action_sha1: ActionSha1, process_pool: Executor, isolated: bool
+    ) -> None:
+        """Replaces a broken process pool and reruns an action that was in flight.
+
+        The crash only counts against the action if it was the only one in
+        flight on the pool. Either way, it's rerun alone on the isolation
+        pool, so that a crash there is its own.
+
+        Args:
+            action_sha1: The SHA-1 of the action that was in flight.
+            process_pool: The process pool that broke.
+            isolated: Whether or not the action ran on the isolation pool.
+        """
+        with self._lock:
+            # Every action in flight on the broken pool ends up here, but only
+            # the first one replaces it. The broken pool terminates its own
+            # processes (and this may run on its management thread, so it
+            # can't be shut down from here).
+            if process_pool not in self._process_pool_crash_sizes:
+                self._process_pool_crash_sizes[process_pool] = len(
+                    self._process_pool_actions.pop(process_pool, ())
+                )
+                self._broken_process_pools.append(process_pool)
+
+                if self._executor is process_pool:
+                    self._executor = self._create_executor()
+                elif self._isolation_pool is process_pool:
+                    self._isolation_pool = None
+
+            crash_count = self._worker_crash_count.get(action_sha1, 0)
+            if self._process_pool_crash_sizes[process_pool] <= 1:
+                crash_count += 1
+                self._worker_crash_count[action_sha1] = crash_count
+
+            if isolated:
+                self._isolated_action = None
+
+        if crash_count > self.max_worker_crash_retries:
+            self._on_action_execution_failed(
+                action_sha1, f"Worker process crashed {crash_count} times"
+            )
+        else:
+            log.warning(
+                "Worker process crashed while executing %s, rerunning it alone",
+                action_sha1,
+            )
+
+            with self._lock:
+                self._isolation_queue.append(action_sha1)
+
+        self._run_next_isolated_action()
+
+    def _run_next_isolated_action(self) -> None:
+        """Submits the next action waiting for the isolation pool, if it's free."""
+        with self._lock:
+            if self._isolated_action is not None:
+                return
+
+            if not self._isolation_queue:
+                self._isolated_action = None
+                return
+
+            self._isolated_action = self._isolation_queue.popleft()
+            action_sha1 = self._isolated_action
+
+        self._submit_to_process_pool(action_sha1, isolated=True)
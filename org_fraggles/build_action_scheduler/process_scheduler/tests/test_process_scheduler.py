@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.process_scheduler import ProcessActionScheduler
+from org_fraggles.build_action_scheduler.scheduler import SchedulingAlgorithm
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def _crash_once(action, action_executor):
+    marker = os.path.join(os.environ["CRASH_MARKER_DIR"], action.sha1)
+    if action.sha1 == "b" and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return action_executor.execute(action)
+
+
+def _always_crash(action, action_executor):
+    if action.sha1 == "b":
+        os._exit(1)
+    return action_executor.execute(action)
+
+
+def _crash_alongside_others(action, action_executor):
+    if action.sha1 == "b":
+        time.sleep(0.1)
+        os._exit(1)
+    # Keeps the other actions in flight while "b" crashes the pool.
+    time.sleep(0.5)
+    return action_executor.execute(action)
+
+
+class CrashOnceScheduler(ProcessActionScheduler):
+    def _process_target(self):
+        return _crash_once
+
+
+class AlwaysCrashScheduler(ProcessActionScheduler):
+    def _process_target(self):
+        return _always_crash
+
+
+class CrashAlongsideOthersScheduler(ProcessActionScheduler):
+    def _process_target(self):
+        return _crash_alongside_others
+
+
+@pytest.fixture
+def actions_info():
+    actions = [
+        Action(sha1="a", duration=3, dependencies=["b", "e"]),
+        Action(sha1="b", duration=2, dependencies=["c"]),
+        Action(sha1="c", duration=1, dependencies=[]),
+        Action(sha1="e", duration=5, dependencies=[]),
+    ]
+    return ActionsInfo(actions=actions)
+
+
+@pytest.fixture
+def dependency_analyzer(actions_info):
+    return DependencyAnalyzer(actions_info=actions_info)
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_simple(actions_info, dependency_analyzer, algorithm):
+    result = ProcessActionScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=algorithm,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    ).schedule()
+    assert "error" not in result
+    assert sorted(result["action_execution_history"]) == ["a", "b", "c", "e"]
+    assert result["action_execution_history"][-1] == "a"
+    assert result["critical_path"]["duration"] == 8
+
+
+def test_schedule_retries_after_worker_crash(
+    actions_info, dependency_analyzer, monkeypatch, tmp_path
+):
+    monkeypatch.setenv("CRASH_MARKER_DIR", str(tmp_path))
+    result = CrashOnceScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    ).schedule()
+    assert "error" not in result
+    assert result["action_execution_history"] == ["e", "c", "b", "a"]
+
+
+def test_schedule_fails_after_repeated_worker_crashes(
+    actions_info, dependency_analyzer
+):
+    result = AlwaysCrashScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        max_worker_crash_retries=1,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    ).schedule()
+    assert result["error"] == "Action execution failed"
+    assert list(result["action_execution_failures"]) == ["b"]
+    assert result["actions_skipped"] == ["a"]
+    assert sorted(result["action_execution_history"]) == ["b", "c", "e"]
+
+
+def test_schedule_only_fails_the_action_that_crashes_workers():
+    actions_info = ActionsInfo(
+        actions=[
+            Action(sha1="b", duration=9, dependencies=[]),
+            Action(sha1="c", duration=1, dependencies=[]),
+            Action(sha1="d", duration=1, dependencies=[]),
+        ]
+    )
+    result = CrashAlongsideOthersScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        max_worker_crash_retries=1,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).schedule()
+    assert list(result["action_execution_failures"]) == ["b"]
+    assert sorted(result["action_execution_history"]) == ["b", "c", "d"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
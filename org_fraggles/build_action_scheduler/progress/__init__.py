@@ -0,0 +1,145 @@
+import dataclasses
+import json
+import logging
+import sys
+import threading
+from dataclasses import dataclass
+from typing import IO, Callable
+
+from pydantic import BaseModel, PrivateAttr
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Progress:
+    """A snapshot of how far scheduling has got."""
+
+    # Seconds elapsed since scheduling started.
+    elapsed_s: float
+
+    # The total number of actions.
+    total: int
+
+    # Actions executing.
+    running: int
+
+    # Actions ready to be executed, waiting for a worker.
+    ready: int
+
+    # Actions done, including the ones whose result was cached.
+    done: int
+
+    # Actions whose execution failed.
+    failed: int
+
+    # Actions that won't be executed because a dependency failed.
+    skipped: int
+
+    # The longest remaining duration among running and ready actions, i.e.,
+    # the time needed to finish even with unlimited parallelism.
+    remaining_critical_path_s: float
+
+    # The estimated time to finish: the larger of the remaining critical path
+    # and the remaining work spread over all workers.
+    eta_s: float
+
+    def __str__(self) -> str:
+        """Returns a one-line summary of the progress."""
+        return (
+            f"{self.done + self.failed + self.skipped}/{self.total} actions finished"
+            f" ({self.running} running, {self.ready} ready, {self.failed} failed,"
+            f" {self.skipped} skipped) | critical path remaining:"
+            f" {self.remaining_critical_path_s:.1f}s | ETA: {self.eta_s:.1f}s"
+        )
+
+
+class ProgressReporter(BaseModel):
+    """Publishes the scheduling progress periodically, from a background thread.
+
+    Progress is only read once per interval, so reporting costs nothing per
+    action execution, no matter how many actions there are.
+    """
+
+    # The interval in seconds between two progress reports.
+    interval_s: float = 1
+
+    # Log the progress.
+    log_progress: bool = True
+
+    # Keep a live progress line on the terminal (on stderr).
+    terminal: bool = False
+
+    # The path to a file to append progress reports to, as JSON lines.
+    json_lines_path: str | None = None
+
+    # Returns the current progress. Set by `start`.
+    _get_progress: Callable[[], Progress] | None = PrivateAttr(default=None)
+
+    # The thread publishing the progress.
+    _thread: threading.Thread | None = PrivateAttr(default=None)
+
+    # Set to stop the thread.
+    _stopped: threading.Event = PrivateAttr(default_factory=threading.Event)
+
+    # The file that JSON lines are appended to.
+    _json_lines_file: IO[str] | None = PrivateAttr(default=None)
+
+    def start(self, get_progress: Callable[[], Progress]) -> None:
+        """Starts publishing the progress in the background.
+
+        Args:
+            get_progress: Returns the current progress. Called from the
+                background thread.
+        """
+        self._get_progress = get_progress
+        self._stopped.clear()
+
+        if self.json_lines_path is not None:
+            self._json_lines_file = open(self.json_lines_path, "a")
+
+        self._thread = threading.Thread(
+            target=self._run, name="progress-reporter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops publishing the progress, after publishing it one last time."""
+        if self._thread is None:
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+        self._publish(self._get_progress())
+
+        if self.terminal:
+            sys.stderr.write("\n")
+            sys.stderr.flush()
+
+        if self._json_lines_file is not None:
+            self._json_lines_file.close()
+            self._json_lines_file = None
+
+    def _run(self) -> None:
+        """Publishes the progress every interval until stopped."""
+        while not self._stopped.wait(self.interval_s):
+            self._publish(self._get_progress())
+
+    def _publish(self, progress: Progress) -> None:
+        """Publishes the progress to every enabled output.
+
+        Args:
+            progress: The progress to publish.
+        """
+        if self.log_progress:
+            log.info("%s", progress)
+
+        if self.terminal:
+            sys.stderr.write(f"\r\033[K{progress}")
+            sys.stderr.flush()
+
+        if self._json_lines_file is not None:
+            self._json_lines_file.write(json.dumps(dataclasses.asdict(progress)) + "\n")
+            self._json_lines_file.flush()
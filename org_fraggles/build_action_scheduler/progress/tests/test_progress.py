@@ -0,0 +1,106 @@
+import json
+import sys
+import time
+from typing import Any, List
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.progress import Progress, ProgressReporter
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+class ProgressCheckingActionExecutor(ActionExecutor):
+    """Records the scheduler progress while executing actions."""
+
+    # The scheduler whose progress is recorded.
+    _scheduler: Any = PrivateAttr(default=None)
+
+    # The progress seen while executing each action.
+    _progress: List[Progress] = PrivateAttr(default_factory=list)
+
+    def execute(self, action: Action) -> ActionResult:
+        self._progress.append(self._scheduler.progress())
+        time.sleep(0.01)
+
+        return ActionResult(exit_code=0, wall_time_s=0.01)
+
+
+@pytest.mark.parametrize(
+    "algorithm", [SchedulingAlgorithm.CRITICAL_PATHS, SchedulingAlgorithm.READY_QUEUE]
+)
+def test_progress_reports(tmp_path, algorithm):
+    actions = [Action(sha1="root", duration=10, dependencies=[])] + [
+        Action(sha1=f"leaf-{i}", duration=1, dependencies=["root"]) for i in range(20)
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    action_executor = ProgressCheckingActionExecutor()
+    json_lines_path = tmp_path / "progress.jsonl"
+
+    scheduler = ActionScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=algorithm,
+        action_executor=action_executor,
+        progress_reporter=ProgressReporter(
+            interval_s=0.01, json_lines_path=str(json_lines_path)
+        ),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+    action_executor._scheduler = scheduler
+
+    assert "error" not in scheduler.schedule()
+
+    # The root action runs alone, and the whole critical path is ahead.
+    first_progress = action_executor._progress[0]
+    assert first_progress.running == 1
+    assert first_progress.done == 0
+    assert 10 < first_progress.remaining_critical_path_s <= 11
+    assert first_progress.eta_s == pytest.approx(15, abs=0.1)
+
+    for progress in action_executor._progress:
+        assert 1 <= progress.running <= 2
+        assert progress.remaining_critical_path_s <= 11
+
+    reports = [json.loads(line) for line in json_lines_path.read_text().splitlines()]
+    assert reports[-1] == {
+        **reports[-1],
+        "total": 21,
+        "running": 0,
+        "ready": 0,
+        "done": 21,
+        "remaining_critical_path_s": 0,
+        "eta_s": 0,
+    }
+
+
+def test_progress_str():
+    progress = Progress(
+        elapsed_s=1,
+        total=10,
+        running=2,
+        ready=3,
+        done=4,
+        failed=1,
+        skipped=0,
+        remaining_critical_path_s=5,
+        eta_s=6,
+    )
+
+    assert str(progress) == (
+        "5/10 actions finished (2 running, 3 ready, 1 failed, 0 skipped)"
+        " | critical path remaining: 5.0s | ETA: 6.0s"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
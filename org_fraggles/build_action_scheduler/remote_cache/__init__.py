@@ -0,0 +1,543 @@
+import http.client
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import BoundedSemaphore, Lock, Thread
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from org_fraggles.build_action_scheduler.action_cache import ActionCache
+from org_fraggles.build_action_scheduler.types import ActionResult, ActionSha1
+
+log = logging.getLogger(__name__)
+
+# The path of the action results, followed by a quoted action SHA-1. `GET`
+# returns a result (or 404), and `PUT` stores one.
+RESULTS_PATH = "/ac/"
+
+# The path to check which actions have a result in one request. `POST` a
+# `{"sha1s": [...]}` object, and get a `{"present": [...]}` object back.
+EXISTS_PATH = "/exists"
+
+
+class RemoteCacheError(Exception):
+    """Raised when the remote action cache can't be reached or misbehaves."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of RemoteCacheError."""
+        super().__init__(message)
+
+
+def result_to_json(action_result: ActionResult) -> Dict[str, Any]:
+    """Converts an action result into the JSON object of the protocol."""
+    return {
+        "exit_code": action_result.exit_code,
+        "wall_time_s": action_result.wall_time_s,
+    }
+
+
+def result_from_json(value: Dict[str, Any]) -> ActionResult:
+    """Converts a JSON object of the protocol back into an action result."""
+    return ActionResult(exit_code=value["exit_code"], wall_time_s=value["wall_time_s"])
+
+
+class RemoteActionCache(ActionCache):
+    """An action cache shared over HTTP, e.g., by the machines of a CI fleet.
+
+    Results are keyed by action SHA-1 (see `RESULTS_PATH` and `EXISTS_PATH`
+    for the protocol). Connections are kept alive and reused, up to
+    `max_connections` at once. Which actions have a result is remembered, so
+    that actions found missing by a batched existence check, or by a
+    prefetch, are never looked up one by one.
+
+    The cache only saves work, so it never fails a build: requests that fail
+    are logged, and count as misses. Safe to use from multiple threads.
+    """
+
+    # The base URL of the cache server, e.g., "http://cache.example.com:8080".
+    url: str
+
+    # The maximum number of connections open to the server at once.
+    max_connections: int = Field(default=8, gt=0)
+
+    # How long to wait for the server, in seconds.
+    timeout_s: float = Field(default=5, gt=0)
+
+    # The most SHA-1s checked with a single existence request.
+    exists_batch_size: int = Field(default=1000, gt=0)
+
+    # The scheme, host, port and path of `url`.
+    _scheme: str = PrivateAttr(default="http")
+    _host: str = PrivateAttr(default="")
+    _port: int | None = PrivateAttr(default=None)
+    _base_path: str = PrivateAttr(default="")
+
+    # Connections that are open and not in use, the most recently used last.
+    _idle_connections: List[http.client.HTTPConnection] = PrivateAttr(
+        default_factory=list
+    )
+
+    # Bounds the number of connections in use.
+    _connection_slots: BoundedSemaphore = PrivateAttr(default=None)
+
+    # Whether or not each action known to the cache has a result.
+    _presence: Dict[ActionSha1, bool] = PrivateAttr(default_factory=dict)
+
+    # Actions whose presence is being prefetched.
+    _prefetching: Set[ActionSha1] = PrivateAttr(default_factory=set)
+
+    # Prefetches presence in the background, one batch at a time. Created on
+    # the first prefetch.
+    _prefetcher: ThreadPoolExecutor | None = PrivateAttr(default=None)
+
+    # The number of requests of each kind, of connections opened, of failed
+    # requests, and of actions prefetched.
+    _stats: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: dict.fromkeys(
+            ("get", "put", "exists", "connections_opened", "errors", "prefetched"),
+            0,
+        )
+    )
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        parsed_url = urlsplit(self.url)
+        if parsed_url.scheme not in ("http", "https") or not parsed_url.hostname:
+            raise RemoteCacheError(f"Unsupported remote cache URL {self.url!r}")
+
+        self._scheme = parsed_url.scheme
+        self._host = parsed_url.hostname
+        self._port = parsed_url.port
+        self._base_path = parsed_url.path.rstrip("/")
+        self._connection_slots = BoundedSemaphore(self.max_connections)
+
+    def get(self, action_sha1: ActionSha1) -> ActionResult | None:
+        """Returns the cached result for an action, unless it's known to be missing."""
+        with self._lock:
+            if self._presence.get(action_sha1) is False:
+                return None
+
+        try:
+            status, body = self._request("get", "GET", _result_path(action_sha1))
+        except RemoteCacheError as e:
+            log.warning("Looking up %s in the remote cache failed: %s", action_sha1, e)
+            return None
+
+        if status not in (200, 404):
+            log.warning(
+                "Looking up %s in the remote cache failed with status %s",
+                action_sha1,
+                status,
+            )
+            return None
+
+        with self._lock:
+            self._presence[action_sha1] = status == 200
+
+        if status == 404:
+            return None
+
+        return result_from_json(json.loads(body))
+
+    def put(self, action_sha1: ActionSha1, action_result: ActionResult) -> None:
+        """Stores an action result on the server."""
+        try:
+            status, _ = self._request(
+                "put", "PUT", _result_path(action_sha1), result_to_json(action_result)
+            )
+        except RemoteCacheError as e:
+            log.warning("Storing %s in the remote cache failed: %s", action_sha1, e)
+            return
+
+        if status not in (200, 201, 204):
+            log.warning(
+                "Storing %s in the remote cache failed with status %s",
+                action_sha1,
+                status,
+            )
+            return
+
+        with self._lock:
+            self._presence[action_sha1] = True
+
+    def contains_many(self, action_sha1s: Iterable[ActionSha1]) -> Set[ActionSha1]:
+        """Returns which actions have a result, checking the unknown ones in batches.
+
+        Actions whose check failed are reported as missing, but are looked up
+        again by `get`.
+        """
+        action_sha1s = list(dict.fromkeys(action_sha1s))
+
+        with self._lock:
+            unknown_action_sha1s = [
+                action_sha1
+                for action_sha1 in action_sha1s
+                if action_sha1 not in self._presence
+            ]
+
+        self._check_presence(unknown_action_sha1s)
+
+        with self._lock:
+            return {
+                action_sha1
+                for action_sha1 in action_sha1s
+                if self._presence.get(action_sha1)
+            }
+
+    def prefetch(self, action_sha1s: Iterable[ActionSha1]) -> None:
+        """Checks which actions have a result in the background."""
+        with self._lock:
+            action_sha1s = [
+                action_sha1
+                for action_sha1 in dict.fromkeys(action_sha1s)
+                if action_sha1 not in self._presence
+                and action_sha1 not in self._prefetching
+            ]
+            if not action_sha1s:
+                return
+
+            self._prefetching.update(action_sha1s)
+            self._stats["prefetched"] += len(action_sha1s)
+
+            if self._prefetcher is None:
+                self._prefetcher = ThreadPoolExecutor(max_workers=1)
+
+            prefetcher = self._prefetcher
+
+        prefetcher.submit(self._prefetch, action_sha1s)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of requests of each kind, of connections opened, of
+        failed requests, and of actions prefetched."""
+        with self._lock:
+            return {"remote": dict(self._stats)}
+
+    def close(self) -> None:
+        """Waits for prefetches in progress, and closes the idle connections."""
+        with self._lock:
+            prefetcher, self._prefetcher = self._prefetcher, None
+
+        if prefetcher is not None:
+            prefetcher.shutdown(wait=True)
+
+        with self._lock:
+            idle_connections, self._idle_connections = self._idle_connections, []
+
+        for connection in idle_connections:
+            connection.close()
+
+    def _prefetch(self, action_sha1s: List[ActionSha1]) -> None:
+        """Checks which actions have a result, on the prefetcher thread."""
+        try:
+            self._check_presence(action_sha1s)
+        finally:
+            with self._lock:
+                self._prefetching.difference_update(action_sha1s)
+
+    def _check_presence(self, action_sha1s: List[ActionSha1]) -> None:
+        """Asks the server which actions have a result, and remembers it.
+
+        Args:
+            action_sha1s: The SHA-1s of the actions, checked in batches of
+                `exists_batch_size`.
+        """
+        for start in range(0, len(action_sha1s), self.exists_batch_size):
+            batch = action_sha1s[start : start + self.exists_batch_size]
+
+            try:
+                status, body = self._request(
+                    "exists", "POST", EXISTS_PATH, {"sha1s": batch}
+                )
+                if status != 200:
+                    raise RemoteCacheError(f"Unexpected status {status}")
+
+                present = set(json.loads(body)["present"])
+            except (RemoteCacheError, ValueError, KeyError) as e:
+                log.warning("Checking the remote cache failed: %s", e)
+                continue
+
+            with self._lock:
+                for action_sha1 in batch:
+                    self._presence[action_sha1] = action_sha1 in present
+
+    def _request(
+        self, kind: str, method: str, path: str, value: Any = None
+    ) -> Tuple[int, bytes]:
+        """Sends a request on a pooled connection and reads the whole response.
+
+        The server may have closed an idle connection in the meantime, so a
+        request that fails on a reused connection is retried once on a new
+        one.
+
+        Args:
+            kind: The kind of request, for the statistics.
+            method: The HTTP method.
+            path: The path, relative to the base URL.
+            value: The JSON value to send as the body, if any.
+
+        Returns:
+            The status code and the body of the response.
+
+        Raises:
+            RemoteCacheError: If the request failed.
+        """
+        body = None
+        headers = {}
+        if value is not None:
+            body = json.dumps(value).encode()
+            headers["Content-Type"] = "application/json"
+
+        with self._lock:
+            self._stats[kind] += 1
+
+        with self._connection_slots:
+            for attempt in range(2):
+                connection, reused = self._take_connection(fresh=attempt > 0)
+
+                try:
+                    connection.request(
+                        method, self._base_path + path, body=body, headers=headers
+                    )
+                    response = connection.getresponse()
+                    response_body = response.read()
+                except (http.client.HTTPException, OSError) as e:
+                    connection.close()
+
+                    if reused and attempt == 0:
+                        continue
+
+                    with self._lock:
+                        self._stats["errors"] += 1
+
+                    raise RemoteCacheError(f"{method} {path}: {e!r}") from e
+
+                if response.will_close:
+                    connection.close()
+                else:
+                    with self._lock:
+                        self._idle_connections.append(connection)
+
+                return response.status, response_body
+
+        raise AssertionError("unreachable")
+
+    def _take_connection(self, fresh: bool) -> Tuple[http.client.HTTPConnection, bool]:
+        """Returns an idle connection, or a new one.
+
+        Must be called with a connection slot acquired.
+
+        Args:
+            fresh: Whether or not to open a new connection in any case.
+
+        Returns:
+            The connection, and whether or not it was reused.
+        """
+        with self._lock:
+            if self._idle_connections and not fresh:
+                return self._idle_connections.pop(), True
+
+            self._stats["connections_opened"] += 1
+
+        connection_class = (
+            http.client.HTTPSConnection
+            if self._scheme == "https"
+            else http.client.HTTPConnection
+        )
+
+        return connection_class(self._host, self._port, timeout=self.timeout_s), False
+
+
+def _result_path(action_sha1: ActionSha1) -> str:
+    """Returns the path of the result of an action."""
+    return RESULTS_PATH + quote(action_sha1, safe="")
+
+
+class _ActionCacheRequestHandler(BaseHTTPRequestHandler):
+    """Serves the remote action cache protocol from an `ActionCacheServer`."""
+
+    # Keeps connections alive between requests.
+    protocol_version = "HTTP/1.1"
+
+    server: "_ActionCacheHTTPServer"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.action_cache_server._count("connections")
+
+    def do_GET(self) -> None:
+        if not self.path.startswith(RESULTS_PATH):
+            self._send(404)
+            return
+
+        self.server.action_cache_server._count("get")
+        action_result = self.server.action_cache_server.results().get(
+            unquote(self.path[len(RESULTS_PATH) :])
+        )
+
+        if action_result is None:
+            self._send(404)
+        else:
+            self._send(200, result_to_json(action_result))
+
+    def do_PUT(self) -> None:
+        if not self.path.startswith(RESULTS_PATH):
+            self._send(404)
+            return
+
+        self.server.action_cache_server._count("put")
+
+        try:
+            action_result = result_from_json(self._read_json())
+        except (ValueError, KeyError, TypeError):
+            self._send(400)
+            return
+
+        self.server.action_cache_server.put(
+            unquote(self.path[len(RESULTS_PATH) :]), action_result
+        )
+        self._send(204)
+
+    def do_POST(self) -> None:
+        if self.path != EXISTS_PATH:
+            self._send(404)
+            return
+
+        self.server.action_cache_server._count("exists")
+
+        try:
+            action_sha1s = self._read_json()["sha1s"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400)
+            return
+
+        results = self.server.action_cache_server.results()
+        self._send(
+            200,
+            {
+                "present": [
+                    action_sha1
+                    for action_sha1 in action_sha1s
+                    if action_sha1 in results
+                ]
+            },
+        )
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug(format, *args)
+
+    def _read_json(self) -> Any:
+        """Reads the JSON body of the request."""
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def _send(self, status: int, value: Any = None) -> None:
+        """Sends a response, with a JSON body if a value is given."""
+        body = b"" if value is None else json.dumps(value).encode()
+
+        self.send_response(status)
+        if value is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ActionCacheHTTPServer(ThreadingHTTPServer):
+    """An HTTP server with a reference to the `ActionCacheServer` it serves."""
+
+    daemon_threads = True
+
+    action_cache_server: "ActionCacheServer"
+
+
+class ActionCacheServer(BaseModel):
+    """A stand-in remote action cache server, keeping results in memory.
+
+    Speaks the protocol of `RemoteActionCache`, for tests and for trying a
+    shared cache out locally. A real deployment would put the results in
+    durable storage.
+    """
+
+    # The address to listen on. Port 0 picks a free port.
+    host: str = "127.0.0.1"
+    port: int = 0
+
+    _server: _ActionCacheHTTPServer | None = PrivateAttr(default=None)
+
+    _thread: Thread | None = PrivateAttr(default=None)
+
+    # The stored results, by action SHA-1.
+    _results: Dict[ActionSha1, ActionResult] = PrivateAttr(default_factory=dict)
+
+    # The number of connections accepted, and of requests of each kind.
+    _stats: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: dict.fromkeys(
+            ("connections", "get", "put", "exists"), 0
+        )
+    )
+
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def start(self) -> Tuple[str, int]:
+        """Starts serving on a background thread, unless already started.
+
+        Returns:
+            The address the server listens on.
+        """
+        with self._lock:
+            if self._server is None:
+                self._server = _ActionCacheHTTPServer(
+                    (self.host, self.port), _ActionCacheRequestHandler
+                )
+                self._server.action_cache_server = self
+
+                # Polls for shutdown often, so that shutting down is quick.
+                self._thread = Thread(
+                    target=self._server.serve_forever,
+                    kwargs={"poll_interval": 0.05},
+                    daemon=True,
+                )
+                self._thread.start()
+
+            return self._server.server_address[:2]
+
+    def url(self) -> str:
+        """Starts the server, unless already started, and returns its URL."""
+        host, port = self.start()
+
+        return f"http://{host}:{port}"
+
+    def shutdown(self) -> None:
+        """Stops serving and closes the listening socket."""
+        with self._lock:
+            server, self._server = self._server, None
+
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            self._thread.join()
+
+    def results(self) -> Dict[ActionSha1, ActionResult]:
+        """Returns a copy of the stored results, by action SHA-1."""
+        with self._lock:
+            return dict(self._results)
+
+    def put(self, action_sha1: ActionSha1, action_result: ActionResult) -> None:
+        """Stores a result, e.g., to seed the server in tests."""
+        with self._lock:
+            self._results[action_sha1] = action_result
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the number of connections accepted, and of requests of each kind."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, kind: str) -> None:
+        """Counts a connection or a request."""
+        with self._lock:
+            self._stats[kind] += 1
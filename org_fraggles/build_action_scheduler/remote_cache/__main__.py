@@ -0,0 +1,44 @@
+import logging
+import threading
+import time
+from typing import Annotated
+
+import typer
+
+from org_fraggles.build_action_scheduler.remote_cache import ActionCacheServer
+
+logging.Formatter.converter = time.gmtime
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%SZ",
+)
+
+log = logging.getLogger(__name__)
+
+
+def main(
+    host: Annotated[
+        str,
+        typer.Option(..., help="The host to listen on."),
+    ] = "127.0.0.1",
+    port: Annotated[
+        int,
+        typer.Option(..., help="The port to listen on. 0 picks a free port."),
+    ] = 0,
+) -> None:
+    """Serves an in-memory remote action cache, until interrupted."""
+    server = ActionCacheServer(host=host, port=port)
+    log.info("Serving the remote action cache at %s", server.url())
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,162 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.remote_cache import (
+    ActionCacheServer,
+    RemoteActionCache,
+    RemoteCacheError,
+)
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+@pytest.fixture
+def server():
+    server = ActionCacheServer()
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def test_remote_action_cache_round_trips_results(server):
+    cache = RemoteActionCache(url=server.url())
+
+    assert cache.get("a") is None
+    cache.put("a", ActionResult(exit_code=0, wall_time_s=1.5))
+
+    assert cache.get("a") == ActionResult(exit_code=0, wall_time_s=1.5)
+    assert RemoteActionCache(url=server.url()).get("a") == ActionResult(
+        exit_code=0, wall_time_s=1.5
+    )
+
+    cache.close()
+
+
+def test_remote_action_cache_doesnt_look_known_misses_up(server):
+    cache = RemoteActionCache(url=server.url())
+
+    assert cache.get("a") is None
+    assert cache.get("a") is None
+
+    assert server.stats()["get"] == 1
+
+    cache.close()
+
+
+def test_remote_action_cache_batches_existence_checks(server):
+    server.put("b", ActionResult(exit_code=0, wall_time_s=1))
+    server.put("d", ActionResult(exit_code=0, wall_time_s=1))
+    cache = RemoteActionCache(url=server.url(), exists_batch_size=2)
+
+    assert cache.contains_many(["a", "b", "c", "d", "e"]) == {"b", "d"}
+    assert server.stats()["exists"] == 3
+
+    # Known now, so neither checked nor looked up again.
+    assert cache.contains_many(["a", "b", "c", "d", "e"]) == {"b", "d"}
+    assert cache.get("a") is None
+    assert server.stats()["exists"] == 3
+    assert server.stats()["get"] == 0
+
+    cache.close()
+
+
+def test_remote_action_cache_reuses_connections(server):
+    cache = RemoteActionCache(url=server.url(), max_connections=2)
+
+    for _ in range(10):
+        cache.put("a", ActionResult(exit_code=0, wall_time_s=1))
+    assert server.stats()["connections"] == 1
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda i: cache.put(str(i), ActionResult(exit_code=0, wall_time_s=1)),
+                range(50),
+            )
+        )
+
+    assert server.stats()["connections"] <= 2
+    assert (
+        cache.stats()["remote"]["connections_opened"] == server.stats()["connections"]
+    )
+
+    cache.close()
+
+
+def test_remote_action_cache_prefetches_in_the_background(server):
+    server.put("b", ActionResult(exit_code=0, wall_time_s=1))
+    cache = RemoteActionCache(url=server.url())
+
+    cache.prefetch(["a", "b"])
+    # Waits for the prefetch.
+    cache.close()
+
+    assert server.stats()["exists"] == 1
+    assert cache.contains_many(["a", "b"]) == {"b"}
+    assert server.stats()["exists"] == 1
+    assert cache.stats()["remote"]["prefetched"] == 2
+
+
+def test_remote_action_cache_misses_when_the_server_is_down():
+    server = ActionCacheServer()
+    url = server.url()
+    server.shutdown()
+    cache = RemoteActionCache(url=url, timeout_s=1)
+
+    assert cache.get("a") is None
+    cache.put("a", ActionResult(exit_code=0, wall_time_s=1))
+    assert cache.contains_many(["a"]) == set()
+    assert cache.stats()["remote"]["errors"] == 3
+
+    cache.close()
+
+
+def test_remote_action_cache_rejects_unsupported_urls():
+    with pytest.raises(RemoteCacheError):
+        RemoteActionCache(url="ftp://cache.example.com")
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_with_remote_action_cache(server, algorithm):
+    actions = [
+        Action(sha1="a", duration=3, dependencies=["b", "e"]),
+        Action(sha1="b", duration=2, dependencies=["c"]),
+        Action(sha1="c", duration=1, dependencies=[]),
+        Action(sha1="e", duration=5, dependencies=[]),
+    ]
+    server.put("c", ActionResult(exit_code=0, wall_time_s=1))
+    server.put("e", ActionResult(exit_code=0, wall_time_s=5))
+
+    actions_info = ActionsInfo(actions=actions)
+    cache = RemoteActionCache(url=server.url())
+    result = ActionScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=algorithm,
+        action_result_cache=cache,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).schedule()
+    cache.close()
+
+    assert result["action_execution_history"] == ["b", "a"]
+    assert result["action_cache"]["hits"] == 2
+    assert result["action_cache"]["misses"] == 2
+    assert result["action_cache"]["remote"]["put"] == 2
+
+    # The actions that missed were found missing by existence checks, and
+    # were never looked up one by one.
+    assert server.stats()["get"] == 2
+    assert set(server.results()) == {"a", "b", "c", "e"}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
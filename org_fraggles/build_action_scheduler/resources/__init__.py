@@ -0,0 +1,188 @@
+import time
+from typing import Any, Dict, Set, Tuple
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from org_fraggles.build_action_scheduler.types import Action
+
+# How many ready actions that don't fit in the resources left are skipped,
+# looking for ones that do, before waiting for resources to be released.
+BACKFILL_LOOKAHEAD = 16
+
+
+class ResourceBudget(BaseModel):
+    """The resources shared by the actions executing in parallel."""
+
+    # The number of CPUs. None means unlimited.
+    cpus: int | None = Field(default=None, ge=1)
+
+    # The memory in MB. None means unlimited.
+    memory_mb: int | None = Field(default=None, ge=1)
+
+
+class ResourcePool(BaseModel):
+    """Tracks the resources used by running actions against a budget.
+
+    Actions demanding more than the whole budget are treated as demanding the
+    whole budget, so that they still run, alone. Named exclusive resources
+    are held by at most one action at a time.
+
+    Also measures how much of the capacity was used over time, from the first
+    acquisition to the last release.
+    """
+
+    # The maximum number of actions executing in parallel.
+    parallelism: int
+
+    # The resources shared by running actions.
+    budget: ResourceBudget = ResourceBudget()
+
+    # The number of actions holding resources.
+    _actions_count: int = PrivateAttr(default=0)
+
+    # The number of CPUs in use.
+    _cpus: int = PrivateAttr(default=0)
+
+    # The memory in use, in MB.
+    _memory_mb: int = PrivateAttr(default=0)
+
+    # The exclusive resources in use.
+    _exclusive_resources: Set[str] = PrivateAttr(default_factory=set)
+
+    # The largest amount of each resource in use at once.
+    _peaks: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"slots": 0, "cpus": 0, "memory_mb": 0}
+    )
+
+    # The integral over time of each resource in use, in resource-nanoseconds.
+    _usage_ns: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"slots": 0, "cpus": 0, "memory_mb": 0}
+    )
+
+    # When resources were first acquired, and when the usage last changed.
+    _first_acquisition_ns: int | None = PrivateAttr(default=None)
+    _last_change_ns: int | None = PrivateAttr(default=None)
+
+    def try_acquire(self, action: Action, reserved_for: Action | None = None) -> bool:
+        """Acquires the resources an action demands, if they're available.
+
+        Args:
+            action: The action to acquire resources for.
+            reserved_for: A more critical action that didn't fit, whose
+                resources are kept for it, so that less critical actions
+                filling the budget as it frees up can't starve it.
+
+        Returns:
+            True if the resources were acquired, False if the action doesn't
+            fit in what's left of the budget.
+        """
+        cpus, memory_mb = self._demand(action)
+
+        needed_cpus, needed_memory_mb = cpus, memory_mb
+        if reserved_for is not None:
+            reserved_cpus, reserved_memory_mb = self._demand(reserved_for)
+            needed_cpus += reserved_cpus
+            needed_memory_mb += reserved_memory_mb
+
+            if not set(reserved_for.exclusive_resources).isdisjoint(
+                action.exclusive_resources
+            ):
+                return False
+
+        if (
+            self.budget.cpus is not None and self._cpus + needed_cpus > self.budget.cpus
+        ) or (
+            self.budget.memory_mb is not None
+            and self._memory_mb + needed_memory_mb > self.budget.memory_mb
+        ):
+            return False
+
+        if not self._exclusive_resources.isdisjoint(action.exclusive_resources):
+            return False
+
+        self._record_usage()
+
+        if self._first_acquisition_ns is None:
+            self._first_acquisition_ns = self._last_change_ns
+
+        self._actions_count += 1
+        self._cpus += cpus
+        self._memory_mb += memory_mb
+        self._exclusive_resources.update(action.exclusive_resources)
+
+        self._peaks["slots"] = max(self._peaks["slots"], self._actions_count)
+        self._peaks["cpus"] = max(self._peaks["cpus"], self._cpus)
+        self._peaks["memory_mb"] = max(self._peaks["memory_mb"], self._memory_mb)
+
+        return True
+
+    def release(self, action: Action) -> None:
+        """Releases the resources acquired for an action.
+
+        Args:
+            action: The action to release resources for.
+        """
+        cpus, memory_mb = self._demand(action)
+
+        self._record_usage()
+
+        self._actions_count -= 1
+        self._cpus -= cpus
+        self._memory_mb -= memory_mb
+        self._exclusive_resources.difference_update(action.exclusive_resources)
+
+    def utilization(self) -> Dict[str, Dict[str, Any]]:
+        """Returns how much of each resource was used.
+
+        Returns:
+            For slots (actions executing in parallel), CPUs and memory: the
+            capacity (None if unlimited), the peak usage, the average usage,
+            and the average usage divided by the capacity (None if unlimited).
+        """
+        elapsed_ns = 0
+        if self._first_acquisition_ns is not None:
+            elapsed_ns = self._last_change_ns - self._first_acquisition_ns
+
+        capacities = {
+            "slots": self.parallelism,
+            "cpus": self.budget.cpus,
+            "memory_mb": self.budget.memory_mb,
+        }
+        utilization = {}
+
+        for resource, capacity in capacities.items():
+            average = self._usage_ns[resource] / elapsed_ns if elapsed_ns else 0
+
+            utilization[resource] = {
+                "capacity": capacity,
+                "peak": self._peaks[resource],
+                "average": average,
+                "utilization": average / capacity if capacity else None,
+            }
+
+        return utilization
+
+    def _demand(self, action: Action) -> Tuple[int, int]:
+        """Returns the CPUs and memory an action demands, capped by the budget."""
+        cpus = action.cpus
+        if self.budget.cpus is not None:
+            cpus = min(cpus, self.budget.cpus)
+
+        memory_mb = action.memory_mb
+        if self.budget.memory_mb is not None:
+            memory_mb = min(memory_mb, self.budget.memory_mb)
+
+        return cpus, memory_mb
+
+    def _record_usage(self) -> None:
+        """Adds the resources in use since the last change to the usage integrals."""
+        now_ns = time.monotonic_ns()
+
+        if self._last_change_ns is not None:
+            elapsed_ns = now_ns - self._last_change_ns
+
+            self._usage_ns["slots"] += self._actions_count * elapsed_ns
+            self._usage_ns["cpus"] += self._cpus * elapsed_ns
+            self._usage_ns["memory_mb"] += self._memory_mb * elapsed_ns
+
+        self._last_change_ns = now_ns
@@ -0,0 +1,172 @@
+import sys
+import threading
+import time
+from typing import Dict
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.async_scheduler import AsyncActionScheduler
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.resources import ResourceBudget
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+class UsageTrackingActionExecutor(ActionExecutor):
+    """Tracks the peak resources used by actions executing concurrently."""
+
+    # The resources in use, and their peaks.
+    _usage: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"cpus": 0, "memory_mb": 0, "gpu": 0}
+    )
+    _peaks: Dict[str, int] = PrivateAttr(
+        default_factory=lambda: {"cpus": 0, "memory_mb": 0, "gpu": 0}
+    )
+
+    # Protects the usage.
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _update(self, action: Action, sign: int) -> None:
+        with self._lock:
+            self._usage["cpus"] += sign * action.cpus
+            self._usage["memory_mb"] += sign * action.memory_mb
+            self._usage["gpu"] += sign * ("gpu" in action.exclusive_resources)
+
+            for resource, usage in self._usage.items():
+                self._peaks[resource] = max(self._peaks[resource], usage)
+
+    def execute(self, action: Action) -> ActionResult:
+        self._update(action, 1)
+        time.sleep(0.02)
+        self._update(action, -1)
+
+        return ActionResult(exit_code=0, wall_time_s=0.02)
+
+
+ACTIONS = (
+    [
+        Action(sha1=f"compile-{i}", duration=1, dependencies=[], memory_mb=100)
+        for i in range(6)
+    ]
+    + [
+        Action(
+            sha1=f"link-{i}",
+            duration=5,
+            dependencies=[f"compile-{2 * i}", f"compile-{2 * i + 1}"],
+            cpus=2,
+            memory_mb=600,
+        )
+        for i in range(3)
+    ]
+    + [
+        Action(
+            sha1=f"test-{i}",
+            duration=2,
+            dependencies=[f"link-{i}"],
+            exclusive_resources=("gpu",),
+        )
+        for i in range(3)
+    ]
+)
+
+
+@pytest.mark.parametrize(
+    "scheduler_class,algorithm",
+    [
+        (ActionScheduler, SchedulingAlgorithm.CRITICAL_PATHS),
+        (ActionScheduler, SchedulingAlgorithm.READY_QUEUE),
+        (AsyncActionScheduler, SchedulingAlgorithm.READY_QUEUE),
+    ],
+)
+def test_schedule_within_resource_budget(scheduler_class, algorithm):
+    actions_info = ActionsInfo(actions=ACTIONS)
+    action_executor = UsageTrackingActionExecutor()
+    scheduler = scheduler_class(
+        parallelism=8,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=algorithm,
+        action_executor=action_executor,
+        resource_budget=ResourceBudget(cpus=3, memory_mb=1000),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    report = scheduler.schedule()
+
+    assert "error" not in report
+    assert len(report["action_execution_history"]) == len(ACTIONS)
+    assert action_executor._peaks["cpus"] <= 3
+    assert action_executor._peaks["memory_mb"] <= 1000
+    assert action_executor._peaks["gpu"] == 1
+
+    utilization = report["resource_utilization"]
+    assert utilization["cpus"]["capacity"] == 3
+    assert 0 < utilization["cpus"]["peak"] <= 3
+    assert 0 < utilization["memory_mb"]["utilization"] <= 1
+    assert 0 < utilization["slots"]["utilization"] <= 1
+
+
+@pytest.mark.parametrize("scheduler_class", [ActionScheduler, AsyncActionScheduler])
+def test_large_critical_action_is_not_starved(scheduler_class):
+    # The link is on the critical path, but only becomes ready once the
+    # compile is done, while small actions keep taking the memory freed.
+    actions = [
+        Action(sha1="compile", duration=1, dependencies=[], memory_mb=300),
+        Action(sha1="link", duration=100, dependencies=["compile"], memory_mb=800),
+    ] + [
+        Action(sha1=f"test-{i}", duration=1, dependencies=[], memory_mb=300)
+        for i in range(30)
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    action_executor = UsageTrackingActionExecutor()
+    scheduler = scheduler_class(
+        parallelism=8,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        action_executor=action_executor,
+        resource_budget=ResourceBudget(memory_mb=1000),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    report = scheduler.schedule()
+
+    # The link starts as soon as the small actions running when it became
+    # ready are done.
+    history = report["action_execution_history"]
+    assert history.index("link") <= 4
+    assert action_executor._peaks["memory_mb"] <= 1000
+
+
+def test_schedule_without_resource_budget():
+    actions_info = ActionsInfo(actions=ACTIONS)
+    action_executor = UsageTrackingActionExecutor()
+    scheduler = ActionScheduler(
+        parallelism=8,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        action_executor=action_executor,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    report = scheduler.schedule()
+
+    # Only the exclusive resources limit concurrency.
+    assert action_executor._peaks["memory_mb"] == 1800
+    assert action_executor._peaks["gpu"] == 1
+    assert report["resource_utilization"]["cpus"]["capacity"] is None
+    assert report["resource_utilization"]["slots"]["peak"] == 6
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
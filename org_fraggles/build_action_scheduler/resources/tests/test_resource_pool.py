@@ -0,0 +1,129 @@
+import sys
+import time
+
+import pytest
+
+from org_fraggles.build_action_scheduler.resources import ResourceBudget, ResourcePool
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def _action(sha1, cpus=1, memory_mb=0, exclusive_resources=()):
+    return Action(
+        sha1=sha1,
+        duration=1,
+        dependencies=[],
+        cpus=cpus,
+        memory_mb=memory_mb,
+        exclusive_resources=exclusive_resources,
+    )
+
+
+def test_acquire_within_budget():
+    pool = ResourcePool(parallelism=8, budget=ResourceBudget(cpus=4, memory_mb=1000))
+    link = _action("link", cpus=2, memory_mb=800)
+    compile_1 = _action("compile-1", cpus=1, memory_mb=100)
+    compile_2 = _action("compile-2", cpus=1, memory_mb=200)
+
+    assert pool.try_acquire(link)
+    assert pool.try_acquire(compile_1)
+
+    # Not enough memory left.
+    assert not pool.try_acquire(compile_2)
+
+    pool.release(link)
+
+    assert pool.try_acquire(compile_2)
+
+
+def test_unlimited_budget():
+    pool = ResourcePool(parallelism=8)
+
+    assert all(
+        pool.try_acquire(_action(f"action-{i}", cpus=64, memory_mb=10**6))
+        for i in range(10)
+    )
+
+
+def test_demands_larger_than_budget_run_alone():
+    pool = ResourcePool(parallelism=8, budget=ResourceBudget(cpus=4))
+    huge = _action("huge", cpus=16)
+
+    assert pool.try_acquire(huge)
+    assert not pool.try_acquire(_action("small"))
+
+    pool.release(huge)
+
+    assert pool.try_acquire(_action("small"))
+    assert not pool.try_acquire(huge)
+
+
+def test_exclusive_resources():
+    pool = ResourcePool(parallelism=8)
+    gpu_1 = _action("gpu-1", exclusive_resources=("gpu",))
+    gpu_2 = _action("gpu-2", exclusive_resources=("gpu", "network"))
+
+    assert pool.try_acquire(gpu_1)
+    assert not pool.try_acquire(gpu_2)
+    assert pool.try_acquire(_action("network", exclusive_resources=("network",)))
+
+    pool.release(gpu_1)
+
+    assert not pool.try_acquire(gpu_2)
+
+
+def test_reserved_resources():
+    pool = ResourcePool(parallelism=8, budget=ResourceBudget(memory_mb=1000))
+    link = _action("link", memory_mb=800, exclusive_resources=("network", "disk"))
+
+    assert pool.try_acquire(_action("fetch", exclusive_resources=("network",)))
+    assert not pool.try_acquire(link)
+
+    # Other actions can only use what's left of the budget once the link
+    # starts.
+    assert pool.try_acquire(_action("compile-1", memory_mb=200), reserved_for=link)
+    assert not pool.try_acquire(_action("compile-2", memory_mb=1), reserved_for=link)
+    assert not pool.try_acquire(
+        _action("cleanup", exclusive_resources=("disk",)), reserved_for=link
+    )
+    assert pool.try_acquire(_action("compile-2", memory_mb=1))
+
+
+def test_utilization():
+    pool = ResourcePool(parallelism=4, budget=ResourceBudget(cpus=4))
+    big = _action("big", cpus=4, memory_mb=100)
+    small = _action("small", cpus=2, memory_mb=100)
+
+    assert pool.try_acquire(big)
+    time.sleep(0.05)
+    pool.release(big)
+
+    assert pool.try_acquire(small)
+    time.sleep(0.05)
+    pool.release(small)
+
+    utilization = pool.utilization()
+
+    assert utilization["slots"]["capacity"] == 4
+    assert utilization["slots"]["peak"] == 1
+    assert utilization["slots"]["utilization"] == pytest.approx(0.25, rel=0.1)
+    assert utilization["cpus"]["peak"] == 4
+    assert utilization["cpus"]["utilization"] == pytest.approx(0.75, rel=0.1)
+    assert utilization["memory_mb"]["capacity"] is None
+    assert utilization["memory_mb"]["peak"] == 100
+    assert utilization["memory_mb"]["average"] == pytest.approx(100, rel=0.1)
+    assert utilization["memory_mb"]["utilization"] is None
+
+
+def test_utilization_without_actions():
+    utilization = ResourcePool(parallelism=4).utilization()
+
+    assert utilization["slots"] == {
+        "capacity": 4,
+        "peak": 0,
+        "average": 0,
+        "utilization": 0,
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
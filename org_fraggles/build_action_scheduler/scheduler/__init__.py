@@ -1,34 +1,127 @@
+import heapq
 import logging
-import time
-from collections import defaultdict, deque
-from concurrent.futures import ThreadPoolExecutor
-from threading import Lock
-from typing import Any, Deque, Dict, List, Set
-
-from pydantic import BaseModel, PrivateAttr
-
-from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from array import array
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from queue import Empty, SimpleQueue
+from threading import Lock, get_ident
+from typing import Any, Deque, Dict, List, Set, Tuple
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from org_fraggles.build_action_scheduler.action_cache import ActionCache
+from org_fraggles.build_action_scheduler.actions_info import (
+    ActionIndex,
+    ActionsInfo,
+    CompactActionGraph,
+)
 from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    BottomLevels,
     CriticalPath,
     CriticalPaths,
     DependencyAnalyzer,
     DependencyCycleError,
+    UnknownDependencyError,
+    sort_actions,
+)
+from org_fraggles.build_action_scheduler.duration_history import (
+    DurationHistory,
+    DurationHistoryKey,
+    duration_history_key,
+)
+from org_fraggles.build_action_scheduler.executors import (
+    ActionExecutor,
+    SleepActionExecutor,
 )
-from org_fraggles.build_action_scheduler.types import ActionDuration, ActionSha1
+from org_fraggles.build_action_scheduler.priority_policies import (
+    CriticalPathPriorityPolicy,
+    PriorityPolicy,
+)
+from org_fraggles.build_action_scheduler.progress import Progress, ProgressReporter
+from org_fraggles.build_action_scheduler.resources import (
+    BACKFILL_LOOKAHEAD,
+    ResourceBudget,
+    ResourcePool,
+)
+from org_fraggles.build_action_scheduler.scheduling_trace import (
+    ActionOutcome,
+    SchedulingTrace,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult, ActionSha1
 
 log = logging.getLogger(__name__)
 
 Timestamp = str
 
 
+class SchedulingAlgorithm(str, Enum):
+    """How the scheduler finds the next actions to execute."""
+
+    # Re-scan the priority queue of leaf-to-root paths for ready path heads.
+    CRITICAL_PATHS = "critical_paths"
+
+    # Push actions into a heap keyed by their priorities (by default, their
+    # bottom levels) as soon as their last dependency is done.
+    READY_QUEUE = "ready_queue"
+
+
+class ActionSchedulerError(Exception):
+    """Raised when the scheduler is used in a way it doesn't support."""
+
+    def __init__(self, message: str | None = "") -> None:
+        """Creates an instance of ActionSchedulerError."""
+        super().__init__(message)
+
+
+@dataclass
+class ActionCompletion:
+    """An action execution that is done or has failed, reported by a worker."""
+
+    # The SHA-1 of the action.
+    action_sha1: ActionSha1
+
+    # The result of the action execution, or None if it failed.
+    action_result: ActionResult | None = None
+
+    # A description of the failure, or None if the action execution is done.
+    error: str | None = None
+
+
+@dataclass
+class ActionsSubmission:
+    """Actions added while scheduling, waiting to be added by the dispatcher."""
+
+    # The new actions, dependencies first.
+    actions: List[Action]
+
+    # Resolved once the actions are added, or with the error that prevented it.
+    future: Future = field(default_factory=Future)
+
+
 class ActionScheduler(BaseModel):
+    """Schedules actions for execution, possibly in parallel.
+
+    The thread calling `schedule` is the dispatcher: it exclusively owns the
+    scheduling state (pending dependency counts, ready actions, resources,
+    histories). Workers never touch it. They push an `ActionCompletion` onto
+    a queue when an action execution is done or has failed, and the
+    dispatcher drains the queue in batches, unblocking dependents and
+    submitting the next actions without contending with workers for a lock.
+    """
+
     # The maximum number of actions to be executing in parallel at any given time.
     parallelism: int
 
-    # The interval in seconds to poll for actions ready to be scheduled.
-    action_status_polling_interval_s: int
+    # The maximum interval in seconds to wait for an action execution to be
+    # done before looking for actions ready to be scheduled again. The
+    # scheduler is woken up as soon as an action execution is done, so this
+    # only bounds how long it sleeps without any. Can be sub-second or zero.
+    action_status_polling_interval_s: float
 
-    # Don't actually execute actions (i.e., don't actually sleep).
+    # Don't actually execute actions (i.e., don't actually sleep). Only used
+    # when no `action_executor` is given.
     dry_run: bool
 
     # Actions info.
@@ -37,16 +130,117 @@ class ActionScheduler(BaseModel):
     # The dependency analyzer.
     dependency_analyzer: DependencyAnalyzer
 
+    # The algorithm used to find actions ready to be executed.
+    algorithm: SchedulingAlgorithm = SchedulingAlgorithm.READY_QUEUE
+
+    # Executes each action. Defaults to sleeping for the action duration.
+    action_executor: ActionExecutor | None = None
+
+    # Decides which ready actions are executed first. Only used by the ready
+    # queue algorithm. Defaults to the longest remaining path first.
+    priority_policy: PriorityPolicy | None = None
+
+    # The CPUs and memory shared by running actions, on top of the
+    # `parallelism` slots. Defaults to unlimited.
+    resource_budget: ResourceBudget | None = None
+
+    # Publishes the scheduling progress periodically. Defaults to logging it
+    # every second.
+    progress_reporter: ProgressReporter | None = None
+
+    # Results of previous builds. Actions whose result is cached are credited
+    # as done without being executed, and successful results are cached.
+    action_result_cache: ActionCache | None = None
+
+    # The most actions whose presence in the action result cache is
+    # prefetched after each dispatch round: the not yet ready dependents of
+    # the actions dispatched, with the longest remaining durations first.
+    action_result_cache_prefetch_count: int = Field(default=64, ge=0)
+
+    # Measured durations of previous builds. The wall times of successful
+    # executions are recorded in it, unless in dry-run mode.
+    duration_history: DurationHistory | None = None
+
+    # What identifies actions in the durations history.
+    duration_history_key: DurationHistoryKey = DurationHistoryKey.SHA1
+
     # Priority queue to store paths and their overall durations.
     _critical_paths: CriticalPaths = PrivateAttr(default=None)
 
-    # Keeps track of the number of pending dependencies for each action.
-    _action_pending_dependencies_count: Dict[ActionSha1, int] = PrivateAttr(
-        default=defaultdict(int)
+    # Longest remaining durations for every action.
+    _bottom_levels: BottomLevels = PrivateAttr(default=None)
+
+    # Min-heap of `(-priority, action_index)` tuples for actions with no
+    # pending dependencies, or `(ready_sequence_number, action_index)` without
+    # priorities. Only used by the ready queue algorithm.
+    _ready_queue: List[Tuple[int, ActionIndex]] = PrivateAttr(default_factory=list)
+
+    # The priority of every action from the priority policy, by action index,
+    # or None to execute actions in the order they became ready in.
+    _priorities: array | None = PrivateAttr(default=None)
+
+    # The number of actions pushed onto the ready queue so far.
+    _ready_actions_count: int = PrivateAttr(default=0)
+
+    # The resources used by running actions.
+    _resource_pool: ResourcePool = PrivateAttr(default=None)
+
+    # Number of actions submitted to the executor that haven't finished yet.
+    _actions_in_flight_count: int = PrivateAttr(default=0)
+
+    # Number of action executions that are either done or have failed.
+    _actions_finished_count: int = PrivateAttr(default=0)
+
+    # The total duration of the actions that haven't finished yet.
+    _remaining_work: int = PrivateAttr(default=0)
+
+    # Whether or not actions can be added with `submit_actions`, i.e., the
+    # ready queue algorithm is running and not all actions have finished.
+    _accepting_actions: bool = PrivateAttr(default=False)
+
+    # Error messages for actions whose execution failed.
+    _action_execution_failures: Dict[ActionSha1, str] = PrivateAttr(
+        default_factory=dict
     )
 
+    # Actions that won't be executed because one of their transitive
+    # dependencies failed.
+    _actions_skipped: Set[ActionSha1] = PrivateAttr(default_factory=set)
+
+    # The executor that actions are submitted to while scheduling.
+    _executor: Executor = PrivateAttr(default=None)
+
+    # The integer-indexed dependency graph.
+    _graph: CompactActionGraph = PrivateAttr(default=None)
+
+    # Keeps track of the number of pending dependencies for each action, by
+    # action index.
+    _action_pending_dependencies_count: array = PrivateAttr(default=None)
+
     # Holds the results for actions that have been executed.
-    _action_cache: Dict[ActionSha1, Any] = PrivateAttr(default_factory=dict)
+    _action_cache: Dict[ActionSha1, ActionResult] = PrivateAttr(default_factory=dict)
+
+    # Actions credited as done from the action result cache.
+    _actions_from_action_result_cache: Set[ActionSha1] = PrivateAttr(
+        default_factory=set
+    )
+
+    # Number of action result cache lookups that missed.
+    _action_result_cache_misses: int = PrivateAttr(default=0)
+
+    # Ready actions not checked against the action result cache yet. They're
+    # checked all at once before the next dispatch round.
+    _action_result_cache_unchecked: List[ActionSha1] = PrivateAttr(default_factory=list)
+
+    # Whether or not the action result cache had a result for each ready
+    # action checked, until the action is dispatched.
+    _action_result_cache_presence: Dict[ActionSha1, bool] = PrivateAttr(
+        default_factory=dict
+    )
+
+    # Actions that have been found ready to be executed by scanning the
+    # critical paths. Only used by the critical paths algorithm.
+    _actions_found_ready: Set[ActionSha1] = PrivateAttr(default_factory=set)
 
     # Actions that are running at a certain time.
     _actions_running: Set[ActionSha1] = PrivateAttr(default_factory=set)
@@ -59,17 +253,54 @@ class ActionScheduler(BaseModel):
     # A linear history of action execution ends.
     _action_execution_end_history: List[ActionSha1] = PrivateAttr(default_factory=list)
 
-    _lock: Lock = PrivateAttr()
+    # When actions became ready, started and ended, and on which worker.
+    _trace: SchedulingTrace = PrivateAttr(default=None)
+
+    # Action completions reported by workers, and actions submitted from
+    # other threads, in the order they happened. Only the dispatcher reads
+    # it.
+    _completions: SimpleQueue = PrivateAttr(default_factory=SimpleQueue)
+
+    # The identifier of the dispatcher thread, once scheduling has started.
+    _dispatcher_thread_id: int | None = PrivateAttr(default=None)
+
+    # Held by the dispatcher while it changes what `progress` reads, so that
+    # progress reports (from another thread) are consistent. Also makes
+    # checking whether actions can be added and queueing them atomic.
+    # Workers never take it.
+    _lock: Lock = PrivateAttr(default_factory=Lock)
 
     def __init__(self, **data):
         super().__init__(**data)
 
-        # Set initial number of pending dependencies for each action.
-        self._action_pending_dependencies_count = (
-            self.actions_info.action_dependencies_count
+        self._graph = self.actions_info.compact_graph
+
+        # Set initial number of pending dependencies for each action. Copied
+        # so that the counts in the compact graph can be reused by other
+        # schedulers.
+        self._action_pending_dependencies_count = array(
+            "q", self._graph.dependencies_count
+        )
+
+        self._remaining_work = sum(self._graph.durations)
+
+        if self.action_executor is None:
+            self.action_executor = SleepActionExecutor(dry_run=self.dry_run)
+
+        if self.progress_reporter is None:
+            self.progress_reporter = ProgressReporter()
+
+        if self.priority_policy is None:
+            self.priority_policy = CriticalPathPriorityPolicy()
+
+        if self.resource_budget is None:
+            self.resource_budget = ResourceBudget()
+
+        self._resource_pool = ResourcePool(
+            parallelism=self.parallelism, budget=self.resource_budget
         )
 
-        self._lock = Lock()
+        self._trace = SchedulingTrace(parallelism=self.parallelism)
 
     def schedule(self) -> Dict[str, Any]:
         """Schedules actions for execution, possibly in parallel.
@@ -77,60 +308,417 @@ class ActionScheduler(BaseModel):
         Returns:
             An error dict in case of errors, or a dict containing scheduling results.
         """
-        ready_actions = deque([])
-
         try:
-            self._critical_paths = self.dependency_analyzer.critical_paths()
+            overall_critical_path = self._analyze_dependencies()
         except DependencyCycleError:
             return {"error": "Dependency cycle detected"}
+        except UnknownDependencyError as e:
+            return {"error": str(e)}
+
+        self._dispatcher_thread_id = get_ident()
+        self._prefetch_from_action_result_cache(overall_critical_path[1])
+        self._executor = self._create_executor()
+        self.progress_reporter.start(self.progress)
 
-        overall_critical_path = self._critical_paths.peek()
+        try:
+            if self.algorithm == SchedulingAlgorithm.READY_QUEUE:
+                self._schedule_ready_queue()
+            else:
+                self._schedule_critical_paths()
+
+            self._wait_for_actions_in_flight()
+        finally:
+            self._shutdown_executor()
+            self.progress_reporter.stop()
+
+        return self._build_report(overall_critical_path)
+
+    def progress(self) -> Progress:
+        """Returns how far scheduling has got.
+
+        Only reads counters and the actions that are running or ready, so
+        that it's cheap enough to call periodically while scheduling.
+        """
+        with self._lock:
+            ready_actions = self._trace.ready_actions()
+            bottom_levels = self._bottom_levels.bottom_levels_by_index()
+            index_by_sha1 = self._graph.index_by_sha1
+
+            # Every action that isn't finished is running, ready, or depends
+            # on one that is, so the longest remaining duration among these
+            # is the remaining critical path.
+            remaining_critical_path_s = max(
+                (
+                    bottom_levels[index_by_sha1[action_sha1]]
+                    - self._trace.running_time_ns(action_sha1) / 1e9
+                    for action_sha1 in self._actions_running
+                ),
+                default=0,
+            )
+            remaining_critical_path_s = max(
+                [remaining_critical_path_s, 0]
+                + [
+                    bottom_levels[index_by_sha1[action_sha1]]
+                    for action_sha1 in ready_actions
+                ]
+            )
 
-        with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
-            while not self._critical_paths.empty():
-                for action in self._find_next_ready_actions():
-                    ready_actions.appendleft(action)
+            return Progress(
+                elapsed_s=self._trace.elapsed_ns() / 1e9,
+                total=len(self._graph),
+                running=len(self._actions_running),
+                ready=len(ready_actions),
+                done=len(self._action_cache),
+                failed=len(self._action_execution_failures),
+                skipped=len(self._actions_skipped),
+                remaining_critical_path_s=remaining_critical_path_s,
+                eta_s=max(
+                    remaining_critical_path_s, self._remaining_work / self.parallelism
+                ),
+            )
 
-                actions_submitted = self._submit_as_many_as_possible(
-                    executor, ready_actions
+    def trace(self) -> SchedulingTrace:
+        """Returns when actions became ready, started and ended, and on which worker."""
+        return self._trace
+
+    def submit_actions(self, actions: List[Action]) -> None:
+        """Adds actions to the graph while it's being scheduled.
+
+        Can be called from any thread, e.g., from an action executor that
+        discovers new actions. The new actions may depend on any action,
+        including each other, and only the edges among them are checked for
+        cycles, since existing actions can't depend on them. Actions already
+        ready keep being dispatched, and new actions whose dependencies are
+        all done become ready right away.
+
+        From other threads than the dispatcher, the actions are queued along
+        with action completions, and this blocks until the dispatcher has
+        added them.
+
+        Args:
+            actions: The new actions.
+
+        Raises:
+            ActionSchedulerError: If the scheduler isn't running the ready
+            queue algorithm, or if the actions are invalid.
+        """
+        try:
+            actions = sort_actions(actions)
+        except DependencyCycleError as e:
+            raise ActionSchedulerError("The new actions have a dependency cycle") from e
+
+        submission = ActionsSubmission(actions=actions)
+
+        with self._lock:
+            if not self._accepting_actions:
+                raise ActionSchedulerError(
+                    "Actions can only be added while the ready queue algorithm is"
+                    " running"
                 )
 
-                if len(actions_submitted) == 0:
-                    self._log_current_status()
-                    time.sleep(self.action_status_polling_interval_s)
+            if get_ident() != self._dispatcher_thread_id:
+                self._completions.put(submission)
+
+        if get_ident() == self._dispatcher_thread_id:
+            self._apply_completions([submission])
+        else:
+            self._wake_dispatcher()
+
+        # Raises the error that prevented adding the actions, if any.
+        submission.future.result()
+
+        log.info("Added %s actions", len(actions))
+
+    def _add_submitted_actions(self, submission: ActionsSubmission) -> None:
+        """Adds actions submitted with `submit_actions` to the graph.
+
+        Must be called by the dispatcher, with `self._lock` held.
+
+        Args:
+            submission: The submitted actions, whose future is resolved once
+                they're added, or with the error that prevented it.
+        """
+        try:
+            self._validate_new_actions(submission.actions)
+        except ActionSchedulerError as e:
+            submission.future.set_exception(e)
+            return
+
+        indexes = self.actions_info.add_actions(submission.actions)
+        increased = self._bottom_levels.add_actions(indexes)
+
+        # Only the priorities the new actions affect are updated, so that
+        # streaming submissions don't recompute them all every time.
+        self._priorities, reprioritize = self.priority_policy.update_priorities(
+            self._bottom_levels, self._priorities, indexes, increased
+        )
+
+        for index in indexes:
+            action = self.actions_info.action_at(index)
+
+            if any(
+                dependency in self._actions_skipped
+                or dependency in self._action_execution_failures
+                for dependency in action.dependencies
+            ):
+                self._actions_skipped.add(action.sha1)
+                self._action_pending_dependencies_count.append(len(action.dependencies))
+                continue
+
+            self._remaining_work += action.duration
+
+            # Dependencies might be done already, in which case they won't
+            # decrement the count anymore.
+            pending_dependencies_count = sum(
+                dependency not in self._action_cache
+                for dependency in action.dependencies
+            )
+            self._action_pending_dependencies_count.append(pending_dependencies_count)
+
+            if pending_dependencies_count == 0:
+                self._push_ready_action(index)
+
+        # Actions in the ready queue whose priorities changed must be
+        # reprioritized.
+        if reprioritize:
+            self._ready_queue = [
+                (-self._priorities[index], index) for _, index in self._ready_queue
+            ]
+            heapq.heapify(self._ready_queue)
+
+        submission.future.set_result(None)
+
+    def _validate_new_actions(self, actions: List[Action]) -> None:
+        """Checks that actions can be added to the graph.
+
+        Args:
+            actions: The new actions.
 
-                    continue
+        Raises:
+            ActionSchedulerError: If an action is already in the graph, or
+            depends on an action that isn't in the graph or among the new ones.
+        """
+        new_action_sha1s = set()
+
+        for action in actions:
+            if (
+                action.sha1 in self._graph.index_by_sha1
+                or action.sha1 in new_action_sha1s
+            ):
+                raise ActionSchedulerError(f"Action {action.sha1} already exists")
+
+            new_action_sha1s.add(action.sha1)
+
+        for action in actions:
+            for dependency in action.dependencies:
+                if (
+                    dependency not in self._graph.index_by_sha1
+                    and dependency not in new_action_sha1s
+                ):
+                    raise ActionSchedulerError(
+                        f"Action {action.sha1} depends on unknown action {dependency}"
+                    )
+
+    def _analyze_dependencies(self) -> CriticalPath:
+        """Computes what the scheduling algorithm needs from the dependency analyzer.
 
-        return {
+        Returns:
+            The overall critical path.
+
+        Raises:
+            DependencyCycleError: If there is a dependency cycle.
+        """
+        self._bottom_levels = self.dependency_analyzer.bottom_levels()
+
+        if self.algorithm == SchedulingAlgorithm.CRITICAL_PATHS:
+            self._critical_paths = self.dependency_analyzer.critical_paths()
+        else:
+            self._priorities = self.priority_policy.priorities(self._bottom_levels)
+
+        return self._bottom_levels.critical_path()
+
+    def _build_report(self, overall_critical_path: CriticalPath) -> Dict[str, Any]:
+        """Builds the build report once all actions are done, failed or skipped.
+
+        Args:
+            overall_critical_path: The overall critical path.
+
+        Returns:
+            A dict containing scheduling results, which also contains an error
+            if any action execution failed.
+        """
+        report = {
             "action_execution_history": self._action_execution_start_history,
+            "action_wall_times_s": {
+                action_sha1: action_result.wall_time_s
+                for action_sha1, action_result in self._action_cache.items()
+                if action_sha1 not in self._actions_from_action_result_cache
+            },
             "critical_path": {
                 "duration": overall_critical_path[0],
                 "path": overall_critical_path[1],
             },
+            "resource_utilization": self._resource_pool.utilization(),
         }
 
-    def execute(self, action_sha1: ActionSha1) -> ActionDuration:
-        """Executes a given action.
+        if self.action_result_cache is not None:
+            report["action_cache"] = {
+                "hits": len(self._actions_from_action_result_cache),
+                "misses": self._action_result_cache_misses,
+                **self.action_result_cache.stats(),
+            }
+
+        if self._action_execution_failures:
+            report = {
+                "error": "Action execution failed",
+                "action_execution_failures": self._action_execution_failures,
+                "actions_skipped": sorted(self._actions_skipped),
+                **report,
+            }
+
+        return report
+
+    def _create_executor(self) -> Executor:
+        """Creates the executor that actions are submitted to."""
+        return ThreadPoolExecutor(max_workers=self.parallelism)
+
+    def _shutdown_executor(self) -> None:
+        """Shuts down the executor, waiting for running actions to finish."""
+        self._executor.shutdown(wait=True)
+
+    def _submit_action(self, action_sha1: ActionSha1) -> None:
+        """Submits an action for execution.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+        """
+        self._executor.submit(self.execute, action_sha1)
+
+    def _schedule_critical_paths(self) -> None:
+        """Submits actions by repeatedly scanning the critical paths for ready heads."""
+        ready_actions = deque([])
+
+        # Actions found ready are submitted as capacity frees up, even once
+        # their paths have all been consumed.
+        while not self._critical_paths.empty() or ready_actions:
+            for action in self._find_next_ready_actions():
+                ready_actions.appendleft(action)
+
+            actions_submitted = self._submit_as_many_as_possible(ready_actions)
+
+            # Unless actions were credited from the action result cache, which
+            # can make others ready, nothing changes until a completion.
+            can_submit_more = actions_submitted and self._actions_in_flight_count < (
+                self.parallelism
+            )
+            self._process_completions(
+                0 if can_submit_more else self.action_status_polling_interval_s
+            )
+
+    def _schedule_ready_queue(self) -> None:
+        """Submits actions from the ready queue until all actions are done.
+
+        The ready queue starts with the actions that have no dependencies and
+        is then fed as completions are processed, so each iteration only pays
+        for the actions that were unblocked since the previous one.
+        """
+        self._push_initial_ready_actions()
+
+        while not self._all_actions_finished():
+            actions_submitted = self._submit_from_ready_queue()
+
+            # Unless actions were credited from the action result cache, which
+            # can make others ready, nothing changes until a completion.
+            can_submit_more = (
+                actions_submitted
+                and self._ready_queue
+                and self._actions_in_flight_count < self.parallelism
+            )
+            self._process_completions(
+                0 if can_submit_more else self.action_status_polling_interval_s
+            )
+
+    def _all_actions_finished(self) -> bool:
+        """Returns True if every action is done, has failed or was skipped.
+
+        Once it has returned True, actions can no longer be added, so that
+        they can't be added after the scheduler stopped looking for them.
+        Actions submitted but not added yet are still in the completions
+        queue, so it must be empty too.
+        """
+        with self._lock:
+            if (
+                self._actions_finished_count + len(self._actions_skipped)
+                < len(self._graph)
+                or not self._completions.empty()
+            ):
+                return False
+
+            self._accepting_actions = False
+
+            return True
+
+    def _process_completions(self, timeout_s: float | None) -> int:
+        """Waits for completions, then applies every queued completion at once.
 
-        For now, all actions are "sleep" actions, so executing them means
-        sleeping for their duration.
+        Returns as soon as a completion is queued, so the polling interval
+        only bounds how long the dispatcher sleeps without any. Applying a
+        batch takes `self._lock` once, however many completions it has.
 
         Args:
-            action: The action to execute.
+            timeout_s: How long to wait for the first completion, or None to
+                wait until there's one. Zero doesn't wait.
 
         Returns:
-            The duration of the action.
+            The number of completions applied.
         """
-        self._on_action_execution_start(action_sha1)
+        try:
+            completions = [self._completions.get(timeout=timeout_s)]
+        except Empty:
+            return 0
+
+        try:
+            while True:
+                completions.append(self._completions.get_nowait())
+        except Empty:
+            pass
+
+        self._apply_completions(completions)
+
+        return len(completions)
+
+    def _wait_for_actions_in_flight(self) -> None:
+        """Blocks until all submitted actions are done or have failed."""
+        while self._actions_in_flight_count > 0:
+            self._process_completions(None)
+
+    def _wake_dispatcher(self) -> None:
+        """Wakes the dispatcher up after something was queued for it.
+
+        A no-op here, since the dispatcher waits on the completions queue
+        itself.
+        """
+
+    def execute(self, action_sha1: ActionSha1) -> ActionResult:
+        """Executes a given action with the action executor.
 
-        duration = self.actions_info.actions_by_sha1[action_sha1].duration
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
 
-        if not self.dry_run:
-            time.sleep(duration)
+        Returns:
+            The result of the action execution.
+        """
+        try:
+            action_result = self.action_executor.execute(
+                self.actions_info.actions_by_sha1[action_sha1]
+            )
+        except Exception as e:
+            self._on_action_execution_failed(action_sha1, repr(e))
+            raise
 
-        self._on_action_execution_done(action_sha1, duration)
+        self._on_action_execution_result(action_sha1, action_result)
 
-        return duration
+        return action_result
 
     def _find_next_ready_actions(self) -> List[ActionSha1]:
         """Iterates over the critical paths and returns the actions that are ready to be executed.
@@ -141,9 +729,6 @@ class ActionScheduler(BaseModel):
             A list of actions that are ready to be executed.
         """
         ready_actions = []
-        # NOTE: using a set in conjunction with a list to ensure that there are
-        # no duplicates in the returned actions.
-        ready_actions_set = set()
 
         # These will be paths whose first action is not ready to be executed
         # yet.
@@ -155,56 +740,308 @@ class ActionScheduler(BaseModel):
 
             maybe_ready_action = path[0]
 
-            if maybe_ready_action in self._action_cache:
+            # The rest of the path depends on an action that failed, so none
+            # of it will be executed.
+            if (
+                maybe_ready_action in self._action_execution_failures
+                or maybe_ready_action in self._actions_skipped
+            ):
+                continue
+
+            # NOTE: paths share actions, so an action might have already been
+            # found ready through another path, in this or a previous call.
+            if (
+                maybe_ready_action in self._action_cache
+                or maybe_ready_action in self._actions_found_ready
+            ):
                 self._reinsert_critical_path_tail(current_critical_path)
 
                 continue
 
-            if self._action_pending_dependencies_count[maybe_ready_action] > 0:
+            if (
+                self._action_pending_dependencies_count[
+                    self._graph.index_by_sha1[maybe_ready_action]
+                ]
+                > 0
+            ):
                 critical_paths_not_ready.append(current_critical_path)
                 continue
 
-            if maybe_ready_action not in ready_actions_set:
-                with self._lock:
-                    ready_actions.append(maybe_ready_action)
-                    ready_actions_set.add(maybe_ready_action)
+            with self._lock:
+                ready_actions.append(maybe_ready_action)
+                self._actions_found_ready.add(maybe_ready_action)
+                self._trace.on_enqueue(maybe_ready_action)
 
-                    self._reinsert_critical_path_tail(current_critical_path)
+                if self.action_result_cache is not None:
+                    self._action_result_cache_unchecked.append(maybe_ready_action)
 
-        with self._lock:
-            for critical_path in critical_paths_not_ready:
-                self._critical_paths.push(critical_path)
+                self._reinsert_critical_path_tail(current_critical_path)
+
+        for critical_path in critical_paths_not_ready:
+            self._critical_paths.push(critical_path)
 
         return ready_actions
 
     def _submit_as_many_as_possible(
-        self, executor: ThreadPoolExecutor, action_sha1s: Deque[ActionSha1]
+        self, action_sha1s: Deque[ActionSha1]
     ) -> List[ActionSha1]:
         """Submits as many actions as possible to the executor based on its current capacity.
 
+        Actions that don't fit in the resources left stay in `action_sha1s`,
+        in the same order, and the next ones that fit are submitted instead,
+        up to `BACKFILL_LOOKAHEAD` of them. They can't take the resources of
+        the first action that didn't fit, so that it can't starve.
+
         Args:
-            executor: The executor to submit actions to.
-            action_sha1s: The actions to submit.
+            action_sha1s: The actions to submit, the next one at the end.
 
         Returns:
             The list of actions that have been submitted.
         """
+        self._check_ready_actions_in_action_result_cache()
+
         current_capacity = self.parallelism - len(self._actions_running)
 
         actions_to_run = []
+        actions_not_fitting = []
+        blocked_action = None
+
+        while (
+            action_sha1s
+            and len(actions_to_run) < current_capacity
+            and len(actions_not_fitting) < BACKFILL_LOOKAHEAD
+        ):
+            action_to_run = action_sha1s.pop()
+            action = self.actions_info.actions_by_sha1[action_to_run]
 
-        for _ in range(0, current_capacity):
-            if len(action_sha1s) == 0:
-                break
+            if not self._resource_pool.try_acquire(action, blocked_action):
+                actions_not_fitting.append(action_to_run)
+                if blocked_action is None:
+                    blocked_action = action
+                continue
+
+            self._actions_in_flight_count += 1
 
-            action_to_run = action_sha1s.pop()
             actions_to_run.append(action_to_run)
-            executor.submit(self.execute, action_to_run)
+            self._submit_action_unless_cached(action_to_run)
+
+        action_sha1s.extend(reversed(actions_not_fitting))
+
+        self._prefetch_dependents_from_action_result_cache(actions_to_run)
+
+        return actions_to_run
+
+    def _submit_from_ready_queue(self) -> List[ActionSha1]:
+        """Submits the ready actions with the highest priorities based on the current capacity.
+
+        Returns:
+            The list of actions that have been submitted.
+        """
+        self._check_ready_actions_in_action_result_cache()
+
+        actions_to_run = self._pop_ready_actions(
+            self.parallelism - self._actions_in_flight_count
+        )
+        self._actions_in_flight_count += len(actions_to_run)
+
+        for action_to_run in actions_to_run:
+            self._submit_action_unless_cached(action_to_run)
+
+        self._prefetch_dependents_from_action_result_cache(actions_to_run)
 
         return actions_to_run
 
+    def _submit_action_unless_cached(self, action_sha1: ActionSha1) -> None:
+        """Submits an action for execution, unless its result is cached.
+
+        The action must already be counted as in flight. Its execution start
+        is recorded here, by the dispatcher, rather than by the worker.
+        Actions whose result is cached are credited as done right away.
+
+        Args:
+            action_sha1: The SHA-1 of the action to execute.
+        """
+        cached_action_result = self._get_cached_action_result(action_sha1)
+
+        if cached_action_result is None:
+            self._on_action_execution_start(action_sha1)
+            self._submit_action(action_sha1)
+        else:
+            self._apply_completions(
+                [
+                    ActionCompletion(
+                        action_sha1=action_sha1, action_result=cached_action_result
+                    )
+                ]
+            )
+
+    def _get_cached_action_result(self, action_sha1: ActionSha1) -> ActionResult | None:
+        """Looks an action up in the action result cache, if there's one.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+
+        Returns:
+            The cached result of the action, or None.
+        """
+        if self.action_result_cache is None:
+            return None
+
+        # Actions the batched check found missing aren't looked up again.
+        if self._action_result_cache_presence.pop(action_sha1, None) is False:
+            cached_action_result = None
+        else:
+            cached_action_result = self.action_result_cache.get(action_sha1)
+
+        if cached_action_result is None:
+            self._action_result_cache_misses += 1
+        else:
+            self._actions_from_action_result_cache.add(action_sha1)
+
+        return cached_action_result
+
+    def _check_ready_actions_in_action_result_cache(self) -> None:
+        """Checks the ready actions not checked yet against the action result cache.
+
+        Takes a single `contains_many` call, however many actions became
+        ready since the previous dispatch round. Must be called by the
+        dispatcher.
+        """
+        if not self._action_result_cache_unchecked:
+            return
+
+        action_sha1s = self._action_result_cache_unchecked
+        self._action_result_cache_unchecked = []
+
+        present = self.action_result_cache.contains_many(action_sha1s)
+
+        for action_sha1 in action_sha1s:
+            self._action_result_cache_presence[action_sha1] = action_sha1 in present
+
+    def _prefetch_dependents_from_action_result_cache(
+        self, action_sha1s: List[ActionSha1]
+    ) -> None:
+        """Prefetches the presence of the dependents of dispatched actions.
+
+        They're the actions most likely to become ready next, so the most
+        critical ones are prefetched, up to `action_result_cache_prefetch_count`.
+
+        Args:
+            action_sha1s: The SHA-1s of the actions just dispatched.
+        """
+        if self.action_result_cache is None or not action_sha1s:
+            return
+
+        dependents = {
+            self._graph.sha1s[dependent]
+            for action_sha1 in action_sha1s
+            for dependent in self._graph.dependents_of(
+                self._graph.index_by_sha1[action_sha1]
+            )
+        }
+
+        self._prefetch_from_action_result_cache(
+            sorted(dependents, key=self._bottom_levels.bottom_level, reverse=True)
+        )
+
+    def _prefetch_from_action_result_cache(
+        self, action_sha1s: List[ActionSha1]
+    ) -> None:
+        """Hints the action result cache at actions that will be looked up soon.
+
+        Args:
+            action_sha1s: The SHA-1s of the actions, the most urgent first.
+                Only the first `action_result_cache_prefetch_count` ones are
+                prefetched.
+        """
+        if (
+            self.action_result_cache is None
+            or self.action_result_cache_prefetch_count == 0
+        ):
+            return
+
+        self.action_result_cache.prefetch(
+            action_sha1s[: self.action_result_cache_prefetch_count]
+        )
+
+    def _push_initial_ready_actions(self) -> None:
+        """Pushes the actions with no dependencies onto the ready queue.
+
+        From then on, actions can be added with `submit_actions`.
+        """
+        with self._lock:
+            for index, pending_dependencies_count in enumerate(
+                self._action_pending_dependencies_count
+            ):
+                if pending_dependencies_count == 0:
+                    self._push_ready_action(index)
+
+            self._accepting_actions = True
+
+    def _push_ready_action(self, index: ActionIndex) -> None:
+        """Pushes an action with no pending dependencies onto the ready queue.
+
+        Must be called with `self._lock` held.
+
+        Args:
+            index: The index of the action that is ready to be executed.
+        """
+        if self._priorities is None:
+            key = self._ready_actions_count
+        else:
+            key = -self._priorities[index]
+
+        heapq.heappush(self._ready_queue, (key, index))
+        self._ready_actions_count += 1
+        self._trace.on_enqueue(self._graph.sha1s[index])
+
+        if self.action_result_cache is not None:
+            self._action_result_cache_unchecked.append(self._graph.sha1s[index])
+
+    def _pop_ready_actions(self, max_count: int) -> List[ActionSha1]:
+        """Pops the ready actions with the highest priorities that fit in the resources left.
+
+        Acquires their resources. Actions that don't fit stay in the ready
+        queue, and the next ones that fit are popped instead, up to
+        `BACKFILL_LOOKAHEAD` of them. They can't take the resources of the
+        first action that didn't fit, so that it can't starve.
+
+        Must be called by the dispatcher.
+
+        Args:
+            max_count: The maximum number of actions to pop.
+
+        Returns:
+            The SHA-1s of the actions, highest priority first.
+        """
+        action_sha1s = []
+        entries_not_fitting = []
+        blocked_action = None
+
+        while (
+            self._ready_queue
+            and len(action_sha1s) < max_count
+            and len(entries_not_fitting) < BACKFILL_LOOKAHEAD
+        ):
+            entry = heapq.heappop(self._ready_queue)
+            action = self.actions_info.action_at(entry[1])
+
+            if self._resource_pool.try_acquire(action, blocked_action):
+                action_sha1s.append(action.sha1)
+            else:
+                entries_not_fitting.append(entry)
+                if blocked_action is None:
+                    blocked_action = action
+
+        for entry in entries_not_fitting:
+            heapq.heappush(self._ready_queue, entry)
+
+        return action_sha1s
+
     def _on_action_execution_start(self, action_sha1: ActionSha1) -> None:
-        """Callback function to be called when an action execution is started.
+        """Records that an action execution started.
+
+        Must be called by the dispatcher.
 
         Args:
             action_sha1: The SHA-1 of the action that has been started.
@@ -215,32 +1052,209 @@ class ActionScheduler(BaseModel):
 
             # Record action execution start in linearizable history.
             self._action_execution_start_history.append(action_sha1)
+            self._trace.on_start(action_sha1)
+
+    def _on_action_execution_result(
+        self, action_sha1: ActionSha1, action_result: ActionResult
+    ) -> None:
+        """Callback function to be called with the result of an action execution.
+
+        Called by workers. Storing the result in the action result cache and
+        the duration history happens here, off the dispatcher. Failing to
+        store it is logged, and doesn't fail the action: the dispatcher waits
+        for its completion either way.
 
-            self._log_current_status()
+        Args:
+            action_sha1: The SHA-1 of the action that has been executed.
+            action_result: The result of the action execution.
+        """
+        if action_result.exit_code == 0:
+            if self.action_result_cache is not None:
+                try:
+                    self.action_result_cache.put(action_sha1, action_result)
+                except Exception:
+                    log.exception("Caching the result of action %s failed", action_sha1)
+
+            if self.duration_history is not None and not self.dry_run:
+                try:
+                    self.duration_history.record(
+                        duration_history_key(
+                            self.actions_info.actions_by_sha1[action_sha1],
+                            self.duration_history_key,
+                        ),
+                        action_result.wall_time_s,
+                    )
+                except Exception:
+                    log.exception(
+                        "Recording the duration of action %s failed", action_sha1
+                    )
+
+            self._on_action_execution_done(action_sha1, action_result)
+        else:
+            self._on_action_execution_failed(
+                action_sha1, f"Exited with code {action_result.exit_code}"
+            )
 
     def _on_action_execution_done(
-        self, action_sha1: ActionSha1, action_output: Any
+        self, action_sha1: ActionSha1, action_output: ActionResult
     ) -> None:
         """Callback function to be called when an action execution is done.
 
+        Can be called from any thread: the completion is handed to the
+        dispatcher.
+
         Args:
             action_sha1: The SHA-1 of the action that has been executed.
+            action_output: The result of the action execution.
+        """
+        self._report_completion(
+            ActionCompletion(action_sha1=action_sha1, action_result=action_output)
+        )
+
+    def _on_action_execution_failed(self, action_sha1: ActionSha1, error: str) -> None:
+        """Callback function to be called when an action execution fails.
+
+        Can be called from any thread: the completion is handed to the
+        dispatcher.
+
+        Args:
+            action_sha1: The SHA-1 of the action that failed.
+            error: A description of the failure.
+        """
+        self._report_completion(ActionCompletion(action_sha1=action_sha1, error=error))
+
+    def _report_completion(self, completion: ActionCompletion) -> None:
+        """Hands a completion to the dispatcher.
+
+        The dispatcher applies it right away. Other threads queue it, without
+        taking any lock.
+
+        Args:
+            completion: The action completion.
+        """
+        if get_ident() == self._dispatcher_thread_id:
+            self._apply_completions([completion])
+        else:
+            self._completions.put(completion)
+
+        self._wake_dispatcher()
+
+    def _apply_completions(
+        self, completions: List[ActionCompletion | ActionsSubmission]
+    ) -> None:
+        """Applies completions and submissions to the scheduling state, in order.
+
+        Must be called by the dispatcher.
+
+        Args:
+            completions: The completions, and the actions submitted from other
+                threads.
         """
         with self._lock:
-            # Record action execution end in linearizable history.
-            self._action_execution_end_history.append(action_sha1)
+            for completion in completions:
+                if isinstance(completion, ActionsSubmission):
+                    self._add_submitted_actions(completion)
+                elif completion.error is None:
+                    self._complete_action_execution(
+                        completion.action_sha1, completion.action_result
+                    )
+                else:
+                    self._fail_action_execution(
+                        completion.action_sha1, completion.error
+                    )
+
+    def _complete_action_execution(
+        self, action_sha1: ActionSha1, action_output: ActionResult
+    ) -> None:
+        """Records that an action execution is done, unblocking its dependents.
+
+        Must be called by the dispatcher, with `self._lock` held.
+
+        Args:
+            action_sha1: The SHA-1 of the action that has been executed.
+            action_output: The result of the action execution.
+        """
+        # Record action execution end in linearizable history.
+        self._action_execution_end_history.append(action_sha1)
+        self._trace.on_end(
+            action_sha1,
+            (
+                ActionOutcome.CACHED
+                if action_sha1 in self._actions_from_action_result_cache
+                else ActionOutcome.DONE
+            ),
+        )
+
+        # Cache the result of the action.
+        self._action_cache[action_sha1] = action_output
+
+        index = self._graph.index_by_sha1[action_sha1]
+        self._remaining_work -= self._graph.durations[index]
+
+        # Remove the action from the set of running actions.
+        self._actions_running.discard(action_sha1)
+        self._resource_pool.release(self.actions_info.actions_by_sha1[action_sha1])
+
+        # Decrement the pending dependencies count for all dependents of the action.
+        pending_dependencies_count = self._action_pending_dependencies_count
+        push_ready_actions = self.algorithm == SchedulingAlgorithm.READY_QUEUE
 
-            # Cache the result of the action.
-            self._action_cache[action_sha1] = action_output
+        for dependent in self._graph.dependents_of(index):
+            pending_dependencies_count[dependent] -= 1
 
-            # Remove the action from the set of running actions.
-            self._actions_running.discard(action_sha1)
+            if push_ready_actions and pending_dependencies_count[dependent] == 0:
+                self._push_ready_action(dependent)
 
-            # Decrement the pending dependencies count for all dependents of the action.
-            for dependent in self.actions_info.action_dependents[action_sha1]:
-                self._action_pending_dependencies_count[dependent] -= 1
+        self._actions_in_flight_count -= 1
+        self._actions_finished_count += 1
 
-            self._log_current_status()
+    def _fail_action_execution(self, action_sha1: ActionSha1, error: str) -> None:
+        """Records that an action execution failed.
+
+        Dependents of a failed action are never unblocked, so all of its
+        transitive dependents are skipped. Independent actions keep going.
+
+        Must be called by the dispatcher, with `self._lock` held.
+
+        Args:
+            action_sha1: The SHA-1 of the action that failed.
+            error: A description of the failure.
+        """
+        self._action_execution_failures[action_sha1] = error
+        self._remaining_work -= self._graph.durations[
+            self._graph.index_by_sha1[action_sha1]
+        ]
+        self._trace.on_end(action_sha1, ActionOutcome.FAILED)
+
+        # Remove the action from the set of running actions.
+        self._actions_running.discard(action_sha1)
+        self._resource_pool.release(self.actions_info.actions_by_sha1[action_sha1])
+
+        self._skip_transitive_dependents(action_sha1)
+
+        self._actions_in_flight_count -= 1
+        self._actions_finished_count += 1
+
+        log.error("Action %s failed: %s", action_sha1, error)
+
+    def _skip_transitive_dependents(self, action_sha1: ActionSha1) -> None:
+        """Marks all transitive dependents of an action as skipped.
+
+        Must be called with `self._lock` held.
+
+        Args:
+            action_sha1: The SHA-1 of the action that failed.
+        """
+        stack = [self._graph.index_by_sha1[action_sha1]]
+
+        while stack:
+            for dependent in self._graph.dependents_of(stack.pop()):
+                dependent_sha1 = self._graph.sha1s[dependent]
+
+                if dependent_sha1 not in self._actions_skipped:
+                    self._actions_skipped.add(dependent_sha1)
+                    self._remaining_work -= self._graph.durations[dependent]
+                    stack.append(dependent)
 
     def _reinsert_critical_path_tail(self, critical_path: CriticalPath) -> None:
         """Removes the action at the head of the critical path (and its duration).
@@ -260,20 +1274,8 @@ class ActionScheduler(BaseModel):
 
         self._critical_paths.push(
             (
-                duration - self.actions_info.actions_by_sha1[action_executed].duration,
+                duration
+                - self._graph.durations[self._graph.index_by_sha1[action_executed]],
                 path[1:],
             )
         )
-
-    def _log_current_status(self) -> None:
-        """Logs the currently running and currently done actions."""
-        actions_running_prefix = ": " if self._actions_running else ""
-        actions_done_prefix = (
-            " | actions done: " if self._action_execution_end_history else ""
-        )
-        log.info(
-            "%s actions running%s%s",
-            len(self._actions_running),
-            f"{actions_running_prefix}{", ".join(self._actions_running)}",
-            f"{actions_done_prefix}{", ".join(self._action_execution_end_history)}",
-        )
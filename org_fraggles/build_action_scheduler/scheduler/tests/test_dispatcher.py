@@ -0,0 +1,116 @@
+import sys
+import threading
+import time
+from typing import List
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionCompletion,
+    ActionScheduler,
+    ActionsSubmission,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+
+class RecordingLock:
+    """A lock recording the names of the threads acquiring it."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.thread_names = set()
+
+    def __enter__(self) -> bool:
+        self.thread_names.add(threading.current_thread().name)
+        return self.lock.__enter__()
+
+    def __exit__(self, *args) -> None:
+        self.lock.__exit__(*args)
+
+
+class BatchRecordingActionScheduler(ActionScheduler):
+    """Records the size of every batch of completions, slowing the first one down."""
+
+    _batch_sizes: List[int] = PrivateAttr(default_factory=list)
+
+    def _apply_completions(
+        self, completions: List[ActionCompletion | ActionsSubmission]
+    ) -> None:
+        self._batch_sizes.append(len(completions))
+
+        # Let the other workers finish while the first batch is applied.
+        if len(self._batch_sizes) == 1:
+            time.sleep(0.2)
+
+        super()._apply_completions(completions)
+
+
+def _actions_info(actions_count: int) -> ActionsInfo:
+    return ActionsInfo(
+        actions=[
+            Action(sha1=f"a{i}", duration=1, dependencies=[])
+            for i in range(actions_count)
+        ]
+        + [
+            Action(
+                sha1="link",
+                duration=1,
+                dependencies=[f"a{i}" for i in range(actions_count)],
+            )
+        ]
+    )
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_workers_never_take_the_scheduler_lock(algorithm):
+    actions_info = _actions_info(32)
+    scheduler = ActionScheduler(
+        parallelism=8,
+        action_status_polling_interval_s=60,
+        dry_run=True,
+        algorithm=algorithm,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+    lock = RecordingLock()
+    scheduler._lock = lock
+
+    report = scheduler.schedule()
+
+    assert "error" not in report
+    assert report["action_execution_history"][-1] == "link"
+    assert len(report["action_execution_history"]) == 33
+    assert lock.thread_names
+    assert not any(
+        thread_name.startswith("ThreadPoolExecutor")
+        for thread_name in lock.thread_names
+    )
+
+
+def test_completions_applied_in_batches():
+    actions_info = _actions_info(4)
+    scheduler = BatchRecordingActionScheduler(
+        parallelism=4,
+        action_status_polling_interval_s=60,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    report = scheduler.schedule()
+
+    assert "error" not in report
+    # The four independent actions end up in at most two batches, then the
+    # action depending on all of them.
+    assert sum(scheduler._batch_sizes) == 5
+    assert len(scheduler._batch_sizes) <= 3
+    assert scheduler._batch_sizes[-1] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
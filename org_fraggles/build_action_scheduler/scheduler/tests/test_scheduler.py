@@ -1,8 +1,14 @@
+import time
+
 import pytest
 
 from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
 from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
-from org_fraggles.build_action_scheduler.scheduler import ActionScheduler
+from org_fraggles.build_action_scheduler.executors import SubprocessActionExecutor
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
 from org_fraggles.build_action_scheduler.types import Action
 
 
@@ -42,5 +48,101 @@ def test_schedule_simple(action_scheduler):
     assert result["critical_path"]["path"] == ["e", "a"]
 
 
+def test_schedule_ready_queue(actions_info, dependency_analyzer):
+    action_scheduler = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    )
+    result = action_scheduler.schedule()
+    assert "error" not in result
+    assert result["action_execution_history"] == ["e", "c", "b", "a"]
+    assert result["critical_path"]["duration"] == 8
+    assert result["critical_path"]["path"] == ["e", "a"]
+
+
+def test_schedule_algorithms_share_actions_info(actions_info, dependency_analyzer):
+    for algorithm in SchedulingAlgorithm:
+        result = ActionScheduler(
+            parallelism=2,
+            action_status_polling_interval_s=1,
+            dry_run=True,
+            algorithm=algorithm,
+            actions_info=actions_info,
+            dependency_analyzer=dependency_analyzer,
+        ).schedule()
+        assert sorted(result["action_execution_history"]) == ["a", "b", "c", "e"]
+
+
+@pytest.mark.parametrize("polling_interval_s", [60, 0.01, 0])
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_wakes_up_on_action_execution_done(
+    actions_info, dependency_analyzer, algorithm, polling_interval_s
+):
+    action_scheduler = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=polling_interval_s,
+        dry_run=True,
+        algorithm=algorithm,
+        actions_info=actions_info,
+        dependency_analyzer=dependency_analyzer,
+    )
+
+    start = time.monotonic()
+    result = action_scheduler.schedule()
+
+    assert time.monotonic() - start < 5
+    assert sorted(result["action_execution_history"]) == ["a", "b", "c", "e"]
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_failed_action_skips_dependents(algorithm):
+    actions = [
+        Action(sha1="a", duration=1, dependencies=["b"], command="true"),
+        Action(sha1="b", duration=1, dependencies=["c"], command="exit 1"),
+        Action(sha1="c", duration=1, dependencies=[], command="true"),
+        Action(sha1="d", duration=1, dependencies=["c"], command="true"),
+        Action(sha1="e", duration=1, dependencies=["d"], command="true"),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    action_scheduler = ActionScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=1,
+        dry_run=False,
+        algorithm=algorithm,
+        action_executor=SubprocessActionExecutor(),
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+    result = action_scheduler.schedule()
+    assert result["error"] == "Action execution failed"
+    assert result["action_execution_failures"] == {"b": "Exited with code 1"}
+    assert result["actions_skipped"] == ["a"]
+    assert sorted(result["action_execution_history"]) == ["b", "c", "d", "e"]
+    assert sorted(result["action_wall_times_s"]) == ["c", "d", "e"]
+
+
+@pytest.mark.parametrize("algorithm", list(SchedulingAlgorithm))
+def test_schedule_reports_unknown_dependencies(algorithm):
+    actions_info = ActionsInfo(
+        actions=[Action(sha1="a", duration=1, dependencies=["zz"])]
+    )
+    action_scheduler = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=algorithm,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    assert action_scheduler.schedule() == {
+        "error": "Action a depends on unknown action zz"
+    }
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,171 @@
+import sys
+from typing import Any, Dict, List
+
+import pytest
+from pydantic import PrivateAttr
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.async_scheduler import AsyncActionScheduler
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.executors import ActionExecutor
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    ActionSchedulerError,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.types import Action, ActionResult
+
+
+class DiscoveringActionExecutor(ActionExecutor):
+    """Adds actions to the scheduler when executing some actions."""
+
+    # The actions discovered by executing each action.
+    discovered_actions: Dict[str, List[Action]] = {}
+
+    # The actions that fail.
+    failing_actions: List[str] = []
+
+    # The scheduler that the discovered actions are added to.
+    _scheduler: Any = PrivateAttr(default=None)
+
+    # The errors raised when adding actions.
+    _errors: List[Exception] = PrivateAttr(default_factory=list)
+
+    def execute(self, action: Action) -> ActionResult:
+        if action.sha1 in self.discovered_actions:
+            try:
+                self._scheduler.submit_actions(self.discovered_actions[action.sha1])
+            except ActionSchedulerError as e:
+                self._errors.append(e)
+
+        return ActionResult(
+            exit_code=int(action.sha1 in self.failing_actions), wall_time_s=0
+        )
+
+
+def _schedule(scheduler_class, actions, action_executor):
+    actions_info = ActionsInfo(actions=actions)
+    scheduler = scheduler_class(
+        parallelism=4,
+        action_status_polling_interval_s=5,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        action_executor=action_executor,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+    action_executor._scheduler = scheduler
+
+    return scheduler.schedule()
+
+
+def _assert_dependencies_first(report, actions):
+    position = {sha1: i for i, sha1 in enumerate(report["action_execution_history"])}
+
+    for action in actions:
+        for dependency in action.dependencies:
+            assert position[dependency] < position[action.sha1]
+
+
+@pytest.mark.parametrize("scheduler_class", [ActionScheduler, AsyncActionScheduler])
+def test_submit_actions_while_scheduling(scheduler_class):
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="gen", duration=1, dependencies=["a"]),
+        Action(sha1="b", duration=1, dependencies=["a"]),
+        Action(sha1="link", duration=1, dependencies=["b", "gen"]),
+    ]
+    discovered_actions = [
+        # Depends on an action that is done, and on another new action.
+        Action(sha1="compile-2", duration=1, dependencies=["a", "compile-1"]),
+        Action(sha1="compile-1", duration=1, dependencies=["gen"]),
+        Action(sha1="compile-3", duration=1, dependencies=["a"]),
+    ]
+    action_executor = DiscoveringActionExecutor(
+        discovered_actions={"gen": discovered_actions}
+    )
+
+    report = _schedule(scheduler_class, actions, action_executor)
+
+    assert "error" not in report
+    assert not action_executor._errors
+    assert sorted(report["action_execution_history"]) == sorted(
+        action.sha1 for action in actions + discovered_actions
+    )
+    _assert_dependencies_first(report, actions + discovered_actions)
+
+
+def test_submit_actions_depending_on_failed_action():
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="gen", duration=1, dependencies=[]),
+    ]
+    action_executor = DiscoveringActionExecutor(
+        discovered_actions={
+            "gen": [
+                Action(sha1="b", duration=1, dependencies=["a"]),
+                Action(sha1="c", duration=1, dependencies=["b"]),
+            ]
+        },
+        failing_actions=["a"],
+    )
+
+    report = _schedule(ActionScheduler, actions, action_executor)
+
+    assert report["error"] == "Action execution failed"
+    assert list(report["action_execution_failures"]) == ["a"]
+    assert report["actions_skipped"] == ["b", "c"]
+
+
+@pytest.mark.parametrize(
+    "discovered_actions",
+    [
+        # A cycle among the new actions.
+        [
+            Action(sha1="x", duration=1, dependencies=["y"]),
+            Action(sha1="y", duration=1, dependencies=["x"]),
+        ],
+        # An action that already exists.
+        [Action(sha1="a", duration=1, dependencies=[])],
+        # A dependency that doesn't exist.
+        [Action(sha1="x", duration=1, dependencies=["missing"])],
+    ],
+)
+def test_submit_invalid_actions(discovered_actions):
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="gen", duration=1, dependencies=[]),
+    ]
+    action_executor = DiscoveringActionExecutor(
+        discovered_actions={"gen": discovered_actions}
+    )
+
+    report = _schedule(ActionScheduler, actions, action_executor)
+
+    assert "error" not in report
+    assert len(action_executor._errors) == 1
+    assert sorted(report["action_execution_history"]) == ["a", "gen"]
+
+
+def test_submit_actions_when_not_scheduling():
+    actions_info = ActionsInfo(actions=[Action(sha1="a", duration=1, dependencies=[])])
+    scheduler = ActionScheduler(
+        parallelism=1,
+        action_status_polling_interval_s=1,
+        dry_run=True,
+        algorithm=SchedulingAlgorithm.READY_QUEUE,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+
+    with pytest.raises(ActionSchedulerError):
+        scheduler.submit_actions([Action(sha1="b", duration=1, dependencies=[])])
+
+    scheduler.schedule()
+
+    with pytest.raises(ActionSchedulerError):
+        scheduler.submit_actions([Action(sha1="b", duration=1, dependencies=[])])
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
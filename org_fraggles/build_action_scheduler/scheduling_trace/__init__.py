@@ -0,0 +1,262 @@
+import heapq
+import json
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, List, Set
+
+from pydantic import BaseModel, PrivateAttr
+
+from org_fraggles.build_action_scheduler.types import ActionPath, ActionSha1
+
+# The process ids of the tracks in the Chrome trace.
+WORKERS_PID = 1
+CRITICAL_PATH_PID = 2
+
+
+class ActionOutcome(str, Enum):
+    """How an action ended."""
+
+    # The action was executed successfully.
+    DONE = "done"
+
+    # The action execution failed.
+    FAILED = "failed"
+
+    # The action result was found in the action result cache.
+    CACHED = "cached"
+
+
+@dataclass
+class ActionTrace:
+    """When and where an action was executed.
+
+    Timestamps are monotonic, in nanoseconds since the trace was created.
+    """
+
+    # The SHA-1 of the action.
+    action_sha1: ActionSha1
+
+    # When the action became ready to be executed.
+    enqueue_ns: int | None = None
+
+    # When the action execution started.
+    start_ns: int | None = None
+
+    # When the action execution ended.
+    end_ns: int | None = None
+
+    # The worker that executed the action, from 0 to the parallelism minus 1.
+    # Workers are execution slots rather than threads or processes, and the
+    # lowest free one is always picked.
+    worker_id: int | None = None
+
+    # How the action ended.
+    outcome: ActionOutcome | None = None
+
+
+class SchedulingTrace(BaseModel):
+    """Records when actions become ready, start and end.
+
+    Not thread-safe: the scheduler records events with its lock held.
+    """
+
+    # The maximum number of actions executing in parallel.
+    parallelism: int
+
+    # When the trace was created, in monotonic nanoseconds.
+    _start_ns: int = PrivateAttr(default_factory=time.monotonic_ns)
+
+    # The trace of each action, in the order they became ready.
+    _action_traces: Dict[ActionSha1, ActionTrace] = PrivateAttr(default_factory=dict)
+
+    # Actions that became ready and haven't started yet.
+    _ready_action_sha1s: Set[ActionSha1] = PrivateAttr(default_factory=set)
+
+    # Min-heap of the workers that aren't executing an action.
+    _free_worker_ids: List[int] = PrivateAttr(default_factory=list)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._free_worker_ids = list(range(self.parallelism))
+
+    def on_enqueue(self, action_sha1: ActionSha1) -> None:
+        """Records that an action became ready to be executed.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+        """
+        self._action_trace(action_sha1).enqueue_ns = self.elapsed_ns()
+        self._ready_action_sha1s.add(action_sha1)
+
+    def on_start(self, action_sha1: ActionSha1) -> None:
+        """Records that an action execution started, on the lowest free worker.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+        """
+        action_trace = self._action_trace(action_sha1)
+        action_trace.start_ns = self.elapsed_ns()
+        self._ready_action_sha1s.discard(action_sha1)
+
+        if self._free_worker_ids:
+            action_trace.worker_id = heapq.heappop(self._free_worker_ids)
+
+    def on_end(self, action_sha1: ActionSha1, outcome: ActionOutcome) -> None:
+        """Records that an action ended, freeing its worker.
+
+        Actions that ended without starting, e.g., because their result was
+        cached, are recorded as starting and ending at the same time.
+
+        Args:
+            action_sha1: The SHA-1 of the action.
+            outcome: How the action ended.
+        """
+        action_trace = self._action_trace(action_sha1)
+        action_trace.end_ns = self.elapsed_ns()
+        action_trace.outcome = outcome
+
+        if action_trace.start_ns is None:
+            action_trace.start_ns = action_trace.end_ns
+            self._ready_action_sha1s.discard(action_sha1)
+
+        if action_trace.worker_id is not None:
+            heapq.heappush(self._free_worker_ids, action_trace.worker_id)
+
+    def ready_actions(self) -> Set[ActionSha1]:
+        """Returns the actions that became ready and haven't started yet."""
+        return self._ready_action_sha1s
+
+    def running_time_ns(self, action_sha1: ActionSha1) -> int:
+        """Returns the nanoseconds elapsed since an action started.
+
+        Args:
+            action_sha1: The SHA-1 of an action that started.
+        """
+        return self.elapsed_ns() - self._action_traces[action_sha1].start_ns
+
+    def elapsed_ns(self) -> int:
+        """Returns the nanoseconds elapsed since the trace was created."""
+        return time.monotonic_ns() - self._start_ns
+
+    def action_traces(self) -> List[ActionTrace]:
+        """Returns the trace of every action that became ready."""
+        return list(self._action_traces.values())
+
+    def to_chrome_trace(
+        self, critical_path: ActionPath | None = None
+    ) -> Dict[str, Any]:
+        """Converts the trace to the Chrome trace event format.
+
+        The result can be loaded into Perfetto or chrome://tracing. Every
+        worker gets a track with the actions it executed, and counters show
+        how many actions were running and how many were ready but waiting for
+        a worker over time. If given, the actions of the critical path are
+        repeated on a separate track, so that gaps between them stand out.
+
+        Args:
+            critical_path: The actions of the overall critical path.
+
+        Returns:
+            A JSON-serializable dict.
+        """
+        events = [
+            _metadata_event("process_name", WORKERS_PID, 0, "Workers"),
+            _metadata_event("process_name", CRITICAL_PATH_PID, 0, "Critical path"),
+            _metadata_event("thread_name", CRITICAL_PATH_PID, 0, "Critical path"),
+        ]
+        events.extend(
+            _metadata_event(
+                "thread_name", WORKERS_PID, worker_id, f"Worker {worker_id}"
+            )
+            for worker_id in range(self.parallelism)
+        )
+
+        # `(timestamp, running delta, ready delta)` tuples for the counters.
+        changes = []
+
+        for action_trace in self._action_traces.values():
+            if action_trace.enqueue_ns is not None:
+                changes.append((action_trace.enqueue_ns, 0, 1))
+
+            if action_trace.start_ns is None:
+                continue
+
+            changes.append((action_trace.start_ns, 1, -1))
+
+            if action_trace.end_ns is None:
+                continue
+
+            changes.append((action_trace.end_ns, -1, 0))
+
+            if action_trace.worker_id is not None:
+                events.append(
+                    _action_event(action_trace, WORKERS_PID, action_trace.worker_id)
+                )
+
+        for action_sha1 in critical_path or []:
+            action_trace = self._action_traces.get(action_sha1)
+
+            if action_trace is not None and action_trace.end_ns is not None:
+                events.append(_action_event(action_trace, CRITICAL_PATH_PID, 0))
+
+        running = ready = 0
+        for timestamp_ns, running_delta, ready_delta in sorted(changes):
+            running += running_delta
+            ready += ready_delta
+            events.append(
+                {
+                    "name": "Actions",
+                    "ph": "C",
+                    "ts": timestamp_ns / 1000,
+                    "pid": WORKERS_PID,
+                    "args": {"running": running, "ready": ready},
+                }
+            )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def _action_trace(self, action_sha1: ActionSha1) -> ActionTrace:
+        """Returns the trace of an action, creating it if needed."""
+        action_trace = self._action_traces.get(action_sha1)
+
+        if action_trace is None:
+            action_trace = ActionTrace(action_sha1=action_sha1)
+            self._action_traces[action_sha1] = action_trace
+
+        return action_trace
+
+
+def write_chrome_trace(path: str, chrome_trace: Dict[str, Any]) -> None:
+    """Writes a trace in the Chrome trace event format to a JSON file.
+
+    Args:
+        path: The path to the JSON file.
+        chrome_trace: The trace, as returned by `SchedulingTrace.to_chrome_trace`.
+    """
+    with open(path, "w") as f:
+        json.dump(chrome_trace, f)
+
+
+def _metadata_event(name: str, pid: int, tid: int, value: str) -> Dict[str, Any]:
+    """Returns a metadata event naming a process or thread track."""
+    return {"name": name, "ph": "M", "pid": pid, "tid": tid, "args": {"name": value}}
+
+
+def _action_event(action_trace: ActionTrace, pid: int, tid: int) -> Dict[str, Any]:
+    """Returns a complete event spanning an action execution."""
+    args = {"outcome": action_trace.outcome.value}
+
+    if action_trace.enqueue_ns is not None:
+        args["queued_ms"] = (action_trace.start_ns - action_trace.enqueue_ns) / 1e6
+
+    return {
+        "name": action_trace.action_sha1,
+        "cat": action_trace.outcome.value,
+        "ph": "X",
+        "ts": action_trace.start_ns / 1000,
+        "dur": (action_trace.end_ns - action_trace.start_ns) / 1000,
+        "pid": pid,
+        "tid": tid,
+        "args": args,
+    }
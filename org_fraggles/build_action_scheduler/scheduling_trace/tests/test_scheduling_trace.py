@@ -0,0 +1,110 @@
+import json
+import sys
+from collections import defaultdict
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.scheduler import (
+    ActionScheduler,
+    SchedulingAlgorithm,
+)
+from org_fraggles.build_action_scheduler.scheduling_trace import (
+    ActionOutcome,
+    SchedulingTrace,
+    write_chrome_trace,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def test_workers_are_reused():
+    trace = SchedulingTrace(parallelism=2)
+
+    for action_sha1 in ["a", "b", "c"]:
+        trace.on_enqueue(action_sha1)
+
+    trace.on_start("a")
+    trace.on_start("b")
+    trace.on_end("a", ActionOutcome.DONE)
+    trace.on_start("c")
+    trace.on_end("c", ActionOutcome.FAILED)
+    trace.on_end("b", ActionOutcome.DONE)
+
+    # Ended without starting.
+    trace.on_enqueue("d")
+    trace.on_end("d", ActionOutcome.CACHED)
+
+    action_traces = {t.action_sha1: t for t in trace.action_traces()}
+
+    assert action_traces["a"].worker_id == 0
+    assert action_traces["b"].worker_id == 1
+    assert action_traces["c"].worker_id == 0
+    assert action_traces["c"].outcome == ActionOutcome.FAILED
+    assert action_traces["d"].worker_id is None
+    assert action_traces["d"].start_ns == action_traces["d"].end_ns
+
+    for action_trace in action_traces.values():
+        assert action_trace.enqueue_ns <= action_trace.start_ns <= action_trace.end_ns
+
+
+@pytest.mark.parametrize(
+    "algorithm", [SchedulingAlgorithm.CRITICAL_PATHS, SchedulingAlgorithm.READY_QUEUE]
+)
+def test_scheduler_trace(tmp_path, algorithm):
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="b", duration=1, dependencies=["a"]),
+        Action(sha1="c", duration=1, dependencies=["a"]),
+        Action(sha1="d", duration=1, dependencies=["a"]),
+        Action(sha1="e", duration=1, dependencies=["b", "c", "d"]),
+    ]
+    actions_info = ActionsInfo(actions=actions)
+    scheduler = ActionScheduler(
+        parallelism=2,
+        action_status_polling_interval_s=0,
+        dry_run=True,
+        algorithm=algorithm,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    )
+    report = scheduler.schedule()
+
+    action_traces = scheduler.trace().action_traces()
+    assert sorted(t.action_sha1 for t in action_traces) == ["a", "b", "c", "d", "e"]
+
+    by_worker = defaultdict(list)
+    for action_trace in action_traces:
+        assert action_trace.outcome == ActionOutcome.DONE
+        assert action_trace.worker_id in (0, 1)
+        assert action_trace.enqueue_ns <= action_trace.start_ns <= action_trace.end_ns
+        by_worker[action_trace.worker_id].append(action_trace)
+
+    # A worker executes one action at a time.
+    for worker_traces in by_worker.values():
+        worker_traces.sort(key=lambda t: t.start_ns)
+        for previous, current in zip(worker_traces, worker_traces[1:]):
+            assert previous.end_ns <= current.start_ns
+
+    path = tmp_path / "trace.json"
+    write_chrome_trace(
+        str(path),
+        scheduler.trace().to_chrome_trace(
+            critical_path=report["critical_path"]["path"]
+        ),
+    )
+    events = json.loads(path.read_text())["traceEvents"]
+
+    complete_events = [event for event in events if event["ph"] == "X"]
+    assert len([e for e in complete_events if e["pid"] == 1]) == 5
+    assert [e["name"] for e in complete_events if e["pid"] == 2] == (
+        report["critical_path"]["path"]
+    )
+
+    counters = [event for event in events if event["ph"] == "C"]
+    assert max(event["args"]["running"] for event in counters) <= 2
+    assert counters[-1]["args"] == {"running": 0, "ready": 0}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
@@ -0,0 +1,264 @@
+import heapq
+from dataclasses import dataclass
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.dependency_analyzer import DependencyAnalyzer
+from org_fraggles.build_action_scheduler.priority_policies import (
+    CriticalPathPriorityPolicy,
+    PriorityPolicy,
+)
+from org_fraggles.build_action_scheduler.resources import (
+    BACKFILL_LOOKAHEAD,
+    ResourceBudget,
+    ResourcePool,
+)
+from org_fraggles.build_action_scheduler.types import Action
+
+# Fractional durations and priorities, e.g., estimated from a durations
+# history, are simulated in millionths, so that heap entries stay integers.
+FRACTIONAL_SCALE = 1_000_000
+
+
+@dataclass
+class SimulationReport:
+    """How a simulated schedule compares with what any schedule could achieve."""
+
+    # The maximum number of actions executing in parallel.
+    parallelism: int
+
+    # The number of actions.
+    actions_count: int
+
+    # The time from the first action start to the last action end.
+    makespan: float
+
+    # The sum of the durations of all actions.
+    total_work: float
+
+    # The duration of the overall critical path. No schedule can be shorter.
+    critical_path: float
+
+    # The largest of the critical path, the total work divided by the
+    # parallelism and, with a resource budget, the total use of each resource
+    # over time divided by the budget, i.e., the makespan with infinitely many
+    # workers or with workers never idle.
+    lower_bound: float
+
+    # How much longer than the lower bound the makespan is, as a fraction of
+    # the lower bound.
+    lower_bound_gap: float
+
+    # The fraction of the available worker time spent executing actions.
+    utilization: float
+
+
+class ScheduleSimulator(BaseModel):
+    """Simulates the scheduling of actions on a virtual clock.
+
+    Actions aren't executed: the clock jumps from one action end to the next,
+    so the makespan a parallelism would achieve is known in the time it takes
+    to walk the graph, whatever the action durations. Ready actions are
+    dispatched like the ready queue algorithm does, by priority, skipping the
+    ones that don't fit in the resources left.
+    """
+
+    # The maximum number of actions to be executing in parallel at any given time.
+    parallelism: int = Field(gt=0)
+
+    # The resources shared by the actions executing in parallel. Unlimited by
+    # default.
+    resource_budget: ResourceBudget | None = None
+
+    # Actions info.
+    actions_info: ActionsInfo
+
+    # The dependency analyzer.
+    dependency_analyzer: DependencyAnalyzer
+
+    # Decides which ready actions are executed first. Defaults to the longest
+    # remaining path first.
+    priority_policy: PriorityPolicy | None = None
+
+    def __init__(self, **data):
+        super().__init__(**data)
+
+        if self.priority_policy is None:
+            self.priority_policy = CriticalPathPriorityPolicy()
+
+        if self.resource_budget is None:
+            self.resource_budget = ResourceBudget()
+
+    def simulate(self) -> SimulationReport:
+        """Simulates the scheduling of every action.
+
+        Returns:
+            The simulation report.
+
+        Raises:
+            DependencyCycleError: If there is a dependency cycle.
+            UnknownDependencyError: If an action depends on an unknown action.
+        """
+        bottom_levels = self.dependency_analyzer.bottom_levels()
+        priorities = self.priority_policy.priorities(bottom_levels)
+
+        graph = self.actions_info.compact_graph
+        graph.compact()
+
+        # Lists index faster than arrays, which box every element they return.
+        durations = graph.durations.tolist()
+        time_scale = 1 if graph.durations.typecode == "q" else FRACTIONAL_SCALE
+        ticks = durations
+        if time_scale != 1:
+            ticks = [round(duration * time_scale) for duration in durations]
+        dependents_offsets = graph.dependents_offsets.tolist()
+        dependents = graph.dependents.tolist()
+        pending_dependencies_count = graph.dependencies_count.tolist()
+
+        # Heap entries pack a key and an action index into a single integer,
+        # `key * actions_count + index`, which compares faster than a tuple.
+        actions_count = len(graph)
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        # Without priorities, actions are keyed by the order they became
+        # ready in.
+        if priorities is None:
+            keys = None
+            ready_actions_count = 0
+        elif priorities.typecode == "d":
+            keys = [-round(priority * FRACTIONAL_SCALE) for priority in priorities]
+        else:
+            keys = [-priority for priority in priorities]
+
+        # Min-heap of ready actions, by highest priority first.
+        ready = []
+        for index in range(actions_count):
+            if pending_dependencies_count[index] == 0:
+                if keys is None:
+                    ready.append(ready_actions_count * actions_count + index)
+                    ready_actions_count += 1
+                else:
+                    ready.append(keys[index] * actions_count + index)
+        heapq.heapify(ready)
+
+        # The actions by index, to acquire their resources, unless no action
+        # can be held back by resources.
+        actions = None
+        if (
+            self.resource_budget.cpus is not None
+            or self.resource_budget.memory_mb is not None
+            or any(action.exclusive_resources for action in self.actions_info.actions)
+        ):
+            actions_by_sha1 = self.actions_info.actions_by_sha1
+            actions = [actions_by_sha1[sha1] for sha1 in graph.sha1s]
+            resource_pool = ResourcePool(
+                parallelism=self.parallelism, budget=self.resource_budget
+            )
+
+        # Min-heap of running actions, by end time.
+        running: List[int] = []
+
+        now = 0
+
+        while ready or running:
+            if actions is None:
+                while ready and len(running) < self.parallelism:
+                    index = heappop(ready) % actions_count
+                    heappush(running, (now + ticks[index]) * actions_count + index)
+            else:
+                # Actions that don't fit go back to the ready queue once the
+                # ones that do are running, like the scheduler does. An action
+                # always fits when nothing is running, so this can't stall.
+                entries_not_fitting = []
+                blocked_action = None
+
+                while (
+                    ready
+                    and len(running) < self.parallelism
+                    and len(entries_not_fitting) < BACKFILL_LOOKAHEAD
+                ):
+                    entry = heappop(ready)
+                    index = entry % actions_count
+
+                    if resource_pool.try_acquire(actions[index], blocked_action):
+                        heappush(running, (now + ticks[index]) * actions_count + index)
+                    else:
+                        entries_not_fitting.append(entry)
+                        if blocked_action is None:
+                            blocked_action = actions[index]
+
+                for entry in entries_not_fitting:
+                    heappush(ready, entry)
+
+            # Actions ending at the same time all unblock their dependents
+            # before the freed workers pick the most critical ready actions.
+            now = running[0] // actions_count
+
+            while running and running[0] // actions_count == now:
+                index = heappop(running) % actions_count
+
+                if actions is not None:
+                    resource_pool.release(actions[index])
+
+                for dependent in dependents[
+                    dependents_offsets[index] : dependents_offsets[index + 1]
+                ]:
+                    pending_dependencies_count[dependent] -= 1
+
+                    if pending_dependencies_count[dependent] == 0:
+                        if keys is None:
+                            key = ready_actions_count
+                            ready_actions_count += 1
+                        else:
+                            key = keys[dependent]
+
+                        heappush(ready, key * actions_count + dependent)
+
+        makespan = now if time_scale == 1 else now / time_scale
+        total_work = sum(durations)
+        critical_path = max(bottom_levels.bottom_levels_by_index(), default=0)
+        lower_bound = max(critical_path, total_work / self.parallelism)
+
+        if actions is not None:
+            lower_bound = max(
+                lower_bound, self._resources_lower_bound(actions, durations)
+            )
+
+        return SimulationReport(
+            parallelism=self.parallelism,
+            actions_count=len(graph),
+            makespan=makespan,
+            total_work=total_work,
+            critical_path=critical_path,
+            lower_bound=lower_bound,
+            lower_bound_gap=makespan / lower_bound - 1 if lower_bound else 0,
+            utilization=total_work / (makespan * self.parallelism) if makespan else 0,
+        )
+
+    def _resources_lower_bound(
+        self, actions: List[Action], durations: List[float]
+    ) -> float:
+        """Returns the makespan needed to fit the use of the limited resources.
+
+        Args:
+            actions: The actions by index, with the resources they demand.
+            durations: The durations of the actions, by index.
+        """
+        lower_bound = 0.0
+
+        for resource in ("cpus", "memory_mb"):
+            capacity = getattr(self.resource_budget, resource)
+            if capacity is None:
+                continue
+
+            # Demands above the budget are capped, like the resource pool does.
+            usage = sum(
+                duration * min(getattr(action, resource), capacity)
+                for action, duration in zip(actions, durations)
+            )
+            lower_bound = max(lower_bound, usage / capacity)
+
+        return lower_bound
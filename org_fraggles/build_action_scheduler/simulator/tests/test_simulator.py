@@ -0,0 +1,158 @@
+import sys
+
+import pytest
+
+from org_fraggles.build_action_scheduler.actions_info import ActionsInfo
+from org_fraggles.build_action_scheduler.benchmarks import GraphShape, generate_actions
+from org_fraggles.build_action_scheduler.dependency_analyzer import (
+    DependencyAnalyzer,
+    DependencyCycleError,
+)
+from org_fraggles.build_action_scheduler.resources import ResourceBudget
+from org_fraggles.build_action_scheduler.simulator import ScheduleSimulator
+from org_fraggles.build_action_scheduler.types import Action
+
+
+def simulate(actions, parallelism, resource_budget=None):
+    actions_info = ActionsInfo(actions=actions)
+
+    return ScheduleSimulator(
+        parallelism=parallelism,
+        resource_budget=resource_budget,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).simulate()
+
+
+def test_simulate_chain():
+    actions = [
+        Action(sha1="a", duration=1, dependencies=[]),
+        Action(sha1="b", duration=2, dependencies=["a"]),
+        Action(sha1="c", duration=3, dependencies=["b"]),
+    ]
+
+    report = simulate(actions, parallelism=4)
+
+    assert report.makespan == 6
+    assert report.total_work == 6
+    assert report.critical_path == 6
+    assert report.lower_bound == 6
+    assert report.lower_bound_gap == 0
+    assert report.utilization == 0.25
+
+
+def test_simulate_independent_actions():
+    actions = [
+        Action(sha1=f"action-{i}", duration=duration, dependencies=[])
+        for i, duration in enumerate([2, 3, 2, 3, 2])
+    ]
+
+    report = simulate(actions, parallelism=2)
+
+    # The longest actions start first: 3 and 3, then 2 and 2, then 2.
+    assert report.makespan == 7
+    assert report.lower_bound == 6
+    assert report.lower_bound_gap == pytest.approx(1 / 6)
+    assert report.utilization == pytest.approx(12 / 14)
+
+
+def test_simulate_prioritizes_critical_path():
+    actions = [
+        Action(sha1="short", duration=2, dependencies=[]),
+        Action(sha1="head", duration=1, dependencies=[]),
+        Action(sha1="tail", duration=5, dependencies=["head"]),
+    ]
+
+    report = simulate(actions, parallelism=1)
+    assert report.makespan == 8
+
+    report = simulate(actions, parallelism=2)
+    assert report.makespan == 6
+
+
+@pytest.mark.parametrize("shape", list(GraphShape))
+@pytest.mark.parametrize("parallelism", [1, 8, 1000])
+def test_simulate_respects_lower_bounds(shape, parallelism):
+    report = simulate(generate_actions(shape, 2000), parallelism)
+
+    assert report.actions_count == 2000
+    assert report.makespan >= report.lower_bound
+    assert 0 < report.utilization <= 1
+
+    if parallelism == 1:
+        assert report.makespan == report.total_work
+
+    if parallelism == 1000 and shape != GraphShape.FAN:
+        assert report.makespan == report.critical_path
+
+
+def test_simulate_dependency_cycle():
+    actions = [
+        Action(sha1="a", duration=1, dependencies=["b"]),
+        Action(sha1="b", duration=1, dependencies=["a"]),
+    ]
+
+    with pytest.raises(DependencyCycleError):
+        simulate(actions, parallelism=1)
+
+
+def test_simulate_fractional_durations():
+    actions_info = ActionsInfo(
+        actions=[
+            Action(sha1="a", duration=1, dependencies=[]),
+            Action(sha1="b", duration=1, dependencies=["a"]),
+            Action(sha1="c", duration=1, dependencies=[]),
+        ]
+    )
+    actions_info.update_durations({"a": 0.25, "b": 0.5, "c": 0.5})
+
+    report = ScheduleSimulator(
+        parallelism=1,
+        actions_info=actions_info,
+        dependency_analyzer=DependencyAnalyzer(actions_info=actions_info),
+    ).simulate()
+
+    assert report.makespan == pytest.approx(1.25)
+    assert report.critical_path == pytest.approx(0.75)
+    assert report.total_work == pytest.approx(1.25)
+
+
+def test_simulate_rejects_invalid_parallelism():
+    with pytest.raises(ValueError, match="greater than 0"):
+        simulate([Action(sha1="a", duration=1, dependencies=[])], parallelism=0)
+
+
+def test_simulate_respects_resource_budget():
+    actions = [
+        Action(sha1="big", duration=4, dependencies=[], cpus=3),
+        Action(sha1="small-1", duration=2, dependencies=[], cpus=1),
+        Action(sha1="small-2", duration=2, dependencies=[], cpus=1),
+    ]
+
+    # The big action leaves a single CPU, so the small ones run one after the
+    # other next to it.
+    report = simulate(actions, parallelism=3, resource_budget=ResourceBudget(cpus=4))
+    assert report.makespan == 4
+    assert report.lower_bound == 4
+
+    report = simulate(actions, parallelism=3, resource_budget=ResourceBudget(cpus=3))
+    assert report.makespan == 6
+    assert report.lower_bound == pytest.approx(16 / 3)
+
+
+def test_simulate_respects_exclusive_resources():
+    actions = [
+        Action(
+            sha1=f"action-{i}",
+            duration=1,
+            dependencies=[],
+            exclusive_resources=("device",),
+        )
+        for i in range(3)
+    ]
+
+    assert simulate(actions, parallelism=3).makespan == 3
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(sys.argv[1:]))
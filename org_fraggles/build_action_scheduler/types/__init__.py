@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 ActionSha1 = str
 ActionDuration = int
@@ -15,6 +15,21 @@ class Action:
     sha1: ActionSha1
     duration: ActionDuration
     dependencies: List[ActionSha1]
+    command: str | None = None
+    cpus: int = 1
+    memory_mb: int = 0
+    exclusive_resources: Tuple[str, ...] = ()
+
+
+@dataclass
+class ActionResult:
+    """The outcome of an action execution."""
+
+    # The exit code of the action. Zero means success.
+    exit_code: int
+
+    # The measured wall time of the execution, in seconds.
+    wall_time_s: float
 
 
 class ActionModel(BaseModel):
@@ -22,6 +37,21 @@ class ActionModel(BaseModel):
 
     Used for validation."""
 
+    # Only build the validator when validating for the first time, so that
+    # runs which skip validation don't pay for it at import time.
+    model_config = ConfigDict(defer_build=True)
+
     sha1: ActionSha1 = Field(..., min_length=1)
     duration: ActionDuration = Field(..., gt=0)
     dependencies: List[ActionSha1] = []
+    command: str | None = Field(default=None, min_length=1)
+
+    # The number of CPUs the action uses.
+    cpus: int = Field(default=1, ge=1)
+
+    # The memory the action uses, in MB.
+    memory_mb: int = Field(default=0, ge=0)
+
+    # Named resources that the action can't share with other actions (e.g., a
+    # device, or a service that doesn't support concurrent clients).
+    exclusive_resources: List[str] = []